@@ -0,0 +1,633 @@
+"""
+Alimentar explotacion
+
+Etapas que alimentan la base de datos con los renglones ya leidos de los archivos de explotacion de una quincena.
+
+Las usan los comandos nominas alimentar, percepciones_deducciones alimentar, cuentas alimentar_bancarias,
+cuentas alimentar_monederos y quincenas alimentar.
+
+- Reciben la sesion, las Dimensiones y los renglones de explotacion
+- NO hacen commit, quien las llama decide cuando, asi se pueden juntar varias en una sola transaccion
+- Si hay un error se muestra y se termina con sys.exit(1)
+"""
+import re
+import sys
+
+import click
+
+from cli.commands.dimensiones import Dimensiones
+from lib.exceptions import MyBulkInsertError
+from lib.fechas import quincena_to_fecha, quinquenio_count
+from lib.insercion_masiva import TAMANO_BLOQUE, InsercionMasiva
+from lib.safe_string import safe_quincena, safe_string
+from perseo.blueprints.centros_trabajos.models import CentroTrabajo
+from perseo.blueprints.conceptos.models import Concepto
+from perseo.blueprints.cuentas.models import Cuenta
+from perseo.blueprints.nominas.models import Nomina
+from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
+from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.plazas.models import Plaza
+from perseo.blueprints.quincenas.models import Quincena
+from perseo.blueprints.tabuladores.models import Tabulador
+
+
+class ReportePersonas:
+    """Anomalias y contadores de las personas insertadas o actualizadas al alimentar"""
+
+    def __init__(self):
+        self.personas_actualizadas_contador = 0
+        self.personas_actualizadas_del_tabulador = []
+        self.personas_actualizadas_del_modelo = []
+        self.personas_actualizadas_del_num_empleado = []
+        self.personas_insertadas_contador = 0
+        self.personas_sin_puestos = []
+        self.personas_sin_tabulador = []
+
+    def mostrar(self):
+        """Mostrar en la terminal los contadores y las anomalias"""
+
+        # Si hubo personas actualizadas, mostrar contador
+        if self.personas_actualizadas_contador > 0:
+            click.echo(click.style(f"  Se actualizaron {self.personas_actualizadas_contador} Personas", fg="green"))
+            for item in self.personas_actualizadas_del_tabulador:
+                click.echo(click.style(f"  {item}", fg="yellow"))
+            for item in self.personas_actualizadas_del_modelo:
+                click.echo(click.style(f"  {item}", fg="yellow"))
+            for item in self.personas_actualizadas_del_num_empleado:
+                click.echo(click.style(f"  {item}", fg="yellow"))
+
+        # Si hubo personas insertadas, mostrar contador
+        if self.personas_insertadas_contador > 0:
+            click.echo(click.style(f"  Se insertaron {self.personas_insertadas_contador} Personas", fg="green"))
+
+        # Si hubo personas_sin_puestos, mostrarlas en pantalla sin repetir, porque varias etapas pueden revisar el mismo RFC
+        personas_sin_puestos = list(dict.fromkeys(self.personas_sin_puestos))
+        if len(personas_sin_puestos) > 0:
+            click.echo(click.style(f"  Hubo {len(personas_sin_puestos)} Personas sin puestos.", fg="yellow"))
+            click.echo(click.style(f"  {', '.join(personas_sin_puestos)}", fg="yellow"))
+
+        # Si hubo personas_sin_tabulador, mostrarlas en pantalla sin repetir
+        personas_sin_tabulador = list(dict.fromkeys(self.personas_sin_tabulador))
+        if len(personas_sin_tabulador) > 0:
+            click.echo(click.style(f"  Hubo {len(personas_sin_tabulador)} Personas sin tabulador.", fg="yellow"))
+            click.echo(click.style(f"  {', '.join(personas_sin_tabulador)}", fg="yellow"))
+
+
+def consultar_genericos(dimensiones: Dimensiones) -> tuple:
+    """Consultar el puesto y el tabulador genericos para las personas que no tengan los suyos"""
+
+    # Definir el puesto generico al que se van a relacionar las personas que no tengan su puesto
+    puesto_generico = dimensiones.consultar_puesto("ND")
+    if puesto_generico is None:
+        click.echo("ERROR: Falta el puesto con clave ND.")
+        sys.exit(1)
+
+    # Definir el tabulador generico al que se van a relacionar los puestos que no tengan su tabulador
+    tabulador_generico = Tabulador.query.filter_by(puesto_id=puesto_generico.id).first()
+    if tabulador_generico is None:
+        click.echo("ERROR: Falta el tabulador del puesto con clave ND.")
+        sys.exit(1)
+
+    # Entregar
+    return puesto_generico, tabulador_generico
+
+
+def consultar_o_agregar_quincena(sesion, quincena_clave: str) -> Quincena:
+    """Consultar la quincena, si no existe se agrega sin hacer commit"""
+
+    # Consultar quincena
+    quincena = Quincena.query.filter_by(clave=quincena_clave).first()
+
+    # Si existe la quincena, pero no esta ABIERTA, entonces se termina
+    if quincena and quincena.estado != "ABIERTA":
+        click.echo(f"ERROR: Quincena {quincena_clave} no esta ABIERTA.")
+        sys.exit(1)
+
+    # Si existe la quincena, pero ha sido eliminada, entonces se termina
+    if quincena and quincena.estatus != "A":
+        click.echo(f"ERROR: Quincena {quincena_clave} ha sido eliminada.")
+        sys.exit(1)
+
+    # Si no existe la quincena, se agrega y se hace flush para tener su id
+    if quincena is None:
+        quincena = Quincena(clave=quincena_clave, estado="ABIERTA")
+        sesion.add(quincena)
+        sesion.flush()
+
+    # Entregar
+    return quincena
+
+
+def revisar_persona(sesion, dimensiones: Dimensiones, renglon, fecha_final, genericos: tuple, reporte: ReportePersonas):
+    """Consultar la Persona del renglon, si no existe se agrega y si cambia su tabulador, modelo o num_empleado se actualiza"""
+
+    # Tomar el puesto y tabulador genericos
+    puesto_generico, tabulador_generico = genericos
+
+    # Si el modelo es 2, entonces en SINDICALIZADO, se toman los quinquenios de PQ1 a PQ6
+    # Si es PME, entonces en esta fila NO esta el quinquenio, se mantiene en None
+    if renglon.modelo == 2:
+        quinquenios = renglon.quinquenios
+    else:
+        # Entonces NO es SINDICALIZADO, se define quinquenios en cero
+        quinquenios = 0
+
+    # Consultar el Puesto, si no existe se agrega a personas_sin_puestos y se le asigna el puesto_generico
+    puesto = dimensiones.consultar_puesto(renglon.puesto_clave)
+    if puesto is None:
+        reporte.personas_sin_puestos.append(renglon.rfc)
+        puesto = puesto_generico
+
+    # Consultar la Persona
+    persona = dimensiones.consultar_persona(renglon.rfc)
+
+    # Si NO existe la Persona, se agrega
+    if persona is None:
+        # Separar nombre_completo, en apellido_primero, apellido_segundo y nombres
+        separado = safe_string(renglon.nombre_completo, save_enie=True).split(" ")
+        apellido_primero = separado[0]
+        apellido_segundo = separado[1]
+        nombres = " ".join(separado[2:])
+
+        # Si el modelo es 2 y quinquenios es None, entonces es SINDICALIZADO y se calculan los quinquenios
+        if renglon.modelo == 2 and quinquenios is None:
+            fecha_ingreso = quincena_to_fecha(renglon.quincena_ingreso, dame_ultimo_dia=False)
+            quinquenios = quinquenio_count(fecha_ingreso, fecha_final)
+
+        # Consultar el tabulador que coincida con puesto_clave, modelo, nivel y quinquenios
+        tabulador = dimensiones.consultar_tabulador(puesto.id, renglon.modelo, renglon.nivel, quinquenios)
+
+        # Si no existe el tabulador, se agrega a personas_sin_tabulador y se le asigna tabulador_generico
+        if tabulador is None:
+            reporte.personas_sin_tabulador.append(renglon.rfc)
+            tabulador = tabulador_generico
+
+        # Insertar a la Persona
+        reporte.personas_insertadas_contador += 1
+        return dimensiones.agregar_persona(
+            Persona(
+                tabulador_id=tabulador.id,
+                rfc=renglon.rfc,
+                nombres=nombres,
+                apellido_primero=apellido_primero,
+                apellido_segundo=apellido_segundo,
+                modelo=renglon.modelo,
+                num_empleado=renglon.num_empleado,
+            )
+        )
+
+    # De lo contrario, se revisa si cambia la Persona de tabulador, modelo o num_empleado
+    hay_cambios = False
+
+    # Si la fila es concepto PME NO va tener los quinquenios, entonces se define con la Persona
+    if quinquenios is None:
+        quinquenios = dimensiones.consultar_tabulador_por_id(persona.tabulador_id).quinquenio
+
+    # Consultar el tabulador que coincida con puesto_clave, modelo, nivel y quinquenios
+    tabulador = dimensiones.consultar_tabulador(puesto.id, renglon.modelo, renglon.nivel, quinquenios)
+
+    # Si NO existe el tabulador, se agrega a personas_sin_tabulador y se le asigna tabulador_generico
+    if tabulador is None:
+        reporte.personas_sin_tabulador.append(renglon.rfc)
+        tabulador = tabulador_generico
+
+    # Revisar si hay que actualizar el tabulador a la Persona
+    if persona.tabulador_id != tabulador.id:
+        reporte.personas_actualizadas_del_tabulador.append(
+            f"{renglon.rfc} {persona.nombre_completo}: Tabulador: {persona.tabulador_id} -> {tabulador.id}"
+        )
+        persona.tabulador_id = tabulador.id
+        hay_cambios = True
+
+    # Revisar si hay que actualizar el modelo a la Persona
+    if persona.modelo != renglon.modelo:
+        reporte.personas_actualizadas_del_modelo.append(
+            f"{renglon.rfc} {persona.nombre_completo}: Modelo: {persona.modelo} -> {renglon.modelo}"
+        )
+        persona.modelo = renglon.modelo
+        hay_cambios = True
+
+    # Revisar si hay que actualizar el numero de empleado a la Persona
+    if persona.num_empleado != renglon.num_empleado:
+        reporte.personas_actualizadas_del_num_empleado.append(
+            f"{renglon.rfc} {persona.nombre_completo}: Num. Emp. {persona.num_empleado} -> {renglon.num_empleado}"
+        )
+        persona.num_empleado = renglon.num_empleado
+        hay_cambios = True
+
+    # Si hay cambios, agregar la Persona a la sesion
+    if hay_cambios:
+        sesion.add(persona)
+        reporte.personas_actualizadas_contador += 1
+
+    # Entregar
+    return persona
+
+
+def revisar_centro_trabajo_plaza(dimensiones: Dimensiones, renglon, contadores: dict) -> tuple:
+    """Consultar el Centro de Trabajo y la Plaza del renglon, si no existen se agregan"""
+
+    # Consultar el Centro de Trabajo, si no existe se agrega
+    centro_trabajo = dimensiones.consultar_centro_trabajo(renglon.centro_trabajo_clave)
+    if centro_trabajo is None:
+        centro_trabajo = dimensiones.agregar_centro_trabajo(CentroTrabajo(clave=renglon.centro_trabajo_clave, descripcion="ND"))
+        contadores["centros_trabajos_insertados"] += 1
+
+    # Consultar la Plaza, si no existe se agrega
+    plaza = dimensiones.consultar_plaza(renglon.plaza_clave)
+    if plaza is None:
+        plaza = dimensiones.agregar_plaza(Plaza(clave=renglon.plaza_clave, descripcion="ND"))
+        contadores["plazas_insertadas"] += 1
+
+    # Entregar
+    return centro_trabajo, plaza
+
+
+def vaciar_insercion(sesion, insercion: InsercionMasiva):
+    """Insertar los renglones pendientes, si falla se revierte la sesion y se termina"""
+    try:
+        insercion.vaciar()
+    except MyBulkInsertError as error:
+        sesion.rollback()
+        click.echo("")
+        click.echo(click.style(f"ERROR: {str(error)}", fg="red"))
+        sys.exit(1)
+
+
+def alimentar_nominas(
+    sesion,
+    dimensiones: Dimensiones,
+    quincena: Quincena,
+    renglones: tuple,
+    fecha_pago,
+    tamano_bloque: int = TAMANO_BLOQUE,
+    reporte: ReportePersonas = None,
+) -> int:
+    """Alimentar nominas con los renglones de NominaFmt2.XLS, entrega la cantidad insertada"""
+
+    # Definir la fecha_final en base a la clave de la quincena
+    fecha_final = quincena_to_fecha(quincena.clave, dame_ultimo_dia=True)
+
+    # Consultar el puesto y el tabulador genericos
+    genericos = consultar_genericos(dimensiones)
+
+    # Inicializar la insercion masiva de las nominas
+    insercion = InsercionMasiva(
+        sesion=sesion,
+        modelo=Nomina,
+        columnas=[
+            "centro_trabajo_id",
+            "persona_id",
+            "plaza_id",
+            "quincena_id",
+            "desde",
+            "desde_clave",
+            "hasta",
+            "hasta_clave",
+            "percepcion",
+            "deduccion",
+            "importe",
+            "tipo",
+            "fecha_pago",
+        ],
+        tamano_bloque=tamano_bloque,
+    )
+
+    # Inicializar el reporte, si se recibe uno lo muestra quien lo compartio entre las etapas
+    mostrar_reporte = reporte is None
+    if reporte is None:
+        reporte = ReportePersonas()
+
+    # Inicializar los contadores
+    contadores = {"centros_trabajos_insertados": 0, "plazas_insertadas": 0}
+    contador = 0
+
+    # Bucle por cada renglon
+    click.echo(f"Alimentar Nominas a la quincena {quincena.clave}: ", nl=False)
+    for renglon in renglones:
+        # Validar desde y hasta
+        try:
+            desde_clave = safe_quincena(renglon.desde_s)
+            desde = quincena_to_fecha(desde_clave, dame_ultimo_dia=False)
+            hasta_clave = safe_quincena(renglon.hasta_s)
+            hasta = quincena_to_fecha(hasta_clave, dame_ultimo_dia=True)
+        except ValueError:
+            click.echo(click.style(f"ERROR: Quincena inválida en '{renglon.desde_s}' o '{renglon.hasta_s}'", fg="red"))
+            sys.exit(1)
+
+        # Consultar el Centro de Trabajo y la Plaza, si no existen se agregan
+        centro_trabajo, plaza = revisar_centro_trabajo_plaza(dimensiones, renglon, contadores)
+
+        # Consultar la Persona, si no existe se agrega, si cambia se actualiza
+        persona = revisar_persona(sesion, dimensiones, renglon, fecha_final, genericos, reporte)
+
+        # Alimentar nomina, si tiene el concepto PME es DESPENSA, de lo contrario es SALARIO
+        try:
+            insercion.agregar(
+                (
+                    centro_trabajo.id,
+                    persona.id,
+                    plaza.id,
+                    quincena.id,
+                    desde,
+                    desde_clave,
+                    hasta,
+                    hasta_clave,
+                    renglon.percepcion,
+                    renglon.deduccion,
+                    renglon.importe,
+                    Nomina.TIPOS[renglon.tipo],
+                    fecha_pago.date(),
+                )
+            )
+        except MyBulkInsertError as error:
+            sesion.rollback()
+            click.echo("")
+            click.echo(click.style(f"ERROR: {str(error)}", fg="red"))
+            sys.exit(1)
+
+        # Incrementar contador
+        contador += 1
+
+        # Mostrar el avance con el modelo
+        click.echo(click.style(renglon.modelo, fg="cyan"), nl=False)
+
+    # Insertar los renglones pendientes
+    vaciar_insercion(sesion, insercion)
+
+    # Poner avance de linea
+    click.echo("")
+
+    # Mostrar la velocidad de la insercion masiva
+    click.echo(click.style(f"  Insercion masiva: {insercion.renglones_por_segundo} renglones por segundo", fg="green"))
+
+    # Si hubo centros_trabajos_insertados, mostrar contador
+    if contadores["centros_trabajos_insertados"] > 0:
+        click.echo(click.style(f"  Se insertaron {contadores['centros_trabajos_insertados']} Centros de Trabajo", fg="green"))
+
+    # Si hubo plazas insertadas, mostrar contador
+    if contadores["plazas_insertadas"] > 0:
+        click.echo(click.style(f"  Se insertaron {contadores['plazas_insertadas']} Plazas", fg="green"))
+
+    # Mostrar el reporte de las personas
+    if mostrar_reporte:
+        reporte.mostrar()
+
+    # Entregar la cantidad de nominas
+    return contador
+
+
+def alimentar_percepciones_deducciones(
+    sesion,
+    dimensiones: Dimensiones,
+    quincena: Quincena,
+    renglones: tuple,
+    tipo: str = "SALARIO",
+    tamano_bloque: int = TAMANO_BLOQUE,
+    reporte: ReportePersonas = None,
+) -> int:
+    """Alimentar percepciones-deducciones con los renglones de NominaFmt2.XLS, entrega la cantidad de renglones"""
+
+    # Definir la fecha_final en base a la clave de la quincena
+    fecha_final = quincena_to_fecha(quincena.clave, dame_ultimo_dia=True)
+
+    # Consultar el puesto y el tabulador genericos
+    genericos = consultar_genericos(dimensiones)
+
+    # Inicializar la insercion masiva de las percepciones-deducciones
+    insercion = InsercionMasiva(
+        sesion=sesion,
+        modelo=PercepcionDeduccion,
+        columnas=["centro_trabajo_id", "concepto_id", "persona_id", "plaza_id", "quincena_id", "importe", "tipo"],
+        tamano_bloque=tamano_bloque,
+    )
+
+    # Inicializar el reporte, si se recibe uno lo muestra quien lo compartio entre las etapas
+    mostrar_reporte = reporte is None
+    if reporte is None:
+        reporte = ReportePersonas()
+
+    # Inicializar los contadores y el listado de conceptos que no existen
+    contadores = {"centros_trabajos_insertados": 0, "plazas_insertadas": 0}
+    conceptos_no_existentes = []
+    contador = 0
+
+    # Bucle por cada renglon
+    click.echo(f"Alimentando Percepciones-Deducciones a la quincena {quincena.clave}: ", nl=False)
+    for renglon in renglones:
+        # Consultar el Centro de Trabajo y la Plaza, si no existen se agregan
+        centro_trabajo, plaza = revisar_centro_trabajo_plaza(dimensiones, renglon, contadores)
+
+        # Consultar la Persona, si no existe se agrega, si cambia se actualiza
+        persona = revisar_persona(sesion, dimensiones, renglon, fecha_final, genericos, reporte)
+
+        # Bucle por las percepciones y deducciones
+        for concepto_clave, impt in renglon.conceptos:
+            # Revisar si el Concepto existe, de lo contrario se agrega
+            concepto = dimensiones.consultar_concepto(concepto_clave)
+            if concepto is None:
+                conceptos_no_existentes.append(concepto_clave)
+                concepto = dimensiones.agregar_concepto(Concepto(clave=concepto_clave, descripcion="DESCONOCIDO"))
+
+            # Alimentar percepcion-deduccion
+            try:
+                insercion.agregar((centro_trabajo.id, concepto.id, persona.id, plaza.id, quincena.id, impt, tipo))
+            except MyBulkInsertError as error:
+                sesion.rollback()
+                click.echo("")
+                click.echo(click.style(f"ERROR: {str(error)}", fg="red"))
+                sys.exit(1)
+
+        # Incrementar contador
+        contador += 1
+
+        # Mostrar un cero en amarillo si no se agregaron percepciones-deducciones
+        if len(renglon.conceptos) == 0:
+            click.echo(click.style("0", fg="yellow"), nl=False)
+        else:
+            click.echo(click.style(".", fg="cyan"), nl=False)
+
+    # Insertar los renglones pendientes
+    vaciar_insercion(sesion, insercion)
+
+    # Poner avance de linea
+    click.echo("")
+
+    # Mostrar la velocidad de la insercion masiva
+    click.echo(click.style(f"  Insercion masiva: {insercion.renglones_por_segundo} renglones por segundo", fg="green"))
+
+    # Si hubo centros trabajos insertados, mostrar contador
+    if contadores["centros_trabajos_insertados"] > 0:
+        click.echo(click.style(f"  Se insertaron {contadores['centros_trabajos_insertados']} Centros de Trabajo", fg="green"))
+
+    # Si hubo plazas insertadas, mostrar contador
+    if contadores["plazas_insertadas"] > 0:
+        click.echo(click.style(f"  Se insertaron {contadores['plazas_insertadas']} Plazas", fg="green"))
+
+    # Si hubo conceptos no existentes, mostrarlos
+    if len(conceptos_no_existentes) > 0:
+        click.echo(click.style(f"  Hubo {len(conceptos_no_existentes)} Conceptos que no existen:", fg="yellow"))
+        click.echo(click.style(f"  {','.join(conceptos_no_existentes)}", fg="yellow"))
+
+    # Mostrar el reporte de las personas
+    if mostrar_reporte:
+        reporte.mostrar()
+
+    # Entregar la cantidad de renglones
+    return contador
+
+
+def alimentar_cuentas_bancarias(sesion, dimensiones: Dimensiones, renglones: tuple) -> int:
+    """Alimentar cuentas bancarias con los renglones de EmpleadosAlfabetico.XLS, entrega la cantidad insertada"""
+
+    # Iniciar contador de cuentas alimentadas
+    contador = 0
+    bancos_que_no_existen = []
+    personas_que_no_existen = []
+
+    # Bucle por cada renglon
+    click.echo("Alimentando Cuentas:", nl=False)
+    for renglon in renglones:
+        # Revisar si el banco existe
+        banco = dimensiones.consultar_banco(renglon.banco_clave)
+        if banco is None:
+            bancos_que_no_existen.append(renglon.banco_clave)
+            continue
+
+        # Revisar si la persona existe
+        persona = dimensiones.consultar_persona(renglon.rfc)
+        if persona is None:
+            personas_que_no_existen.append(renglon.rfc)
+            continue
+
+        # Bucle por las cuentas de la persona
+        tiene_cuenta = False
+        for cuenta in dimensiones.consultar_cuentas(persona.id):
+            # Se saltan las cuentas eliminadas
+            if cuenta.estatus == "B":
+                continue
+            # Se salta la cuenta del banco con clave 9 que es PREVIVALE
+            if cuenta.banco.clave == "9":
+                continue
+            # Si el banco y la cuenta son iguales, se salta
+            if cuenta.banco.clave == renglon.banco_clave and cuenta.num_cuenta == renglon.num_cuenta:
+                tiene_cuenta = True
+                continue
+            # Entonces se elimina la cuenta porque se va a agregar una nueva mas adelante
+            cuenta.estatus = "B"
+            sesion.add(cuenta)
+
+        # Si tiene_cuenta es verdadero, se salta
+        if tiene_cuenta:
+            continue
+
+        # Alimentar la cuenta
+        dimensiones.agregar_cuenta(
+            Cuenta(
+                persona_id=persona.id,
+                banco=banco,
+                num_cuenta=renglon.num_cuenta,
+            )
+        )
+
+        # Incrementar contador
+        contador += 1
+        if contador % 100 == 0:
+            click.echo(click.style(".", fg="cyan"), nl=False)
+
+    # Poner avance de linea
+    click.echo("")
+
+    # Si hubo bancos que no existen, se muestran
+    if len(bancos_que_no_existen) > 0:
+        click.echo(click.style(f"  Hubo {len(bancos_que_no_existen)} Bancos que NO existen. Se omiten:", fg="yellow"))
+        click.echo(click.style(f"  {', '.join(bancos_que_no_existen)}", fg="yellow"))
+
+    # Si hubo personas que no existen, se muestran
+    if len(personas_que_no_existen) > 0:
+        click.echo(click.style(f"  Hubo {len(personas_que_no_existen)} Personas que NO existen. Se omiten:", fg="yellow"))
+
+    # Entregar la cantidad de cuentas
+    return contador
+
+
+def alimentar_cuentas_monederos(sesion, dimensiones: Dimensiones, renglones: tuple) -> tuple:
+    """Alimentar cuentas monederos con los renglones de Monederos.XLS, entrega las cantidades de nuevas y bajas"""
+
+    # Consultar el banco con clave 9 que es PREVIVALE
+    banco = dimensiones.consultar_banco("9")
+    if banco is None:
+        click.echo("ERROR: No existe el banco con clave 9")
+        sys.exit(1)
+
+    # Iniciar contador de monederos alimentadas
+    contador_nuevas = 0
+    contador_bajas = 0
+    contador_num_tarjeta_invalido = 0
+    personas_que_no_existen = []
+
+    # Bucle por cada renglon
+    click.echo("Alimentando Monederos: ", nl=False)
+    for renglon in renglones:
+        # Si RFC es un string vacio, se salta
+        if renglon.rfc == "":
+            continue
+
+        # Validar que el num_tarjeta sea de 16 digitos, de lo contrario, se pone en 16 ceros
+        num_tarjeta = renglon.num_tarjeta
+        if re.match(r"^\d{16}$", num_tarjeta) is None:
+            contador_num_tarjeta_invalido += 1
+            num_tarjeta = "0" * 16
+
+        # Revisar si la persona existe
+        persona = dimensiones.consultar_persona(renglon.rfc)
+        if persona is None:
+            personas_que_no_existen.append(renglon.rfc)
+            continue
+
+        # Consultar las cuentas de la persona, con el banco 9
+        cuentas = [cuenta for cuenta in dimensiones.consultar_cuentas(persona.id) if cuenta.banco == banco]
+
+        # Si no tiene cuentas, hay que agregar una cuenta nueva
+        hay_que_agregar_cuenta = len(cuentas) == 0
+
+        #  De lo contrario, ya tiene cuentas, hay que revisar sus cuentas
+        for cuenta in cuentas:
+            # Si el num_cuenta es diferente, se le agrega la nueva y se da de baja la anterior
+            if cuenta.num_cuenta != num_tarjeta and cuenta.estatus == "A":
+                hay_que_agregar_cuenta = True
+                cuenta.estatus = "B"
+                sesion.add(cuenta)
+                contador_bajas += 1
+
+        # Si no hay que agregar una cuenta, se salta
+        if not hay_que_agregar_cuenta:
+            continue
+
+        # Agregar la cuenta nueva
+        dimensiones.agregar_cuenta(
+            Cuenta(
+                persona_id=persona.id,
+                banco=banco,
+                num_cuenta=num_tarjeta,
+            )
+        )
+
+        # Incrementar contador
+        contador_nuevas += 1
+        if contador_nuevas % 100 == 0:
+            click.echo(click.style(".", fg="cyan"), nl=False)
+
+    # Poner avance de linea
+    click.echo("")
+
+    # Si hubo numeros de tarjeta invalidos, se muestra el contador
+    if contador_num_tarjeta_invalido > 0:
+        click.echo(click.style(f"  Fallaron {contador_num_tarjeta_invalido} mun_cuenta. Se llenaron con ceros.", fg="yellow"))
+
+    # Si hubo personas que no existen, se muestran
+    if len(personas_que_no_existen) > 0:
+        click.echo(click.style(f"  Hubo {len(personas_que_no_existen)} Personas que NO existen. Se omiten:", fg="yellow"))
+
+    # Entregar las cantidades de nuevas y bajas
+    return contador_nuevas, contador_bajas
@@ -0,0 +1,121 @@
+"""
+Lectura de los CFDI de nomina timbrados
+
+Toma de cada archivo XML solo los atributos de cfdi:Emisor, cfdi:Receptor y tfd:TimbreFiscalDigital,
+leyendo con iterparse y deteniendose en cuanto tiene los tres, sin construir el arbol completo.
+
+- Cada archivo se entrega como DatosCfdi, una tupla que se puede pasar entre procesos
+- leer_cfdis reparte los archivos en un ProcessPoolExecutor y entrega los resultados en el mismo orden
+
+Estructura del CFDI version 4.0, solo con los elementos que se leen
+
+- cfdi:Comprobante [Version, Serie, Folio, Fecha, SubTotal, Descuento, Moneda, Total, ...]
+  - cfdi:Emisor [Rfc, Nombre, RegimenFiscal]
+  - cfdi:Receptor [Rfc, Nombre, DomicilioFiscalReceptor, RegimenFiscalReceptor, UsoCFDI]
+  - cfdi:Conceptos
+  - cfdi:Complemento
+    - tfd:TimbreFiscalDigital [Version, UUID, FechaTimbrado, RfcProvCertif, SelloCFD, NoCertificadoSAT, SelloSAT]
+    - nomina12:Nomina
+
+Ejemplo de uso
+
+    for datos in leer_cfdis(sorted(timbrados_dir.glob("*.xml")), procesos=4):
+        if datos.es_comprobante and datos.receptor_rfc is not None:
+            click.echo(f"{datos.receptor_rfc} {datos.tfd_uuid}")
+
+"""
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+XML_TAG_CFD_PREFIX = "{http://www.sat.gob.mx/cfd/4}"
+XML_TAG_TFD_PREFIX = "{http://www.sat.gob.mx/TimbreFiscalDigital}"
+
+TAG_COMPROBANTE = f"{XML_TAG_CFD_PREFIX}Comprobante"
+TAG_EMISOR = f"{XML_TAG_CFD_PREFIX}Emisor"
+TAG_RECEPTOR = f"{XML_TAG_CFD_PREFIX}Receptor"
+TAG_TIMBRE_FISCAL_DIGITAL = f"{XML_TAG_TFD_PREFIX}TimbreFiscalDigital"
+
+ARCHIVOS_POR_BLOQUE = 64
+
+
+class DatosCfdi(NamedTuple):
+    """Datos de un CFDI de nomina que se necesitan para actualizar su timbrado"""
+
+    ruta: Path
+    es_comprobante: bool
+    emisor_rfc: Optional[str] = None
+    emisor_nombre: Optional[str] = None
+    emisor_regimen_fiscal: Optional[str] = None
+    receptor_rfc: Optional[str] = None
+    receptor_nombre: Optional[str] = None
+    tfd_version: Optional[str] = None
+    tfd_uuid: Optional[str] = None
+    tfd_fecha_timbrado: Optional[str] = None
+    tfd_sello_cfd: Optional[str] = None
+    tfd_num_cert_sat: Optional[str] = None
+    tfd_sello_sat: Optional[str] = None
+
+
+def leer_cfdi(ruta: Path) -> DatosCfdi:
+    """Leer de un archivo XML los datos del Emisor, Receptor y TimbreFiscalDigital"""
+
+    # Inicializar los atributos de los elementos buscados
+    emisor = {}
+    receptor = {}
+    timbre = {}
+
+    # Los atributos ya estan completos al abrir cada elemento, entonces basta con el evento start
+    with open(ruta, "rb") as archivo:
+        try:
+            for numero, (_, elemento) in enumerate(ET.iterparse(archivo, events=("start",))):
+                # Validar que el tag raiz sea cfdi:Comprobante
+                if numero == 0 and elemento.tag != TAG_COMPROBANTE:
+                    return DatosCfdi(ruta, False)
+
+                # Tomar los atributos de los elementos buscados
+                if elemento.tag == TAG_EMISOR:
+                    emisor = dict(elemento.attrib)
+                elif elemento.tag == TAG_RECEPTOR:
+                    receptor = dict(elemento.attrib)
+                elif elemento.tag == TAG_TIMBRE_FISCAL_DIGITAL:
+                    timbre = dict(elemento.attrib)
+
+                # Detenerse en cuanto se tengan los tres
+                if emisor and receptor and timbre:
+                    break
+        except ET.ParseError:
+            return DatosCfdi(ruta, False)
+
+    # Entregar los datos
+    return DatosCfdi(
+        ruta=ruta,
+        es_comprobante=True,
+        emisor_rfc=emisor.get("Rfc"),
+        emisor_nombre=emisor.get("Nombre"),
+        emisor_regimen_fiscal=emisor.get("RegimenFiscal"),
+        receptor_rfc=receptor.get("Rfc"),
+        receptor_nombre=receptor.get("Nombre"),
+        tfd_version=timbre.get("Version"),
+        tfd_uuid=timbre.get("UUID"),
+        tfd_fecha_timbrado=timbre.get("FechaTimbrado"),
+        tfd_sello_cfd=timbre.get("SelloCFD"),
+        tfd_num_cert_sat=timbre.get("NoCertificadoSAT"),
+        tfd_sello_sat=timbre.get("SelloSAT"),
+    )
+
+
+def leer_cfdis(rutas: list, procesos: int = None) -> list:
+    """Leer varios archivos XML en procesos paralelos, entrega la lista de DatosCfdi en el mismo orden"""
+
+    # Si se pide un solo proceso, o hay pocos archivos, leer en este mismo proceso
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+    if procesos <= 1 or len(rutas) <= ARCHIVOS_POR_BLOQUE:
+        return [leer_cfdi(ruta) for ruta in rutas]
+
+    # Repartir los archivos por bloques entre los procesos
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        return list(ejecutor.map(leer_cfdi, rutas, chunksize=ARCHIVOS_POR_BLOQUE))
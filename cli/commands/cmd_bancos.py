@@ -8,14 +8,13 @@ from pathlib import Path
 import click
 
 from lib.safe_string import safe_string
-from perseo.app import create_app
+from perseo.app import get_app
 from perseo.blueprints.bancos.models import Banco
 from perseo.extensions import database
 
 BANCOS_CSV = "seed/bancos.csv"
 
-app = create_app()
-app.app_context().push()
+app = get_app()
 
 
 @click.group()
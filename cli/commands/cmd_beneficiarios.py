@@ -9,7 +9,7 @@ from pathlib import Path
 import click
 
 from lib.safe_string import QUINCENA_REGEXP, safe_rfc, safe_string
-from perseo.app import create_app
+from perseo.app import get_app
 from perseo.blueprints.bancos.models import Banco
 from perseo.blueprints.beneficiarios.models import Beneficiario
 from perseo.blueprints.beneficiarios_cuentas.models import BeneficiarioCuenta
@@ -19,9 +19,7 @@ from perseo.extensions import database
 
 BENEFICIARIOS_CSV = "seed/beneficiarios.csv"
 
-app = create_app()
-app.app_context().push()
-database.app = app
+app = get_app()
 
 
 @click.group()
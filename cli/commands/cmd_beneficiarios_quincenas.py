@@ -10,7 +10,7 @@ from dotenv import load_dotenv
 from openpyxl import Workbook
 
 from lib.safe_string import QUINCENA_REGEXP, safe_string
-from perseo.app import create_app
+from perseo.app import get_app
 from perseo.blueprints.bancos.models import Banco
 from perseo.blueprints.beneficiarios.models import Beneficiario
 from perseo.blueprints.beneficiarios_cuentas.models import BeneficiarioCuenta
@@ -18,9 +18,7 @@ from perseo.blueprints.beneficiarios_quincenas.models import BeneficiarioQuincen
 from perseo.blueprints.quincenas.models import Quincena
 from perseo.extensions import database
 
-app = create_app()
-app.app_context().push()
-database.app = app
+app = get_app()
 
 
 @click.group()
@@ -64,11 +62,11 @@ def generar(quincena_clave: str):
 
     # TODO: Si no hay quincenas de los beneficiarios, tomamos la quincena anterior para agregar nuevos registros
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Iniciar el archivo XLSX en modo solo escritura, las filas se escriben conforme se agregan sin guardarlas en memoria
+    libro = Workbook(write_only=True)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Crear la hoja del libro XLSX
+    hoja = libro.create_sheet()
 
     # Agregar la fila con las cabeceras de las columnas
     hoja.append(
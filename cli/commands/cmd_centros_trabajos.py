@@ -12,7 +12,7 @@ from dotenv import load_dotenv
 
 from lib.exceptions import MyAnyError
 from lib.safe_string import safe_clave, safe_string
-from perseo.app import create_app
+from perseo.app import get_app
 from perseo.blueprints.centros_trabajos.models import CentroTrabajo
 from perseo.blueprints.centros_trabajos.tasks import exportar_xlsx
 from perseo.extensions import database
@@ -25,9 +25,7 @@ TIMEOUT = 12
 
 CENTROS_TRABAJOS_CSV = "seed/centros_trabajos.csv"
 
-app = create_app()
-app.app_context().push()
-database.app = app
+app = get_app()
 
 
 @click.group()
@@ -17,7 +17,7 @@ import click
 
 from lib.exceptions import MyAnyError
 from lib.safe_string import QUINCENA_REGEXP, safe_clave, safe_string
-from perseo.app import create_app
+from perseo.app import get_app
 from perseo.blueprints.conceptos.models import Concepto
 from perseo.blueprints.conceptos.tasks import exportar_xlsx
 from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
@@ -25,8 +25,7 @@ from perseo.blueprints.quincenas.models import Quincena
 
 CONCEPTOS_CSV = "seed/conceptos.csv"
 
-app = create_app()
-app.app_context().push()
+app = get_app()
 
 
 @click.group()
@@ -12,12 +12,13 @@ import sys
 from pathlib import Path
 
 import click
-import xlrd
 from dotenv import load_dotenv
 
+from cli.commands.alimentar_explotacion import alimentar_cuentas_bancarias, alimentar_cuentas_monederos
+from cli.commands.dimensiones import Dimensiones
+from cli.commands.explotacion import leer_cuentas_bancarias, leer_monederos
 from lib.safe_string import QUINCENA_REGEXP
-from perseo.app import create_app
-from perseo.blueprints.bancos.models import Banco
+from perseo.app import get_app
 from perseo.blueprints.centros_trabajos.models import CentroTrabajo
 from perseo.blueprints.conceptos.models import Concepto
 from perseo.blueprints.conceptos_productos.models import ConceptoProducto
@@ -33,9 +34,7 @@ EXPLOTACION_BASE_DIR = os.environ.get("EXPLOTACION_BASE_DIR")
 CUENTAS_FILENAME_XLS = "EmpleadosAlfabetico.XLS"
 MONEDEROS_FILENAME_XLS = "Monederos.XLS"
 
-app = create_app()
-app.app_context().push()
-database.app = app
+app = get_app()
 
 
 @click.group()
@@ -70,90 +69,19 @@ def alimentar_bancarias(quincena: str):
         click.echo(f"ERROR: {str(ruta)} no es un archivo.")
         sys.exit(1)
 
-    # Abrir el archivo XLS con xlrd
-    libro = xlrd.open_workbook(str(ruta))
+    # Leer el archivo XLS una sola vez, o tomarlo del cache si ya se leyo antes
+    renglones = leer_cuentas_bancarias(ruta)
 
-    # Obtener la primera hoja
-    hoja = libro.sheet_by_index(0)
+    # Cargar en memoria los catalogos para no consultar la base de datos por cada fila
+    dimensiones = Dimensiones(sesion)
 
-    # Iniciar contador de cuentas alimentadas
-    contador = 0
-    bancos_que_no_existen = []
-    personas_que_no_existen = []
-
-    # Bucle por cada fila
-    click.echo("Alimentando Cuentas:", nl=False)
-    for fila in range(1, hoja.nrows):
-        # Tomar las columnas
-        rfc = hoja.cell_value(fila, 0)
-        bco_admdor = str(int(hoja.cell_value(fila, 23)))  # Tiene 5 y 10
-        emp_cta_bancaria = str(int(hoja.cell_value(fila, 22)))
-
-        # Revisar si el banco existe
-        banco = Banco.query.filter_by(clave=bco_admdor).first()
-        if banco is None:
-            bancos_que_no_existen.append(bco_admdor)
-            continue
-
-        # Revisar si la persona existe
-        persona = Persona.query.filter_by(rfc=rfc).first()
-        if persona is None:
-            personas_que_no_existen.append(rfc)
-            continue
-
-        # Bucle por las cuentas de la persona
-        tiene_cuenta = False
-        contador_cuentas_bajas = 0
-        for cuentas in persona.cuentas:
-            # Se saltan las cuentas eliminadas
-            if cuentas.estatus == "B":
-                continue
-            # Se salta la cuenta del banco con clave 9 que es PREVIVALE
-            if cuentas.banco.clave == "9":
-                continue
-            # Si el banco y la cuenta son iguales, se salta
-            if cuentas.banco.clave == bco_admdor and cuentas.num_cuenta == emp_cta_bancaria:
-                tiene_cuenta = True
-                continue
-            # Entonces se elimina la cuenta porque se va a agregar una nueva mas adelante
-            cuentas.estatus = "B"
-            sesion.add(cuentas)
-            contador_cuentas_bajas += 1
-
-        # Si tiene_cuenta es verdadero, se salta
-        if tiene_cuenta:
-            continue
-
-        # Alimentar la cuenta
-        cuenta = Cuenta(
-            persona_id=persona.id,
-            banco_id=banco.id,
-            num_cuenta=emp_cta_bancaria,
-        )
-        sesion.add(cuenta)
-
-        # Incrementar contador
-        contador += 1
-        if contador % 100 == 0:
-            click.echo(click.style(".", fg="cyan"), nl=False)
-
-    # Poner avance de linea
-    click.echo("")
+    # Alimentar las cuentas bancarias
+    contador = alimentar_cuentas_bancarias(sesion, dimensiones, renglones)
 
     # Cerrar la sesion para que se guarden todos los datos en la base de datos
     sesion.commit()
     sesion.close()
 
-    # Si hubo bancos que no existen, se muestran
-    if len(bancos_que_no_existen) > 0:
-        click.echo(click.style(f"  Hubo {len(bancos_que_no_existen)} Bancos que NO existen. Se omiten:", fg="yellow"))
-        click.echo(click.style(f"  {', '.join(bancos_que_no_existen)}", fg="yellow"))
-
-    # Si hubo personas que no existen, se muestran
-    if len(personas_que_no_existen) > 0:
-        click.echo(click.style(f"  Hubo {len(personas_que_no_existen)} Personas que NO existen. Se omiten:", fg="yellow"))
-        # click.echo(click.style(f"  {', '.join(personas_que_no_existen)}", fg="yellow"))
-
     # Mensaje termino
     click.echo(click.style(f"  Alimentar Cuentas Bancarias: {contador} insertadas.", fg="green"))
 
@@ -185,98 +113,19 @@ def alimentar_monederos(quincena: str):
         click.echo(f"ERROR: {str(ruta)} no es un archivo.")
         sys.exit(1)
 
-    # Consultar el banco con clave 9 que es PREVIVALE
-    banco = Banco.query.filter_by(clave="9").first()
-    if banco is None:
-        click.echo("ERROR: No existe el banco con clave 9")
-        sys.exit(1)
-
-    # Abrir el archivo XLS con xlrd
-    libro = xlrd.open_workbook(str(ruta))
-
-    # Obtener la primera hoja
-    hoja = libro.sheet_by_index(0)
-
-    # Iniciar contador de monederos alimentadas
-    contador_nuevas = 0
-    contador_bajas = 0
-    contador_num_tarjeta_invalido = 0
-    personas_que_no_existen = []
-
-    # Bucle por cada fila
-    click.echo("Alimentando Monederos: ", nl=False)
-    for fila in range(1, hoja.nrows):
-        # Tomar las columnas
-        rfc = str(hoja.cell_value(fila, 1)).strip().upper()
-        num_tarjeta = str(hoja.cell_value(fila, 4)).strip()
+    # Leer el archivo XLS una sola vez, o tomarlo del cache si ya se leyo antes
+    renglones = leer_monederos(ruta)
 
-        # Si RFC es un string vacio, se salta
-        if rfc == "":
-            continue
+    # Cargar en memoria los catalogos para no consultar la base de datos por cada fila
+    dimensiones = Dimensiones(sesion)
 
-        # Validar que el num_tarjeta sea de 16 digitos, de lo contrario, se pone en 16 ceros
-        if re.match(r"^\d{16}$", num_tarjeta) is None:
-            contador_num_tarjeta_invalido += 1
-            num_tarjeta = "0" * 16
-
-        # Revisar si la persona existe
-        persona = Persona.query.filter_by(rfc=rfc).first()
-        if persona is None:
-            personas_que_no_existen.append(rfc)
-            continue
-
-        # Consultar las cuentas de la persona, con el banco 9
-        cuentas = Cuenta.query.filter_by(persona_id=persona.id).filter_by(banco_id=banco.id).all()
-
-        # Inicializar hay_nueva_cuenta en falso
-        hay_que_agregar_cuenta = False
-
-        # Si no tiene cuentas, hay que agregar una cuenta nueva
-        if len(cuentas) == 0:
-            hay_que_agregar_cuenta = True
-
-        #  De lo contrario, ya tiene cuentas, hay que revisar sus cuentas
-        for cuenta in cuentas:
-            # Si el num_cuenta es diferente, se le agrega la nueva y se da de baja la anterior
-            if cuenta.num_cuenta != num_tarjeta and cuenta.estatus == "A":
-                hay_que_agregar_cuenta = True
-                cuenta.estatus = "B"
-                sesion.add(cuenta)
-                contador_bajas += 1
-
-        # Si no hay que agregar una cuenta, se salta
-        if not hay_que_agregar_cuenta:
-            continue
-
-        # Agregar la cuenta nueva
-        cuenta_nueva = Cuenta(
-            persona_id=persona.id,
-            banco_id=banco.id,
-            num_cuenta=num_tarjeta,
-        )
-        sesion.add(cuenta_nueva)
-
-        # Incrementar contador
-        contador_nuevas += 1
-        if contador_nuevas % 100 == 0:
-            click.echo(click.style(".", fg="cyan"), nl=False)
-
-    # Poner avance de linea
-    click.echo("")
+    # Alimentar los monederos
+    contador_nuevas, contador_bajas = alimentar_cuentas_monederos(sesion, dimensiones, renglones)
 
     # Cerrar la sesion para que se guarden todos los datos en la base de datos
     sesion.commit()
     sesion.close()
 
-    # Si hubo numeros de tarjeta invalidos, se muestra el contador
-    if contador_num_tarjeta_invalido > 0:
-        click.echo(click.style(f"  Fallaron {contador_num_tarjeta_invalido} mun_cuenta. Se llenaron con ceros.", fg="yellow"))
-
-    # Si hubo personas que no existen, se muestran
-    if len(personas_que_no_existen) > 0:
-        click.echo(click.style(f"  Hubo {len(personas_que_no_existen)} Personas que NO existen. Se omiten:", fg="yellow"))
-        # click.echo(click.style(f"  {', '.join(personas_que_no_existen)}", fg="yellow"))
-
     # Mensaje termino
     click.echo(click.style(f"  Alimentar Monederos: {contador_nuevas} insertados y {contador_bajas} eliminados.", fg="green"))
 
@@ -288,8 +137,11 @@ def agregar_cuentas_faltantes():
     # Iniciar sesion con la base de datos para que la alimentacion sea rapida
     sesion = database.session
 
+    # Cargar en memoria los catalogos para no consultar la base de datos por cada persona
+    dimensiones = Dimensiones(sesion)
+
     # Consultar el Banco Santander
-    banco = Banco.query.filter_by(clave="5").first()
+    banco = dimensiones.consultar_banco("5")
 
     # Si no se encuentra el banco, se termina
     if banco is None:
@@ -308,7 +160,7 @@ def agregar_cuentas_faltantes():
     contador = 0
     for persona in personas:
         # Consultar las cuentas de la persona
-        cuentas = Cuenta.query.filter_by(persona_id=persona.id).all()
+        cuentas = dimensiones.consultar_cuentas(persona.id)
 
         # Tomar la cuenta de la persona que no tenga la clave 9, porque esa clave es la de DESPENSA
         tiene_cuenta_bancaria = False
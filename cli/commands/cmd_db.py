@@ -6,6 +6,7 @@ import sys
 
 import click
 from dotenv import load_dotenv
+from sqlalchemy import text
 
 from cli.commands.alimentar_autoridades import alimentar_autoridades
 from cli.commands.alimentar_distritos import alimentar_distritos
@@ -19,21 +20,20 @@ from cli.commands.respaldar_distritos import respaldar_distritos
 from cli.commands.respaldar_modulos import respaldar_modulos
 from cli.commands.respaldar_roles_permisos import respaldar_roles_permisos
 from cli.commands.respaldar_usuarios_roles import respaldar_usuarios_roles
-from perseo.app import create_app
+from perseo.app import get_app
 from perseo.blueprints.autoridades.models import Autoridad
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.distritos.models import Distrito
 from perseo.blueprints.entradas_salidas.models import EntradaSalida
 from perseo.blueprints.modulos.models import Modulo
 from perseo.blueprints.permisos.models import Permiso
+from perseo.blueprints.personas.models import INDICES_TRIGRAMAS
 from perseo.blueprints.roles.models import Rol
 from perseo.blueprints.usuarios.models import Usuario
 from perseo.blueprints.usuarios_roles.models import UsuarioRol
 from perseo.extensions import database
 
-app = create_app()
-app.app_context().push()
-database.app = app
+app = get_app()
 
 load_dotenv()
 ENTORNO_IMPLEMENTACION = os.getenv("ENTORNO_IMPLEMENTACION")
@@ -71,6 +71,20 @@ def inicializar():
     click.echo("Termina inicializar.")
 
 
+@click.command()
+def crear_indices_trigramas():
+    """Crear la extension pg_trgm y los indices de trigramas de personas en una base de datos existente"""
+    if database.engine.dialect.name != "postgresql":
+        click.echo("ERROR: Los indices de trigramas requieren PostgreSQL.")
+        sys.exit(1)
+    with database.engine.begin() as conexion:
+        conexion.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for indice in INDICES_TRIGRAMAS:
+            indice.create(conexion, checkfirst=True)
+            click.echo(f"  Indice {indice.name} listo")
+    click.echo("Termina crear indices de trigramas.")
+
+
 @click.command()
 @click.pass_context
 def reiniciar(ctx):
@@ -92,6 +106,7 @@ def respaldar(ctx):
 
 
 cli.add_command(alimentar)
+cli.add_command(crear_indices_trigramas)
 cli.add_command(inicializar)
 cli.add_command(reiniciar)
 cli.add_command(respaldar)
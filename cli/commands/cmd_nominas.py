@@ -1,9 +1,12 @@
 """
 CLI Nominas
 """
+import multiprocessing
 import os
 import re
 import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -11,21 +14,24 @@ import click
 import xlrd
 from openpyxl import Workbook, load_workbook
 
-from lib.fechas import quincena_to_fecha, quinquenio_count
-from lib.safe_string import QUINCENA_REGEXP, safe_clave, safe_quincena, safe_string
-from perseo.app import create_app
+from cli.commands.alimentar_explotacion import alimentar_nominas, consultar_o_agregar_quincena
+from cli.commands.dimensiones import Dimensiones
+from cli.commands.explotacion import leer_nominas_fmt2
+from cli.commands.medir_xlsx import MODOS, medir_libro
+from lib.exceptions import MyEmptyError
+from lib.fechas import quincena_to_fecha
+from lib.insercion_masiva import TAMANO_BLOQUE
+from lib.safe_string import QUINCENA_REGEXP, safe_quincena, safe_string
+from perseo.app import get_app
 from perseo.blueprints.bancos.models import Banco
-from perseo.blueprints.centros_trabajos.models import CentroTrabajo
-from perseo.blueprints.conceptos.models import Concepto
 from perseo.blueprints.conceptos_productos.models import ConceptoProducto
+from perseo.blueprints.nominas.generators.consecutivos import reservar_bloques_bancos
+from perseo.blueprints.nominas.generators.timbrados import elaborar_timbrados
 from perseo.blueprints.nominas.models import Nomina
 from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
-from perseo.blueprints.personas.models import Persona
 from perseo.blueprints.plazas.models import Plaza
 from perseo.blueprints.productos.models import Producto
-from perseo.blueprints.puestos.models import Puesto
 from perseo.blueprints.quincenas.models import Quincena
-from perseo.blueprints.tabuladores.models import Tabulador
 from perseo.blueprints.timbrados.models import Timbrado
 from perseo.extensions import database
 
@@ -37,14 +43,7 @@ BONOS_FILENAME_XLS = "Bonos.XLS"
 NOMINAS_FILENAME_XLS = "NominaFmt2.XLS"
 SERICA_FILENAME_XLSX = "SERICA.xlsx"
 
-PATRON_RFC = "PJE901211TI9"
-COMPANIA_NOMBRE = "PODER JUDICIAL DEL ESTADO DE COAHUILA DE ZARAGOZA"
-COMPANIA_RFC = PATRON_RFC
-COMPANIA_CP = "25000"
-
-app = create_app()
-app.app_context().push()
-database.app = app
+app = get_app()
 
 
 @click.group()
@@ -138,7 +137,8 @@ def actualizar_timbrados(quincena_clave: str):
 @click.command()
 @click.argument("quincena_clave", type=str)
 @click.argument("fecha_pago_str", type=str)
-def alimentar(quincena_clave: str, fecha_pago_str: str):
+@click.option("--tamano-bloque", type=int, default=TAMANO_BLOQUE, help="Cantidad de renglones por bloque al insertar")
+def alimentar(quincena_clave: str, fecha_pago_str: str, tamano_bloque: int):
     """Alimentar nominas"""
 
     # Iniciar sesion con la base de datos para que la alimentacion sea rapida
@@ -149,13 +149,6 @@ def alimentar(quincena_clave: str, fecha_pago_str: str):
         click.echo("ERROR: Quincena inválida.")
         sys.exit(1)
 
-    # Definir la fecha_final en base a la clave de la quincena
-    try:
-        fecha_final = quincena_to_fecha(quincena_clave, dame_ultimo_dia=True)
-    except ValueError:
-        click.echo("ERROR: Quincena inválida.")
-        sys.exit(1)
-
     # Validar fecha_pago
     try:
         fecha_pago = datetime.strptime(fecha_pago_str, "%Y-%m-%d")
@@ -177,309 +170,21 @@ def alimentar(quincena_clave: str, fecha_pago_str: str):
         click.echo(f"ERROR: {str(ruta)} no es un archivo.")
         sys.exit(1)
 
-    # Consultar quincena
-    quincena = Quincena.query.filter_by(clave=quincena_clave).first()
-
-    # Si existe la quincena, pero no esta ABIERTA, entonces se termina
-    if quincena and quincena.estado != "ABIERTA":
-        click.echo(f"ERROR: Quincena {quincena_clave} no esta ABIERTA.")
-        sys.exit(1)
-
-    # Si existe la quincena, pero ha sido eliminada, entonces se termina
-    if quincena and quincena.estatus != "A":
-        click.echo(f"ERROR: Quincena {quincena_clave} esta sido eliminada.")
-        sys.exit(1)
-
-    # Si no existe la quincena, se agrega
-    if quincena is None:
-        quincena = Quincena(clave=quincena_clave, estado="ABIERTA")
-        sesion.add(quincena)
-        sesion.commit()
-
-    # Abrir el archivo XLS con xlrd
-    libro = xlrd.open_workbook(str(ruta))
-
-    # Obtener la primera hoja
-    hoja = libro.sheet_by_index(0)
-
-    # Definir el puesto generico al que se van a relacionar las personas que no tengan su puesto
-    puesto_generico = Puesto.query.filter_by(clave="ND").first()
-    if puesto_generico is None:
-        click.echo("ERROR: Falta el puesto con clave ND.")
-        sys.exit(1)
-
-    # Definir el tabulador generico al que se van a relacionar los puestos que no tengan su tabulador
-    tabulador_generico = Tabulador.query.filter_by(puesto_id=puesto_generico.id).first()
-    if tabulador_generico is None:
-        click.echo("ERROR: Falta el tabulador del puesto con clave ND.")
-        sys.exit(1)
-
-    # Inicializar los listados con las anomalias
-    personas_actualizadas_del_tabulador = []
-    personas_actualizadas_del_modelo = []
-    personas_actualizadas_del_num_empleado = []
-    personas_sin_puestos = []
-    personas_sin_tabulador = []
-
-    # Iniciar contadores
-    contador = 0
-    centros_trabajos_insertados_contador = 0
-    personas_actualizadas_contador = 0
-    personas_insertadas_contador = 0
-    plazas_insertadas_contador = 0
-
-    # Bucle por cada fila
-    click.echo(f"Alimentar Nominas a la quincena {quincena.clave}: ", nl=False)
-    for fila in range(1, hoja.nrows):
-        # Tomar las columnas
-        centro_trabajo_clave = hoja.cell_value(fila, 1)
-        plaza_clave = hoja.cell_value(fila, 8)
-        percepcion = int(hoja.cell_value(fila, 12)) / 100.0
-        deduccion = int(hoja.cell_value(fila, 13)) / 100.0
-        impte = int(hoja.cell_value(fila, 14)) / 100.0
-        desde_s = str(int(hoja.cell_value(fila, 16)))
-        hasta_s = str(int(hoja.cell_value(fila, 17)))
-
-        # Tomar las columnas con datos de la Persona
-        rfc = hoja.cell_value(fila, 2)
-        modelo = int(hoja.cell_value(fila, 236))
-        nombre_completo = hoja.cell_value(fila, 3)
-        num_empleado = int(hoja.cell_value(fila, 240))
-
-        # Tomar las columnas necesarias para el timbrado
-        puesto_clave = safe_clave(hoja.cell_value(fila, 20))
-        nivel = int(hoja.cell_value(fila, 9))
-        quincena_ingreso = str(int(hoja.cell_value(fila, 19)))
-
-        # Validar desde y hasta
-        try:
-            desde_clave = safe_quincena(desde_s)
-            desde = quincena_to_fecha(desde_clave, dame_ultimo_dia=False)
-            hasta_clave = safe_quincena(hasta_s)
-            hasta = quincena_to_fecha(hasta_clave, dame_ultimo_dia=True)
-        except ValueError:
-            click.echo(click.style(f"ERROR: Quincena inválida en '{desde_s}' o '{hasta_s}'", fg="red"))
-            sys.exit(1)
-
-        # Consultar el Centro de Trabajo, si no existe se agrega
-        centro_trabajo = CentroTrabajo.query.filter_by(clave=centro_trabajo_clave).first()
-        if centro_trabajo is None:
-            centro_trabajo = CentroTrabajo(clave=centro_trabajo_clave, descripcion="ND")
-            sesion.add(centro_trabajo)
-            sesion.commit()
-            centros_trabajos_insertados_contador += 1
+    # Consultar quincena, si no existe se agrega
+    quincena = consultar_o_agregar_quincena(sesion, quincena_clave)
 
-        # Consultar la Plaza, si no existe se agrega
-        plaza = Plaza.query.filter_by(clave=plaza_clave).first()
-        if plaza is None:
-            plaza = Plaza(clave=plaza_clave, descripcion="ND")
-            sesion.add(plaza)
-            sesion.commit()
-            plazas_insertadas_contador += 1
-
-        # Si el modelo es 2, entonces en SINDICALIZADO, se toman 4 caracteres del puesto y se busca quinquenios
-        quinquenios = None
-        if modelo == 2:
-            puesto_clave = puesto_clave[:4]
-
-            # Inicializar la bandera para saltar la fila si el concepto es PME
-            es_concepto_pme = False
-
-            # Bucle entre las columnas de los conceptos para encontrar PQ1, PQ2, PQ3, PQ4, PQ5, PQ6
-            col_num = 26
-            while True:
-                # Tomar el p_o_d
-                p_o_d = safe_string(hoja.cell_value(fila, col_num))
-                # Tomar el conc
-                conc = safe_string(hoja.cell_value(fila, col_num + 1))
-                # Si 'P' o 'D' es un texto vacio, se rompe el ciclo
-                if p_o_d == "":
-                    break
-                # Si NO es P, se salta
-                if p_o_d != "P":
-                    col_num += 6
-                    continue
-                # Si conc es ME es monedero, se rompe el ciclo porque aqui no hay quinquenios
-                if conc == "ME":
-                    es_concepto_pme = True
-                    break
-                # Si el concepto no es PQ1, PQ2, PQ3, PQ4, PQ5, PQ6, se salta
-                if conc not in ["Q1", "Q2", "Q3", "Q4", "Q5", "Q6"]:
-                    col_num += 6
-                    continue
-                # Tomar el tercer caracter del concepto y convertirlo a entero porque es la cantidad de quinquenios
-                quinquenios = int(conc[1])
-                break
+    # Leer el archivo XLS una sola vez, o tomarlo del cache si ya se leyo antes
+    renglones = leer_nominas_fmt2(ruta)
 
-            # Si es PME, entonces en esta fila NO esta el quinquenio, se mantiene en None
-            if es_concepto_pme:
-                quinquenios = None
+    # Cargar en memoria los catalogos para no consultar la base de datos por cada fila
+    dimensiones = Dimensiones(sesion)
 
-        else:
-            # Entonces NO es SINDICALIZADO, se define quinquenios en cero
-            quinquenios = 0
-
-        # Consultar el Puesto, si no existe se agrega a personas_sin_puestos y se le asigna el puesto_generico
-        puesto = Puesto.query.filter_by(clave=puesto_clave).first()
-        if puesto is None:
-            personas_sin_puestos.append(rfc)
-            puesto = puesto_generico
-
-        # Consultar la Persona
-        persona = Persona.query.filter_by(rfc=rfc).first()
-
-        # Si NO existe la Persona, se agrega
-        if persona is None:
-            # Separar nombre_completo, en apellido_primero, apellido_segundo y nombres
-            separado = safe_string(nombre_completo, save_enie=True).split(" ")
-            apellido_primero = separado[0]
-            apellido_segundo = separado[1]
-            nombres = " ".join(separado[2:])
-
-            # Si el modelo es 2 y quinquenios es None, entonces es SINDICALIZADO y se calculan los quinquenios
-            if modelo == 2 and quinquenios is None:
-                # Calcular la cantidad de quinquenios
-                fecha_ingreso = quincena_to_fecha(quincena_ingreso, dame_ultimo_dia=False)
-                quinquenios = quinquenio_count(fecha_ingreso, fecha_final)
-
-            # Consultar el tabulador que coincida con puesto_clave, modelo, nivel y quinquenios
-            tabulador = (
-                Tabulador.query.filter_by(puesto_id=puesto.id)
-                .filter_by(modelo=modelo)
-                .filter_by(nivel=nivel)
-                .filter_by(quinquenio=quinquenios)
-                .first()
-            )
-
-            # Si no existe el tabulador, se agrega a personas_sin_tabulador y se le asigna tabulador_generico
-            if tabulador is None:
-                personas_sin_tabulador.append(rfc)
-                tabulador = tabulador_generico
-
-            # Insertar a la Persona
-            persona = Persona(
-                tabulador_id=tabulador.id,
-                rfc=rfc,
-                nombres=nombres,
-                apellido_primero=apellido_primero,
-                apellido_segundo=apellido_segundo,
-                modelo=modelo,
-                num_empleado=num_empleado,
-            )
-            sesion.add(persona)
-            sesion.commit()
-            personas_insertadas_contador += 1
-
-        # De lo contrario, se revisa si cambia la Persona de tabulador, modelo o num_empleado
-        else:
-            # Inicializar hay_cambios
-            hay_cambios = False
-
-            # Si la fila es concepto PME NO va tener los quinquenios, entonces se define con la Persona
-            if quinquenios is None:
-                quinquenios = persona.tabulador.quinquenio
-
-            # Consultar el tabulador que coincida con puesto_clave, modelo, nivel y quinquenios
-            tabulador = (
-                Tabulador.query.filter_by(puesto_id=puesto.id)
-                .filter_by(modelo=modelo)
-                .filter_by(nivel=nivel)
-                .filter_by(quinquenio=quinquenios)
-                .first()
-            )
-
-            # Si NO existe el tabulador, se agrega a personas_sin_tabulador y se le asigna tabulador_generico
-            if tabulador is None:
-                personas_sin_tabulador.append(rfc)
-                tabulador = tabulador_generico
-
-            # Revisar si hay que actualizar el tabulador a la Persona
-            if persona.tabulador_id != tabulador.id:
-                personas_actualizadas_del_tabulador.append(
-                    f"{rfc} {persona.nombre_completo}: Tabulador: {persona.tabulador_id} -> {tabulador.id}"
-                )
-                persona.tabulador_id = tabulador.id
-                hay_cambios = True
-
-            # Revisar si hay que actualizar el modelo a la Persona
-            if persona.modelo != modelo:
-                personas_actualizadas_del_modelo.append(
-                    f"{rfc} {persona.nombre_completo}: Modelo: {persona.modelo} -> {modelo}"
-                )
-                persona.modelo = modelo
-                hay_cambios = True
-
-            # Revisar si hay que actualizar el numero de empleado a la Persona
-            if persona.num_empleado != num_empleado:
-                personas_actualizadas_del_num_empleado.append(
-                    f"{rfc} {persona.nombre_completo}: Num. Emp. {persona.num_empleado} -> {num_empleado}"
-                )
-                persona.num_empleado = num_empleado
-                hay_cambios = True
-
-            # Si hay cambios, guardar la Persona
-            if hay_cambios:
-                persona.save()
-                personas_actualizadas_contador += 1
-
-        # Bucle entre P-D para determinar el tipo entre SALARIO y DESPENSA
-        nomina_tipo = None
-        col_num = 26
-        while True:
-            # Tomar el tipo y el conc para armar la clave del concepto
-            tipo = safe_string(hoja.cell_value(fila, col_num))
-            conc = safe_string(hoja.cell_value(fila, col_num + 1))
-            concepto_clave = f"{tipo}{conc}"
-
-            # Si el tipo es un texto vacio, se rompe el ciclo
-            if tipo == "":
-                break
-
-            # Si el concepto_clave es PME, entonces es DESPENSA y se termina este ciclo
-            if concepto_clave == "PME":
-                nomina_tipo = Nomina.TIPOS["DESPENSA"]
-                break
-
-            # Incrementar col_num en SEIS
-            col_num += 6
-
-            # Romper el ciclo cuando se llega a la columna
-            if col_num > 236:
-                break
-
-        # Si no se encontro el tipo, entonces es SALARIO
-        if nomina_tipo is None:
-            nomina_tipo = Nomina.TIPOS["SALARIO"]
-
-        # Alimentar nomina
-        nomina = Nomina(
-            centro_trabajo=centro_trabajo,
-            persona=persona,
-            plaza=plaza,
-            quincena=quincena,
-            desde=desde,
-            desde_clave=desde_clave,
-            hasta=hasta,
-            hasta_clave=hasta_clave,
-            percepcion=percepcion,
-            deduccion=deduccion,
-            importe=impte,
-            tipo=nomina_tipo,
-            fecha_pago=fecha_pago,
-        )
-        sesion.add(nomina)
-
-        # Incrementar contador
-        contador += 1
-
-        # Mostrar el avance con el modelo
-        click.echo(click.style(modelo, fg="cyan"), nl=False)
-
-    # Poner avance de linea
-    click.echo("")
+    # Alimentar las nominas
+    contador = alimentar_nominas(sesion, dimensiones, quincena, renglones, fecha_pago, tamano_bloque)
 
     # Si contador es cero, mostrar mensaje de error y terminar
     if contador == 0:
+        sesion.rollback()
         click.echo(click.style("ERROR: No se alimentaron registros en nominas.", fg="red"))
         sys.exit(1)
 
@@ -487,38 +192,6 @@ def alimentar(quincena_clave: str, fecha_pago_str: str):
     sesion.commit()
     sesion.close()
 
-    # Si hubo centros_trabajos_insertados, mostrar contador
-    if centros_trabajos_insertados_contador > 0:
-        click.echo(click.style(f"  Se insertaron {centros_trabajos_insertados_contador} Centros de Trabajo", fg="green"))
-
-    # Si hubo personas actualizadas, mostrar contador
-    if personas_actualizadas_contador > 0:
-        click.echo(click.style(f"  Se actualizaron {personas_actualizadas_contador} Personas", fg="green"))
-        for item in personas_actualizadas_del_tabulador:
-            click.echo(click.style(f"  {item}", fg="yellow"))
-        for item in personas_actualizadas_del_modelo:
-            click.echo(click.style(f"  {item}", fg="yellow"))
-        for item in personas_actualizadas_del_num_empleado:
-            click.echo(click.style(f"  {item}", fg="yellow"))
-
-    # Si hubo personas insertadas, mostrar contador
-    if personas_insertadas_contador > 0:
-        click.echo(click.style(f"  Se insertaron {personas_insertadas_contador} Personas", fg="green"))
-
-    # Si hubo plazas insertadas, mostrar contador
-    if plazas_insertadas_contador > 0:
-        click.echo(click.style(f"  Se insertaron {plazas_insertadas_contador} Plazas", fg="green"))
-
-    # Si hubo personas_sin_puestos, mostrarlas en pantalla
-    if len(personas_sin_puestos) > 0:
-        click.echo(click.style(f"  Hubo {len(personas_sin_puestos)} Personas sin puestos.", fg="yellow"))
-        click.echo(click.style(f"  {', '.join(personas_sin_puestos)}", fg="yellow"))
-
-    # Si hubo personas_sin_tabulador, mostrarlas en pantalla
-    if len(personas_sin_tabulador) > 0:
-        click.echo(click.style(f"  Hubo {len(personas_sin_tabulador)} Personas sin tabulador.", fg="yellow"))
-        click.echo(click.style(f"  {', '.join(personas_sin_tabulador)}", fg="yellow"))
-
     # Mensaje termino
     click.echo(click.style(f"  Alimentar Nominas: {contador} insertadas.", fg="green"))
 
@@ -592,6 +265,9 @@ def alimentar_aguinaldos(quincena_clave: str, fecha_pago_str: str):
     # Obtener la primera hoja
     hoja = libro.sheet_by_index(0)
 
+    # Cargar en memoria los catalogos para no consultar la base de datos por cada fila
+    dimensiones = Dimensiones(sesion)
+
     # Iniciar contadores
     contador = 0
     centros_trabajos_inexistentes = []
@@ -625,22 +301,21 @@ def alimentar_aguinaldos(quincena_clave: str, fecha_pago_str: str):
             sys.exit(1)
 
         # Consultar la persona, si no existe, se agrega a la lista de personas_inexistentes y se salta
-        persona = Persona.query.filter_by(rfc=rfc).first()
+        persona = dimensiones.consultar_persona(rfc)
         if persona is None:
             personas_inexistentes.append(rfc)
             continue
 
         # Consultar el Centro de Trabajo, si no existe se agrega a la lista de centros_trabajos_inexistentes y se salta
-        centro_trabajo = CentroTrabajo.query.filter_by(clave=centro_trabajo_clave).first()
+        centro_trabajo = dimensiones.consultar_centro_trabajo(centro_trabajo_clave)
         if centro_trabajo is None:
             centros_trabajos_inexistentes.append(centro_trabajo_clave)
             continue
 
         # Revisar si la Plaza existe, de lo contrario insertarla
-        plaza = Plaza.query.filter_by(clave=plaza_clave).first()
+        plaza = dimensiones.consultar_plaza(plaza_clave)
         if plaza is None:
-            plaza = Plaza(clave=plaza_clave, descripcion="ND")
-            sesion.add(plaza)
+            plaza = dimensiones.agregar_plaza(Plaza(clave=plaza_clave, descripcion="ND"))
             plazas_insertadas_contador += 1
 
         # Alimentar registro en Nomina
@@ -761,24 +436,37 @@ def alimentar_apoyos_anuales(quincena_clave: str, fecha_pago_str: str):
         sesion.add(quincena)
         sesion.commit()
 
+    # Cargar en memoria los catalogos para no consultar la base de datos por cada fila
+    dimensiones = Dimensiones(sesion)
+
     # Consultar el concepto con clave PAZ que es APOYO ANUAL, si no se encuentra, error
-    concepto_paz = Concepto.query.filter_by(clave="PAZ").first()
+    concepto_paz = dimensiones.consultar_concepto("PAZ")
     if concepto_paz is None:
         click.echo("ERROR: No existe el concepto con clave PAZ")
         sys.exit(1)
 
     # Consultar el concepto con clave DAZ que es ISR DE APOYO DE FIN DE AÑO, si no se encuentra, error
-    concepto_daz = Concepto.query.filter_by(clave="DAZ").first()
+    concepto_daz = dimensiones.consultar_concepto("DAZ")
     if concepto_daz is None:
         click.echo("ERROR: No existe el concepto con clave DAZ")
         sys.exit(1)
 
     # Consultar el concepto con clave D62 que es PENSION ALIMENTICIA, si no se encuentra, error
-    concepto_d62 = Concepto.query.filter_by(clave="D62").first()
+    concepto_d62 = dimensiones.consultar_concepto("D62")
     if concepto_d62 is None:
         click.echo("ERROR: No existe el concepto con clave D62")
         sys.exit(1)
 
+    # Consultar en una sola vez las personas que ya tienen nomina de APOYO ANUAL en esta quincena
+    personas_ids_con_apoyo_anual = {
+        persona_id
+        for (persona_id,) in sesion.query(Nomina.persona_id)
+        .filter_by(quincena_id=quincena.id)
+        .filter_by(tipo="APOYO ANUAL")
+        .filter_by(estatus="A")
+        .all()
+    }
+
     # Abrir el archivo XLS con xlrd
     libro = xlrd.open_workbook(str(ruta))
 
@@ -822,7 +510,7 @@ def alimentar_apoyos_anuales(quincena_clave: str, fecha_pago_str: str):
             impte_concepto_d62 = 0.0
 
         # Consultar la persona
-        persona = Persona.query.filter_by(rfc=rfc).first()
+        persona = dimensiones.consultar_persona(rfc)
 
         # Si NO existe, se agrega a la lista de personas_inexistentes y se salta
         if persona is None:
@@ -830,7 +518,7 @@ def alimentar_apoyos_anuales(quincena_clave: str, fecha_pago_str: str):
             continue
 
         # Consultar el Centro de Trabajo
-        centro_trabajo = CentroTrabajo.query.filter_by(clave=centro_trabajo_clave).first()
+        centro_trabajo = dimensiones.consultar_centro_trabajo(centro_trabajo_clave)
 
         # Si NO existe se agrega a la lista de centros_trabajos_inexistentes y se salta
         if centro_trabajo is None:
@@ -838,7 +526,7 @@ def alimentar_apoyos_anuales(quincena_clave: str, fecha_pago_str: str):
             continue
 
         # Consultar la Plaza
-        plaza = Plaza.query.filter_by(clave=plaza_clave).first()
+        plaza = dimensiones.consultar_plaza(plaza_clave)
 
         # Si NO existe se agrega a la lista de plazas_inexistentes y se salta
         if plaza is None:
@@ -846,16 +534,10 @@ def alimentar_apoyos_anuales(quincena_clave: str, fecha_pago_str: str):
             continue
 
         # Revisar que en nominas no exista una nomina con la misma persona, quincena y tipo APOYO ANUAL, si existe se omite
-        nominas_posibles = (
-            Nomina.query.filter_by(persona_id=persona.id)
-            .filter_by(quincena_id=quincena.id)
-            .filter_by(tipo="APOYO ANUAL")
-            .filter_by(estatus="A")
-            .all()
-        )
-        if len(nominas_posibles) > 0:
+        if persona.id in personas_ids_con_apoyo_anual:
             nominas_existentes.append(rfc)
             continue
+        personas_ids_con_apoyo_anual.add(persona.id)
 
         # Alimentar percepcion en PercepcionDeduccion, con concepto PAZ
         percepcion_deduccion_paz = PercepcionDeduccion(
@@ -999,11 +681,11 @@ def generar_aguinaldos(quincena_clave: str):
         click.echo(f"AVISO: No hay nominas de tipo SALARIO en la quincena {quincena_clave}.")
         sys.exit(0)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Iniciar el archivo XLSX en modo solo escritura, las filas se escriben conforme se agregan sin guardarlas en memoria
+    libro = Workbook(write_only=True)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Crear la hoja del libro XLSX
+    hoja = libro.create_sheet()
 
     # Agregar la fila con las cabeceras de las columnas
     hoja.append(
@@ -1023,8 +705,8 @@ def generar_aguinaldos(quincena_clave: str):
         ]
     )
 
-    # Bucle para crear cada fila del archivo XLSX
-    contador = 0
+    # Bucle para juntar las nominas con la cuenta que van al archivo XLSX
+    filas = []
     personas_sin_cuentas = []
     for nomina in nominas:
         # Si el modelo de la persona es 3, se omite
@@ -1051,14 +733,23 @@ def generar_aguinaldos(quincena_clave: str):
             personas_sin_cuentas.append(nomina.persona.rfc)
             continue
 
+        # Juntar la fila
+        filas.append((nomina, su_cuenta))
+
+    # Reservar de una vez los consecutivos de cada banco, asi no chocan con las tareas que generan al mismo tiempo
+    consecutivos = reservar_bloques_bancos(Counter(su_cuenta.banco_id for _, su_cuenta in filas))
+
+    # Bucle para crear cada fila del archivo XLSX
+    contador = 0
+    for nomina, su_cuenta in filas:
         # Tomar el banco de la cuenta de la persona
         su_banco = su_cuenta.banco
 
-        # Incrementer el consecutivo_generado del banco
-        su_banco.consecutivo_generado += 1
+        # Tomar el siguiente consecutivo del bloque del banco
+        consecutivos[su_banco.id] += 1
 
         # Elaborar el numero de cheque, juntando la clave del banco y la consecutivo, siempre de 9 digitos
-        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{su_banco.consecutivo_generado:07}"
+        num_cheque = f"{su_banco.clave.zfill(2)}{consecutivos[su_banco.id]:07}"
 
         # Agregar la fila
         hoja.append(
@@ -1083,7 +774,7 @@ def generar_aguinaldos(quincena_clave: str):
         if contador % 100 == 0:
             click.echo(f"  Van {contador}...")
 
-    # Actualizar los consecutivos de cada banco
+    # Terminar la transaccion, los bloques de consecutivos se guardaron al reservarlos
     sesion.commit()
 
     # Determinar el nombre del archivo XLSX, juntando 'aguinaldos' con la quincena y la fecha como YYYY-MM-DD HHMMSS
@@ -1194,11 +885,11 @@ def generar_nominas(quincena_clave: str):
         click.echo(f"AVISO: No hay nominas de tipo SALARIO en la quincena {quincena_clave}.")
         sys.exit(0)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Iniciar el archivo XLSX en modo solo escritura, las filas se escriben conforme se agregan sin guardarlas en memoria
+    libro = Workbook(write_only=True)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Crear la hoja del libro XLSX
+    hoja = libro.create_sheet()
 
     # Agregar la fila con las cabeceras de las columnas
     hoja.append(
@@ -1218,8 +909,8 @@ def generar_nominas(quincena_clave: str):
         ]
     )
 
-    # Bucle para crear cada fila del archivo XLSX
-    contador = 0
+    # Bucle para juntar las nominas con la cuenta que van al archivo XLSX
+    filas = []
     personas_sin_cuentas = []
     for nomina in nominas:
         # Si el modelo de la persona es 3, se omite
@@ -1246,14 +937,23 @@ def generar_nominas(quincena_clave: str):
             personas_sin_cuentas.append(nomina.persona.rfc)
             continue
 
+        # Juntar la fila
+        filas.append((nomina, su_cuenta))
+
+    # Reservar de una vez los consecutivos de cada banco, asi no chocan con las tareas que generan al mismo tiempo
+    consecutivos = reservar_bloques_bancos(Counter(su_cuenta.banco_id for _, su_cuenta in filas))
+
+    # Bucle para crear cada fila del archivo XLSX
+    contador = 0
+    for nomina, su_cuenta in filas:
         # Tomar el banco de la cuenta de la persona
         su_banco = su_cuenta.banco
 
-        # Incrementer el consecutivo_generado del banco
-        su_banco.consecutivo_generado += 1
+        # Tomar el siguiente consecutivo del bloque del banco
+        consecutivos[su_banco.id] += 1
 
         # Elaborar el numero de cheque, juntando la clave del banco y la consecutivo, siempre de 9 digitos
-        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{su_banco.consecutivo_generado:07}"
+        num_cheque = f"{su_banco.clave.zfill(2)}{consecutivos[su_banco.id]:07}"
 
         # Agregar la fila
         hoja.append(
@@ -1278,7 +978,7 @@ def generar_nominas(quincena_clave: str):
         if contador % 100 == 0:
             click.echo(f"  Van {contador}...")
 
-    # Actualizar los consecutivos de cada banco
+    # Terminar la transaccion, los bloques de consecutivos se guardaron al reservarlos
     sesion.commit()
 
     # Determinar el nombre del archivo XLSX, juntando 'nominas' con la quincena y la fecha como YYYY-MM-DD HHMMSS
@@ -1344,11 +1044,11 @@ def generar_monederos(quincena_clave: str):
         click.echo(f"AVISO: No hay nominas de tipo DESPENSA en la quincena {quincena_clave}.")
         sys.exit(0)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Iniciar el archivo XLSX en modo solo escritura, las filas se escriben conforme se agregan sin guardarlas en memoria
+    libro = Workbook(write_only=True)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Crear la hoja del libro XLSX
+    hoja = libro.create_sheet()
 
     # Agregar la fila con las cabeceras de las columnas
     hoja.append(
@@ -1363,8 +1063,8 @@ def generar_monederos(quincena_clave: str):
         ]
     )
 
-    # Bucle para crear cada fila del archivo XLSX
-    contador = 0
+    # Bucle para juntar las nominas con la cuenta que van al archivo XLSX
+    filas = []
     personas_sin_cuentas = []
     for nomina in nominas:
         # Tomar las cuentas de la persona
@@ -1387,11 +1087,21 @@ def generar_monederos(quincena_clave: str):
             personas_sin_cuentas.append(nomina.persona)
             continue
 
-        # Incrementar el consecutivo_generado del banco
-        banco.consecutivo_generado += 1
+        # Juntar la fila
+        filas.append((nomina, su_cuenta))
 
-        # Elaborar el numero de cheque, juntando la clave del banco y el consecutivo_generado, siempre de 9 digitos
-        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{banco.consecutivo_generado:07}"
+    # Guardar el reinicio del consecutivo_generado y reservar de una vez los consecutivos en la misma transaccion
+    sesion.flush()
+    consecutivo = reservar_bloques_bancos({banco.id: len(filas)})[banco.id]
+
+    # Bucle para crear cada fila del archivo XLSX
+    contador = 0
+    for nomina, su_cuenta in filas:
+        # Tomar el siguiente consecutivo del bloque del banco
+        consecutivo += 1
+
+        # Elaborar el numero de cheque, juntando la clave del banco y el consecutivo, siempre de 9 digitos
+        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{consecutivo:07}"
 
         # Agregar la fila
         hoja.append(
@@ -1411,7 +1121,7 @@ def generar_monederos(quincena_clave: str):
         if contador % 100 == 0:
             click.echo(f"  Van {contador}...")
 
-    # Actualizar los consecutivo_generado de cada banco
+    # Terminar la transaccion, el bloque de consecutivos se guardo al reservarlo
     sesion.commit()
 
     # Determinar el nombre del archivo XLSX, juntando 'monederos' con la quincena y la fecha como YYYY-MM-DD HHMMSS
@@ -1468,11 +1178,11 @@ def generar_pensionados(quincena_clave: str):
         click.echo(f"AVISO: No hay nominas de tipo SALARIO en la quincena {quincena_clave}.")
         sys.exit(0)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Iniciar el archivo XLSX en modo solo escritura, las filas se escriben conforme se agregan sin guardarlas en memoria
+    libro = Workbook(write_only=True)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Crear la hoja del libro XLSX
+    hoja = libro.create_sheet()
 
     # Agregar la fila con las cabeceras de las columnas
     hoja.append(
@@ -1492,8 +1202,8 @@ def generar_pensionados(quincena_clave: str):
         ]
     )
 
-    # Bucle para crear cada fila del archivo XLSX
-    contador = 0
+    # Bucle para juntar las nominas con la cuenta que van al archivo XLSX
+    filas = []
     personas_sin_cuentas = []
     for nomina in nominas:
         # Si el modelo de la persona NO es 3, se omite
@@ -1520,14 +1230,23 @@ def generar_pensionados(quincena_clave: str):
             personas_sin_cuentas.append(nomina.persona.rfc)
             continue
 
+        # Juntar la fila
+        filas.append((nomina, su_cuenta))
+
+    # Reservar de una vez los consecutivos de cada banco, asi no chocan con las tareas que generan al mismo tiempo
+    consecutivos = reservar_bloques_bancos(Counter(su_cuenta.banco_id for _, su_cuenta in filas))
+
+    # Bucle para crear cada fila del archivo XLSX
+    contador = 0
+    for nomina, su_cuenta in filas:
         # Tomar el banco de la cuenta de la persona
         su_banco = su_cuenta.banco
 
-        # Incrementar la consecutivo del banco
-        su_banco.consecutivo_generado += 1
+        # Tomar el siguiente consecutivo del bloque del banco
+        consecutivos[su_banco.id] += 1
 
         # Elaborar el numero de cheque, juntando la clave del banco y la consecutivo, siempre de 9 digitos
-        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{su_banco.consecutivo_generado:07}"
+        num_cheque = f"{su_banco.clave.zfill(2)}{consecutivos[su_banco.id]:07}"
 
         # Agregar la fila
         hoja.append(
@@ -1552,7 +1271,7 @@ def generar_pensionados(quincena_clave: str):
         if contador % 100 == 0:
             click.echo(f"  Van {contador}...")
 
-    # Actualizar los consecutivos de cada banco
+    # Terminar la transaccion, los bloques de consecutivos se guardaron al reservarlos
     sesion.commit()
 
     # Determinar el nombre del archivo XLSX, juntando 'nominas' con la quincena y la fecha como YYYY-MM-DD HHMMSS
@@ -1606,11 +1325,11 @@ def generar_dispersiones_pensionados(quincena_clave: str):
         click.echo(f"AVISO: No hay nominas de tipo SALARIO en la quincena {quincena_clave}.")
         sys.exit(0)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Iniciar el archivo XLSX en modo solo escritura, las filas se escriben conforme se agregan sin guardarlas en memoria
+    libro = Workbook(write_only=True)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Crear la hoja del libro XLSX
+    hoja = libro.create_sheet()
 
     # Agregar la fila con las cabeceras de las columnas
     hoja.append(
@@ -1735,254 +1454,13 @@ def generar_timbrados(quincena_clave: str, tipo: str):
         click.echo(f"ERROR: Quincena {quincena_clave} esta eliminada.")
         sys.exit(1)
 
-    # Determinar las fechas inicial y final de la quincena
-    quincena_fecha_inicial = quincena_to_fecha(quincena_clave, dame_ultimo_dia=False)
-    quincena_fecha_final = quincena_to_fecha(quincena_clave, dame_ultimo_dia=True)
-
-    # Inicializar el diccionario de conceptos
-    conceptos_dict = {}
-
-    # Si el tipo es SALARIO armar un diccionario con las percepciones y deducciones de Conceptos activos
-    if tipo == "SALARIO":
-        # Consultar los conceptos activos
-        conceptos = Concepto.query.filter_by(estatus="A").order_by(Concepto.clave).all()
-        # Ordenar las claves, primero las que empiezan con P
-        for concepto in conceptos:
-            if concepto.clave.startswith("P"):
-                conceptos_dict[concepto.clave] = concepto
-        # Ordenar las claves, primero las que empiezan con P
-        for concepto in conceptos:
-            if concepto.clave.startswith("D"):
-                conceptos_dict[concepto.clave] = concepto
-        # Al final agregar las claves que no empiezan con P o D
-        for concepto in conceptos:
-            if not concepto.clave.startswith("P") and not concepto.clave.startswith("D"):
-                conceptos_dict[concepto.clave] = concepto
-    elif tipo == "APOYO ANUAL":
-        # Si el tipo es APOYO ANUAL armar un diccionario con PAZ y DAZ como None
-        conceptos_dict = {
-            "PAZ": None,  # Percepcion de Apoyo Anual
-            "DAZ": None,  # Deduccion ISR Apoyo Anual
-            "D62": None,  # Deduccion Pension Alimenticia
-        }
-
-    # Consultar las Nominas activas de la quincena, del tipo dado, juntar con personas para ordenar por RFC
-    nominas = (
-        Nomina.query.join(Persona)
-        .filter(Nomina.quincena_id == quincena.id)
-        .filter(Nomina.tipo == tipo)
-        .filter(Nomina.estatus == "A")
-        .order_by(Persona.rfc)
-        .all()
-    )
-
-    # Si no hay nominas, entonces se termina
-    if len(nominas) == 0:
-        click.echo(f"AVISO: No hay nominas de tipo {tipo} en la quincena {quincena_clave}.")
+    # Elaborar el libro XLSX con el mismo generador que usan las tareas en segundo plano
+    try:
+        libro, contador, personas_sin_cuentas = elaborar_timbrados(quincena, tipo)
+    except MyEmptyError as error:
+        click.echo(f"AVISO: {str(error)} en la quincena {quincena_clave}.")
         sys.exit(0)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
-
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
-
-    # Encabezados primera parte
-    encabezados_parte_1 = [
-        "CONSECUTIVO",
-        "NUMERO DE EMPLEADO",
-        "APELLIDO PRIMERO",
-        "APELLIDO SEGUNDO",
-        "NOMBRES",
-        "RFC",
-        "CURP",
-        "NO DE SEGURIDAD SOCIAL",
-        "FECHA DE INGRESO",
-        "CLAVE TIPO NOMINA",
-        "SINDICALIZADO",
-        "CLAVE BANCO SAT",
-        "NUMERO DE CUENTA",
-        "PLANTA",
-        "SALARIO DIARIO",
-        "SALARIO INTEGRADO",
-        "FECHA INICIAL PERIODO",
-        "FECHA FINAL PERIODO",
-        "FECHA DE PAGO",
-        "DIAS TRABAJADOS",
-        "RFC DEL PATRON",
-        "CLASE RIESGO PUESTO SAT",
-        "TIPO CONTRATO SAT",
-        "JORNADA SAT",
-        "TIPO REGIMEN SAT",
-        "ANIO",
-        "MES",
-        "PERIODO NOM",
-        "CLAVE COMPANIA",
-        "RFC COMPANIA",
-        "NOMBRE COMPANIA",
-        "CP DE LA COMPANIA",
-        "REGIMEN FISCAL",
-        "ESTADO SAT",
-        "CLAVE PLANTA U OFICINA",
-        "PLANTA U OFICINA",
-        "CLAVE CENTRO COSTOS",
-        "CENTRO COSTOS",
-        "FORMA DE PAGO",
-        "CLAVE DEPARTAMENTO",
-        "NOMBRE DEPARTAMENTO",
-        "NOMBRE PUESTO",
-    ]
-
-    # Encabezados segunda parte, tomar las claves de conceptos_dict
-    encabezados_parte_2 = list(conceptos_dict.keys())
-
-    # Encabezados tercera parte
-    encabezados_parte_3 = [
-        "ORIGEN RECURSO",
-        "MONTO DEL RECURSO",
-        "CODIGO POSTAL FISCAL",
-    ]
-
-    # Agregar la fila con las cabeceras de las columnas
-    hoja.append(encabezados_parte_1 + encabezados_parte_2 + encabezados_parte_3)
-
-    # Inicializar el contador
-    contador = 0
-    personas_sin_cuentas = []
-
-    # Bucle para crear cada fila del archivo XLSX
-    for nomina in nominas:
-        # Consultar las cuentas de la persona
-        cuentas = nomina.persona.cuentas
-
-        # De las cuentas hay que sacar la que no tenga la clave 9, porque esa clave es la de DESPENSA
-        su_cuenta = None
-        for cuenta in cuentas:
-            if cuenta.banco.clave != "9" and cuenta.estatus == "A":
-                su_cuenta = cuenta
-                break
-
-        # Si no tiene cuenta bancaria, entonces se agrega a la lista de personas_sin_cuentas y se salta
-        if su_cuenta is None:
-            personas_sin_cuentas.append(nomina.persona.rfc)
-            continue
-
-        # Incrementar contador
-        contador += 1
-
-        # Fila parte 1
-        fila_parte_1 = [
-            contador,  # CONSECUTIVO
-            nomina.persona.num_empleado,  # NUMERO DE EMPLEADO
-            nomina.persona.apellido_primero,  # APELLIDO PRIMERO
-            nomina.persona.apellido_segundo,  # APELLIDO SEGUNDO
-            nomina.persona.nombres,  # NOMBRES
-            nomina.persona.rfc,  # RFC
-            nomina.persona.curp,  # CURP
-            nomina.persona.seguridad_social,  # NO DE SEGURIDAD SOCIAL
-            nomina.persona.ingreso_pj_fecha,  # FECHA DE INGRESO
-            "O" if tipo == "SALARIO" else "E",  # CLAVE TIPO NOMINA ordinarias es O, extraordinarias es E
-            "SI" if nomina.persona.modelo == 2 else "NO",  # SINDICALIZADO modelo es 2
-            su_cuenta.banco.clave_dispersion_pensionados,  # CLAVE BANCO SAT
-            su_cuenta.num_cuenta,  # NUMERO DE CUENTA
-            "",  # PLANTA nula
-            nomina.persona.tabulador.salario_diario,  # SALARIO DIARIO
-            nomina.persona.tabulador.salario_diario_integrado,  # SALARIO INTEGRADO
-            datetime(year=2023, month=1, day=1).date(),  # FECHA INICIAL PERIODO quincena_fecha_inicial
-            datetime(year=2023, month=12, day=31).date(),  # FECHA FINAL PERIODO quincena_fecha_final
-            nomina.fecha_pago,  # FECHA DE PAGO
-            "15" if tipo == "SALARIO" else "1",  # DIAS TRABAJADOS cuando es anual se pone 1
-            PATRON_RFC,  # RFC DEL PATRON
-            "1",  # CLASE RIESGO PUESTO es 1
-            "01",  # TIPO CONTRATO SAT
-            "08",  # JORNADA SAT
-            "02",  # TIPO REGIMEN SAT
-            nomina.fecha_pago.year,  # ANIO
-            nomina.fecha_pago.month,  # MES
-            quincena.clave[-2:],  # PERIODO NOM los dos ultimos digitos de la clave de la quincena
-            "",  # CLAVE COMPANIA nulo
-            COMPANIA_RFC,  # RFC COMPANIA
-            COMPANIA_NOMBRE,  # NOMBRE COMPANIA
-            COMPANIA_CP,  # CP DE LA COMPANIA
-            "603",  # REGIMEN FISCAL solo la clave 603 PERSONAS MORALES CON FINES NO LUCRATIVOS
-            "COA",  # ESTADO SAT
-            "",  # CLAVE PLANTA U OFICINA nulo
-            "",  # PLANTA U OFICINA nulo
-            "",  # CLAVE CENTRO COSTOS nulo
-            "",  # CENTRO COSTOS nulo
-            "04" if tipo == "SALARIO" else "99",  # FORMA DE PAGO para la ayuda es 99 y para los salarios es 04
-            nomina.centro_trabajo.clave,  # CLAVE DEPARTAMENTO
-            nomina.centro_trabajo.descripcion,  # NOMBRE DEPARTAMENTO
-            nomina.persona.tabulador.puesto.clave,  # NOMBRE PUESTO por lo pronto es la clave del puesto
-        ]
-
-        # Fila parte 2
-        fila_parte_2 = []
-        if tipo == "SALARIO":
-            # Bucle por los conceptos
-            for _, concepto in conceptos_dict.items():
-                # Consultar la P-D de la quincena, la persona y el concepto
-                percepcion_deduccion = (
-                    PercepcionDeduccion.query.filter_by(quincena_id=quincena.id)
-                    .filter_by(persona_id=nomina.persona.id)
-                    .filter_by(concepto_id=concepto.id)
-                    .first()
-                )
-                if percepcion_deduccion is not None:
-                    fila_parte_2.append(percepcion_deduccion.importe)
-                else:
-                    fila_parte_2.append(0)
-        elif tipo == "APOYO ANUAL":
-            # Consultar la PercepcionDeduccion con concepto PAZ
-            percepcion_deduccion_paz = (
-                PercepcionDeduccion.query.join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona.id)
-                .filter(PercepcionDeduccion.tipo == "APOYO ANUAL")
-                .filter(Concepto.clave == "PAZ")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_paz.importe if percepcion_deduccion_paz is not None else 0)
-            # Consultar la PercepcionDeduccion con concepto DAZ
-            percepcion_deduccion_daz = (
-                PercepcionDeduccion.query.join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona.id)
-                .filter(PercepcionDeduccion.tipo == "APOYO ANUAL")
-                .filter(Concepto.clave == "DAZ")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_daz.importe if percepcion_deduccion_daz is not None else 0)
-            # Consultar la PercepcionDeduccion con concepto D62
-            percepcion_deduccion_d62 = (
-                PercepcionDeduccion.query.join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona.id)
-                .filter(PercepcionDeduccion.tipo == "APOYO ANUAL")
-                .filter(Concepto.clave == "D62")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_d62.importe if percepcion_deduccion_d62 is not None else 0)
-
-        # Si el codigo postal fiscal es cero, entonces se usa 00000
-        codigo_postal_fiscal = "00000"
-        if nomina.persona.codigo_postal_fiscal:
-            codigo_postal_fiscal = str(nomina.persona.codigo_postal_fiscal).zfill(5)
-
-        # Fila parte 3
-        fila_parte_3 = [
-            "IP",  # ORIGEN RECURSO
-            "100",  # MONTO DEL RECURSO
-            codigo_postal_fiscal,  # CODIGO POSTAL FISCAL
-        ]
-
-        # Agregar la fila
-        hoja.append(fila_parte_1 + fila_parte_2 + fila_parte_3)
-
-        # Mostrar contador
-        if contador % 100 == 0:
-            click.echo(f"  Van {contador}...")
-
     # Determinar el nombre del archivo XLSX, juntando 'timbrados' con la quincena y la fecha como YYYY-MM-DD HHMMSS
     if tipo == "SALARIO":
         nombre_archivo = f"timbrados_salarios_{quincena_clave}_{datetime.now().strftime('%Y-%m-%d_%H%M%S')}.xlsx"
@@ -1995,12 +1473,26 @@ def generar_timbrados(quincena_clave: str, tipo: str):
     # Si hubo personas sin cuentas, entonces mostrarlas en pantalla
     if len(personas_sin_cuentas) > 0:
         click.echo(click.style(f"  Hubo {len(personas_sin_cuentas)} Personas sin cuentas:", fg="yellow"))
-        click.echo(click.style(f"  {', '.join(personas_sin_cuentas)}", fg="yellow"))
+        click.echo(click.style(f"  {', '.join(persona.rfc for persona in personas_sin_cuentas)}", fg="yellow"))
 
     # Mensaje termino
     click.echo(f"  Generar Timbrados: {contador} filas en {nombre_archivo}")
 
 
+@click.command()
+@click.option("--empleados", type=int, default=5000, help="Cantidad de empleados de la quincena sintetica")
+@click.option("--conceptos", type=int, default=150, help="Cantidad de columnas de conceptos")
+def medir_xlsx(empleados: int, conceptos: int):
+    """Medir el pico de memoria al elaborar un XLSX de timbrados sintetico, en modo normal y solo escritura"""
+
+    # Medir cada modo en un proceso nuevo para que el pico de memoria de uno no afecte al otro
+    click.echo(f"Quincena sintetica de {empleados} empleados y {conceptos} conceptos")
+    for modo in MODOS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as ejecutor:
+            megabytes, segundos = ejecutor.submit(medir_libro, modo, empleados, conceptos).result()
+        click.echo(f"  {modo}: pico RSS {megabytes:.1f} MB en {segundos:.2f} s")
+
+
 cli.add_command(actualizar_timbrados)
 cli.add_command(alimentar)
 cli.add_command(alimentar_aguinaldos)
@@ -2011,3 +1503,4 @@ cli.add_command(generar_monederos)
 cli.add_command(generar_pensionados)
 cli.add_command(generar_dispersiones_pensionados)
 cli.add_command(generar_timbrados)
+cli.add_command(medir_xlsx)
@@ -9,20 +9,18 @@ from pathlib import Path
 import click
 import xlrd
 
-from lib.fechas import quincena_to_fecha, quinquenio_count
-from lib.safe_string import QUINCENA_REGEXP, safe_clave, safe_string
-from perseo.app import create_app
-from perseo.blueprints.centros_trabajos.models import CentroTrabajo
-from perseo.blueprints.conceptos.models import Concepto
+from cli.commands.alimentar_explotacion import alimentar_percepciones_deducciones, consultar_o_agregar_quincena
+from cli.commands.dimensiones import Dimensiones
+from cli.commands.explotacion import leer_nominas_fmt2
+from cli.commands.medir_paginacion import medir_paginacion
+from lib.insercion_masiva import TAMANO_BLOQUE
+from lib.safe_string import QUINCENA_REGEXP
+from perseo.app import get_app
 from perseo.blueprints.conceptos_productos.models import ConceptoProducto
 from perseo.blueprints.nominas.models import Nomina
 from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
-from perseo.blueprints.personas.models import Persona
-from perseo.blueprints.plazas.models import Plaza
 from perseo.blueprints.productos.models import Producto
-from perseo.blueprints.puestos.models import Puesto
 from perseo.blueprints.quincenas.models import Quincena
-from perseo.blueprints.tabuladores.models import Tabulador
 from perseo.extensions import database
 
 EXPLOTACION_BASE_DIR = os.environ.get("EXPLOTACION_BASE_DIR")
@@ -31,9 +29,7 @@ AGUINALDOS_FILENAME_XLS = "Aguinaldos.XLS"
 APOYOS_FILENAME_XLS = "Apoyos.XLS"
 NOMINAS_FILENAME_XLS = "NominaFmt2.XLS"
 
-app = create_app()
-app.app_context().push()
-database.app = app
+app = get_app()
 
 
 @click.group()
@@ -44,7 +40,8 @@ def cli():
 @click.command()
 @click.argument("quincena_clave", type=str)
 @click.option("--tipo", type=click.Choice(["", "SALARIO", "DESPENSA", "AGUINALDO", "APOYO ANUAL"]), default="")
-def alimentar(quincena_clave: str, tipo: str):
+@click.option("--tamano-bloque", type=int, default=TAMANO_BLOQUE, help="Cantidad de renglones por bloque al insertar")
+def alimentar(quincena_clave: str, tipo: str, tamano_bloque: int):
     """Alimentar percepciones-deducciones"""
 
     # Iniciar sesion con la base de datos para que la alimentacion sea rapida
@@ -59,13 +56,6 @@ def alimentar(quincena_clave: str, tipo: str):
     if tipo == "":
         tipo = "SALARIO"
 
-    # Definir la fecha_final en base a la clave de la quincena
-    try:
-        fecha_final = quincena_to_fecha(quincena_clave, dame_ultimo_dia=True)
-    except ValueError:
-        click.echo("ERROR: Quincena inválida")
-        sys.exit(1)
-
     # Validar el directorio donde espera encontrar los archivos de explotacion
     if EXPLOTACION_BASE_DIR is None:
         click.echo("ERROR: Variable de entorno EXPLOTACION_BASE_DIR no definida.")
@@ -85,339 +75,22 @@ def alimentar(quincena_clave: str, tipo: str):
         click.echo(f"ERROR: {str(ruta)} no es un archivo.")
         sys.exit(1)
 
-    # Consultar quincena
-    quincena = Quincena.query.filter_by(clave=quincena_clave).first()
-
-    # Si existe la quincena, pero no esta ABIERTA, entonces se termina
-    if quincena and quincena.estado != "ABIERTA":
-        click.echo(f"ERROR: Quincena {quincena_clave} no esta ABIERTA.")
-        sys.exit(1)
-
-    # Si existe la quincena, pero ha sido eliminada, entonces se termina
-    if quincena and quincena.estatus != "A":
-        click.echo(f"ERROR: Quincena {quincena_clave} ha sido eliminada.")
-        sys.exit(1)
-
-    # Si no existe la quincena, se agrega
-    if quincena is None:
-        quincena = Quincena(clave=quincena_clave, estado="ABIERTA")
-        sesion.add(quincena)
-        sesion.commit()
-
-    # Abrir el archivo XLS con xlrd
-    libro = xlrd.open_workbook(str(ruta))
+    # Consultar quincena, si no existe se agrega
+    quincena = consultar_o_agregar_quincena(sesion, quincena_clave)
 
-    # Obtener la primera hoja
-    hoja = libro.sheet_by_index(0)
+    # Leer el archivo XLS una sola vez, o tomarlo del cache si ya se leyo antes
+    renglones = leer_nominas_fmt2(ruta)
 
-    # Iniciar listado de conceptos que no existen
-    conceptos_no_existentes = []
+    # Cargar en memoria los catalogos para no consultar la base de datos por cada fila
+    dimensiones = Dimensiones(sesion)
 
-    # Definir el puesto generico al que se van a relacionar las personas que no tengan su puesto
-    puesto_generico = Puesto.query.filter_by(clave="ND").first()
-    if puesto_generico is None:
-        click.echo("ERROR: Falta el puesto con clave ND.")
-        sys.exit(1)
-
-    # Definir el tabulador generico al que se van a relacionar los puestos que no tengan su tabulador
-    tabulador_generico = Tabulador.query.filter_by(puesto_id=puesto_generico.id).first()
-    if tabulador_generico is None:
-        click.echo("ERROR: Falta el tabulador del puesto con clave ND.")
-        sys.exit(1)
-
-    # Iniciar contadores
-    contador = 0
-    centros_trabajos_insertados_contador = 0
-    personas_actualizadas_contador = 0
-    personas_actualizadas_del_tabulador = []
-    personas_actualizadas_del_modelo = []
-    personas_actualizadas_del_num_empleado = []
-    personas_insertadas_contador = 0
-    personas_sin_puestos = []
-    personas_sin_tabulador = []
-    plazas_insertadas_contador = 0
-
-    # Bucle por cada fila
-    click.echo(f"Alimentando Percepciones-Deducciones a la quincena {quincena.clave}: ", nl=False)
-    for fila in range(1, hoja.nrows):
-        # Tomar las columnas
-        centro_trabajo_clave = hoja.cell_value(fila, 1)
-        plaza_clave = hoja.cell_value(fila, 8)
-
-        # Tomar las columnas con datos de la Persona
-        rfc = hoja.cell_value(fila, 2)
-        modelo = int(hoja.cell_value(fila, 236))
-        nombre_completo = hoja.cell_value(fila, 3)
-        num_empleado = int(hoja.cell_value(fila, 240))
-
-        # Tomar las columnas necesarias para el timbrado
-        puesto_clave = safe_clave(hoja.cell_value(fila, 20))
-        nivel = int(hoja.cell_value(fila, 9))
-        quincena_ingreso = str(int(hoja.cell_value(fila, 19)))
-
-        # Consultar el Centro de Trabajo, si no existe se agrega
-        centro_trabajo = CentroTrabajo.query.filter_by(clave=centro_trabajo_clave).first()
-        if centro_trabajo is None:
-            centro_trabajo = CentroTrabajo(clave=centro_trabajo_clave, descripcion="ND")
-            sesion.add(centro_trabajo)
-            sesion.commit()
-            centros_trabajos_insertados_contador += 1
-
-        # Consultar la Plaza, si no existe se agrega
-        plaza = Plaza.query.filter_by(clave=plaza_clave).first()
-        if plaza is None:
-            plaza = Plaza(clave=plaza_clave, descripcion="ND")
-            sesion.add(plaza)
-            sesion.commit()
-            plazas_insertadas_contador += 1
-
-        # Si el modelo es 2, entonces en SINDICALIZADO y se toman 4 caracteres del puesto
-        quinquenios = None
-        if modelo == 2:
-            puesto_clave = puesto_clave[:4]
-
-            # Inicializar la bandera para saltar la fila si el concepto es PME
-            es_concepto_pme = False
-
-            # Bucle entre las columnas de los conceptos para encontrar PQ1, PQ2, PQ3, PQ4, PQ5, PQ6
-            col_num = 26
-            while True:
-                # Tomar el p_o_d
-                p_o_d = safe_string(hoja.cell_value(fila, col_num))
-                # Tomar el conc
-                conc = safe_string(hoja.cell_value(fila, col_num + 1))
-                # Si 'P' o 'D' es un texto vacio, se rompe el ciclo
-                if p_o_d == "":
-                    break
-                # Si NO es P, se salta
-                if p_o_d != "P":
-                    col_num += 6
-                    continue
-                # Si conc es ME es monedero, se rompe el ciclo porque aqui no hay quinquenios
-                if conc == "ME":
-                    es_concepto_pme = True
-                    break
-                # Si el concepto no es PQ1, PQ2, PQ3, PQ4, PQ5, PQ6, se salta
-                if conc not in ["Q1", "Q2", "Q3", "Q4", "Q5", "Q6"]:
-                    col_num += 6
-                    continue
-                # Tomar el tercer caracter del concepto y convertirlo a entero porque es la cantidad de quinquenios
-                quinquenios = int(conc[1])
-                break
-
-            # Si es PME, entonces en esta fila NO esta el quinquenio, se mantiene en None
-            if es_concepto_pme:
-                quinquenios = None
-
-        else:
-            # Entonces NO es SINDICALIZADO, se define quinquenios en cero
-            quinquenios = 0
-
-        # Consultar el Puesto, si no existe se agrega a personas_sin_puestos y se le asigna el puesto_generico
-        puesto = Puesto.query.filter_by(clave=puesto_clave).first()
-        if puesto is None:
-            personas_sin_puestos.append(puesto_clave)
-            puesto = puesto_generico
-
-        # Consultar la Persona
-        persona = Persona.query.filter_by(rfc=rfc).first()
-
-        # Si NO existe la Persona, se agrega
-        if persona is None:
-            # Separar nombre_completo, en apellido_primero, apellido_segundo y nombres
-            separado = safe_string(nombre_completo, save_enie=True).split(" ")
-            apellido_primero = separado[0]
-            apellido_segundo = separado[1]
-            nombres = " ".join(separado[2:])
-
-            # Si el modelo es 2 y quinquenios es None, entonces es SINDICALIZADO y se calculan los quinquenios
-            if modelo == 2 and quinquenios is None:
-                # Calcular la cantidad de quinquenios
-                fecha_ingreso = quincena_to_fecha(quincena_ingreso, dame_ultimo_dia=False)
-                quinquenios = quinquenio_count(fecha_ingreso, fecha_final)
-
-            # Consultar el tabulador que coincida con puesto_clave, modelo, nivel y quinquenios
-            tabulador = (
-                Tabulador.query.filter_by(puesto_id=puesto.id)
-                .filter_by(modelo=modelo)
-                .filter_by(nivel=nivel)
-                .filter_by(quinquenio=quinquenios)
-                .first()
-            )
-
-            # Si no existe el tabulador, se agrega a personas_sin_tabulador y se le asigna tabulador_generico
-            if tabulador is None:
-                personas_sin_tabulador.append(rfc)
-                tabulador = tabulador_generico
-
-            # Insertar a la Persona
-            persona = Persona(
-                tabulador_id=tabulador.id,
-                rfc=rfc,
-                nombres=nombres,
-                apellido_primero=apellido_primero,
-                apellido_segundo=apellido_segundo,
-                modelo=modelo,
-                num_empleado=num_empleado,
-            )
-            sesion.add(persona)
-            sesion.commit()
-            personas_insertadas_contador += 1
-
-        # De lo contrario, se revisa si cambia la Persona de tabulador, modelo o num_empleado
-        else:
-            # Inicializar hay_cambios
-            hay_cambios = False
-
-            # Si la fila es concepto PME NO va tener los quinquenios, entonces se define con la Persona
-            if quinquenios is None:
-                quinquenios = persona.tabulador.quinquenio
-
-            # Consultar el tabulador que coincida con puesto_clave, modelo, nivel y quinquenios
-            tabulador = (
-                Tabulador.query.filter_by(puesto_id=puesto.id)
-                .filter_by(modelo=modelo)
-                .filter_by(nivel=nivel)
-                .filter_by(quinquenio=quinquenios)
-                .first()
-            )
-
-            # Si NO existe el tabulador, se agrega a personas_sin_tabulador y se le asigna tabulador_generico
-            if tabulador is None:
-                personas_sin_tabulador.append(rfc)
-                tabulador = tabulador_generico
-
-            # Revisar si hay que actualizar el tabulador a la Persona
-            if persona.tabulador_id != tabulador.id:
-                personas_actualizadas_del_tabulador.append(
-                    f"{rfc} {persona.nombre_completo}: Tabulador: {persona.tabulador_id} -> {tabulador.id}"
-                )
-                persona.tabulador_id = tabulador.id
-                hay_cambios = True
-
-            # Revisar si hay que actualizar el modelo a la Persona
-            if persona.modelo != modelo:
-                personas_actualizadas_del_modelo.append(
-                    f"{rfc} {persona.nombre_completo}: Modelo: {persona.modelo} -> {modelo}"
-                )
-                persona.modelo = modelo
-                hay_cambios = True
-
-            # Revisar si hay que actualizar el numero de empleado a la Persona
-            if persona.num_empleado != num_empleado:
-                personas_actualizadas_del_num_empleado.append(
-                    f"{rfc} {persona.nombre_completo}: No. Emp. {persona.num_empleado} -> {num_empleado}"
-                )
-                persona.num_empleado = num_empleado
-                hay_cambios = True
-
-            # Si hay cambios, guardar la Persona
-            if hay_cambios:
-                persona.save()
-                personas_actualizadas_contador += 1
-
-        # Buscar percepciones y deducciones
-        percepciones_deducciones_agregadas_contador = 0
-        col_num = 26
-        while True:
-            # Tomar 'P' o 'D', primero
-            p_o_d = safe_string(hoja.cell_value(fila, col_num))
-
-            # Si 'P' o 'D' es un texto vacio, se rompe el ciclo
-            if p_o_d == "":
-                break
-
-            # Tomar los dos caracteres adicionales del concepto
-            conc = safe_string(hoja.cell_value(fila, col_num + 1))
-
-            # Tomar el importe
-            try:
-                impt = int(hoja.cell_value(fila, col_num + 3)) / 100.0
-            except ValueError:
-                impt = 0.0
-
-            # Revisar si el Concepto existe, de lo contrario se agrega
-            concepto_clave = f"{p_o_d}{conc}"
-            concepto = Concepto.query.filter_by(clave=concepto_clave).first()
-            if concepto is None and concepto_clave not in conceptos_no_existentes:
-                conceptos_no_existentes.append(concepto_clave)
-                concepto = Concepto(clave=concepto_clave, descripcion="DESCONOCIDO")
-                sesion.add(concepto)
-                sesion.commit()
-
-            # Alimentar percepcion-deduccion
-            percepcion_deduccion = PercepcionDeduccion(
-                centro_trabajo=centro_trabajo,
-                concepto=concepto,
-                persona=persona,
-                plaza=plaza,
-                quincena=quincena,
-                importe=impt,
-                tipo=tipo,
-            )
-            sesion.add(percepcion_deduccion)
-            percepciones_deducciones_agregadas_contador += 1
-
-            # Incrementar col_num en SEIS
-            col_num += 6
-
-            # Romper el ciclo cuando se llega a la columna
-            if col_num > 236:
-                break
-
-        # Incrementar contador
-        contador += 1
-
-        # Mostrar un cero en rojo si no se agregaron percepciones-deducciones
-        if percepciones_deducciones_agregadas_contador == 0:
-            click.echo(click.style("0", fg="yellow"), nl=False)
-        else:
-            click.echo(click.style(".", fg="cyan"), nl=False)
-
-    # Poner avance de linea
-    click.echo("")
+    # Alimentar las percepciones-deducciones
+    contador = alimentar_percepciones_deducciones(sesion, dimensiones, quincena, renglones, tipo, tamano_bloque)
 
     # Cerrar la sesion para que se guarden todos los datos en la base de datos
     sesion.commit()
     sesion.close()
 
-    # Si hubo centros trabajos insertados, mostrar contador
-    if centros_trabajos_insertados_contador > 0:
-        click.echo(click.style(f"  Se insertaron {centros_trabajos_insertados_contador} Centros de Trabajo", fg="green"))
-
-    # Si hubo personas actualizadas, mostrar contador
-    if personas_actualizadas_contador > 0:
-        click.echo(click.style(f"  Se actualizaron {personas_actualizadas_contador} Personas", fg="green"))
-        for item in personas_actualizadas_del_tabulador:
-            click.echo(click.style(f"  {item}", fg="yellow"))
-        for item in personas_actualizadas_del_modelo:
-            click.echo(click.style(f"  {item}", fg="yellow"))
-        for item in personas_actualizadas_del_num_empleado:
-            click.echo(click.style(f"  {item}", fg="yellow"))
-
-    # Si hubo personas insertadas, mostrar contador
-    if personas_insertadas_contador > 0:
-        click.echo(click.style(f"  Se insertaron {personas_insertadas_contador} Personas", fg="green"))
-
-    # Si hubo plazas insertadas, mostrar contador
-    if plazas_insertadas_contador > 0:
-        click.echo(click.style(f"  Se insertaron {plazas_insertadas_contador} Plazas", fg="green"))
-
-    # Si hubo conceptos no existentes, mostrarlos
-    if len(conceptos_no_existentes) > 0:
-        click.echo(click.style(f"  Hubo {len(conceptos_no_existentes)} Conceptos que no existen:", fg="yellow"))
-        click.echo(click.style(f"  {','.join(conceptos_no_existentes)}", fg="yellow"))
-
-    # Si hubo personas sin puestos, mostrarlos
-    if personas_insertadas_contador > 0 and len(personas_sin_puestos) > 0:
-        click.echo(click.style(f"  Hubo {len(personas_sin_puestos)} Personas sin reconocer su Puesto:", fg="yellow"))
-        # click.echo(click.style(f"  {','.join(personas_sin_puestos)}", fg="yellow"))
-
-    # Si hubo personas_sin_tabulador, mostrarlas en pantalla
-    if personas_insertadas_contador > 0 and len(personas_sin_tabulador) > 0:
-        click.echo(click.style(f"  Hubo {len(personas_sin_tabulador)} Personas sin reconocer su Tabulador.", fg="yellow"))
-        # click.echo(click.style(f"  {', '.join(personas_sin_tabulador)}", fg="yellow"))
-
     # Mensaje termino
     click.echo(click.style(f"  Alimentar Percepciones-Deducciones: {contador} insertadas.", fg="green"))
 
@@ -468,24 +141,34 @@ def alimentar_apoyos_anuales(quincena_clave: str):
         sesion.add(quincena)
         sesion.commit()
 
+    # Cargar en memoria los catalogos para no consultar la base de datos por cada fila
+    dimensiones = Dimensiones(sesion)
+
     # Consultar el concepto con clave PAZ que es APOYO ANUAL, si no se encuentra, error
-    concepto_paz = Concepto.query.filter_by(clave="PAZ").first()
+    concepto_paz = dimensiones.consultar_concepto("PAZ")
     if concepto_paz is None:
         click.echo("ERROR: No existe el concepto con clave PAZ")
         sys.exit(1)
 
     # Consultar el concepto con clave DAZ que es ISR DE APOYO DE FIN DE AÑO, si no se encuentra, error
-    concepto_daz = Concepto.query.filter_by(clave="DAZ").first()
+    concepto_daz = dimensiones.consultar_concepto("DAZ")
     if concepto_daz is None:
         click.echo("ERROR: No existe el concepto con clave DAZ")
         sys.exit(1)
 
     # Consultar el concepto con clave D62 que es PENSION ALIMENTICIA, si no se encuentra, error
-    concepto_d62 = Concepto.query.filter_by(clave="D62").first()
+    concepto_d62 = dimensiones.consultar_concepto("D62")
     if concepto_d62 is None:
         click.echo("ERROR: No existe el concepto con clave D62")
         sys.exit(1)
 
+    # Consultar en una sola vez las nominas de tipo APOYO ANUAL de la quincena, por persona_id
+    nominas_por_persona_id = {}
+    for nomina in (
+        Nomina.query.filter_by(quincena_id=quincena.id).filter_by(tipo="APOYO ANUAL").filter_by(estatus="A").order_by(Nomina.id)
+    ):
+        nominas_por_persona_id.setdefault(nomina.persona_id, nomina)
+
     # Abrir el archivo XLS con xlrd
     libro = xlrd.open_workbook(str(ruta))
 
@@ -517,7 +200,7 @@ def alimentar_apoyos_anuales(quincena_clave: str):
             impte_concepto_d62 = 0.0
 
         # Consultar la persona
-        persona = Persona.query.filter_by(rfc=rfc).first()
+        persona = dimensiones.consultar_persona(rfc)
 
         # Si NO existe, se agrega a la lista de personas_inexistentes y se salta
         if persona is None:
@@ -525,7 +208,7 @@ def alimentar_apoyos_anuales(quincena_clave: str):
             continue
 
         # Consultar el Centro de Trabajo
-        centro_trabajo = CentroTrabajo.query.filter_by(clave=centro_trabajo_clave).first()
+        centro_trabajo = dimensiones.consultar_centro_trabajo(centro_trabajo_clave)
 
         # Si NO existe se agrega a la lista de centros_trabajos_inexistentes y se salta
         if centro_trabajo is None:
@@ -533,7 +216,7 @@ def alimentar_apoyos_anuales(quincena_clave: str):
             continue
 
         # Consultar la Plaza
-        plaza = Plaza.query.filter_by(clave=plaza_clave).first()
+        plaza = dimensiones.consultar_plaza(plaza_clave)
 
         # Si NO existe se agrega a la lista de plazas_inexistentes y se salta
         if plaza is None:
@@ -541,13 +224,7 @@ def alimentar_apoyos_anuales(quincena_clave: str):
             continue
 
         # Consultar la nomina de la quincena, de la persona y que sea de tipo APOYO ANUAL
-        nomina = (
-            Nomina.query.filter_by(persona_id=persona.id)
-            .filter_by(quincena_id=quincena.id)
-            .filter_by(tipo="APOYO ANUAL")
-            .filter_by(estatus="A")
-            .first()
-        )
+        nomina = nominas_por_persona_id.get(persona.id)
 
         # Si NO existe, se agrega a la lista de nominas_inexistentes y se salta
         if nomina is None:
@@ -641,5 +318,23 @@ def alimentar_apoyos_anuales(quincena_clave: str):
     click.echo(click.style(f"  Alimentar P-D Apoyos Anuales: {contador} insertadas.", fg="green"))
 
 
+@click.command()
+@click.option("--renglones", type=int, default=1000000, help="Cantidad de renglones de la tabla sintetica")
+@click.option("--por-pagina", type=int, default=100, help="Cantidad de renglones por pagina")
+@click.option("--database-url", type=str, default="", help="URL de la base de datos, por defecto SQLite temporal")
+def medir_paginacion_datatables(renglones: int, por_pagina: int, database_url: str):
+    """Medir la paginacion con offset contra la paginacion por llave en una tabla sintetica"""
+
+    # Crear la tabla sintetica y medir
+    click.echo(f"Tabla sintetica de {renglones} renglones, paginas de {por_pagina}")
+    mediciones, segundos = medir_paginacion(renglones, por_pagina, database_url)
+
+    # Mostrar los tiempos por profundidad
+    for medicion in mediciones:
+        click.echo(f"  {medicion.profundidad:>4}: offset {medicion.offset_ms:>10} ms, llave {medicion.llave_ms:>8} ms")
+    click.echo(f"Recorrer todas las paginas por llave tomo {segundos} s")
+
+
 cli.add_command(alimentar)
 cli.add_command(alimentar_apoyos_anuales)
+cli.add_command(medir_paginacion_datatables)
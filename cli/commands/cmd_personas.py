@@ -13,15 +13,16 @@ import requests
 import xlrd
 from dotenv import load_dotenv
 
+from cli.commands.dimensiones import Dimensiones
+from cli.commands.explotacion import leer_nominas_fmt2
 from lib.exceptions import MyAnyError
 from lib.fechas import quincena_to_fecha
-from lib.safe_string import QUINCENA_REGEXP, safe_clave, safe_curp, safe_rfc, safe_string
-from perseo.app import create_app
+from lib.safe_string import QUINCENA_REGEXP, safe_curp, safe_rfc, safe_string
+from perseo.app import get_app
 from perseo.blueprints.nominas.models import Nomina
 from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
 from perseo.blueprints.personas.models import Persona
 from perseo.blueprints.personas.tasks import exportar_xlsx
-from perseo.blueprints.puestos.models import Puesto
 from perseo.blueprints.tabuladores.models import Tabulador
 from perseo.extensions import database
 
@@ -36,9 +37,7 @@ EXPLOTACION_BASE_DIR = os.environ.get("EXPLOTACION_BASE_DIR")
 NOMINAS_FILENAME_XLS = "NominaFmt2.XLS"
 EMPLEADOS_ALFABETICO_FILENAME_XLS = "EmpleadosAlfabetico.XLS"
 
-app = create_app()
-app.app_context().push()
-database.app = app
+app = get_app()
 
 
 @click.group()
@@ -63,6 +62,9 @@ def actualizar(personas_csv: str):
     # Iniciar sesión con la base de datos para que la alimentación sea rápida
     sesion = database.session
 
+    # Cargar en memoria los catalogos para no consultar la base de datos por cada fila
+    dimensiones = Dimensiones(sesion)
+
     # Inicializar contadores y mensajes
     contador = 0
     errores = []
@@ -73,7 +75,7 @@ def actualizar(personas_csv: str):
         reader = csv.DictReader(csvfile)
         for row in reader:
             # Consultar la persona
-            persona = Persona.query.filter_by(rfc=row["rfc"]).first()
+            persona = dimensiones.consultar_persona(row["rfc"])
 
             # Si no existe, saltar
             if persona is None:
@@ -196,6 +198,12 @@ def actualizar_fechas_ingreso(quincena_clave: str):
     # Obtener la primera hoja
     hoja = libro.sheet_by_index(0)
 
+    # Iniciar sesion con la base de datos para que la actualizacion sea rapida
+    sesion = database.session
+
+    # Cargar en memoria los catalogos para no consultar la base de datos por cada fila
+    dimensiones = Dimensiones(sesion)
+
     # Inicializar los listados con las anomalias
     personas_no_encontradas = []
 
@@ -227,7 +235,7 @@ def actualizar_fechas_ingreso(quincena_clave: str):
             sys.exit(1)
 
         # Consultar a la persona
-        persona = Persona.query.filter_by(rfc=rfc).first()
+        persona = dimensiones.consultar_persona(rfc)
 
         # Si no se encuentra, agregar a la lista de anomalias y saltar
         if persona is None:
@@ -249,13 +257,17 @@ def actualizar_fechas_ingreso(quincena_clave: str):
 
         # Si hay cambios, agregar a la sesion e incrementar el contador
         if hay_cambios is True:
-            persona.save()
+            sesion.add(persona)
             personas_actualizadas_contador += 1
             click.echo(click.style("u", fg="green"), nl=False)
 
     # Poner avance de linea
     click.echo("")
 
+    # Guardar todos los cambios en la base de datos
+    sesion.commit()
+    sesion.close()
+
     # Si hubo personas_no_encontradas, mostrarlas
     if len(personas_no_encontradas) > 0:
         click.echo(click.style(f"  Hubo {len(personas_no_encontradas)} personas que no se encontraron:", fg="yellow"))
@@ -289,14 +301,17 @@ def actualizar_tabuladores(quincena_clave: str):
         click.echo(f"ERROR: {str(ruta)} no es un archivo.")
         sys.exit(1)
 
-    # Abrir el archivo XLS con xlrd
-    libro = xlrd.open_workbook(str(ruta))
+    # Leer el archivo XLS una sola vez, o tomarlo del cache si ya se leyo antes
+    renglones = leer_nominas_fmt2(ruta)
 
-    # Obtener la primera hoja
-    hoja = libro.sheet_by_index(0)
+    # Iniciar sesion con la base de datos para que la actualizacion sea rapida
+    sesion = database.session
+
+    # Cargar en memoria los catalogos para no consultar la base de datos por cada fila
+    dimensiones = Dimensiones(sesion)
 
     # Definir el puesto generico
-    puesto_generico = Puesto.query.filter_by(clave="ND").first()
+    puesto_generico = dimensiones.consultar_puesto("ND")
     if puesto_generico is None:
         click.echo("ERROR: Falta el puesto con clave ND.")
         sys.exit(1)
@@ -322,62 +337,31 @@ def actualizar_tabuladores(quincena_clave: str):
 
     # Bucle por cada fila
     click.echo(f"Actualizando Tabuladores de las Personas con {quincena_clave}: ", nl=False)
-    for fila in range(1, hoja.nrows):
-        # Tomar las columnas
-        rfc = hoja.cell_value(fila, 2)
-        modelo = int(hoja.cell_value(fila, 236))
-        puesto_clave = safe_clave(hoja.cell_value(fila, 20))
-        nivel = int(hoja.cell_value(fila, 9))
-        num_empleado = int(hoja.cell_value(fila, 240))
+    for renglon in renglones:
+        # Tomar las columnas, si el modelo es 2 el puesto ya viene con 4 caracteres
+        rfc = renglon.rfc
+        modelo = renglon.modelo
+        puesto_clave = renglon.puesto_clave
+        nivel = renglon.nivel
+        num_empleado = renglon.num_empleado
 
         # Consultar a la persona
-        persona = Persona.query.filter_by(rfc=rfc).first()
+        persona = dimensiones.consultar_persona(rfc)
 
         # Si no se encuentra, agregar a personas_no_encontradas y saltar
         if persona is None:
             personas_no_encontradas.append(rfc)
             continue
 
-        # Inicializar la bandera para saltar la fila si el concepto es PME
-        es_concepto_pme = False
-
-        # Si el modelo es 2, entonces en SINDICALIZADO, se toman 4 caracteres del puesto
-        if modelo == 2:
-            puesto_clave = puesto_clave[:4]
-
-        # Bucle entre las columnas de los conceptos para encontrar PQ1, PQ2, PQ3, PQ4, PQ5, PQ6 o PME
-        quinquenios = 0
-        col_num = 26
-        while True:
-            # Tomar el p_o_d
-            p_o_d = safe_string(hoja.cell_value(fila, col_num))
-            # Tomar el conc
-            conc = safe_string(hoja.cell_value(fila, col_num + 1))
-            # Si 'P' o 'D' es un texto vacio, se rompe el ciclo
-            if p_o_d == "":
-                break
-            # Si NO es P, se salta
-            if p_o_d != "P":
-                col_num += 6
-                continue
-            # Si conc es ME es monedero, se rompe el ciclo porque aqui no hay quinquenios
-            if conc == "ME":
-                es_concepto_pme = True
-                break
-            # Si el concepto no es PQ1, PQ2, PQ3, PQ4, PQ5, PQ6, se salta
-            if conc not in ["Q1", "Q2", "Q3", "Q4", "Q5", "Q6"]:
-                col_num += 6
-                continue
-            # Tomar el tercer caracter del concepto y convertirlo a entero porque es la cantidad de quinquenios
-            quinquenios = int(conc[1])
-            break
-
         # Si el concepto es PME, entonces en esta fila se salta
-        if es_concepto_pme:
+        if renglon.es_concepto_pme:
             continue
 
+        # Tomar los quinquenios de PQ1, PQ2, PQ3, PQ4, PQ5, PQ6, si no los tiene es cero
+        quinquenios = renglon.quinquenios if renglon.quinquenios is not None else 0
+
         # Consultar el puesto
-        puesto = Puesto.query.filter_by(clave=puesto_clave).first()
+        puesto = dimensiones.consultar_puesto(puesto_clave)
 
         # Si no se encuentra, agregar a puestos_claves_no_encontrados y saltar
         if puesto is None:
@@ -395,12 +379,7 @@ def actualizar_tabuladores(quincena_clave: str):
             continue
 
         # Consultar el tabulador
-        tabulador = Tabulador.query.filter(
-            Tabulador.puesto_id == puesto.id,
-            Tabulador.modelo == modelo,
-            Tabulador.nivel == nivel,
-            Tabulador.quinquenio == quinquenios,
-        ).first()
+        tabulador = dimensiones.consultar_tabulador(puesto.id, modelo, nivel, quinquenios)
 
         # Si no se encuentra, agregar a la lista de anomalias y saltar
         if tabulador is None:
@@ -432,15 +411,19 @@ def actualizar_tabuladores(quincena_clave: str):
             persona.num_empleado = num_empleado
             hay_cambios = True
 
-        # Si hay cambios, guardar la Persona
+        # Si hay cambios, agregar la Persona a la sesion
         if hay_cambios:
-            persona.save()
+            sesion.add(persona)
             personas_actualizadas_contador += 1
             click.echo(click.style("u", fg="green"), nl=False)
 
     # Poner avance de linea
     click.echo("")
 
+    # Guardar todos los cambios en la base de datos
+    sesion.commit()
+    sesion.close()
+
     # Si hubo modelos_no_validos, mostrar contador
     if modelos_no_validos_contador > 0:
         click.echo(click.style(f"  Hubo {modelos_no_validos_contador} filas con modelos NO validos, se omiten", fg="yellow"))
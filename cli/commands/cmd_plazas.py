@@ -6,11 +6,10 @@ import sys
 import click
 
 from lib.exceptions import MyAnyError
-from perseo.app import create_app
+from perseo.app import get_app
 from perseo.blueprints.plazas.tasks import exportar_xlsx
 
-app = create_app()
-app.app_context().push()
+app = get_app()
 
 
 @click.group()
@@ -2,22 +2,42 @@
 CLI Quincenas
 """
 import os
+import re
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
 
 import click
 from dotenv import load_dotenv
 
-from perseo.app import create_app
+from cli.commands.alimentar_explotacion import (
+    ReportePersonas,
+    alimentar_cuentas_bancarias,
+    alimentar_cuentas_monederos,
+    alimentar_nominas,
+    alimentar_percepciones_deducciones,
+    consultar_o_agregar_quincena,
+)
+from cli.commands.dimensiones import Dimensiones
+from cli.commands.explotacion import leer_cuentas_bancarias, leer_monederos, leer_nominas_fmt2
+from lib.insercion_masiva import TAMANO_BLOQUE
+from lib.safe_string import QUINCENA_REGEXP
+from perseo.app import get_app
 from perseo.blueprints.bancos.models import Banco
 from perseo.blueprints.quincenas.models import Quincena
 from perseo.extensions import database
 
-app = create_app()
-app.app_context().push()
-database.app = app
+app = get_app()
 
 load_dotenv()
 HOST = os.getenv("HOST", "http://localhost:5000")
+EXPLOTACION_BASE_DIR = os.environ.get("EXPLOTACION_BASE_DIR")
+
+CUENTAS_FILENAME_XLS = "EmpleadosAlfabetico.XLS"
+MONEDEROS_FILENAME_XLS = "Monederos.XLS"
+NOMINAS_FILENAME_XLS = "NominaFmt2.XLS"
 
 
 @click.group()
@@ -25,6 +45,143 @@ def cli():
     """Quincenas"""
 
 
+@click.command()
+@click.argument("quincena_clave", type=str)
+@click.argument("fecha_pago_str", type=str)
+@click.option("--tamano-bloque", type=int, default=TAMANO_BLOQUE, help="Cantidad de renglones por bloque al insertar")
+@click.option("--paralelo", is_flag=True, default=False, help="Leer los archivos XLS en procesos paralelos")
+def alimentar(quincena_clave: str, fecha_pago_str: str, tamano_bloque: int, paralelo: bool):
+    """Alimentar nominas, percepciones-deducciones, cuentas y monederos de una quincena en una sola transaccion"""
+
+    # Iniciar sesion con la base de datos para que la alimentacion sea rapida
+    sesion = database.session
+
+    # Validar quincena
+    if re.match(QUINCENA_REGEXP, quincena_clave) is None:
+        click.echo("ERROR: Quincena inválida.")
+        sys.exit(1)
+
+    # Validar fecha_pago
+    try:
+        fecha_pago = datetime.strptime(fecha_pago_str, "%Y-%m-%d")
+    except ValueError:
+        click.echo("ERROR: Fecha de pago inválida")
+        sys.exit(1)
+
+    # Validar el directorio donde espera encontrar los archivos de explotacion
+    if EXPLOTACION_BASE_DIR is None:
+        click.echo("ERROR: Variable de entorno EXPLOTACION_BASE_DIR no definida.")
+        sys.exit(1)
+
+    # Validar que exista el archivo de nominas, es obligatorio
+    ruta_nominas = Path(EXPLOTACION_BASE_DIR, quincena_clave, NOMINAS_FILENAME_XLS)
+    if not ruta_nominas.is_file():
+        click.echo(f"ERROR: {str(ruta_nominas)} no se encontró o no es un archivo.")
+        sys.exit(1)
+
+    # Los archivos de cuentas y monederos son opcionales, si no estan se omiten sus etapas
+    ruta_cuentas = Path(EXPLOTACION_BASE_DIR, quincena_clave, CUENTAS_FILENAME_XLS)
+    if not ruta_cuentas.is_file():
+        click.echo(click.style(f"AVISO: {str(ruta_cuentas)} no se encontró. Se omiten las cuentas bancarias.", fg="yellow"))
+        ruta_cuentas = None
+    ruta_monederos = Path(EXPLOTACION_BASE_DIR, quincena_clave, MONEDEROS_FILENAME_XLS)
+    if not ruta_monederos.is_file():
+        click.echo(click.style(f"AVISO: {str(ruta_monederos)} no se encontró. Se omiten los monederos.", fg="yellow"))
+        ruta_monederos = None
+
+    # Inicializar los tiempos por etapa
+    tiempos = {}
+
+    # Leer los archivos XLS una sola vez, en procesos paralelos si se pide, porque decodificarlos no usa la base de datos
+    inicio = time.perf_counter()
+    if paralelo:
+        with ProcessPoolExecutor(max_workers=3) as ejecutor:
+            futuro_nominas = ejecutor.submit(leer_nominas_fmt2, ruta_nominas)
+            futuro_cuentas = ejecutor.submit(leer_cuentas_bancarias, ruta_cuentas) if ruta_cuentas else None
+            futuro_monederos = ejecutor.submit(leer_monederos, ruta_monederos) if ruta_monederos else None
+            renglones_nominas = futuro_nominas.result()
+            renglones_cuentas = futuro_cuentas.result() if futuro_cuentas else ()
+            renglones_monederos = futuro_monederos.result() if futuro_monederos else ()
+    else:
+        renglones_nominas = leer_nominas_fmt2(ruta_nominas)
+        renglones_cuentas = leer_cuentas_bancarias(ruta_cuentas) if ruta_cuentas else ()
+        renglones_monederos = leer_monederos(ruta_monederos) if ruta_monederos else ()
+    tiempos["Leer XLS"] = time.perf_counter() - inicio
+
+    # Las etapas comparten la sesion, los catalogos en memoria y el reporte de las personas
+    dimensiones = Dimensiones(sesion)
+    reporte = ReportePersonas()
+
+    # Ejecutar las etapas en la misma transaccion, si alguna falla se revierte todo
+    try:
+        # Consultar quincena, si no existe se agrega sin hacer commit
+        quincena = consultar_o_agregar_quincena(sesion, quincena_clave)
+
+        # Alimentar nominas
+        inicio = time.perf_counter()
+        nominas_contador = alimentar_nominas(
+            sesion, dimensiones, quincena, renglones_nominas, fecha_pago, tamano_bloque, reporte=reporte
+        )
+        tiempos["Nominas"] = time.perf_counter() - inicio
+
+        # Si no se alimentaron nominas, se termina sin guardar nada
+        if nominas_contador == 0:
+            click.echo(click.style("ERROR: No se alimentaron registros en nominas.", fg="red"))
+            sys.exit(1)
+
+        # Alimentar percepciones-deducciones con los mismos renglones
+        inicio = time.perf_counter()
+        percepciones_deducciones_contador = alimentar_percepciones_deducciones(
+            sesion, dimensiones, quincena, renglones_nominas, "SALARIO", tamano_bloque, reporte=reporte
+        )
+        tiempos["Percepciones-Deducciones"] = time.perf_counter() - inicio
+
+        # Alimentar cuentas bancarias
+        inicio = time.perf_counter()
+        cuentas_contador = alimentar_cuentas_bancarias(sesion, dimensiones, renglones_cuentas) if ruta_cuentas else 0
+        tiempos["Cuentas bancarias"] = time.perf_counter() - inicio
+
+        # Alimentar monederos
+        inicio = time.perf_counter()
+        monederos_nuevos, monederos_bajas = (0, 0)
+        if ruta_monederos:
+            monederos_nuevos, monederos_bajas = alimentar_cuentas_monederos(sesion, dimensiones, renglones_monederos)
+        tiempos["Monederos"] = time.perf_counter() - inicio
+
+        # Guardar todo en la base de datos
+        inicio = time.perf_counter()
+        sesion.commit()
+        tiempos["Commit"] = time.perf_counter() - inicio
+    except SystemExit:
+        sesion.rollback()
+        raise
+    except Exception as error:
+        sesion.rollback()
+        click.echo(click.style(f"ERROR: {str(error)}", fg="red"))
+        sys.exit(1)
+    finally:
+        sesion.close()
+
+    # Mostrar el reporte de las personas
+    reporte.mostrar()
+
+    # Mostrar los tiempos por etapa
+    click.echo("Tiempos por etapa:")
+    for etapa, segundos in tiempos.items():
+        click.echo(f"  {etapa}: {segundos:.2f} s")
+    click.echo(f"  Total: {sum(tiempos.values()):.2f} s")
+
+    # Mensaje termino
+    click.echo(
+        click.style(
+            f"Alimentar quincena {quincena_clave}: {nominas_contador} nominas, "
+            f"{percepciones_deducciones_contador} renglones de percepciones-deducciones, "
+            f"{cuentas_contador} cuentas y {monederos_nuevos} monederos insertados, {monederos_bajas} monederos eliminados.",
+            fg="green",
+        )
+    )
+
+
 @click.command()
 def cerrar():
     """Cerrar TODAS las quincenas con estado ABIERTA"""
@@ -78,4 +235,5 @@ def cerrar():
     click.echo(f"Quincenas terminado: {contador} cambios en quincenas, {bancos_actualizados_contador} cambios en bancos.")
 
 
+cli.add_command(alimentar)
 cli.add_command(cerrar)
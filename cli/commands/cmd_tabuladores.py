@@ -10,15 +10,14 @@ import click
 
 from lib.exceptions import MyAnyError
 from lib.safe_string import safe_clave
-from perseo.app import create_app
+from perseo.app import get_app
 from perseo.blueprints.puestos.models import Puesto
 from perseo.blueprints.tabuladores.models import Tabulador
 from perseo.blueprints.tabuladores.tasks import exportar_xlsx
 
 TABULADORES_CSV = "seed/tabuladores.csv"
 
-app = create_app()
-app.app_context().push()
+app = get_app()
 
 
 @click.group()
@@ -0,0 +1,90 @@
+"""
+CLI Tareas
+"""
+import importlib
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Process
+
+import click
+from redis import Redis
+from rq import Worker
+
+from cli.commands.medir_arranque import medir_arranque
+from perseo.app import get_app
+from perseo.blueprints.tareas.colas import COLAS, crear_colas, estado_colas, modulos_tareas
+
+app = get_app()
+
+
+@click.group()
+def cli():
+    """Tareas"""
+
+
+def trabajar_colas(clases: list):
+    """Arrancar un worker de RQ que escucha las colas en el orden dado"""
+    conexion = Redis.from_url(app.config["REDIS_URL"])
+    colas = crear_colas(app.config["TASK_QUEUE"], conexion)
+    Worker([colas[clase] for clase in clases], connection=conexion).work()
+
+
+@click.command()
+@click.option("--cola", "clases", multiple=True, type=click.Choice(list(COLAS)), help="Cola a atender, se puede repetir")
+@click.option("--cantidad", default=1, help="Cantidad de workers")
+def trabajar(clases: tuple, cantidad: int):
+    """Arrancar workers de RQ para las colas dadas, sin --cola atienden todas"""
+
+    # Validar la cantidad
+    if cantidad < 1:
+        click.echo("ERROR: La cantidad de workers debe ser uno o mas.")
+        sys.exit(1)
+
+    # Ordenar las colas por prioridad, las interactivas primero
+    clases = [clase for clase in COLAS if not clases or clase in clases]
+
+    # Cargar una sola vez los modulos de tareas, los workers y el proceso de cada tarea los heredan con la app ya creada
+    for modulo in modulos_tareas():
+        try:
+            importlib.import_module(modulo)
+        except (ImportError, OSError) as error:
+            click.echo(f"AVISO: No se pudo cargar {modulo}: {error}")
+
+    # Arrancar cada worker en su propio proceso con su propia conexion a Redis
+    click.echo(f"Arrancando {cantidad} workers para las colas {', '.join(clases)}")
+    procesos = [Process(target=trabajar_colas, args=(clases,)) for _ in range(cantidad)]
+    for proceso in procesos:
+        proceso.start()
+    for proceso in procesos:
+        proceso.join()
+
+
+@click.command()
+def mostrar_colas():
+    """Mostrar las tareas en cola y en ejecucion, los workers y la espera de cada cola"""
+    estados = estado_colas(app.task_queues)
+    if len(estados) == 0:
+        click.echo("ERROR: No se pudo consultar Redis.")
+        sys.exit(1)
+    for estado in estados:
+        click.echo(
+            f"{estado.nombre}: {estado.en_cola} en cola, {estado.en_ejecucion} en ejecucion, "
+            f"{estado.trabajadores} workers, {estado.espera} segundos de espera"
+        )
+
+
+@click.command()
+def medir_arranque_tareas():
+    """Medir las apps creadas y los segundos al cargar los modulos de tareas en un proceso nuevo"""
+    contexto = multiprocessing.get_context("spawn")
+    mediciones = [(modulo, [modulo]) for modulo in modulos_tareas()] + [("todos", modulos_tareas())]
+    for nombre, modulos in mediciones:
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as ejecutor:
+            apps, segundos = ejecutor.submit(medir_arranque, modulos).result()
+        click.echo(f"{nombre}: {apps} apps creadas en {segundos:.2f} segundos")
+
+
+cli.add_command(trabajar)
+cli.add_command(mostrar_colas)
+cli.add_command(medir_arranque_tareas)
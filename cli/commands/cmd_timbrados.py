@@ -4,16 +4,17 @@ CLI Timbrados
 import os
 import re
 import sys
-import xml.etree.ElementTree as ET
 from pathlib import Path
 
 import click
 from dotenv import load_dotenv
+from sqlalchemy import update
 
-from lib.exceptions import MyBucketNotFoundError, MyFileNotAllowedError, MyFileNotFoundError, MyUploadError
-from lib.google_cloud_storage import check_file_exists_from_gcs, get_public_url_from_gcs, upload_file_to_gcs
+from cli.commands.cfdi import leer_cfdis
+from lib.depositos import HILOS, DepositoLocal, Subida, obtener_deposito, subir_en_paralelo
+from lib.exceptions import MyBucketNotFoundError
 from lib.safe_string import QUINCENA_REGEXP, safe_string
-from perseo.app import create_app
+from perseo.app import get_app
 from perseo.blueprints.nominas.models import Nomina
 from perseo.blueprints.personas.models import Persona
 from perseo.blueprints.quincenas.models import Quincena
@@ -21,9 +22,6 @@ from perseo.blueprints.timbrados.models import Timbrado
 from perseo.extensions import database
 
 CARPETA = "timbrados"
-XML_TAG_CFD_PREFIX = "{http://www.sat.gob.mx/cfd/4}"
-XML_TAG_TFD_PREFIX = "{http://www.sat.gob.mx/TimbreFiscalDigital}"
-XML_TAG_NOMINA_PREFIX = "{http://www.sat.gob.mx/nomina12}"
 
 load_dotenv()
 
@@ -33,9 +31,7 @@ CFDI_EMISOR_REGFIS = os.environ.get("CFDI_EMISOR_REGFIS", "")
 CLOUD_STORAGE_DEPOSITO = os.environ.get("CLOUD_STORAGE_DEPOSITO", "")
 TIMBRADOS_BASE_DIR = os.environ.get("TIMBRADOS_BASE_DIR", "")
 
-app = create_app()
-app.app_context().push()
-database.app = app
+app = get_app()
 
 
 @click.group()
@@ -47,7 +43,10 @@ def cli():
 @click.argument("quincena_clave", type=str)
 @click.argument("tipo", type=str, default="SALARIO")
 @click.option("--subdir", type=str, default=None)
-def actualizar(quincena_clave: str, tipo: str, subdir: str):
+@click.option("--procesos", type=int, default=None, help="Cantidad de procesos para leer los XML, por defecto los CPU")
+@click.option("--hilos", type=int, default=HILOS, help="Cantidad de hilos para subir los archivos al deposito")
+@click.option("--deposito-local", type=str, default="", help="Directorio local que toma el lugar del deposito GCS")
+def actualizar(quincena_clave: str, tipo: str, subdir: str, procesos: int, hilos: int, deposito_local: str):
     """Actualizar los timbrados de una quincena a partir de archivos XML y PDF"""
 
     # Validar el directorio donde espera encontrar los archivos de explotacion
@@ -89,6 +88,13 @@ def actualizar(quincena_clave: str, tipo: str, subdir: str):
         click.echo(f"ERROR: No existe el directorio {timbrados_dir}")
         sys.exit(1)
 
+    # Definir el deposito, un directorio local si se pide o el de GCS si esta configurado
+    deposito = None
+    if deposito_local != "":
+        deposito = DepositoLocal(deposito_local)
+    elif CLOUD_STORAGE_DEPOSITO != "":
+        deposito = obtener_deposito(CLOUD_STORAGE_DEPOSITO)
+
     # Inicializar listas de errores
     archivos_pdf_no_encontrados = []
     emisor_rfc_no_coincide = []
@@ -106,125 +112,65 @@ def actualizar(quincena_clave: str, tipo: str, subdir: str):
     errores_xml = 0
     procesados_contador = 0
 
-    # Recorrer los archivos con extension xml
-    click.echo(f"Actualizar los timbrados de {quincena_clave}: ", nl=False)
-    for archivo in timbrados_dir.glob("*.xml"):
-        # Obtener el nombre del archivo
-        archivo_nombre = archivo.name
-        # click.echo(f"  {archivo_nombre}")
-
-        # Definir ruta al archivo XML
-        ruta_xml = Path(timbrados_dir, archivo_nombre)
-
-        # Definir ruta al archivo PDF
-        ruta_pdf = Path(timbrados_dir, archivo_nombre.replace(".xml", ".pdf"))
-
+    # Juntar los archivos con extension xml que tengan su archivo PDF
+    rutas_xml = []
+    for ruta_xml in sorted(timbrados_dir.glob("*.xml")):
         # Si no existe el archivo PDF, se agrega a la lista de errores y se omite
-        if not ruta_pdf.is_file:
-            archivos_pdf_no_encontrados.append(archivo_nombre)
+        ruta_pdf = Path(timbrados_dir, ruta_xml.name.replace(".xml", ".pdf"))
+        if not ruta_pdf.is_file():
+            archivos_pdf_no_encontrados.append(ruta_xml.name)
             continue
+        rutas_xml.append(ruta_xml)
+
+    # Leer los archivos XML en procesos paralelos, solo se toman Emisor, Receptor y TimbreFiscalDigital
+    click.echo(f"Leyendo {len(rutas_xml)} archivos XML de {timbrados_dir}...")
+    cfdis = leer_cfdis(rutas_xml, procesos)
+
+    # Consultar de una vez las nominas de la quincena y tipo, si una persona tiene varias se toma la ultima
+    nominas_por_rfc = {}
+    consulta = (
+        database.session.query(Persona.rfc, Nomina.id)
+        .select_from(Nomina)
+        .join(Persona, Nomina.persona_id == Persona.id)
+        .join(Quincena, Nomina.quincena_id == Quincena.id)
+        .filter(Quincena.clave == quincena_clave)
+        .filter(Nomina.tipo == tipo)
+        .filter(Nomina.estatus == "A")
+        .order_by(Nomina.id)
+    )
+    for rfc, nomina_id in consulta:
+        nominas_por_rfc[rfc] = nomina_id
+
+    # Consultar de una vez los timbrados activos de esas nominas, si una nomina tiene varios se toma el ultimo
+    timbrados_por_nomina = {}
+    if len(nominas_por_rfc) > 0:
+        consulta = (
+            Timbrado.query.filter(Timbrado.nomina_id.in_(list(nominas_por_rfc.values())))
+            .filter_by(estatus="A")
+            .order_by(Timbrado.id)
+        )
+        for timbrado in consulta:
+            timbrados_por_nomina[timbrado.nomina_id] = timbrado
+
+    # Bucle para validar los datos de los CFDI
+    validos = []
+    for cfdi in cfdis:
+        # Obtener el nombre del archivo
+        archivo_nombre = cfdi.ruta.name
 
         # Obtener el RFC que esta en los primeros 13 caracteres del nombre del archivo
         rfc_en_nombre = archivo_nombre[:13]
 
-        # Parsear el archivo XML
-        tree = ET.parse(ruta_xml)
-        root = tree.getroot()
-
-        # Estructura del CFDI version 4.0
-        # - cfdi:Comprobante [xmlns:xsi, xmlns:nomina12, xmlns:cfdi, Version, Serie, Folio, Fecha, SubTotal, Descuento, Moneda,
-        #     Total, TipoDeComprobante, Exportacion, MetodoPago, LugarExpedicion, Sello, Certificado, NoCertificado]
-        #   - cfdi:Emisor [Rfc, Nombre, RegimenFiscal]
-        #   - cfdi:Receptor [Rfc, Nombre, DomicilioFiscalReceptor, RegimenFiscalReceptor, UsoCFDI]
-        #   - cfdi:Conceptos
-        #     - cfdi:Concepto [ClaveProdServ, Cantidad, ClaveUnidad, Descripcion, ValorUnitario, Importe, Descuento, ObjetoImp]
-        #   - cfdi:Complemento
-        #     - tfd:TimbreFiscalDigital [Version, UUID, FechaTimbrado, RfcProvCertif, SelloCFD, NoCertificadoSAT, SelloSAT]
-        #     - nomina12:Nomina [Version, TipoNomina, FechaPago, FechaInicialPago, FechaFinalPago, NumDiasPagados,
-        #         TotalDeducciones, TotalOtrosPagos]
-        #       - nomina12:Emisor [RegistroPatronal]
-        #         - nomina12:EntidadSNCF [OrigenRecurso]
-        #       - nomina12:Receptor [Curp, NumSeguridadSocial, FechaInicioRelLaboral, Antigüedad, TipoContrato, Sindicalizado,
-        #           TipoJornada, TipoRegimen, NumEmpleado, Departamento, Puesto, RiesgoPuesto, PeriodicidadPago, Banco,
-        #           CuentaBancaria, SalarioBaseCotApor, SalarioDiarioIntegrado, ClaveEntFed]
-        #       - nomina12:Percepciones [TotalSueldos, TotalGravado, TotalExento]
-        #         - nomina12:Percepcion [TipoPercepcion, Clave, Concepto, ImporteGravado, ImporteExento]
-        #       - nomina12:Deducciones [TotalOtrasDeducciones]
-        #         - nomina12:Deduccion [TipoDeduccion, Clave, Concepto, Importe]
-        #       - nomina12:OtrosPagos
-        #         - nomina12:OtroPago [TipoOtroPago, Clave, Concepto, Importe]
-
         # Validar que el tag raiz sea cfdi:Comprobante
-        if root.tag != f"{XML_TAG_CFD_PREFIX}Comprobante":
+        if not cfdi.es_comprobante:
             errores_xml += 1
             continue
 
-        # Obtener datos de cfdi:Comprobante
-        # cfdi_comprobante_version = None
-        # if "Version" in root.attrib:
-        #     cfdi_comprobante_version = root.attrib["Version"]
-        # click.echo(click.style(f"    Version: {cfdi_comprobante_version}", fg="green"))
-        # cfdi_comprobante_serie = None
-        # if "Serie" in root.attrib:
-        #     cfdi_comprobante_serie = root.attrib["Serie"]
-        # click.echo(click.style(f"    Serie: {cfdi_comprobante_serie}", fg="green"))
-        # cfdi_comprobante_folio = None
-        # if "Folio" in root.attrib:
-        #     cfdi_comprobante_folio = root.attrib["Folio"]
-        # click.echo(click.style(f"    Folio: {cfdi_comprobante_folio}", fg="green"))
-        # cfdi_comprobante_fecha = None
-        # if "Fecha" in root.attrib:
-        #     cfdi_comprobante_fecha = root.attrib["Fecha"]
-        # click.echo(click.style(f"    Fecha: {cfdi_comprobante_fecha}", fg="green"))
-
-        # Inicializar variables de los datos que se van a obtener
-        cfdi_emisor_rfc = None
-        cfdi_emisor_nombre = None
-        cfdi_emisor_regimen_fiscal = None
-        cfdi_receptor_rfc = None
-        cfdi_receptor_nombre = None
-        tfd_version = None
-        tfd_uuid = None
-        tfd_fecha_timbrado = None
-        tfd_sello_cfd = None
-        tfd_num_cert_sat = None
-        tfd_sello_sat = None
-
-        # Bucle por los elementos de root
-        for element in root.iter():
-            # Mostrar el tag
-            # click.echo(click.style(f"    {element.tag}", fg="blue"))
-
-            # Obtener datos de Emisor
-            if element.tag == f"{XML_TAG_CFD_PREFIX}Emisor":
-                if "Rfc" in element.attrib:
-                    cfdi_emisor_rfc = element.attrib["Rfc"]
-                if "Nombre" in element.attrib:
-                    cfdi_emisor_nombre = element.attrib["Nombre"]
-                if "RegimenFiscal" in element.attrib:
-                    cfdi_emisor_regimen_fiscal = element.attrib["RegimenFiscal"]
-
-            # Obtener datos de Receptor
-            if element.tag == f"{XML_TAG_CFD_PREFIX}Receptor":
-                if "Rfc" in element.attrib:
-                    cfdi_receptor_rfc = element.attrib["Rfc"]
-                if "Nombre" in element.attrib:
-                    cfdi_receptor_nombre = element.attrib["Nombre"]
-
-            # Obtener datos de TimbreFiscalDigital
-            if element.tag == f"{XML_TAG_TFD_PREFIX}TimbreFiscalDigital":
-                if "Version" in element.attrib:
-                    tfd_version = element.attrib["Version"]
-                if "UUID" in element.attrib:
-                    tfd_uuid = element.attrib["UUID"]
-                if "FechaTimbrado" in element.attrib:
-                    tfd_fecha_timbrado = element.attrib["FechaTimbrado"]
-                if "SelloCFD" in element.attrib:
-                    tfd_sello_cfd = element.attrib["SelloCFD"]
-                if "NoCertificadoSAT" in element.attrib:
-                    tfd_num_cert_sat = element.attrib["NoCertificadoSAT"]
-                if "SelloSAT" in element.attrib:
-                    tfd_sello_sat = element.attrib["SelloSAT"]
+        # Tomar los datos del Emisor y Receptor
+        cfdi_emisor_rfc = cfdi.emisor_rfc
+        cfdi_emisor_nombre = cfdi.emisor_nombre
+        cfdi_emisor_regimen_fiscal = cfdi.emisor_regimen_fiscal
+        cfdi_receptor_rfc = cfdi.receptor_rfc
 
         # Si NO se encontro el Receptor RFC, se agrega a la lista de errores y se omite
         if cfdi_receptor_rfc is None:
@@ -251,33 +197,77 @@ def actualizar(quincena_clave: str, tipo: str, subdir: str):
             emisor_regfis_no_coincide.append(archivo_nombre)
             continue
 
-        # Consultar la Nomina
-        nomina = (
-            Nomina.query.join(Persona)
-            .join(Quincena)
-            .filter(Persona.rfc == cfdi_receptor_rfc)
-            .filter(Quincena.clave == quincena_clave)
-            .filter(Nomina.tipo == tipo)
-            .filter(Nomina.estatus == "A")
-            .order_by(Nomina.id.desc())
-            .first()
-        )
+        # Tomar la Nomina
+        nomina_id = nominas_por_rfc.get(cfdi_receptor_rfc)
 
         # Si NO se encuentra registro en Nomina
-        if nomina is None:
+        if nomina_id is None:
             nomina_no_encontrada.append(cfdi_receptor_rfc)
             continue
 
+        # Juntar el CFDI valido con su nomina
+        validos.append((cfdi, nomina_id))
+
+    # Si esta definido el deposito, listar de una vez sus archivos y subir solo los que falten
+    blobs_con_error = set()
+    if deposito is not None:
+        # Listar los archivos que ya estan en el deposito
+        try:
+            existentes = deposito.listar(f"{CARPETA}/{directorio}/")
+        except MyBucketNotFoundError as error:
+            click.echo(click.style(f"ERROR: {str(error)}", fg="red"))
+            sys.exit(1)
+
+        # Juntar los archivos XML y PDF que falten
+        subidas = []
+        for cfdi, _ in validos:
+            for extension, content_type in (("xml", "application/xml"), ("pdf", "application/pdf")):
+                blob_nombre = f"{CARPETA}/{directorio}/{cfdi.tfd_uuid}.{extension}"
+                ruta = cfdi.ruta.with_suffix(f".{extension}")
+                if blob_nombre in existentes:
+                    continue
+                if not ruta.is_file():
+                    blobs_con_error.add(blob_nombre)
+                    continue
+                subidas.append(Subida(blob_nombre, ruta, content_type))
+                existentes.add(blob_nombre)
+
+        # Subir los archivos que falten con varios hilos, reintentando los que fallen
+        click.echo(f"Subiendo {len(subidas)} archivos al deposito con {hilos} hilos...")
+        resultado = subir_en_paralelo(deposito, subidas, hilos)
+        blobs_con_error.update(resultado.errores)
+        click.echo(
+            f"Se subieron {len(resultado.urls)} archivos ({resultado.bytes_subidos} bytes) en {resultado.segundos:.2f} s, "
+            f"{resultado.archivos_por_segundo} archivos/s, {resultado.megabytes_por_segundo} MB/s"
+        )
+        for blob_nombre, mensaje in resultado.errores.items():
+            click.echo(click.style(f"  {blob_nombre}: {mensaje}", fg="red"))
+
+    # Bucle por los CFDI validos
+    timbrados_con_cambios = []
+    click.echo(f"Actualizar los timbrados de {quincena_clave}: ", nl=False)
+    for cfdi, nomina_id in validos:
+        # Tomar la ruta al archivo XML y los datos del CFDI
+        ruta_xml = cfdi.ruta
+        cfdi_receptor_rfc = cfdi.receptor_rfc
+        tfd_version = cfdi.tfd_version
+        tfd_uuid = cfdi.tfd_uuid
+        tfd_fecha_timbrado = cfdi.tfd_fecha_timbrado
+        tfd_sello_cfd = cfdi.tfd_sello_cfd
+        tfd_num_cert_sat = cfdi.tfd_num_cert_sat
+        tfd_sello_sat = cfdi.tfd_sello_sat
+
         # Inicializar bandera hay_cambios
         hay_cambios = False
 
         # Puede existir el registro de Timbrado
-        timbrado = Timbrado.query.filter(Timbrado.nomina == nomina).filter_by(estatus="A").order_by(Timbrado.id.desc()).first()
+        timbrado = timbrados_por_nomina.get(nomina_id)
 
         # Si NO existe el registro de Timbrado, se crea
         es_nuevo = False
         if timbrado is None:
-            timbrado = Timbrado(nomina=nomina, estado="TIMBRADO", archivo_pdf="", url_pdf="", archivo_xml="", url_xml="")
+            timbrado = Timbrado(nomina_id=nomina_id, estado="TIMBRADO", archivo_pdf="", url_pdf="", archivo_xml="", url_xml="")
+            timbrados_por_nomina[nomina_id] = timbrado
             es_nuevo = True
             hay_cambios = True
 
@@ -322,77 +312,35 @@ def actualizar(quincena_clave: str, tipo: str, subdir: str):
         archivo_pdf = timbrado.archivo_pdf
         url_pdf = timbrado.url_pdf
 
-        # Si esta definido el deposito GCS
-        if CLOUD_STORAGE_DEPOSITO != "":
-            # Bloque try-except para contar errores en subida de archivos XML
-            try:
-                # Definir el nombre de descarga del archivo XML
-                if archivo_sufijo == "":
-                    archivo_xml = f"{cfdi_receptor_rfc}-{quincena_clave}.xml"
-                else:
-                    archivo_xml = f"{cfdi_receptor_rfc}-{quincena_clave}-{archivo_sufijo}.xml"
-                # Definir la ruta del archivo XML en el deposito GCS
-                blob_nombre_xml = f"{CARPETA}/{directorio}/{tfd_uuid}.xml"
-                # Si existe el archivo XML en el deposito GCS
-                if check_file_exists_from_gcs(CLOUD_STORAGE_DEPOSITO, blob_nombre_xml):
-                    # Obtener la URL del archivo XML
-                    url_xml = get_public_url_from_gcs(CLOUD_STORAGE_DEPOSITO, blob_nombre_xml)
-                # De lo contrario, NO existe el archivo XML en el deposito GCS
-                else:
-                    # Si NO existe el archivo XML, causa error
-                    if not ruta_xml.is_file():
-                        raise MyFileNotFoundError
-                    # Cargar el contenido del archivo XML
-                    with open(ruta_xml, "r", encoding="utf8") as f:
-                        data_xml = f.read()
-                    # Subir el archivo XML
-                    url_xml = upload_file_to_gcs(
-                        bucket_name=CLOUD_STORAGE_DEPOSITO,
-                        blob_name=blob_nombre_xml,
-                        content_type="application/xml",
-                        data=data_xml,
-                    )
-                    click.echo(click.style("(XML)", fg="green"), nl=False)
-            except (MyBucketNotFoundError, MyFileNotAllowedError, MyFileNotFoundError, MyUploadError):
+        # Si esta definido el deposito, tomar los nombres de descarga y las URLs de los archivos XML y PDF
+        if deposito is not None:
+            # Definir el nombre de descarga del archivo XML y su URL
+            blob_nombre_xml = f"{CARPETA}/{directorio}/{tfd_uuid}.xml"
+            if blob_nombre_xml in blobs_con_error:
                 archivo_xml = ""
                 url_xml = ""
                 errores_cargas_xml_contador += 1
                 click.echo(click.style("(XML)", fg="red"), nl=False)
-
-            # Bloque try-except para contar errores en subida de archivos PDF
-            try:
-                # Definir el nombre de descarga del archivo PDF
+            else:
                 if archivo_sufijo == "":
-                    archivo_pdf = f"{cfdi_receptor_rfc}-{quincena_clave}.pdf"
-                else:
-                    archivo_pdf = f"{cfdi_receptor_rfc}-{quincena_clave}-{archivo_sufijo}.pdf"
-                # Definir la ruta del archivo PDF en el deposito GCS
-                blob_nombre_pdf = f"{CARPETA}/{directorio}/{tfd_uuid}.pdf"
-                # Si existe el archivo PDF en el deposito GCS
-                if check_file_exists_from_gcs(CLOUD_STORAGE_DEPOSITO, blob_nombre_pdf):
-                    # Obtener la URL del archivo PDF
-                    url_pdf = get_public_url_from_gcs(CLOUD_STORAGE_DEPOSITO, blob_nombre_pdf)
-                # De lo contrario, NO existe el archivo PDF en el deposito GCS
+                    archivo_xml = f"{cfdi_receptor_rfc}-{quincena_clave}.xml"
                 else:
-                    # Si NO existe el archivo XML, causa error
-                    if not ruta_pdf.is_file():
-                        raise MyFileNotFoundError
-                    # Cargar el contenido del archivo PDF
-                    with open(ruta_pdf, "rb") as f:
-                        data_pdf = f.read()
-                    # Subir el archivo PDF
-                    url_pdf = upload_file_to_gcs(
-                        bucket_name=CLOUD_STORAGE_DEPOSITO,
-                        blob_name=blob_nombre_pdf,
-                        content_type="application/pdf",
-                        data=data_pdf,
-                    )
-                    click.echo(click.style("(PDF)", fg="green"), nl=False)
-            except (MyBucketNotFoundError, MyFileNotAllowedError, MyFileNotFoundError, MyUploadError):
+                    archivo_xml = f"{cfdi_receptor_rfc}-{quincena_clave}-{archivo_sufijo}.xml"
+                url_xml = deposito.url_publica(blob_nombre_xml)
+
+            # Definir el nombre de descarga del archivo PDF y su URL
+            blob_nombre_pdf = f"{CARPETA}/{directorio}/{tfd_uuid}.pdf"
+            if blob_nombre_pdf in blobs_con_error:
                 archivo_pdf = ""
                 url_pdf = ""
                 errores_cargas_pdf_contador += 1
                 click.echo(click.style("(PDF)", fg="red"), nl=False)
+            else:
+                if archivo_sufijo == "":
+                    archivo_pdf = f"{cfdi_receptor_rfc}-{quincena_clave}.pdf"
+                else:
+                    archivo_pdf = f"{cfdi_receptor_rfc}-{quincena_clave}-{archivo_sufijo}.pdf"
+                url_pdf = deposito.url_publica(blob_nombre_pdf)
 
         # Si archivo_xml es diferente, hay_cambios sera verdadero
         if timbrado.archivo_xml != archivo_xml:
@@ -420,12 +368,10 @@ def actualizar(quincena_clave: str, tipo: str, subdir: str):
             with open(ruta_xml, "r", encoding="utf8") as f:
                 timbrado.tfd = f.read()
 
-            # Guardar timbrado
-            timbrado.save()
-
-            # Actualizar nomina con el ID del timbrado
-            nomina.timbrado_id = timbrado.id
-            nomina.save()
+            # Juntar el timbrado para guardarlo con los demas
+            if es_nuevo:
+                database.session.add(timbrado)
+            timbrados_con_cambios.append(timbrado)
 
             # Si es_nuevo, incrementar agregados_contador
             if es_nuevo:
@@ -441,6 +387,19 @@ def actualizar(quincena_clave: str, tipo: str, subdir: str):
         # Mostrar un punto en la terminal
         click.echo(click.style(".", fg="cyan"), nl=False)
 
+    # Guardar de una vez los timbrados nuevos y cambiados, y despues actualizar las nominas con el ID de su timbrado
+    if len(timbrados_con_cambios) > 0:
+        database.session.flush()
+        database.session.execute(
+            update(Nomina),
+            [{"id": timbrado.nomina_id, "timbrado_id": timbrado.id} for timbrado in timbrados_con_cambios],
+        )
+        database.session.commit()
+
+    # Si hubo errores en XML, se muestra el contador
+    if errores_xml > 0:
+        click.echo(click.style(f"  Hubo {errores_xml} archivos XML que no son cfdi:Comprobante", fg="yellow"))
+
     # Si hubo errores en archivos_pdf_no_encontrados, se muestran
     if len(archivos_pdf_no_encontrados) > 0:
         click.echo(click.style(f"  Faltan {len(archivos_pdf_no_encontrados)} archivos PDF", fg="yellow"))
@@ -0,0 +1,186 @@
+"""
+Dimensiones
+
+Diccionarios en memoria con los catalogos que usan los comandos que alimentan desde los archivos de explotacion.
+
+- Cada diccionario se carga con UNA consulta la primera vez que se necesita
+- Al insertar un registro se agrega a la sesion y al diccionario, sin hacer commit
+- Los centros de trabajo, conceptos, personas y plazas insertados hacen flush para tener su id
+- El commit lo hace el comando al terminar de recorrer el archivo
+
+Ejemplo de uso
+
+    sesion = database.session
+    dimensiones = Dimensiones(sesion)
+
+    centro_trabajo = dimensiones.consultar_centro_trabajo(centro_trabajo_clave)
+    if centro_trabajo is None:
+        centro_trabajo = dimensiones.agregar_centro_trabajo(CentroTrabajo(clave=centro_trabajo_clave, descripcion="ND"))
+
+"""
+from perseo.blueprints.bancos.models import Banco
+from perseo.blueprints.centros_trabajos.models import CentroTrabajo
+from perseo.blueprints.conceptos.models import Concepto
+from perseo.blueprints.cuentas.models import Cuenta
+from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.plazas.models import Plaza
+from perseo.blueprints.puestos.models import Puesto
+from perseo.blueprints.tabuladores.models import Tabulador
+
+
+class Dimensiones:
+    """Catalogos en memoria para consultar por clave, por RFC o por la combinacion del tabulador"""
+
+    def __init__(self, sesion):
+        self.sesion = sesion
+        self._bancos = None
+        self._centros_trabajos = None
+        self._conceptos = None
+        self._cuentas = None
+        self._personas = None
+        self._plazas = None
+        self._puestos = None
+        self._tabuladores = None
+        self._tabuladores_por_id = None
+
+    @property
+    def bancos(self) -> dict:
+        """Diccionario de bancos por clave"""
+        if self._bancos is None:
+            self._bancos = {banco.clave: banco for banco in Banco.query.all()}
+        return self._bancos
+
+    @property
+    def centros_trabajos(self) -> dict:
+        """Diccionario de centros de trabajo por clave"""
+        if self._centros_trabajos is None:
+            self._centros_trabajos = {centro_trabajo.clave: centro_trabajo for centro_trabajo in CentroTrabajo.query.all()}
+        return self._centros_trabajos
+
+    @property
+    def conceptos(self) -> dict:
+        """Diccionario de conceptos por clave"""
+        if self._conceptos is None:
+            self._conceptos = {concepto.clave: concepto for concepto in Concepto.query.all()}
+        return self._conceptos
+
+    @property
+    def cuentas(self) -> dict:
+        """Diccionario con los listados de cuentas por persona_id"""
+        if self._cuentas is None:
+            self.bancos  # Cargar los bancos para que cuenta.banco no haga consultas
+            self._cuentas = {}
+            for cuenta in Cuenta.query.order_by(Cuenta.id).all():
+                self._cuentas.setdefault(cuenta.persona_id, []).append(cuenta)
+        return self._cuentas
+
+    @property
+    def personas(self) -> dict:
+        """Diccionario de personas por RFC"""
+        if self._personas is None:
+            self._personas = {persona.rfc: persona for persona in Persona.query.all()}
+        return self._personas
+
+    @property
+    def plazas(self) -> dict:
+        """Diccionario de plazas por clave"""
+        if self._plazas is None:
+            self._plazas = {plaza.clave: plaza for plaza in Plaza.query.all()}
+        return self._plazas
+
+    @property
+    def puestos(self) -> dict:
+        """Diccionario de puestos por clave"""
+        if self._puestos is None:
+            self._puestos = {puesto.clave: puesto for puesto in Puesto.query.all()}
+        return self._puestos
+
+    @property
+    def tabuladores(self) -> dict:
+        """Diccionario de tabuladores por (puesto_id, modelo, nivel, quinquenio)"""
+        if self._tabuladores is None:
+            self._tabuladores = {}
+            self._tabuladores_por_id = {}
+            for tabulador in Tabulador.query.order_by(Tabulador.id).all():
+                # Si hay repetidos se conserva el primero, como lo hace first()
+                llave = (tabulador.puesto_id, tabulador.modelo, tabulador.nivel, tabulador.quinquenio)
+                self._tabuladores.setdefault(llave, tabulador)
+                self._tabuladores_por_id[tabulador.id] = tabulador
+        return self._tabuladores
+
+    @property
+    def tabuladores_por_id(self) -> dict:
+        """Diccionario de tabuladores por id"""
+        if self._tabuladores_por_id is None:
+            self.tabuladores  # Se cargan juntos
+        return self._tabuladores_por_id
+
+    def consultar_banco(self, clave: str):
+        """Consultar un banco por su clave"""
+        return self.bancos.get(clave)
+
+    def consultar_centro_trabajo(self, clave: str):
+        """Consultar un centro de trabajo por su clave"""
+        return self.centros_trabajos.get(clave)
+
+    def consultar_concepto(self, clave: str):
+        """Consultar un concepto por su clave"""
+        return self.conceptos.get(clave)
+
+    def consultar_cuentas(self, persona_id: int) -> list:
+        """Consultar las cuentas de una persona"""
+        return self.cuentas.get(persona_id, [])
+
+    def consultar_persona(self, rfc: str):
+        """Consultar una persona por su RFC"""
+        return self.personas.get(rfc)
+
+    def consultar_plaza(self, clave: str):
+        """Consultar una plaza por su clave"""
+        return self.plazas.get(clave)
+
+    def consultar_puesto(self, clave: str):
+        """Consultar un puesto por su clave"""
+        return self.puestos.get(clave)
+
+    def consultar_tabulador(self, puesto_id: int, modelo: int, nivel: int, quinquenio: int):
+        """Consultar el tabulador que coincida con el puesto, modelo, nivel y quinquenio"""
+        return self.tabuladores.get((puesto_id, modelo, nivel, quinquenio))
+
+    def consultar_tabulador_por_id(self, tabulador_id: int):
+        """Consultar un tabulador por su id"""
+        return self.tabuladores_por_id.get(tabulador_id)
+
+    def agregar_centro_trabajo(self, centro_trabajo: CentroTrabajo) -> CentroTrabajo:
+        """Agregar un centro de trabajo a la sesion y al diccionario"""
+        self.sesion.add(centro_trabajo)
+        self.sesion.flush()
+        self.centros_trabajos[centro_trabajo.clave] = centro_trabajo
+        return centro_trabajo
+
+    def agregar_concepto(self, concepto: Concepto) -> Concepto:
+        """Agregar un concepto a la sesion y al diccionario"""
+        self.sesion.add(concepto)
+        self.sesion.flush()
+        self.conceptos[concepto.clave] = concepto
+        return concepto
+
+    def agregar_cuenta(self, cuenta: Cuenta) -> Cuenta:
+        """Agregar una cuenta a la sesion y al listado de la persona"""
+        self.sesion.add(cuenta)
+        self.cuentas.setdefault(cuenta.persona_id, []).append(cuenta)
+        return cuenta
+
+    def agregar_persona(self, persona: Persona) -> Persona:
+        """Agregar una persona a la sesion y al diccionario"""
+        self.sesion.add(persona)
+        self.sesion.flush()
+        self.personas[persona.rfc] = persona
+        return persona
+
+    def agregar_plaza(self, plaza: Plaza) -> Plaza:
+        """Agregar una plaza a la sesion y al diccionario"""
+        self.sesion.add(plaza)
+        self.sesion.flush()
+        self.plazas[plaza.clave] = plaza
+        return plaza
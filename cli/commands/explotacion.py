@@ -0,0 +1,249 @@
+"""
+Explotacion
+
+Lee UNA sola vez los archivos de explotacion y entrega renglones inmutables.
+
+- NominaFmt2.XLS (o Aguinaldos.XLS que tiene el mismo formato) con leer_nominas_fmt2
+- EmpleadosAlfabetico.XLS con leer_cuentas_bancarias
+- Monederos.XLS con leer_monederos
+
+Para NominaFmt2.XLS
+
+- Cada renglon se toma completo con row_values, no celda por celda
+- Los conceptos se toman desde la columna 26 en pasos de 6 hasta la 236, con su importe
+- Los quinquenios se buscan en los conceptos PQ1 a PQ6, si antes aparece PME no hay quinquenios
+
+Para todos, el resultado se puede guardar en un archivo JSON comprimido cuyo nombre lleva el hash SHA256 del XLS,
+asi los siguientes comandos de la misma quincena no tienen que decodificar el XLS
+
+Ejemplo de uso
+
+    for renglon in leer_nominas_fmt2(ruta):
+        click.echo(f"{renglon.rfc} {renglon.modelo} {renglon.quinquenios} {renglon.tipo}")
+        for concepto in renglon.conceptos:
+            click.echo(f"  {concepto.clave} {concepto.importe}")
+
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import xlrd
+
+from lib.safe_string import safe_clave, safe_string
+
+EXPLOTACION_CACHE_DIR = os.environ.get("EXPLOTACION_CACHE_DIR", str(Path(tempfile.gettempdir(), "perseo_explotacion")))
+CACHE_VERSION = 2
+
+COLUMNA_CONCEPTOS_INICIAL = 26
+COLUMNA_CONCEPTOS_FINAL = 236
+COLUMNAS_POR_CONCEPTO = 6
+QUINQUENIOS_CONCEPTOS = ["Q1", "Q2", "Q3", "Q4", "Q5", "Q6"]
+
+
+class ConceptoImporte(NamedTuple):
+    """Concepto con su importe, la clave es P o D mas los dos caracteres del concepto"""
+
+    clave: str
+    importe: float
+
+
+class RenglonNomina(NamedTuple):
+    """Renglon del archivo NominaFmt2.XLS"""
+
+    centro_trabajo_clave: str
+    rfc: str
+    nombre_completo: str
+    plaza_clave: str
+    nivel: int
+    percepcion: float
+    deduccion: float
+    importe: float
+    desde_s: str
+    hasta_s: str
+    quincena_ingreso: str
+    puesto_clave: str  # Si el modelo es 2 ya viene con los primeros 4 caracteres
+    modelo: int
+    num_empleado: int
+    quinquenios: Optional[int]  # None si no tiene PQ1 a PQ6 o si antes aparece PME
+    es_concepto_pme: bool  # Verdadero si al buscar los quinquenios aparece primero PME
+    tipo: str  # DESPENSA si tiene el concepto PME, de lo contrario SALARIO
+    conceptos: tuple
+
+
+class RenglonCuenta(NamedTuple):
+    """Renglon del archivo EmpleadosAlfabetico.XLS"""
+
+    rfc: str
+    banco_clave: str  # Tiene 5 y 10
+    num_cuenta: str
+
+
+class RenglonMonedero(NamedTuple):
+    """Renglon del archivo Monederos.XLS"""
+
+    rfc: str
+    num_tarjeta: str
+
+
+def analizar_renglon(valores: list) -> RenglonNomina:
+    """Convertir los valores de un renglon del XLS en un RenglonNomina"""
+
+    # Tomar los conceptos con sus importes
+    conceptos = []
+    col_num = COLUMNA_CONCEPTOS_INICIAL
+    while col_num <= COLUMNA_CONCEPTOS_FINAL:
+        # Si 'P' o 'D' es un texto vacio, se rompe el ciclo
+        p_o_d = safe_string(valores[col_num])
+        if p_o_d == "":
+            break
+        # Tomar los dos caracteres adicionales del concepto y el importe
+        conc = safe_string(valores[col_num + 1])
+        try:
+            impt = int(valores[col_num + 3]) / 100.0
+        except ValueError:
+            impt = 0.0
+        conceptos.append(ConceptoImporte(f"{p_o_d}{conc}", impt))
+        col_num += COLUMNAS_POR_CONCEPTO
+
+    # Buscar los quinquenios en las percepciones, si primero se encuentra PME es monedero y no hay quinquenios
+    quinquenios = None
+    es_concepto_pme = False
+    for concepto in conceptos:
+        if concepto.clave == "PME":
+            es_concepto_pme = True
+            break
+        if concepto.clave[0] == "P" and concepto.clave[1:] in QUINQUENIOS_CONCEPTOS:
+            quinquenios = int(concepto.clave[2])
+            break
+
+    # Si tiene el concepto PME es DESPENSA, de lo contrario es SALARIO
+    tipo = "SALARIO"
+    if "PME" in (concepto.clave for concepto in conceptos):
+        tipo = "DESPENSA"
+
+    # Si el modelo es 2, entonces en SINDICALIZADO y se toman 4 caracteres del puesto
+    modelo = int(valores[236])
+    puesto_clave = safe_clave(valores[20])
+    if modelo == 2:
+        puesto_clave = puesto_clave[:4]
+
+    # Entregar el renglon
+    return RenglonNomina(
+        centro_trabajo_clave=valores[1],
+        rfc=valores[2],
+        nombre_completo=valores[3],
+        plaza_clave=valores[8],
+        nivel=int(valores[9]),
+        percepcion=int(valores[12]) / 100.0,
+        deduccion=int(valores[13]) / 100.0,
+        importe=int(valores[14]) / 100.0,
+        desde_s=str(int(valores[16])),
+        hasta_s=str(int(valores[17])),
+        quincena_ingreso=str(int(valores[19])),
+        puesto_clave=puesto_clave,
+        modelo=modelo,
+        num_empleado=int(valores[240]),
+        quinquenios=quinquenios,
+        es_concepto_pme=es_concepto_pme,
+        tipo=tipo,
+        conceptos=tuple(conceptos),
+    )
+
+
+def calcular_hash(ruta: Path) -> str:
+    """Calcular el hash SHA256 de un archivo"""
+    sha256 = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(1024 * 1024), b""):
+            sha256.update(bloque)
+    return sha256.hexdigest()
+
+
+def analizar_renglon_cuenta(valores: list) -> RenglonCuenta:
+    """Convertir los valores de un renglon de EmpleadosAlfabetico.XLS en un RenglonCuenta"""
+    return RenglonCuenta(
+        rfc=valores[0],
+        banco_clave=str(int(valores[23])),
+        num_cuenta=str(int(valores[22])),
+    )
+
+
+def analizar_renglon_monedero(valores: list) -> RenglonMonedero:
+    """Convertir los valores de un renglon de Monederos.XLS en un RenglonMonedero"""
+    return RenglonMonedero(
+        rfc=str(valores[1]).strip().upper(),
+        num_tarjeta=str(valores[4]).strip(),
+    )
+
+
+def _leer(ruta: Path, nombre: str, analizar, reconstruir, usar_cache: bool) -> tuple:
+    """Leer un archivo XLS con la funcion analizar, usando el cache si existe"""
+
+    # Definir el archivo de cache con el hash del XLS
+    ruta_cache = None
+    if usar_cache and EXPLOTACION_CACHE_DIR:
+        ruta_cache = Path(EXPLOTACION_CACHE_DIR, f"{calcular_hash(ruta)}-{nombre}-v{CACHE_VERSION}.json.gz")
+
+    # Si existe el cache, se entregan los renglones sin abrir el XLS
+    if ruta_cache is not None and ruta_cache.exists():
+        with gzip.open(ruta_cache, "rt", encoding="utf8") as archivo:
+            return tuple(reconstruir(dato) for dato in json.load(archivo))
+
+    # Abrir el archivo XLS con xlrd y obtener la primera hoja
+    libro = xlrd.open_workbook(str(ruta))
+    hoja = libro.sheet_by_index(0)
+
+    # Convertir cada renglon, se omite el primero porque es el encabezado
+    renglones = tuple(analizar(hoja.row_values(fila)) for fila in range(1, hoja.nrows))
+
+    # Guardar el cache, si no se puede escribir se continua sin cache
+    if ruta_cache is not None:
+        try:
+            ruta_cache.parent.mkdir(parents=True, exist_ok=True)
+            ruta_temporal = ruta_cache.with_suffix(".tmp")
+            with gzip.open(ruta_temporal, "wt", encoding="utf8") as archivo:
+                json.dump(renglones, archivo, separators=(",", ":"))
+            ruta_temporal.replace(ruta_cache)
+        except OSError:
+            pass
+
+    # Entregar los renglones
+    return renglones
+
+
+def leer_nominas_fmt2(ruta: Path, usar_cache: bool = True) -> tuple:
+    """Leer el archivo NominaFmt2.XLS y entregar la tupla de RenglonNomina"""
+    return _leer(
+        ruta=ruta,
+        nombre="nominas",
+        analizar=analizar_renglon,
+        reconstruir=lambda dato: RenglonNomina(*dato[:-1], conceptos=tuple(ConceptoImporte(*c) for c in dato[-1])),
+        usar_cache=usar_cache,
+    )
+
+
+def leer_cuentas_bancarias(ruta: Path, usar_cache: bool = True) -> tuple:
+    """Leer el archivo EmpleadosAlfabetico.XLS y entregar la tupla de RenglonCuenta"""
+    return _leer(
+        ruta=ruta,
+        nombre="cuentas",
+        analizar=analizar_renglon_cuenta,
+        reconstruir=lambda dato: RenglonCuenta(*dato),
+        usar_cache=usar_cache,
+    )
+
+
+def leer_monederos(ruta: Path, usar_cache: bool = True) -> tuple:
+    """Leer el archivo Monederos.XLS y entregar la tupla de RenglonMonedero"""
+    return _leer(
+        ruta=ruta,
+        nombre="monederos",
+        analizar=analizar_renglon_monedero,
+        reconstruir=lambda dato: RenglonMonedero(*dato),
+        usar_cache=usar_cache,
+    )
@@ -0,0 +1,40 @@
+"""
+Medir el arranque de los modulos de tareas en el fondo
+
+Importa los modulos en un proceso nuevo, como lo hace el work horse de RQ con cada tarea,
+y cuenta cuantas veces se crea la app de Flask y los segundos que tarda.
+
+Debe ejecutarse en un proceso nuevo (spawn) para que no encuentre los modulos ya cargados.
+
+Ejemplo de uso
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as ejecutor:
+        apps, segundos = ejecutor.submit(medir_arranque, ["perseo.blueprints.nominas.tasks"]).result()
+
+"""
+import importlib
+import time
+
+
+def medir_arranque(modulos: list) -> tuple:
+    """Importar los modulos, entrega la cantidad de apps creadas y los segundos"""
+
+    # Contar las llamadas a create_app, los modulos la usan a traves de get_app
+    inicio = time.perf_counter()
+    perseo_app = importlib.import_module("perseo.app")
+    crear_app = perseo_app.create_app
+    creadas = []
+
+    def contar_create_app():
+        creadas.append(time.perf_counter())
+        return crear_app()
+
+    perseo_app.create_app = contar_create_app
+
+    # Importar los modulos
+    for modulo in modulos:
+        importlib.import_module(modulo)
+    segundos = time.perf_counter() - inicio
+
+    # Entregar la cantidad de apps creadas y los segundos
+    return len(creadas), segundos
@@ -0,0 +1,121 @@
+"""
+Medir la paginacion con offset contra la paginacion por llave
+
+Crea una tabla sintetica con la forma de percepciones_deducciones y la cantidad de renglones indicada,
+y mide el tiempo de consultar una pagina a distintas profundidades con offset y por llave (keyset),
+ademas del tiempo de recorrer toda la tabla pagina por pagina por llave.
+
+Usa una base de datos SQLite temporal, o la que se indique con su URL; la tabla se elimina al terminar.
+
+Ejemplo de uso
+
+    mediciones, segundos = medir_paginacion(1000000, 100)
+    for medicion in mediciones:
+        click.echo(f"{medicion.profundidad}: offset {medicion.offset_ms} ms, llave {medicion.llave_ms} ms")
+
+"""
+import random
+import tempfile
+import time
+from typing import NamedTuple
+
+from sqlalchemy import Column, Integer, MetaData, Numeric, String, Table, create_engine, select
+
+from lib.datatables import ordenar, paginar_keyset
+
+PROFUNDIDADES = [0.0, 0.1, 0.5, 0.9, 1.0]
+RENGLONES_POR_BLOQUE = 10000
+REPETICIONES = 3
+
+
+class Medicion(NamedTuple):
+    """Tiempos de consultar una pagina a una profundidad"""
+
+    profundidad: str
+    offset_ms: float
+    llave_ms: float
+
+
+def crear_tabla(engine, renglones: int) -> Table:
+    """Crear la tabla sintetica y llenarla por bloques"""
+    metadata = MetaData()
+    tabla = Table(
+        "medir_paginacion",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("persona_id", Integer, nullable=False),
+        Column("concepto_id", Integer, nullable=False),
+        Column("quincena_id", Integer, nullable=False),
+        Column("importe", Numeric(precision=24, scale=4), nullable=False),
+        Column("estatus", String(1), nullable=False),
+    )
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    aleatorio = random.Random(0)
+    with engine.begin() as conexion:
+        for inicio in range(1, renglones + 1, RENGLONES_POR_BLOQUE):
+            bloque = []
+            for identificador in range(inicio, min(inicio + RENGLONES_POR_BLOQUE, renglones + 1)):
+                bloque.append(
+                    {
+                        "id": identificador,
+                        "persona_id": aleatorio.randint(1, 5000),
+                        "concepto_id": aleatorio.randint(1, 150),
+                        "quincena_id": aleatorio.randint(1, 48),
+                        "importe": aleatorio.randint(1, 10000000) / 100,
+                        "estatus": "A",
+                    }
+                )
+            conexion.execute(tabla.insert(), bloque)
+    return tabla
+
+
+def cronometrar(conexion, consulta) -> tuple:
+    """Ejecutar la consulta varias veces, entrega el mejor tiempo en milisegundos y los renglones"""
+    mejor = None
+    renglones = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        renglones = conexion.execute(consulta).all()
+        transcurrido = (time.perf_counter() - inicio) * 1000
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return round(mejor, 2), renglones
+
+
+def medir_paginacion(renglones: int, rows_per_page: int, database_url: str = "") -> tuple:
+    """Medir una pagina a cada profundidad con offset y por llave, entrega las mediciones y los segundos del recorrido"""
+    with tempfile.TemporaryDirectory() as directorio:
+        if database_url == "":
+            database_url = f"sqlite:///{directorio}/medir_paginacion.sqlite"
+        engine = create_engine(database_url)
+        tabla = crear_tabla(engine, renglones)
+        orden = [tabla.c.id]
+        consulta = select(tabla).filter(tabla.c.estatus == "A")
+        try:
+            with engine.connect() as conexion:
+                # Consultar una pagina a cada profundidad, el ancla es el id del renglon anterior a la pagina
+                mediciones = []
+                for profundidad in PROFUNDIDADES:
+                    start = min(int(renglones * profundidad), max(0, renglones - rows_per_page))
+                    offset_ms, por_offset = cronometrar(
+                        conexion, ordenar(consulta, orden, True).offset(start).limit(rows_per_page)
+                    )
+                    ancla = None if start == 0 else [renglones - start + 1]
+                    llave_ms, por_llave = cronometrar(conexion, paginar_keyset(consulta, orden, ancla, rows_per_page, True))
+                    if [renglon.id for renglon in por_offset] != [renglon.id for renglon in por_llave]:
+                        raise AssertionError(f"Las paginas por offset y por llave no coinciden en start {start}")
+                    mediciones.append(Medicion(f"{int(profundidad * 100)}%", offset_ms, llave_ms))
+
+                # Recorrer toda la tabla por llave, como lo haria un usuario pasando de pagina en pagina
+                inicio = time.perf_counter()
+                ancla = None
+                while True:
+                    pagina = conexion.execute(paginar_keyset(consulta, orden, ancla, rows_per_page, True)).all()
+                    if len(pagina) < rows_per_page:
+                        break
+                    ancla = [pagina[-1].id]
+                segundos = round(time.perf_counter() - inicio, 2)
+        finally:
+            tabla.drop(engine)
+            engine.dispose()
+    return mediciones, segundos
@@ -0,0 +1,61 @@
+"""
+Medir la memoria al elaborar un archivo XLSX
+
+Elabora un libro con la forma de los timbrados (datos de la persona, una columna por concepto y totales)
+para una quincena sintetica, lo guarda en memoria y entrega el pico de memoria residente (RSS) del proceso.
+
+Debe ejecutarse en un proceso nuevo por cada modo para que el pico de uno no contamine al otro.
+
+Ejemplo de uso
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as ejecutor:
+        megabytes, segundos = ejecutor.submit(medir_libro, "write_only", 5000, 150).result()
+
+"""
+import io
+import resource
+import time
+from datetime import date
+
+from openpyxl import Workbook
+
+MODOS = ["normal", "write_only"]
+COLUMNAS_PERSONA = 42
+COLUMNAS_TOTALES = 3
+
+
+def medir_libro(modo: str, empleados: int, conceptos: int) -> tuple:
+    """Elaborar y guardar en memoria un libro XLSX sintetico, entrega el pico de RSS en MB y los segundos"""
+
+    # Iniciar el libro segun el modo
+    inicio = time.perf_counter()
+    if modo == "write_only":
+        libro = Workbook(write_only=True)
+        hoja = libro.create_sheet()
+    else:
+        libro = Workbook()
+        hoja = libro.active
+
+    # Agregar la fila con las cabeceras
+    hoja.append(
+        [f"DATO {i}" for i in range(COLUMNAS_PERSONA)]
+        + [f"CONCEPTO {i}" for i in range(conceptos)]
+        + ["TOTAL PERCEPCIONES", "TOTAL DEDUCCIONES", "TOTAL NETO"]
+    )
+
+    # Agregar una fila por empleado
+    for numero in range(empleados):
+        datos = [f"RFC{numero:010}", "NOMBRE APELLIDO APELLIDO", date(2023, 1, 15)] * (COLUMNAS_PERSONA // 3)
+        importes = [float((numero + i) % 1000) for i in range(conceptos)]
+        hoja.append(datos + importes + [sum(importes), 0.0, sum(importes)])
+
+    # Guardar en memoria
+    buffer = io.BytesIO()
+    libro.save(buffer)
+    segundos = time.perf_counter() - inicio
+
+    # En Linux ru_maxrss esta en kilobytes
+    megabytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    # Entregar el pico de memoria y los segundos
+    return megabytes, segundos
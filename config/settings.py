@@ -20,6 +20,15 @@ Para desarrollo, debe crear un archivo .env con las variables de entorno:
 - SECRET_KEY
 - SQLALCHEMY_DATABASE_URI
 - TASK_QUEUE
+
+Opcionalmente, defina DEPOSITO_LOCAL_DIR para guardar y leer los archivos en ese directorio en lugar del bucket,
+asi el desarrollo y las pruebas no usan la red (vea lib/depositos.py)
+
+Las descargas redirigen a URLs firmadas, defina DESCARGAS_POR_PROXY=true para transmitirlas desde el servidor
+
+El avance de las tareas se transmite en vivo con eventos enviados por el servidor (vea lib/eventos.py). App Engine
+standard no transmite las respuestas, entonces ahi EVENTOS_EN_VIVO es falso y el navegador pregunta cada 3 segundos.
+Para tenerlo en vivo, sirva /tareas/<id>/eventos desde App Engine flexible o Cloud Run con EVENTOS_EN_VIVO=true
 """
 import os
 from functools import lru_cache
@@ -56,6 +65,8 @@ class Settings(BaseSettings):
     """Settings"""
 
     CLOUD_STORAGE_DEPOSITO: str = get_secret("cloud_storage_deposito")
+    DESCARGAS_POR_PROXY: bool = os.getenv("DESCARGAS_POR_PROXY", "false").lower() == "true"
+    EVENTOS_EN_VIVO: bool = os.getenv("EVENTOS_EN_VIVO", str(os.getenv("GAE_ENV") != "standard")).lower() == "true"
     HOST: str = get_secret("host")
     REDIS_URL: str = get_secret("redis_url")
     SALT: str = get_secret("salt")
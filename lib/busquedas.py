@@ -0,0 +1,41 @@
+"""
+Busquedas por fragmentos de texto
+
+En PostgreSQL con la extension pg_trgm, las columnas con indices GIN de trigramas (gin_trgm_ops)
+resuelven con el indice tanto los filtros contains (LIKE '%x%') como las busquedas por similitud.
+
+- buscar_similares filtra por similitud de palabras (operador %>) y entrega la expresion de similitud
+  para ordenar del mas al menos parecido
+- En otras bases de datos, como SQLite en las pruebas, se filtra con LIKE por cada palabra
+  y la similitud es la proporcion del texto buscado dentro del valor
+- La similitud se entrega como doble precision, word_similarity es real y al paginar por llave el ancla regresa
+  como doble precision, si no coinciden los empates con el ancla se saltan o se repiten
+
+Ejemplo de uso
+
+    consulta, similitud = buscar_similares(consulta, Persona.nombre_completo, "JUAN PEREZ")
+    registros = paginar(consulta, [similitud, Persona.id], start, rows_per_page, descendente=True)
+
+"""
+from sqlalchemy import Float, and_, cast, func
+
+SIMILITUD_ETIQUETA = "similitud"
+SIMILITUD_TIPO = Float(precision=53)  # Doble precision, igual que los numeros de Python
+
+
+def es_postgresql(consulta) -> bool:
+    """Revisar si la consulta se ejecuta en PostgreSQL"""
+    return consulta.session.get_bind().dialect.name == "postgresql"
+
+
+def buscar_similares(consulta, expresion, texto: str) -> tuple:
+    """Filtrar la consulta por similitud con el texto, entrega la consulta y la expresion de similitud"""
+    texto = " ".join(texto.split())
+    if es_postgresql(consulta):
+        # El operador %> usa el indice GIN y compara contra cada palabra, el umbral es pg_trgm.word_similarity_threshold
+        consulta = consulta.filter(expresion.op("%>")(texto))
+        similitud = cast(func.word_similarity(texto, expresion), SIMILITUD_TIPO)
+    else:
+        consulta = consulta.filter(and_(*[expresion.contains(palabra, autoescape=True) for palabra in texto.split(" ")]))
+        similitud = cast(func.length(texto), SIMILITUD_TIPO) / func.max(func.length(expresion), 1)
+    return consulta, similitud.label(SIMILITUD_ETIQUETA)
@@ -0,0 +1,58 @@
+"""
+Consecutivos por bloques
+
+Reserva de una sola vez un bloque contiguo de consecutivos por renglon (por ejemplo, por banco) con
+UPDATE ... RETURNING, para que los numeros se asignen en memoria y no se repitan aunque haya varios
+procesos reservando al mismo tiempo.
+
+- Se actualiza un renglon por identificador, siempre en orden ascendente para que los bloqueos no se crucen
+- El UPDATE bloquea el renglon hasta el commit, entonces otro proceso espera y recibe el bloque siguiente
+- Hace commit al terminar para soltar los bloqueos lo antes posible, lo pendiente en la sesion se guarda junto
+- Entrega el ultimo consecutivo usado antes del bloque, el primer numero del bloque es ese mas uno
+
+Ejemplo de uso
+
+    inicios = reservar_bloques(sesion, Banco.__table__, {banco.id: 120, otro_banco.id: 8})
+    for fila in filas:
+        inicios[fila.banco_id] += 1
+        num_cheque = f"{fila.banco_clave.zfill(2)}{inicios[fila.banco_id]:07}"
+
+"""
+from sqlalchemy import update
+
+from lib.exceptions import MyNotExistsError
+
+COLUMNA_CONSECUTIVO = "consecutivo_generado"
+
+
+def reservar_bloques(sesion, tabla, cantidades: dict, columna: str = COLUMNA_CONSECUTIVO) -> dict:
+    """Reservar un bloque de consecutivos por identificador, recibe id -> cantidad y entrega id -> ultimo usado"""
+
+    # Si no hay cantidades, no hay nada que reservar
+    inicios = {}
+    if len(cantidades) == 0:
+        return inicios
+
+    # Actualizar cada renglon en orden, sumando su cantidad y tomando el nuevo valor
+    consecutivo = tabla.c[columna]
+    try:
+        for identificador in sorted(cantidades):
+            cantidad = cantidades[identificador]
+            nuevo = sesion.execute(
+                update(tabla)
+                .where(tabla.c.id == identificador)
+                .values({columna: consecutivo + cantidad})
+                .returning(consecutivo)
+            ).scalar()
+            if nuevo is None:
+                raise MyNotExistsError(f"No existe el renglon {identificador} en {tabla.name}")
+            inicios[identificador] = nuevo - cantidad
+    except Exception:
+        sesion.rollback()
+        raise
+
+    # Soltar los bloqueos
+    sesion.commit()
+
+    # Entregar el ultimo consecutivo usado antes de cada bloque
+    return inicios
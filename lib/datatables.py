@@ -1,7 +1,57 @@
 """
 Datatables
+
+Paginacion por llave (keyset) para los listados de DataTables
+
+- DataTables pide las paginas con start y length, que con offset obligan a la base de datos a recorrer y descartar
+  todos los renglones anteriores, entre mas profunda la pagina mas lenta
+- paginar guarda en Redis, por cada consulta, la llave del ultimo renglon de cada pagina entregada (el ancla);
+  si al pedir la pagina siguiente ya se conoce el ancla, se consulta con WHERE llave > ancla y sin offset
+- Si no se conoce el ancla, por ejemplo al saltar a una pagina lejana, se usa offset una vez y se guarda el ancla
+- Las columnas de orden deben identificar a cada renglon, si la primera se repite agregue el id al final
+
+Proyeccion de columnas
+
+- Cada vista declara en COLUMNAS_DATATABLE las columnas que necesita, con el nombre que tendran en cada renglon
+  y la ruta desde el modelo, por ejemplo {"quincena_clave": "quincena.clave", "importe": "importe"}
+- paginar con columnas entrega tuplas con esos nombres en un solo SELECT con los joins necesarios,
+  en lugar de entidades completas que cargan sus relaciones con una consulta por renglon
+
+Conteo de registros para iTotalRecords
+
+- contar guarda en Redis por poco tiempo el total de cada consulta (vista y filtros) y el de las tablas que usa
+- Cada tabla tiene un numero de version en Redis que sube al hacer commit de cambios en ella, eso invalida sus totales;
+  registrar_invalidacion_conteos conecta los eventos de las sesiones de SQLAlchemy que lo hacen
+- Se cuenta con un tope de CONTEO_TOPE renglones, si se rebasa en PostgreSQL se usa la estimacion del planeador
+
+Ejemplo de uso
+
+    draw, start, rows_per_page = get_datatable_parameters()
+    consulta = Nomina.query.filter_by(estatus="A")
+    registros = paginar(consulta, [Nomina.id], start, rows_per_page, descendente=True, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
+    data = [{"id": resultado.id, "quincena_clave": resultado.quincena_clave} for resultado in registros]
+
 """
-from flask import request
+import hashlib
+import json
+from datetime import date, datetime
+
+from flask import current_app, has_app_context, request
+from redis.exceptions import RedisError
+from sqlalchemy import event, tuple_
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql.util import find_tables
+
+ANCLAS_KEY = "perseo:datatables:{}"
+ANCLAS_TTL = 600  # Segundos que se conservan las anclas de una consulta
+
+CONTEO_KEY = "perseo:datatables:conteo:{}:{}"
+CONTEO_TTL = 60  # Segundos que se conserva el total de una consulta
+CONTEO_TOPE = 10000  # Arriba de esta cantidad se usa la estimacion del planeador de PostgreSQL
+VERSION_KEY = "perseo:datatables:version:{}"
+VERSION_TTL = 86400
+TABLAS_MODIFICADAS = "tablas_modificadas"  # Llave en session.info con las tablas cambiadas antes del commit
 
 
 def get_datatable_parameters():
@@ -25,3 +75,239 @@ def output_datatable_json(draw, total, data):
         "iTotalDisplayRecords": total,
         "aaData": data,
     }
+
+
+def codificar_llave(valores: list) -> str:
+    """Codificar en JSON los valores de una llave, conservando las fechas"""
+    elementos = []
+    for valor in valores:
+        if isinstance(valor, datetime):
+            elementos.append({"datetime": valor.isoformat()})
+        elif isinstance(valor, date):
+            elementos.append({"date": valor.isoformat()})
+        else:
+            elementos.append(valor)
+    return json.dumps(elementos)
+
+
+def decodificar_llave(texto: str) -> list:
+    """Decodificar los valores de una llave codificada con codificar_llave"""
+    valores = []
+    for elemento in json.loads(texto):
+        if isinstance(elemento, dict) and "datetime" in elemento:
+            valores.append(datetime.fromisoformat(elemento["datetime"]))
+        elif isinstance(elemento, dict) and "date" in elemento:
+            valores.append(date.fromisoformat(elemento["date"]))
+        else:
+            valores.append(elemento)
+    return valores
+
+
+def ordenar(consulta, orden: list, descendente: bool = False):
+    """Ordenar la consulta por las columnas de orden, todas en el mismo sentido"""
+    return consulta.order_by(*[columna.desc() if descendente else columna for columna in orden])
+
+
+def paginar_keyset(consulta, orden: list, ultimo: list, rows_per_page: int, descendente: bool = False):
+    """Consultar la pagina que sigue al renglon con la llave ultimo, o la primera si ultimo es None"""
+    if ultimo is not None:
+        if len(orden) == 1:
+            columnas, valores = orden[0], ultimo[0]
+        else:
+            columnas, valores = tuple_(*orden), tuple_(*ultimo)
+        consulta = consulta.filter(columnas < valores if descendente else columnas > valores)
+    return ordenar(consulta, orden, descendente).limit(rows_per_page)
+
+
+def firma_consulta(orden: list, descendente: bool) -> str:
+    """Identificar la consulta por la vista, los filtros que mando DataTables y el orden"""
+    filtros = sorted((llave, valor) for llave, valor in request.form.items() if llave not in ("draw", "start", "length"))
+    columnas = [str(columna) for columna in orden]
+    texto = json.dumps([request.endpoint, filtros, columnas, descendente])
+    return hashlib.sha1(texto.encode("utf8")).hexdigest()
+
+
+def leer_ancla(firma: str, start: int) -> list:
+    """Leer de Redis la llave del renglon anterior a start, entrega None si no se conoce"""
+    redis = getattr(current_app, "redis", None)
+    if redis is None:
+        return None
+    try:
+        texto = redis.hget(ANCLAS_KEY.format(firma), str(start))
+    except RedisError:
+        return None
+    return decodificar_llave(texto) if texto is not None else None
+
+
+def guardar_ancla(firma: str, start: int, valores: list) -> None:
+    """Guardar en Redis la llave del renglon anterior a start"""
+    redis = getattr(current_app, "redis", None)
+    if redis is None:
+        return
+    llave = ANCLAS_KEY.format(firma)
+    try:
+        redis.hset(llave, str(start), codificar_llave(valores))
+        redis.expire(llave, ANCLAS_TTL)
+    except RedisError:
+        pass
+
+
+def proyectar(consulta, columnas: dict, orden: list = None):
+    """Cambiar la consulta para entregar tuplas con las columnas declaradas, agregando los joins de sus rutas"""
+    modelo = consulta.column_descriptions[0]["entity"]
+    entidades = {}  # Ruta de relaciones -> entidad con alias, para hacer un solo join por ruta
+    expresiones = []
+    for nombre, ruta in columnas.items():
+        partes = ruta.split(".")
+        entidad = modelo
+        camino = ""
+        for relacion in partes[:-1]:
+            camino = f"{camino}.{relacion}" if camino != "" else relacion
+            if camino not in entidades:
+                atributo = getattr(entidad, relacion)
+                destino = aliased(atributo.property.mapper.class_)
+                consulta = consulta.outerjoin(atributo.of_type(destino))
+                entidades[camino] = destino
+            entidad = entidades[camino]
+        expresiones.append(getattr(entidad, partes[-1]).label(nombre))
+    # Las columnas de orden se necesitan en cada renglon para guardar el ancla
+    for columna in orden or []:
+        if columna.key not in columnas:
+            expresiones.append(columna.label(columna.key))
+    return consulta.with_entities(*expresiones)
+
+
+def paginar(
+    consulta,
+    orden: list,
+    start: int,
+    rows_per_page: int,
+    descendente: bool = False,
+    columnas: dict = None,
+) -> list:
+    """Entregar los registros de la pagina, por llave si se conoce el ancla de start, si no con offset"""
+    firma = firma_consulta(orden, descendente)
+    if columnas is not None:
+        consulta = proyectar(consulta, columnas, orden)
+    ultimo = leer_ancla(firma, start) if start > 0 else None
+    if start <= 0 or ultimo is not None:
+        registros = paginar_keyset(consulta, orden, ultimo, rows_per_page, descendente).all()
+    else:
+        registros = ordenar(consulta, orden, descendente).offset(start).limit(rows_per_page).all()
+    # Guardar el ancla de la pagina siguiente con la llave del ultimo renglon de esta
+    if rows_per_page > 0 and len(registros) == rows_per_page:
+        guardar_ancla(firma, start + rows_per_page, [getattr(registros[-1], columna.key) for columna in orden])
+    return registros
+
+
+def tablas_de_consulta(consulta) -> list:
+    """Nombres de las tablas que usa la consulta"""
+    return sorted({tabla.name for tabla in find_tables(consulta.statement, include_joins=False) if hasattr(tabla, "name")})
+
+
+def version_tablas(redis, tablas: list) -> str:
+    """Leer de Redis las versiones de las tablas, cambia cada vez que se hace commit de cambios en alguna"""
+    versiones = redis.mget([VERSION_KEY.format(tabla) for tabla in tablas]) if tablas else []
+    return ",".join(valor.decode() if valor is not None else "0" for valor in versiones)
+
+
+def estimar_conteo(consulta) -> int:
+    """Estimacion del planeador de PostgreSQL para la cantidad de renglones de la consulta"""
+    conexion = consulta.session.connection()
+    compilada = consulta.statement.compile(dialect=conexion.dialect)
+    plan = conexion.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compilada}", compilada.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def contar(consulta) -> int:
+    """Contar los registros de la consulta, con cache en Redis y con estimacion si son demasiados"""
+    consulta = consulta.order_by(None)
+
+    # Buscar el total en Redis, la llave lleva las versiones de las tablas para que un cambio lo invalide
+    redis = getattr(current_app, "redis", None)
+    llave = None
+    if redis is not None:
+        try:
+            version = version_tablas(redis, tablas_de_consulta(consulta))
+            llave = CONTEO_KEY.format(firma_consulta([], False), version)
+            guardado = redis.get(llave)
+            if guardado is not None:
+                return int(guardado)
+        except RedisError:
+            llave = None
+
+    # Contar hasta el tope, si lo rebasa en PostgreSQL usar la estimacion, con otros motores contar todo
+    total = consulta.limit(CONTEO_TOPE + 1).count()
+    if total > CONTEO_TOPE:
+        if consulta.session.get_bind().dialect.name == "postgresql":
+            total = max(total, estimar_conteo(consulta))
+        else:
+            total = consulta.count()
+
+    # Guardar el total en Redis
+    if llave is not None:
+        try:
+            redis.set(llave, total, ex=CONTEO_TTL)
+        except RedisError:
+            pass
+    return total
+
+
+def marcar_tablas_modificadas(sesion, tablas) -> None:
+    """Anotar en la sesion las tablas que cambiaron, sus totales se invalidan al hacer commit"""
+    sesion.info.setdefault(TABLAS_MODIFICADAS, set()).update(tablas)
+
+
+def invalidar_conteos(tablas) -> None:
+    """Subir la version de las tablas en Redis, asi dejan de usarse los totales guardados"""
+    if not tablas or not has_app_context():
+        return
+    redis = getattr(current_app, "redis", None)
+    if redis is None:
+        return
+    try:
+        with redis.pipeline() as tuberia:
+            for tabla in tablas:
+                tuberia.incr(VERSION_KEY.format(tabla))
+                tuberia.expire(VERSION_KEY.format(tabla), VERSION_TTL)
+            tuberia.execute()
+    except RedisError:
+        pass
+
+
+def _despues_de_flush(sesion, _contexto) -> None:
+    """Anotar las tablas de los objetos agregados, cambiados o eliminados con el ORM"""
+    objetos = list(sesion.new) + list(sesion.dirty) + list(sesion.deleted)
+    marcar_tablas_modificadas(sesion, {objeto.__table__.name for objeto in objetos if hasattr(objeto, "__table__")})
+
+
+def _al_ejecutar(estado) -> None:
+    """Anotar la tabla de los insert, update y delete ejecutados con session.execute"""
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        tabla = getattr(estado.statement, "table", None)
+        if tabla is not None and hasattr(tabla, "name"):
+            marcar_tablas_modificadas(estado.session, {tabla.name})
+
+
+def _despues_de_commit(sesion) -> None:
+    """Invalidar los totales de las tablas que cambiaron"""
+    invalidar_conteos(sesion.info.pop(TABLAS_MODIFICADAS, set()))
+
+
+def _despues_de_rollback(sesion) -> None:
+    """Olvidar las tablas anotadas, sus cambios no se guardaron"""
+    sesion.info.pop(TABLAS_MODIFICADAS, None)
+
+
+def registrar_invalidacion_conteos() -> None:
+    """Conectar los eventos de las sesiones de SQLAlchemy que invalidan los totales guardados"""
+    for nombre, funcion in (
+        ("after_flush", _despues_de_flush),
+        ("do_orm_execute", _al_ejecutar),
+        ("after_commit", _despues_de_commit),
+        ("after_rollback", _despues_de_rollback),
+    ):
+        if not event.contains(Session, nombre, funcion):
+            event.listen(Session, nombre, funcion)
@@ -0,0 +1,294 @@
+"""
+Depositos
+
+Guardar y listar archivos en un deposito, que puede ser un bucket de Google Cloud Storage o un directorio local.
+
+- DepositoGCS crea UN cliente y UN bucket y los reusa en todas las operaciones, incluso desde varios hilos
+- DepositoLocal guarda en un directorio con la misma forma de rutas, sirve para desarrollo y pruebas sin red
+- obtener_deposito entrega el deposito del proceso para un bucket, se crea una sola vez y se comparte entre hilos;
+  si esta definida la variable de entorno DEPOSITO_LOCAL_DIR se usa DepositoLocal en ese directorio
+- listar entrega de una vez los nombres de los archivos con un prefijo, para no preguntar archivo por archivo
+- abrir entrega un lector por bloques con su tamano y ETag, y url_firmada una URL temporal para descargar directo
+- subir_en_paralelo sube varios archivos con un ThreadPoolExecutor y reintenta con espera creciente
+
+Ejemplo de uso
+
+    deposito = obtener_deposito(CLOUD_STORAGE_DEPOSITO)
+    existentes = deposito.listar("timbrados/202401/")
+    pendientes = [Subida(nombre, ruta, "application/pdf") for nombre, ruta in archivos if nombre not in existentes]
+    resultado = subir_en_paralelo(deposito, pendientes, hilos=8)
+    click.echo(f"Se subieron {len(resultado.urls)} archivos a {resultado.megabytes_por_segundo} MB/s")
+
+"""
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from typing import NamedTuple, Optional
+from urllib.parse import quote
+
+from lib.exceptions import MyBucketNotFoundError, MyFileNotFoundError, MyUploadError
+
+HILOS = 8
+REINTENTOS = 3
+ESPERA_INICIAL = 0.5
+TAMANO_BLOQUE = 256 * 1024  # Bytes por bloque al leer un archivo del deposito
+
+DEPOSITO_LOCAL_DIR = os.environ.get("DEPOSITO_LOCAL_DIR", "")
+
+_depositos = {}
+_depositos_candado = threading.Lock()
+
+bitacora = logging.getLogger(__name__)
+
+
+class Subida(NamedTuple):
+    """Archivo por subir al deposito"""
+
+    nombre: str  # Ruta del archivo dentro del deposito
+    ruta: Path  # Ruta del archivo local
+    content_type: str
+
+
+class ResultadoSubidas(NamedTuple):
+    """Resultado de subir varios archivos"""
+
+    urls: dict  # nombre -> URL publica de los archivos que se subieron
+    errores: dict  # nombre -> mensaje de error de los archivos que no se pudieron subir
+    bytes_subidos: int
+    segundos: float
+
+    @property
+    def archivos_por_segundo(self) -> float:
+        """Cantidad de archivos subidos por segundo"""
+        return round(len(self.urls) / self.segundos, 1) if self.segundos > 0 else 0.0
+
+    @property
+    def megabytes_por_segundo(self) -> float:
+        """Megabytes subidos por segundo"""
+        return round(self.bytes_subidos / 1048576 / self.segundos, 2) if self.segundos > 0 else 0.0
+
+
+class DepositoGCS:
+    """Deposito en un bucket de Google Cloud Storage"""
+
+    def __init__(self, bucket_name: str):
+        # Se importa aqui para que el deposito local no requiera google-cloud-storage
+        from google.cloud import storage
+
+        self.bucket_name = bucket_name
+        self.cliente = storage.Client()
+        self.bucket = self.cliente.bucket(bucket_name)  # No hace peticiones, a diferencia de get_bucket
+        self.credenciales = None  # Para firmar con la API de IAM cuando las credenciales no tienen llave privada
+        self.candado = threading.Lock()
+
+    def listar(self, prefijo: str) -> set:
+        """Listar los nombres de los archivos que empiezan con el prefijo"""
+        from google.cloud.exceptions import NotFound
+
+        try:
+            return {blob.name for blob in self.cliente.list_blobs(self.bucket, prefix=prefijo)}
+        except NotFound as error:
+            raise MyBucketNotFoundError("Bucket not found") from error
+
+    def subir(self, nombre: str, data: bytes, content_type: str) -> str:
+        """Subir un archivo, entrega la URL publica"""
+        blob = self.bucket.blob(nombre)
+        try:
+            blob.upload_from_string(data, content_type=content_type)
+        except Exception as error:
+            raise MyUploadError(f"Error uploading {nombre}: {str(error)}") from error
+        return blob.public_url
+
+    def subir_archivo(self, nombre: str, ruta: Path, content_type: str) -> str:
+        """Subir un archivo local sin cargarlo en memoria, entrega la URL publica"""
+        blob = self.bucket.blob(nombre, chunk_size=TAMANO_BLOQUE * 32)  # Subida reanudable por bloques de 8 MB
+        try:
+            blob.upload_from_filename(str(ruta), content_type=content_type)
+        except Exception as error:
+            raise MyUploadError(f"Error uploading {nombre}: {str(error)}") from error
+        return blob.public_url
+
+    def url_publica(self, nombre: str) -> str:
+        """URL publica de un archivo, sin consultar el deposito"""
+        return self.bucket.blob(nombre).public_url
+
+    def existe(self, nombre: str) -> bool:
+        """Revisar si existe un archivo"""
+        return self.bucket.blob(nombre).exists()
+
+    def descargar(self, nombre: str) -> bytes:
+        """Descargar el contenido de un archivo"""
+        from google.cloud.exceptions import NotFound
+
+        try:
+            return self.bucket.blob(nombre).download_as_bytes()
+        except NotFound as error:
+            raise MyFileNotFoundError("File not found") from error
+
+    def abrir(self, nombre: str) -> tuple:
+        """Abrir un archivo para leerlo por bloques, entrega el lector, el tamano y el ETag"""
+        blob = self.bucket.get_blob(nombre)
+        if blob is None:
+            raise MyFileNotFoundError("File not found")
+        return blob.open("rb", chunk_size=TAMANO_BLOQUE), blob.size, blob.etag
+
+    def url_firmada(self, nombre: str, minutos: int, descarga_nombre: str, content_type: str) -> Optional[str]:
+        """URL firmada que vence en los minutos dados, entrega None si las credenciales no pueden firmar"""
+        import google.auth
+        from google.auth.exceptions import GoogleAuthError
+        from google.auth.transport.requests import Request
+
+        blob = self.bucket.blob(nombre)
+        opciones = {
+            "version": "v4",
+            "expiration": timedelta(minutes=minutos),
+            "method": "GET",
+            "response_disposition": f"attachment; filename={descarga_nombre}",
+            "response_type": content_type,
+        }
+
+        # Con una cuenta de servicio con llave privada se firma sin hacer peticiones
+        try:
+            return blob.generate_signed_url(**opciones)
+        except AttributeError:
+            pass
+
+        # En App Engine las credenciales no tienen llave privada, se firma con la API de IAM usando el token
+        try:
+            with self.candado:
+                if self.credenciales is None:
+                    self.credenciales, _ = google.auth.default()
+                if not self.credenciales.valid:
+                    self.credenciales.refresh(Request())
+                correo, token = self.credenciales.service_account_email, self.credenciales.token
+            return blob.generate_signed_url(service_account_email=correo, access_token=token, **opciones)
+        except (GoogleAuthError, AttributeError) as error:
+            # Sin credenciales, fallo el token o la API de IAM, o las credenciales no son de una cuenta de servicio
+            bitacora.warning("No se pudo firmar la URL de %s: %s", nombre, error)
+        return None
+
+
+class DepositoLocal:
+    """Deposito en un directorio local, con la misma forma de rutas que el bucket"""
+
+    def __init__(self, directorio: str, bucket_name: str = "local"):
+        self.directorio = Path(directorio)
+        self.bucket_name = bucket_name
+        self.raiz = Path(directorio, bucket_name)
+
+    def listar(self, prefijo: str) -> set:
+        """Listar los nombres de los archivos que empiezan con el prefijo"""
+        if not self.directorio.is_dir():
+            raise MyBucketNotFoundError("Bucket not found")
+        nombres = set()
+        for ruta in self.raiz.rglob("*"):
+            nombre = ruta.relative_to(self.raiz).as_posix()
+            if ruta.is_file() and nombre.startswith(prefijo):
+                nombres.add(nombre)
+        return nombres
+
+    def subir(self, nombre: str, data: bytes, content_type: str) -> str:
+        """Guardar un archivo, entrega su URL"""
+        ruta = Path(self.raiz, nombre)
+        try:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            ruta.write_bytes(data if isinstance(data, bytes) else data.encode("utf8"))
+        except OSError as error:
+            raise MyUploadError(f"Error uploading {nombre}: {str(error)}") from error
+        return self.url_publica(nombre)
+
+    def subir_archivo(self, nombre: str, ruta: Path, content_type: str) -> str:
+        """Copiar un archivo local, entrega su URL"""
+        destino = Path(self.raiz, nombre)
+        try:
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(ruta, destino)
+        except OSError as error:
+            raise MyUploadError(f"Error uploading {nombre}: {str(error)}") from error
+        return self.url_publica(nombre)
+
+    def url_publica(self, nombre: str) -> str:
+        """URL de un archivo, con el bucket como primer directorio igual que en GCS"""
+        return f"file://localhost/{quote(self.bucket_name)}/{quote(nombre)}"
+
+    def existe(self, nombre: str) -> bool:
+        """Revisar si existe un archivo"""
+        return Path(self.raiz, nombre).is_file()
+
+    def descargar(self, nombre: str) -> bytes:
+        """Leer el contenido de un archivo"""
+        ruta = Path(self.raiz, nombre)
+        if not ruta.is_file():
+            raise MyFileNotFoundError("File not found")
+        return ruta.read_bytes()
+
+    def abrir(self, nombre: str) -> tuple:
+        """Abrir un archivo para leerlo por bloques, entrega el lector, el tamano y el ETag"""
+        ruta = Path(self.raiz, nombre)
+        if not ruta.is_file():
+            raise MyFileNotFoundError("File not found")
+        estado = ruta.stat()
+        return open(ruta, "rb"), estado.st_size, f"{estado.st_mtime_ns:x}-{estado.st_size:x}"
+
+    def url_firmada(self, nombre: str, minutos: int, descarga_nombre: str, content_type: str) -> Optional[str]:
+        """Un directorio local no puede firmar URLs, siempre entrega None"""
+        return None
+
+
+def obtener_deposito(bucket_name: str):
+    """Entregar el deposito del proceso para el bucket, se crea la primera vez y despues se reusa"""
+    # La llave lleva el PID porque los workers de RQ hacen fork y el cliente no debe compartirse entre procesos
+    llave = (os.getpid(), bucket_name)
+    deposito = _depositos.get(llave)
+    if deposito is None:
+        with _depositos_candado:
+            deposito = _depositos.get(llave)
+            if deposito is None:
+                if DEPOSITO_LOCAL_DIR != "":
+                    deposito = DepositoLocal(DEPOSITO_LOCAL_DIR, bucket_name)
+                else:
+                    deposito = DepositoGCS(bucket_name)
+                _depositos[llave] = deposito
+    return deposito
+
+
+def subir_con_reintentos(deposito, subida: Subida, reintentos: int = REINTENTOS, espera: float = ESPERA_INICIAL) -> tuple:
+    """Subir un archivo, si falla se reintenta esperando el doble cada vez, entrega la URL y los bytes"""
+    data = subida.ruta.read_bytes()
+    for intento in range(reintentos + 1):
+        try:
+            return deposito.subir(subida.nombre, data, subida.content_type), len(data)
+        except MyUploadError:
+            if intento == reintentos:
+                raise
+            time.sleep(espera * 2**intento)
+    return None, 0
+
+
+def subir_en_paralelo(
+    deposito,
+    subidas: list,
+    hilos: int = HILOS,
+    reintentos: int = REINTENTOS,
+    espera: float = ESPERA_INICIAL,
+) -> ResultadoSubidas:
+    """Subir varios archivos con un limite de hilos, entrega las URLs, los errores, los bytes y los segundos"""
+    urls = {}
+    errores = {}
+    bytes_subidos = 0
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, hilos)) as ejecutor:
+        futuros = {ejecutor.submit(subir_con_reintentos, deposito, subida, reintentos, espera): subida for subida in subidas}
+        for futuro, subida in futuros.items():
+            try:
+                url, tamano = futuro.result()
+                urls[subida.nombre] = url
+                bytes_subidos += tamano
+            except (MyUploadError, OSError) as error:
+                errores[subida.nombre] = str(error)
+    return ResultadoSubidas(urls, errores, bytes_subidos, time.perf_counter() - inicio)
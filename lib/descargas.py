@@ -0,0 +1,68 @@
+"""
+Descargas
+
+Entregar al navegador un archivo del deposito sin cargarlo completo en la memoria del worker.
+
+- Por defecto se redirige a una URL firmada que vence en URL_FIRMADA_MINUTOS y el navegador descarga directo del bucket
+- Si DESCARGAS_POR_PROXY es verdadero, o el deposito no puede firmar, se transmite el archivo por bloques
+  con Content-Length y ETag
+- Si el navegador manda If-None-Match con el mismo ETag se responde 304 sin leer el archivo
+
+Ejemplo de uso
+
+    try:
+        return descargar_archivo(
+            bucket_name=current_app.config["CLOUD_STORAGE_DEPOSITO"],
+            blob_name=get_blob_name_from_url(timbrado.url_pdf),
+            descarga_nombre=descarga_nombre,
+            content_type="application/pdf",
+        )
+    except MyAnyError as error:
+        flash(str(error), "danger")
+        return redirect(url_for("timbrados.detail", timbrado_id=timbrado.id))
+
+"""
+from flask import Response, current_app, redirect, request
+
+from lib.depositos import TAMANO_BLOQUE, obtener_deposito
+
+URL_FIRMADA_MINUTOS = 5
+
+
+def leer_bloques(archivo):
+    """Entregar el contenido de un archivo abierto por bloques y cerrarlo al terminar"""
+    with archivo:
+        while True:
+            bloque = archivo.read(TAMANO_BLOQUE)
+            if not bloque:
+                break
+            yield bloque
+
+
+def descargar_archivo(bucket_name: str, blob_name: str, descarga_nombre: str, content_type: str) -> Response:
+    """Redirigir a una URL firmada o transmitir por bloques un archivo del deposito"""
+    deposito = obtener_deposito(bucket_name)
+
+    # Redirigir a una URL firmada, asi el worker no transmite el archivo
+    if not current_app.config.get("DESCARGAS_POR_PROXY", False):
+        url = deposito.url_firmada(blob_name, URL_FIRMADA_MINUTOS, descarga_nombre, content_type)
+        if url is not None:
+            return redirect(url)
+
+    # Abrir el archivo, causa MyFileNotFoundError si no existe
+    archivo, tamano, etag = deposito.abrir(blob_name)
+
+    # Si el navegador ya tiene esta version, responder 304 sin leer el contenido
+    if request.if_none_match.contains(etag):
+        archivo.close()
+        respuesta = Response(status=304)
+        respuesta.set_etag(etag)
+        return respuesta
+
+    # Transmitir por bloques
+    respuesta = Response(leer_bloques(archivo), content_type=content_type)
+    respuesta.headers["Content-Length"] = str(tamano)
+    respuesta.headers["Content-Disposition"] = f"attachment; filename={descarga_nombre}"
+    respuesta.headers["Cache-Control"] = "private, no-cache"
+    respuesta.set_etag(etag)
+    return respuesta
@@ -0,0 +1,81 @@
+"""
+Eventos enviados por el servidor (Server-Sent Events)
+
+- transmitir_canal envia primero el estado actual y despues cada mensaje que se publica en un canal de Redis,
+  asi el navegador solo recibe algo cuando de verdad cambia
+- Termina cuando un mensaje cumple la condicion de termino o al pasar DURACION segundos, el EventSource del navegador
+  se vuelve a conectar solo, asi cada conexion ocupa un hilo del servidor por un tiempo limitado
+- Mientras no hay mensajes se envia un comentario cada KEEPALIVE segundos para que los proxies no corten la conexion
+- Con duracion cero solo se envia el estado actual y se cierra, el navegador vuelve a preguntar cada REINTENTO
+  milisegundos; es lo que se usa en App Engine standard, que junta toda la respuesta antes de enviarla y no transmite
+
+Ejemplo de uso
+
+    eventos = transmitir_canal(redis, canal, consultar_estado, ha_terminado)
+    return Response(eventos, mimetype="text/event-stream", headers=ENCABEZADOS)
+
+"""
+import json
+import time
+from typing import Callable, Iterator
+
+from redis.exceptions import RedisError
+
+DURACION = 60  # Segundos que dura cada conexion
+KEEPALIVE = 15  # Segundos entre comentarios para mantener viva la conexion
+REINTENTO = 3000  # Milisegundos que espera el navegador para volver a conectarse
+ENCABEZADOS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def formato_evento(datos: dict, reintento: int = None) -> str:
+    """Convertir un diccionario en un evento SSE"""
+    lineas = []
+    if reintento is not None:
+        lineas.append(f"retry: {reintento}")
+    lineas.append(f"data: {json.dumps(datos)}")
+    return "\n".join(lineas) + "\n\n"
+
+
+def transmitir_canal(
+    redis,
+    canal: str,
+    consultar_estado: Callable[[], dict],
+    ha_terminado: Callable[[dict], bool],
+    duracion: int = DURACION,
+) -> Iterator[str]:
+    """Transmitir el estado actual y los mensajes publicados en el canal hasta que termine o pase la duracion"""
+
+    # Sin duracion no se suscribe al canal, se entrega el estado actual y el navegador vuelve a preguntar
+    if duracion <= 0:
+        try:
+            yield formato_evento(consultar_estado(), reintento=REINTENTO)
+        except RedisError:
+            pass
+        return
+
+    pubsub = redis.pubsub(ignore_subscribe_messages=True)
+    try:
+        # Suscribirse antes de consultar el estado para no perder lo que se publique entre ambos
+        pubsub.subscribe(canal)
+        estado = consultar_estado()
+        yield formato_evento(estado, reintento=REINTENTO)
+        if ha_terminado(estado):
+            return
+        limite = time.monotonic() + duracion
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return
+            mensaje = pubsub.get_message(timeout=min(KEEPALIVE, restante))
+            if mensaje is None:
+                yield ": keepalive\n\n"
+                continue
+            datos = json.loads(mensaje["data"])
+            yield formato_evento(datos)
+            if ha_terminado(datos):
+                return
+    except RedisError:
+        # Sin Redis se cierra la conexion y el navegador lo vuelve a intentar
+        return
+    finally:
+        pubsub.close()
@@ -19,6 +19,10 @@ class MyBucketNotFoundError(MyAnyError):
     """Excepción porque no se encontró el bucket"""
 
 
+class MyBulkInsertError(MyAnyError):
+    """Excepción porque falló la inserción masiva"""
+
+
 class MyConnectionError(MyAnyError):
     """Excepción porque no se pudo conectar"""
 
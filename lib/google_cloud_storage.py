@@ -3,22 +3,17 @@ Google Cloud Storage
 
 Functions to get and upload files from Google Cloud Storage
 
-For develpment you need the environment variable GOOGLE_APPLICATION_CREDENTIALS
+The client and the bucket are created once per process and reused, see lib/depositos.py
+
+For develpment you need the environment variable GOOGLE_APPLICATION_CREDENTIALS,
+or define DEPOSITO_LOCAL_DIR to use a local directory instead of the bucket
 
 """
 from pathlib import Path
 from urllib.parse import unquote, urlparse
 
-from google.cloud import storage
-from google.cloud.exceptions import NotFound
-
-from lib.exceptions import (
-    MyBucketNotFoundError,
-    MyFileNotAllowedError,
-    MyFileNotFoundError,
-    MyNotValidParamError,
-    MyUploadError,
-)
+from lib.depositos import obtener_deposito
+from lib.exceptions import MyFileNotAllowedError, MyFileNotFoundError, MyNotValidParamError
 
 EXTENSIONS_MEDIA_TYPES = {
     "doc": "application/msword",
@@ -90,20 +85,8 @@ def check_file_exists_from_gcs(
     :return: True if file exists
     """
 
-    # Get bucket
-    storage_client = storage.Client()
-    try:
-        bucket = storage_client.get_bucket(bucket_name)
-    except NotFound as error:
-        raise MyBucketNotFoundError("Bucket not found") from error
-
-    # Get file
-    blob = bucket.get_blob(blob_name)
-    if blob is None:
-        return False
-
     # Return True if file exists
-    return True
+    return obtener_deposito(bucket_name).existe(blob_name)
 
 
 def get_public_url_from_gcs(
@@ -118,20 +101,13 @@ def get_public_url_from_gcs(
     :return: Public URL
     """
 
-    # Get bucket
-    storage_client = storage.Client()
-    try:
-        bucket = storage_client.get_bucket(bucket_name)
-    except NotFound as error:
-        raise MyBucketNotFoundError("Bucket not found") from error
-
-    # Get file
-    blob = bucket.get_blob(blob_name)
-    if blob is None:
+    # Check file
+    deposito = obtener_deposito(bucket_name)
+    if not deposito.existe(blob_name):
         raise MyFileNotFoundError("File not found")
 
     # Return public URL
-    return blob.public_url
+    return deposito.url_publica(blob_name)
 
 
 def get_file_from_gcs(
@@ -146,20 +122,8 @@ def get_file_from_gcs(
     :return: File content
     """
 
-    # Get bucket
-    storage_client = storage.Client()
-    try:
-        bucket = storage_client.get_bucket(bucket_name)
-    except NotFound as error:
-        raise MyBucketNotFoundError("Bucket not found") from error
-
-    # Get file
-    blob = bucket.get_blob(blob_name)
-    if blob is None:
-        raise MyFileNotFoundError("File not found")
-
-    # Return file content
-    return blob.download_as_string()
+    # Return file content, causes MyFileNotFoundError if the file does not exist
+    return obtener_deposito(bucket_name).descargar(blob_name)
 
 
 def upload_file_to_gcs(
@@ -182,21 +146,5 @@ def upload_file_to_gcs(
     # if content_type not in EXTENSIONS_MEDIA_TYPES.values():
     #     raise MyFileNotAllowedError("File not allowed")
 
-    # Get bucket
-    storage_client = storage.Client()
-    try:
-        bucket = storage_client.get_bucket(bucket_name)
-    except NotFound as error:
-        raise MyBucketNotFoundError("Bucket not found") from error
-
-    # Create blob
-    blob = bucket.blob(blob_name)
-
-    # Upload file
-    try:
-        blob.upload_from_string(data, content_type=content_type)
-    except Exception as error:
-        raise MyUploadError("Error uploading file") from error
-
-    # Return public URL
-    return blob.public_url
+    # Upload file and return public URL, causes MyUploadError on failure
+    return obtener_deposito(bucket_name).subir(blob_name, data, content_type)
@@ -0,0 +1,119 @@
+"""
+Inserción masiva
+
+Junta renglones como tuplas y los inserta por bloques en una tabla, sin pasar por el ORM.
+
+- Si el motor es psycopg2 se usa COPY FROM STDIN, que es lo mas rapido en PostgreSQL
+- Con COPY los None se escriben como \\N, asi un texto vacio no se confunde con NULL
+- Con otros motores se usa insert() con executemany
+- Cada bloque va dentro de un SAVEPOINT, si falla se revierte solo ese bloque y se eleva MyBulkInsertError
+- El commit lo hace quien la usa, asi queda en la misma transaccion que el resto de la sesion
+
+Ejemplo de uso
+
+    insercion = InsercionMasiva(sesion, PercepcionDeduccion, ["persona_id", "concepto_id", "importe"])
+    for renglon in renglones:
+        insercion.agregar((persona.id, concepto.id, importe))
+    insercion.vaciar()
+    sesion.commit()
+    click.echo(f"{insercion.contador} a {insercion.renglones_por_segundo} renglones por segundo")
+
+"""
+import csv
+import io
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from lib.datatables import marcar_tablas_modificadas
+from lib.exceptions import MyBulkInsertError
+
+TAMANO_BLOQUE = 5000
+NULO = "\\N"  # Valor que COPY interpreta como NULL, un campo vacio es un texto vacio
+
+
+class InsercionMasiva:
+    """Insertar renglones por bloques en la tabla de un modelo"""
+
+    def __init__(self, sesion, modelo, columnas: list, tamano_bloque: int = TAMANO_BLOQUE):
+        self.sesion = sesion
+        self.tabla = modelo.__table__
+        self.columnas = list(columnas)
+        self.tamano_bloque = tamano_bloque
+        self.renglones = []
+        self.contador = 0
+        self.segundos = 0.0
+        self.usar_copy = sesion.get_bind().dialect.driver == "psycopg2"
+
+        # COPY no aplica los valores por defecto de SQLAlchemy, entonces se agregan las columnas que los tienen
+        self.columnas_por_defecto = {}
+        if self.usar_copy:
+            for columna in self.tabla.columns:
+                if columna.primary_key or columna.name in self.columnas or columna.default is None:
+                    continue
+                if columna.default.is_scalar:
+                    self.columnas_por_defecto[columna.name] = columna.default.arg
+                elif columna.default.is_clause_element:
+                    self.columnas_por_defecto[columna.name] = None  # Como func.now(), se define al vaciar
+
+    @property
+    def renglones_por_segundo(self) -> int:
+        """Cantidad de renglones insertados por segundo"""
+        if self.segundos == 0:
+            return 0
+        return int(self.contador / self.segundos)
+
+    def agregar(self, renglon: tuple):
+        """Agregar un renglon, si se llena el bloque se inserta"""
+        if len(renglon) != len(self.columnas):
+            raise MyBulkInsertError(f"El renglon tiene {len(renglon)} valores y se esperan {len(self.columnas)}")
+        self.renglones.append(renglon)
+        if len(self.renglones) >= self.tamano_bloque:
+            self.vaciar()
+
+    def vaciar(self):
+        """Insertar los renglones pendientes"""
+        if len(self.renglones) == 0:
+            return
+        inicio = time.perf_counter()
+        punto_de_guardado = self.sesion.begin_nested()
+        try:
+            if self.usar_copy:
+                self._copiar()
+                marcar_tablas_modificadas(self.sesion, {self.tabla.name})  # COPY no pasa por los eventos de la sesion
+            else:
+                self.sesion.execute(insert(self.tabla), [dict(zip(self.columnas, renglon)) for renglon in self.renglones])
+            punto_de_guardado.commit()
+        except Exception as error:
+            punto_de_guardado.rollback()
+            cantidad = len(self.renglones)
+            self.renglones = []
+            mensaje = f"Falló la inserción de un bloque de {cantidad} renglones en {self.tabla.name}: {error}"
+            raise MyBulkInsertError(mensaje) from error
+        self.contador += len(self.renglones)
+        self.segundos += time.perf_counter() - inicio
+        self.renglones = []
+
+    def _copiar(self):
+        """Insertar los renglones pendientes con COPY FROM STDIN"""
+
+        # Definir los valores por defecto, las funciones como func.now() toman el tiempo actual
+        ahora = datetime.now()
+        por_defecto = tuple(ahora if valor is None else valor for valor in self.columnas_por_defecto.values())
+        columnas = self.columnas + list(self.columnas_por_defecto.keys())
+
+        # Escribir los renglones en CSV, los None como NULO porque un campo vacio seria NULL en lugar de un texto vacio
+        archivo = io.StringIO()
+        escritor = csv.writer(archivo)
+        for renglon in self.renglones:
+            escritor.writerow(tuple(NULO if valor is None else valor for valor in tuple(renglon) + por_defecto))
+        archivo.seek(0)
+
+        # Usar la misma conexion de la sesion para que quede en la misma transaccion
+        conexion = self.sesion.connection().connection
+        with conexion.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {self.tabla.name} ({', '.join(columnas)}) FROM STDIN WITH (FORMAT csv, NULL '{NULO}')",
+                archivo,
+            )
@@ -1,18 +1,79 @@
 """
 Tareas en el fondo
+
+- El avance de una tarea (porcentaje, renglones hechos, etapa, tiempo estimado y mensaje) se guarda solo en un hash
+  de Redis, asi report_task_progress puede llamarse cada pocos cientos de renglones sin costo para la base de datos
+- En la tabla tareas se escribe solo al cambiar de estado: al iniciar (progreso 0), al terminar (progreso 100),
+  al fallar, o cuando hay archivo o URL para descargar
+- Cada cambio del avance tambien se publica en un canal de Redis, la vista tareas.events lo transmite al navegador
+  con eventos enviados por el servidor (vea lib/eventos.py); al terminar se escribe primero en la base de datos
+  y despues se publica, asi la pagina que recarga al recibir el 100 ya encuentra la tarea terminada
+- Tarea.get_avance lee el hash para mostrarlo
+
+Ejemplo de uso
+
+    set_task_progress(0, "Generando nominas...")
+    for numero, nomina in enumerate(nominas, start=1):
+        ...
+        if numero % REPORT_EVERY == 0:
+            report_task_progress(numero, len(nominas), "Escribiendo filas")
+    set_task_progress(100, "Se generaron las nominas", archivo, url)
+
 """
+import json
+import time
+
 from rq import get_current_job
 
-from perseo.blueprints.tareas.models import Tarea
+from perseo.blueprints.tareas.models import PROGRESS_CHANNEL, PROGRESS_KEY, Tarea
+
+CHILDREN_KEY = "perseo:tareas:{}:padre"
+CHILDREN_MESSAGES_KEY = "perseo:tareas:{}:hijas"
+CHILDREN_MESSAGES_TTL = 86400
+PROGRESS_TTL = 86400
+REPORT_EVERY = 500  # Renglones entre cada reporte de avance en los bucles largos
+
+_stage_starts = {}  # (id de la tarea, etapa) -> segundos en que empezo la etapa, para estimar el tiempo restante
+
+
+def save_progress(connection, job_id: str, **fields) -> None:
+    """Guardar campos del avance de la tarea en el hash de Redis y publicarlos en su canal"""
+    key = PROGRESS_KEY.format(job_id)
+    mapping = {field: str(value) for field, value in fields.items()}
+    with connection.pipeline() as pipe:
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, PROGRESS_TTL)
+        pipe.publish(PROGRESS_CHANNEL.format(job_id), json.dumps(mapping))
+        pipe.execute()
+
+
+def report_task_progress(done: int, total: int, stage: str = "", message: str = None) -> None:
+    """Reportar el avance de la tarea solo en Redis, con los renglones hechos, la etapa y el tiempo estimado"""
+    job = get_current_job()
+    if job is None:
+        return
+    now = time.monotonic()
+    started = _stage_starts.setdefault((job.get_id(), stage), now)
+    fields = {"done": done, "total": total, "stage": stage}
+    if total > 0:
+        fields["progress"] = min(99, done * 100 // total)
+    if 0 < done < total:
+        fields["eta"] = round((now - started) / done * (total - done))
+    if message is not None:
+        fields["message"] = message
+    save_progress(job.connection, job.get_id(), **fields)
 
 
 def set_task_progress(progress: int, message: str = None, archivo: str = "", url: str = "") -> None:
-    """Cambiar el progreso de la tarea"""
+    """Cambiar el progreso de la tarea, en la base de datos solo al iniciar, al terminar o si hay archivo o URL"""
     job = get_current_job()
     if job:
-        job.meta["progress"] = progress
-        job.save_meta()
-        tarea = Tarea.query.get(job.get_id())
+        fields = {"progress": progress, "eta": 0}
+        if message is not None:
+            fields["message"] = message
+        tarea = None
+        if not 0 < progress < 100 or archivo != "" or url != "":
+            tarea = Tarea.query.get(job.get_id())
         if tarea:
             hay_cambios = False
             if archivo != "":
@@ -29,17 +90,61 @@ def set_task_progress(progress: int, message: str = None, archivo: str = "", url
                 hay_cambios = True
             if hay_cambios:
                 tarea.save()
+        save_progress(job.connection, job.get_id(), **fields)
 
 
 def set_task_error(message: str) -> str:
     """Al fallar la tarea debe tomar el message y terminarla"""
     job = get_current_job()
     if job:
-        job.meta["progress"] = 100
-        job.save_meta()
         tarea = Tarea.query.get(job.get_id())
         if tarea:
             tarea.ha_terminado = True
             tarea.mensaje = message
             tarea.save()
+        save_progress(job.connection, job.get_id(), progress=100, eta=0, message=message, error=1)
     return message
+
+
+def set_task_children(total: int, message: str = "") -> None:
+    """Registrar la cantidad de tareas hijas, la tarea termina cuando termine la ultima hija"""
+    job = get_current_job()
+    if job:
+        # En una llave propia y no en job.meta, porque RQ borra el trabajo de la tarea padre al vencer su resultado
+        key = CHILDREN_KEY.format(job.get_id())
+        with job.connection.pipeline() as pipe:
+            pipe.hset(key, mapping={"children": total, "message": message})
+            pipe.expire(key, CHILDREN_MESSAGES_TTL)
+            pipe.execute()
+        tarea = Tarea.query.get(job.get_id())
+        if tarea and message != "":
+            tarea.mensaje = message
+            tarea.save()
+
+
+def set_parent_task_progress(parent_id: str, message: str, connection=None) -> int:
+    """Sumar el termino de una tarea hija al progreso de la tarea padre, entrega el progreso"""
+    if connection is None:
+        job = get_current_job()
+        if job is None:
+            return 0
+        connection = job.connection
+    parent = {field.decode(): value.decode() for field, value in connection.hgetall(CHILDREN_KEY.format(parent_id)).items()}
+    if "children" not in parent:
+        return 0
+    # La lista en Redis es el contador atomico de hijas terminadas y conserva sus mensajes
+    key = CHILDREN_MESSAGES_KEY.format(parent_id)
+    finished = connection.rpush(key, message)
+    connection.expire(key, CHILDREN_MESSAGES_TTL)
+    total = int(parent["children"])
+    progress = 100 if total == 0 else min(100, finished * 100 // total)
+    # Solo al terminar la ultima hija se escriben en la base de datos los mensajes de todas
+    if finished >= total:
+        tarea = Tarea.query.get(parent_id)
+        if tarea:
+            messages = [parent.get("message", "")] + [item.decode() for item in connection.lrange(key, 0, -1)]
+            tarea.mensaje = "\n".join(m for m in messages if m != "")[:1024]
+            tarea.ha_terminado = True
+            tarea.save()
+    save_progress(connection, parent_id, progress=progress, done=finished, total=total, message=message)
+    return progress
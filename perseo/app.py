@@ -1,11 +1,13 @@
 """
 Flask App
 """
-import rq
+from functools import lru_cache
+
 from flask import Flask
 from redis import Redis
 
 from config.settings import Settings
+from lib.datatables import registrar_invalidacion_conteos
 from perseo.blueprints.autoridades.views import autoridades
 from perseo.blueprints.bancos.views import bancos
 from perseo.blueprints.beneficiarios.views import beneficiarios
@@ -31,9 +33,10 @@ from perseo.blueprints.quincenas_productos.views import quincenas_productos
 from perseo.blueprints.roles.views import roles
 from perseo.blueprints.sistemas.views import sistemas
 from perseo.blueprints.tabuladores.views import tabuladores
+from perseo.blueprints.tareas.colas import crear_colas
 from perseo.blueprints.tareas.views import tareas
 from perseo.blueprints.timbrados.views import timbrados
-from perseo.blueprints.usuarios.models import Usuario
+from perseo.blueprints.usuarios.principal import cargar_principal
 from perseo.blueprints.usuarios.views import usuarios
 from perseo.blueprints.usuarios_roles.views import usuarios_roles
 from perseo.extensions import csrf, database, login_manager, moment
@@ -49,7 +52,7 @@ def create_app():
 
     # Redis
     app.redis = Redis.from_url(app.config["REDIS_URL"])
-    app.task_queue = rq.Queue(app.config["TASK_QUEUE"], connection=app.redis, default_timeout=1920)
+    app.task_queues = crear_colas(app.config["TASK_QUEUE"], app.redis)
 
     # Registrar blueprints
     app.register_blueprint(autoridades)
@@ -86,12 +89,20 @@ def create_app():
     extensions(app)
 
     # Inicializar autenticación
-    authentication(Usuario)
+    authentication(cargar_principal)
 
     # Entregar app
     return app
 
 
+@lru_cache()
+def get_app():
+    """Crear una sola vez la app del proceso y activar su contexto, la comparten las tareas en el fondo y el CLI"""
+    app = create_app()
+    app.app_context().push()
+    return app
+
+
 def extensions(app):
     """Inicializar extensiones"""
     csrf.init_app(app)
@@ -99,12 +110,13 @@ def extensions(app):
     login_manager.init_app(app)
     moment.init_app(app)
     # socketio.init_app(app)
+    registrar_invalidacion_conteos()
 
 
-def authentication(user_model):
-    """Inicializar Flask-Login"""
+def authentication(cargar_usuario):
+    """Inicializar Flask-Login, el usuario se carga de Redis sin consultar la base de datos en cada peticion"""
     login_manager.login_view = "usuarios.login"
 
     @login_manager.user_loader
     def load_user(uid):
-        return user_model.query.get(uid)
+        return cargar_usuario(uid)
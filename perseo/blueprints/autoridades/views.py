@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_clave, safe_message, safe_string
 from perseo.blueprints.autoridades.forms import AutoridadForm
 from perseo.blueprints.autoridades.models import Autoridad
@@ -17,6 +17,14 @@ from perseo.blueprints.permisos.models import Permiso
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "AUTORIDADES"
+COLUMNAS_DATATABLE = {
+    "clave": "clave",
+    "id": "id",
+    "descripcion_corta": "descripcion_corta",
+    "distrito_nombre_corto": "distrito.nombre_corto",
+    "distrito_id": "distrito_id",
+    "es_extinto": "es_extinto",
+}
 
 autoridades = Blueprint("autoridades", __name__, template_folder="templates")
 
@@ -50,8 +58,8 @@ def datatable_json():
             pass
     if "descripcion" in request.form:
         consulta = consulta.filter(Autoridad.descripcion.contains(safe_string(request.form["descripcion"], to_uppercase=False)))
-    registros = consulta.order_by(Autoridad.clave).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Autoridad.clave], start, rows_per_page, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -63,7 +71,7 @@ def datatable_json():
                 },
                 "descripcion_corta": resultado.descripcion_corta,
                 "distrito": {
-                    "nombre_corto": resultado.distrito.nombre_corto,
+                    "nombre_corto": resultado.distrito_nombre_corto,
                     "url": url_for("distritos.detail", distrito_id=resultado.distrito_id)
                     if current_user.can_view("DISTRITOS")
                     else "",
@@ -128,7 +136,7 @@ def new():
         autoridad.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Nueva Autoridad {autoridad.clave}"),
             url=url_for("autoridades.detail", autoridad_id=autoridad.id),
         )
@@ -164,7 +172,7 @@ def edit(autoridad_id):
             autoridad.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Editada Autoridad {autoridad.clave}"),
                 url=url_for("autoridades.detail", autoridad_id=autoridad.id),
             )
@@ -188,7 +196,7 @@ def delete(autoridad_id):
         autoridad.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Autoridad {autoridad.clave}"),
             url=url_for("autoridades.detail", autoridad_id=autoridad.id),
         )
@@ -206,7 +214,7 @@ def recover(autoridad_id):
         autoridad.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Autoridad {autoridad.clave}"),
             url=url_for("autoridades.detail", autoridad_id=autoridad.id),
         )
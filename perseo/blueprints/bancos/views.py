@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_clave, safe_message, safe_string
 from perseo.blueprints.bancos.forms import BancoForm
 from perseo.blueprints.bancos.models import Banco
@@ -49,8 +49,8 @@ def datatable_json():
     if "nombre" in request.form:
         consulta = consulta.filter(Banco.nombre.contains(safe_string(request.form["nombre"])))
     # Ordenar y paginar
-    registros = consulta.order_by(Banco.nombre).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Banco.nombre], start, rows_per_page)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -134,7 +134,7 @@ def new():
             banco.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Nuevo Banco {banco.nombre}"),
                 url=url_for("bancos.detail", banco_id=banco.id),
             )
@@ -183,7 +183,7 @@ def edit(banco_id):
             banco.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Editado Banco {banco.nombre}"),
                 url=url_for("bancos.detail", banco_id=banco.id),
             )
@@ -207,7 +207,7 @@ def delete(banco_id):
         banco.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Banco {banco.nombre}"),
             url=url_for("bancos.detail", banco_id=banco.id),
         )
@@ -225,7 +225,7 @@ def recover(banco_id):
         banco.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Banco {banco.nombre}"),
             url=url_for("bancos.detail", banco_id=banco.id),
         )
@@ -239,10 +239,10 @@ def recover(banco_id):
 def reiniciar_consecutivos_generados():
     """Lanzar tarea en el fondo para reiniciar los consecutivos generados de cada banco con el consecutivo"""
     # Lanzar la tarea en el fondo
-    current_user.launch_task(
+    tarea = current_user.launch_task(
         comando="bancos.tasks.lanzar_reiniciar_consecutivos_generados",
         mensaje="Lanzando Reiniciar Consecutivos Generados...",
     )
-    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar en 10 segundos...", "info")
+    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar al terminar...", f"tarea:{tarea.id}")
     # Redireccionar al listado de productos activos
     return redirect(url_for("bancos.list_active"))
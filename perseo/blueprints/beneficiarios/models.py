@@ -2,6 +2,7 @@
 Beneficiarios, modelos
 """
 from sqlalchemy import Column, Date, Integer, String
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 
 from lib.universal_mixin import UniversalMixin
@@ -41,11 +42,16 @@ class Beneficiario(database.Model, UniversalMixin):
     beneficiarios_cuentas = relationship("BeneficiarioCuenta", back_populates="beneficiario")
     beneficiarios_quincenas = relationship("BeneficiarioQuincena", back_populates="beneficiario")
 
-    @property
+    @hybrid_property
     def nombre_completo(self):
         """Nombre completo"""
         return f"{self.nombres} {self.apellido_primero} {self.apellido_segundo}"
 
+    @nombre_completo.expression
+    def nombre_completo(cls):
+        """Nombre completo como expresion SQL, para proyectarlo en las consultas"""
+        return cls.nombres + " " + cls.apellido_primero + " " + cls.apellido_segundo
+
     def __repr__(self):
         """Representación"""
         return f"<Beneficiario {self.rfc}>"
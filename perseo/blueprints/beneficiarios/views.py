@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_curp, safe_message, safe_rfc, safe_string
 from perseo.blueprints.beneficiarios.forms import BeneficiarioForm
 from perseo.blueprints.beneficiarios.models import Beneficiario
@@ -48,8 +48,8 @@ def datatable_json():
     if "apellido_segundo" in request.form:
         consulta = consulta.filter(Beneficiario.apellido_segundo.contains(safe_string(request.form["apellido_segundo"])))
     # Ordenar y paginar
-    registros = consulta.order_by(Beneficiario.rfc).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Beneficiario.rfc], start, rows_per_page)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -141,7 +141,7 @@ def new():
             beneficiario.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Nuevo Beneficiario {beneficiario.rfc}"),
                 url=url_for("beneficiarios.detail", beneficiario_id=beneficiario.id),
             )
@@ -195,7 +195,7 @@ def edit(beneficiario_id):
             beneficiario.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Editado Beneficiario {beneficiario.rfc}"),
                 url=url_for("beneficiarios.detail", beneficiario_id=beneficiario.id),
             )
@@ -221,7 +221,7 @@ def delete(beneficiario_id):
         beneficiario.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Beneficiario {beneficiario.rfc}"),
             url=url_for("beneficiarios.detail", beneficiario_id=beneficiario.id),
         )
@@ -239,7 +239,7 @@ def recover(beneficiario_id):
         beneficiario.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Beneficiario {beneficiario.rfc}"),
             url=url_for("beneficiarios.detail", beneficiario_id=beneficiario.id),
         )
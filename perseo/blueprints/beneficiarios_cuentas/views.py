@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_clave, safe_message, safe_rfc, safe_string
 from perseo.blueprints.bancos.models import Banco
 from perseo.blueprints.beneficiarios.models import Beneficiario
@@ -18,6 +18,13 @@ from perseo.blueprints.permisos.models import Permiso
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "BENEFICIARIOS CUENTAS"
+COLUMNAS_DATATABLE = {
+    "id": "id",
+    "beneficiario_rfc": "beneficiario.rfc",
+    "beneficiario_nombre_completo": "beneficiario.nombre_completo",
+    "banco_nombre": "banco.nombre",
+    "num_cuenta": "num_cuenta",
+}
 
 beneficiarios_cuentas = Blueprint("beneficiarios_cuentas", __name__, template_folder="templates")
 
@@ -68,8 +75,8 @@ def datatable_json():
             Beneficiario.apellido_segundo.contains(safe_string(request.form["beneficiario_apellido_segundo"], save_enie=True))
         )
     # Ordenar y paginar
-    registros = consulta.order_by(BeneficiarioCuenta.id).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [BeneficiarioCuenta.id], start, rows_per_page, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -79,9 +86,9 @@ def datatable_json():
                     "id": resultado.id,
                     "url": url_for("beneficiarios_cuentas.detail", beneficiario_cuenta_id=resultado.id),
                 },
-                "beneficiario_rfc": resultado.beneficiario.rfc,
-                "beneficiario_nombre_completo": resultado.beneficiario.nombre_completo,
-                "banco_nombre": resultado.banco.nombre,
+                "beneficiario_rfc": resultado.beneficiario_rfc,
+                "beneficiario_nombre_completo": resultado.beneficiario_nombre_completo,
+                "banco_nombre": resultado.banco_nombre,
                 "num_cuenta": resultado.num_cuenta,
             }
         )
@@ -135,7 +142,7 @@ def new_with_beneficiario(beneficiario_id):
         beneficiario_cuenta.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Nuevo Beneficiario Cuenta {beneficiario_cuenta.num_cuenta}"),
             url=url_for("beneficiarios_cuentas.detail", beneficiario_cuenta_id=beneficiario_cuenta.id),
         )
@@ -163,7 +170,7 @@ def edit(beneficiario_cuenta_id):
         beneficiario_cuenta.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Editado Beneficiario Cuenta {beneficiario_cuenta.num_cuenta}"),
             url=url_for("beneficiarios_cuentas.detail", beneficiario_cuenta_id=beneficiario_cuenta.id),
         )
@@ -186,7 +193,7 @@ def delete(beneficiario_cuenta_id):
         beneficiario_cuenta.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Beneficiario Cuenta ID {beneficiario_cuenta.id}"),
             url=url_for("beneficiarios_cuentas.detail", beneficiario_cuenta_id=beneficiario_cuenta.id),
         )
@@ -204,7 +211,7 @@ def recover(beneficiario_cuenta_id):
         beneficiario_cuenta.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Beneficiario Cuenta ID {beneficiario_cuenta.id}"),
             url=url_for("beneficiarios_cuentas.detail", beneficiario_cuenta_id=beneficiario_cuenta.id),
         )
@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_message, safe_quincena, safe_rfc, safe_string
 from perseo.blueprints.beneficiarios.models import Beneficiario
 from perseo.blueprints.beneficiarios_quincenas.forms import (
@@ -21,6 +21,14 @@ from perseo.blueprints.quincenas.models import Quincena
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "BENEFICIARIOS QUINCENAS"
+COLUMNAS_DATATABLE = {
+    "id": "id",
+    "quincena_clave": "quincena.clave",
+    "beneficiario_rfc": "beneficiario.rfc",
+    "beneficiario_nombre_completo": "beneficiario.nombre_completo",
+    "num_cheque": "num_cheque",
+    "importe": "importe",
+}
 
 beneficiarios_quincenas = Blueprint("beneficiarios_quincenas", __name__, template_folder="templates")
 
@@ -78,8 +86,8 @@ def datatable_json():
             Beneficiario.apellido_segundo.contains(safe_string(request.form["beneficiario_apellido_segundo"], save_enie=True))
         )
     # Ordenar y paginar
-    registros = consulta.order_by(BeneficiarioQuincena.id).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [BeneficiarioQuincena.id], start, rows_per_page, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -89,9 +97,9 @@ def datatable_json():
                     "id": resultado.id,
                     "url": url_for("beneficiarios_quincenas.detail", beneficiario_quincena_id=resultado.id),
                 },
-                "quincena_clave": resultado.quincena.clave,
-                "beneficiario_rfc": resultado.beneficiario.rfc,
-                "beneficiario_nombre_completo": resultado.beneficiario.nombre_completo,
+                "quincena_clave": resultado.quincena_clave,
+                "beneficiario_rfc": resultado.beneficiario_rfc,
+                "beneficiario_nombre_completo": resultado.beneficiario_nombre_completo,
                 "num_cheque": resultado.num_cheque,
                 "importe": resultado.importe,
             }
@@ -150,7 +158,7 @@ def new_with_beneficiario(beneficiario_id):
             beneficiario_quincena.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Nuevo Beneficiario Quincena ID {beneficiario_quincena.id}"),
                 url=url_for("beneficiarios_quincenas.detail", beneficiario_quincena_id=beneficiario_quincena.id),
             )
@@ -179,7 +187,7 @@ def edit(beneficiario_quincena_id):
         beneficiario_quincena.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Editado Beneficiario Quincena {beneficiario_quincena.importe}"),
             url=url_for("beneficiarios_quincenas.detail", beneficiario_quincena_id=beneficiario_quincena.id),
         )
@@ -203,7 +211,7 @@ def delete(beneficiario_quincena_id):
         beneficiario_quincena.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Beneficiario Quincena ID {beneficiario_quincena.id}"),
             url=url_for("beneficiarios_quincenas.detail", beneficiario_quincena_id=beneficiario_quincena.id),
         )
@@ -221,7 +229,7 @@ def recover(beneficiario_quincena_id):
         beneficiario_quincena.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Beneficiario Quincena {beneficiario_quincena.id}"),
             url=url_for("beneficiarios_quincenas.detail", beneficiario_quincena_id=beneficiario_quincena.id),
         )
@@ -4,12 +4,19 @@ Bitácoras
 from flask import Blueprint, render_template, request, url_for
 from flask_login import login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.permisos.models import Permiso
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "BITACORAS"
+COLUMNAS_DATATABLE = {
+    "creado": "creado",
+    "usuario_email": "usuario.email",
+    "usuario_id": "usuario_id",
+    "descripcion": "descripcion",
+    "url": "url",
+}
 
 bitacoras = Blueprint("bitacoras", __name__, template_folder="templates")
 
@@ -32,8 +39,8 @@ def datatable_json():
         consulta = consulta.filter_by(estatus=request.form["estatus"])
     else:
         consulta = consulta.filter_by(estatus="A")
-    registros = consulta.order_by(Bitacora.id.desc()).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Bitacora.id], start, rows_per_page, descendente=True, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -41,7 +48,7 @@ def datatable_json():
             {
                 "creado": resultado.creado.strftime("%Y-%m-%d %H:%M:%S"),
                 "usuario": {
-                    "email": resultado.usuario.email,
+                    "email": resultado.usuario_email,
                     "url": url_for("usuarios.detail", usuario_id=resultado.usuario_id),
                 },
                 "vinculo": {
@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_clave, safe_message, safe_string
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.centros_trabajos.forms import CentroTrabajoForm
@@ -49,8 +49,8 @@ def datatable_json():
     if "descripcion" in request.form:
         consulta = consulta.filter(CentroTrabajo.descripcion.contains(safe_string(request.form["descripcion"])))
     # Ordenar y paginar
-    registros = consulta.order_by(CentroTrabajo.id).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [CentroTrabajo.id], start, rows_per_page)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -103,8 +103,12 @@ def exportar_xlsx():
     tarea = current_user.launch_task(
         comando="centros_trabajos.tasks.lanzar_exportar_xlsx",
         mensaje="Exportando los Centros de Trabajo a un archivo XLSX...",
+        reutilizar_tablas=["centros_trabajos"],
     )
-    flash("Se ha lanzado esta tarea en el fondo. Esta página se va a recargar en 10 segundos...", "info")
+    if tarea.ha_terminado:
+        flash("No hay cambios desde la exportacion anterior, se entrega su archivo.", "info")
+    else:
+        flash("Se ha lanzado esta tarea en el fondo.", "info")
     return redirect(url_for("tareas.detail", tarea_id=tarea.id))
 
 
@@ -127,7 +131,7 @@ def new():
         centro_trabajo.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Nuevo Centro de Trabajo {centro_trabajo.clave}"),
             url=url_for("centros_trabajos.detail", centro_trabajo_id=centro_trabajo.id),
         )
@@ -159,7 +163,7 @@ def edit(centro_trabajo_id):
             centro_trabajo.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Editado Centro de Trabajo {centro_trabajo.descripcion}"),
                 url=url_for("centros_trabajos.detail", centro_trabajo_id=centro_trabajo.id),
             )
@@ -180,7 +184,7 @@ def delete(centro_trabajo_id):
         centro_trabajo.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Centro de Trabajo {centro_trabajo.clave}"),
             url=url_for("centros_trabajos.detail", centro_trabajo_id=centro_trabajo.id),
         )
@@ -198,7 +202,7 @@ def recover(centro_trabajo_id):
         centro_trabajo.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Centro de Trabajo {centro_trabajo.clave}"),
             url=url_for("centros_trabajos.detail", centro_trabajo_id=centro_trabajo.id),
         )
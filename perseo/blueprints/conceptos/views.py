@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_clave, safe_message, safe_string
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.conceptos.forms import ConceptoForm
@@ -49,8 +49,8 @@ def datatable_json():
     if "descripcion" in request.form:
         consulta = consulta.filter(Concepto.descripcion.contains(safe_string(request.form["descripcion"])))
     # Ordenar y paginar
-    registros = consulta.order_by(Concepto.id).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Concepto.id], start, rows_per_page)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -103,8 +103,12 @@ def exportar_xlsx():
     tarea = current_user.launch_task(
         comando="conceptos.tasks.lanzar_exportar_xlsx",
         mensaje="Exportando los Conceptos a un archivo XLSX...",
+        reutilizar_tablas=["conceptos"],
     )
-    flash("Se ha lanzado esta tarea en el fondo. Esta página se va a recargar en 10 segundos...", "info")
+    if tarea.ha_terminado:
+        flash("No hay cambios desde la exportacion anterior, se entrega su archivo.", "info")
+    else:
+        flash("Se ha lanzado esta tarea en el fondo.", "info")
     return redirect(url_for("tareas.detail", tarea_id=tarea.id))
 
 
@@ -127,7 +131,7 @@ def new():
         concepto.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Nuevo Concepto {concepto.clave}"),
             url=url_for("conceptos.detail", concepto_id=concepto.id),
         )
@@ -159,7 +163,7 @@ def edit(concepto_id):
             concepto.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Editado Concepto {concepto.descripcion}"),
                 url=url_for("conceptos.detail", concepto_id=concepto.id),
             )
@@ -180,7 +184,7 @@ def delete(concepto_id):
         concepto.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Concepto {concepto.clave}"),
             url=url_for("conceptos.detail", concepto_id=concepto.id),
         )
@@ -198,7 +202,7 @@ def recover(concepto_id):
         concepto.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Concepto {concepto.clave}"),
             url=url_for("conceptos.detail", concepto_id=concepto.id),
         )
@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_message
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.conceptos.models import Concepto
@@ -18,6 +18,15 @@ from perseo.blueprints.productos.models import Producto
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "CONCEPTOS PRODUCTOS"
+COLUMNAS_DATATABLE = {
+    "id": "id",
+    "concepto_clave": "concepto.clave",
+    "concepto_id": "concepto_id",
+    "concepto_descripcion": "concepto.descripcion",
+    "producto_clave": "producto.clave",
+    "producto_id": "producto_id",
+    "producto_descripcion": "producto.descripcion",
+}
 
 conceptos_productos = Blueprint("conceptos_productos", __name__, template_folder="templates")
 
@@ -44,8 +53,8 @@ def datatable_json():
         consulta = consulta.filter_by(concepto_id=request.form["concepto_id"])
     if "producto_id" in request.form:
         consulta = consulta.filter_by(producto_id=request.form["producto_id"])
-    registros = consulta.order_by(ConceptoProducto.id).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [ConceptoProducto.id], start, rows_per_page, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -56,19 +65,19 @@ def datatable_json():
                     "url": url_for("conceptos_productos.detail", concepto_producto_id=resultado.id),
                 },
                 "concepto": {
-                    "clave": resultado.concepto.clave,
+                    "clave": resultado.concepto_clave,
                     "url": url_for("conceptos.detail", concepto_id=resultado.concepto_id)
                     if current_user.can_view("CONCEPTOS")
                     else "",
                 },
-                "concepto_descripcion": resultado.concepto.descripcion,
+                "concepto_descripcion": resultado.concepto_descripcion,
                 "producto": {
-                    "clave": resultado.producto.clave,
+                    "clave": resultado.producto_clave,
                     "url": url_for("productos.detail", producto_id=resultado.producto_id)
                     if current_user.can_view("PRODUCTOS")
                     else "",
                 },
-                "producto_descripcion": resultado.producto.descripcion,
+                "producto_descripcion": resultado.producto_descripcion,
             }
         )
     # Entregar JSON
@@ -128,7 +137,7 @@ def new_with_concepto(concepto_id):
         concepto_producto.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Nuevo Concepto-Producto {descripcion}"),
             url=url_for("conceptos_productos.detail", concepto_producto_id=concepto_producto.id),
         )
@@ -168,7 +177,7 @@ def new_with_producto(producto_id):
         concepto_producto.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Nuevo Concepto-Producto {descripcion}"),
             url=url_for("conceptos_productos.detail", concepto_producto_id=concepto_producto.id),
         )
@@ -194,7 +203,7 @@ def delete(concepto_producto_id):
         concepto_producto.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Concepto-Producto {concepto_producto.descripcion}"),
             url=url_for("conceptos_productos.detail", concepto_producto_id=concepto_producto.id),
         )
@@ -212,7 +221,7 @@ def recover(concepto_producto_id):
         concepto_producto.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Concepto-Producto {concepto_producto.descripcion}"),
             url=url_for("conceptos_productos.detail", concepto_producto_id=concepto_producto.id),
         )
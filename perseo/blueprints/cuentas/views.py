@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_clave, safe_message, safe_rfc, safe_string
 from perseo.blueprints.bancos.models import Banco
 from perseo.blueprints.bitacoras.models import Bitacora
@@ -18,6 +18,13 @@ from perseo.blueprints.personas.models import Persona
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "CUENTAS"
+COLUMNAS_DATATABLE = {
+    "id": "id",
+    "persona_rfc": "persona.rfc",
+    "persona_nombre_completo": "persona.nombre_completo",
+    "banco_nombre": "banco.nombre",
+    "num_cuenta": "num_cuenta",
+}
 
 cuentas = Blueprint("cuentas", __name__, template_folder="templates")
 
@@ -68,8 +75,8 @@ def datatable_json():
             Persona.apellido_segundo.contains(safe_string(request.form["persona_apellido_segundo"], save_enie=True))
         )
     # Ordenar y paginar
-    registros = consulta.order_by(Cuenta.id).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Cuenta.id], start, rows_per_page, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -79,9 +86,9 @@ def datatable_json():
                     "id": resultado.id,
                     "url": url_for("cuentas.detail", cuenta_id=resultado.id),
                 },
-                "persona_rfc": resultado.persona.rfc,
-                "persona_nombre_completo": resultado.persona.nombre_completo,
-                "banco_nombre": resultado.banco.nombre,
+                "persona_rfc": resultado.persona_rfc,
+                "persona_nombre_completo": resultado.persona_nombre_completo,
+                "banco_nombre": resultado.banco_nombre,
                 "num_cuenta": resultado.num_cuenta,
             }
         )
@@ -135,7 +142,7 @@ def new_with_persona(persona_id):
         cuenta.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Nueva Cuenta de {persona.rfc} en {banco.nombre} - {cuenta.num_cuenta}"),
             url=url_for("cuentas.detail", cuenta_id=cuenta.id),
         )
@@ -163,7 +170,7 @@ def edit(cuenta_id):
         cuenta.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Editada Cuenta de {cuenta.persona.rfc} en {cuenta.banco.nombre} {cuenta.num_cuenta}"),
             url=url_for("cuentas.detail", cuenta_id=cuenta.id),
         )
@@ -186,7 +193,7 @@ def delete(cuenta_id):
         cuenta.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Cuenta de {cuenta.persona.rfc} en {cuenta.banco.nombre} {cuenta.num_cuenta}"),
             url=url_for("cuentas.detail", cuenta_id=cuenta.id),
         )
@@ -204,7 +211,7 @@ def recover(cuenta_id):
         cuenta.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperada Cuenta de {cuenta.persona.rfc} en {cuenta.banco.nombre} {cuenta.num_cuenta}"),
             url=url_for("cuentas.detail", cuenta_id=cuenta.id),
         )
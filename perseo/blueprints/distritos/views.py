@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_clave, safe_message, safe_string
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.distritos.forms import DistritoForm
@@ -38,8 +38,8 @@ def datatable_json():
         consulta = consulta.filter_by(estatus=request.form["estatus"])
     else:
         consulta = consulta.filter_by(estatus="A")
-    registros = consulta.order_by(Distrito.clave).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Distrito.clave], start, rows_per_page)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -118,7 +118,7 @@ def new():
             distrito.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Nuevo Distrito {distrito.clave}"),
                 url=url_for("distritos.detail", distrito_id=distrito.id),
             )
@@ -160,7 +160,7 @@ def edit(distrito_id):
             distrito.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Editado Distrito {distrito.clave}"),
                 url=url_for("distritos.detail", distrito_id=distrito.id),
             )
@@ -184,7 +184,7 @@ def delete(distrito_id):
         distrito.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Distrito {distrito.clave}"),
             url=url_for("distritos.detail", distrito_id=distrito.id),
         )
@@ -202,7 +202,7 @@ def recover(distrito_id):
         distrito.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Distrito {distrito.clave}"),
             url=url_for("distritos.detail", distrito_id=distrito.id),
         )
@@ -4,12 +4,18 @@ Entradas-Salidas
 from flask import Blueprint, render_template, request, url_for
 from flask_login import login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from perseo.blueprints.entradas_salidas.models import EntradaSalida
 from perseo.blueprints.permisos.models import Permiso
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "ENTRADAS SALIDAS"
+COLUMNAS_DATATABLE = {
+    "creado": "creado",
+    "tipo": "tipo",
+    "usuario_email": "usuario.email",
+    "usuario_id": "usuario_id",
+}
 
 entradas_salidas = Blueprint("entradas_salidas", __name__, template_folder="templates")
 
@@ -32,8 +38,8 @@ def datatable_json():
         consulta = consulta.filter_by(estatus=request.form["estatus"])
     else:
         consulta = consulta.filter_by(estatus="A")
-    registros = consulta.order_by(EntradaSalida.id.desc()).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [EntradaSalida.id], start, rows_per_page, descendente=True, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -42,7 +48,7 @@ def datatable_json():
                 "creado": resultado.creado.strftime("%Y-%m-%d %H:%M:%S"),
                 "tipo": resultado.tipo,
                 "usuario": {
-                    "email": resultado.usuario.email,
+                    "email": resultado.usuario_email,
                     "url": url_for("usuarios.detail", usuario_id=resultado.usuario_id),
                 },
             }
@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_message, safe_string
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.modulos.forms import ModuloForm
@@ -37,8 +37,8 @@ def datatable_json():
         consulta = consulta.filter_by(estatus=request.form["estatus"])
     else:
         consulta = consulta.filter_by(estatus="A")
-    registros = consulta.order_by(Modulo.nombre).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Modulo.nombre], start, rows_per_page)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -108,7 +108,7 @@ def new():
         modulo.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Nuevo Modulo {modulo.nombre}"),
             url=url_for("modulos.detail", modulo_id=modulo.id),
         )
@@ -143,7 +143,7 @@ def edit(modulo_id):
             modulo.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Editado Modulo {modulo.nombre}"),
                 url=url_for("modulos.detail", modulo_id=modulo.id),
             )
@@ -172,7 +172,7 @@ def delete(modulo_id):
         # Guardar en la bitacora
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Modulo {este_modulo.nombre}"),
             url=url_for("modulos.detail", modulo_id=este_modulo.id),
         )
@@ -195,7 +195,7 @@ def recover(modulo_id):
         # Guardar en la bitacora
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Modulo {este_modulo.nombre}"),
             url=url_for("modulos.detail", modulo_id=este_modulo.id),
         )
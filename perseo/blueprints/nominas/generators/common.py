@@ -1,12 +1,16 @@
 """
 Nominas, comunes para los generadores
 """
+import io
 import logging
 import re
+from pathlib import Path
+
+from openpyxl import Workbook
 
 from lib.exceptions import MyNotExistsError, MyNotValidParamError
 from lib.safe_string import QUINCENA_REGEXP
-from perseo.app import create_app
+from perseo.app import get_app
 from perseo.blueprints.quincenas.models import Quincena
 from perseo.blueprints.quincenas_productos.models import QuincenaProducto
 from perseo.extensions import database
@@ -22,9 +26,7 @@ empunadura = logging.FileHandler("nominas.log")
 empunadura.setFormatter(formato)
 bitacora.addHandler(empunadura)
 
-app = create_app()
-app.app_context().push()
-database.app = app
+app = get_app()
 
 
 def consultar_validar_quincena(quincena_clave: str) -> Quincena:
@@ -91,3 +93,21 @@ def actualizar_quincena_producto(
 
     # Entregar la quincena_producto
     return quincena_producto
+
+
+def guardar_libro(libro: Workbook, nombre_archivo_xlsx: str) -> bytes:
+    """Guardar el libro XLSX en LOCAL_BASE_DIRECTORY y entregar su contenido para subirlo sin volver a leer el archivo"""
+
+    # Guardar el libro en memoria, en modo solo escritura se puede guardar una sola vez
+    buffer = io.BytesIO()
+    libro.save(buffer)
+    contenido = buffer.getvalue()
+
+    # Si no existe la carpeta LOCAL_BASE_DIRECTORY, crearla
+    Path(LOCAL_BASE_DIRECTORY).mkdir(parents=True, exist_ok=True)
+
+    # Escribir el archivo XLSX
+    Path(LOCAL_BASE_DIRECTORY, nombre_archivo_xlsx).write_bytes(contenido)
+
+    # Entregar el contenido
+    return contenido
@@ -0,0 +1,80 @@
+"""
+Nominas, reservar los consecutivos de los bancos para generar en paralelo
+
+Los generadores de nominas y pensionados toman numeros de cheque de los mismos bancos. Para que puedan
+ejecutarse al mismo tiempo, se reserva antes un bloque de consecutivos por banco para cada uno, en el
+mismo orden en que se generaban uno tras otro: primero NOMINAS y despues PENSIONADOS.
+
+- Se usa la instantanea de la quincena para contar las filas que cada generador va a numerar por banco
+- Cada bloque se reserva con UPDATE ... RETURNING (ver lib/consecutivos.py), es seguro entre procesos
+- Se entrega el ultimo consecutivo usado antes del bloque, el generador suma uno por cada fila
+- Tambien se entregan las cantidades reservadas por banco, el generador las compara con sus filas y si no
+  coinciden (la quincena cambio entre la reserva y la generacion) provoca un error en lugar de pasarse del bloque
+- Si un generador no recibe sus consecutivos, reserva sus propios bloques con tomar_consecutivos
+
+Los monederos usan solo el banco con clave 9 (DESPENSA) que no usan los otros, por eso reservan su propio bloque.
+
+Ejemplo de uso
+
+    reservas = reservar_consecutivos(quincena_clave)
+    crear_nominas(quincena_clave, 0, True, **reservas["NOMINAS"])
+    crear_pensionados(quincena_clave, 0, True, **reservas["PENSIONADOS"])
+
+"""
+from collections import Counter
+
+from lib.consecutivos import reservar_bloques
+from lib.exceptions import MyNotValidParamError
+from perseo.blueprints.bancos.models import Banco
+from perseo.blueprints.nominas.generators.common import consultar_validar_quincena, database
+from perseo.blueprints.nominas.generators.instantanea import consultar_instantanea
+
+FUENTES_CON_CONSECUTIVOS = ["NOMINAS", "PENSIONADOS"]
+MODELO_PENSIONADOS = 3
+
+
+def reservar_consecutivos(quincena_clave: str, tipo: str = "SALARIO") -> dict:
+    """Reservar los bloques de consecutivos de cada banco para las nominas y los pensionados de una quincena"""
+
+    # Consultar y validar quincena
+    quincena = consultar_validar_quincena(quincena_clave)  # Puede provocar una excepcion
+
+    # Contar las filas con cuenta bancaria por fuente y banco, igual que lo hacen los generadores
+    conteos = {fuente: Counter() for fuente in FUENTES_CON_CONSECUTIVOS}
+    for nomina in consultar_instantanea(quincena.id, tipo):
+        if nomina.cuenta is None:
+            continue
+        fuente = "PENSIONADOS" if nomina.modelo == MODELO_PENSIONADOS else "NOMINAS"
+        conteos[fuente][nomina.cuenta.banco_id] += 1
+
+    # Reservar los bloques en orden por fuente para que los numeros de cheque sean siempre los mismos
+    reservas = {}
+    for fuente in FUENTES_CON_CONSECUTIVOS:
+        reservas[fuente] = {
+            "consecutivos": reservar_bloques_bancos(conteos[fuente]),
+            "cantidades": dict(conteos[fuente]),
+        }
+    return reservas
+
+
+def reservar_bloques_bancos(cantidades: dict) -> dict:
+    """Reservar los bloques de consecutivos de los bancos, recibe banco_id -> cantidad y entrega banco_id -> ultimo usado"""
+    return reservar_bloques(database.session, Banco.__table__, cantidades)
+
+
+def tomar_consecutivos(fuente: str, filas: list, consecutivos: dict = None, cantidades: dict = None) -> dict:
+    """Entregar banco_id -> ultimo usado para las filas, reserva sus bloques o valida los que ya vienen reservados"""
+
+    # Contar las filas por banco
+    conteos = Counter(fila.cuenta.banco_id for fila in filas)
+
+    # Si no vienen reservados, reservar los bloques
+    if consecutivos is None:
+        return reservar_bloques_bancos(conteos)
+
+    # Si las filas por banco no son las reservadas, los numeros de cheque se saldrian del bloque
+    if cantidades is None or dict(conteos) != dict(cantidades):
+        raise MyNotValidParamError(f"Las filas por banco de {fuente} no coinciden con los consecutivos reservados")
+
+    # Entregar una copia para que el generador la incremente
+    return dict(consecutivos)
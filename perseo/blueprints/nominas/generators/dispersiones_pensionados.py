@@ -2,7 +2,6 @@
 Nominas, generadores de dispersiones de pensionados
 """
 from datetime import datetime
-from pathlib import Path
 
 import pytz
 from openpyxl import Workbook
@@ -12,14 +11,13 @@ from lib.exceptions import MyAnyError, MyEmptyError, MyNotValidParamError
 from lib.storage import GoogleCloudStorage
 from perseo.blueprints.nominas.generators.common import (
     GCS_BASE_DIRECTORY,
-    LOCAL_BASE_DIRECTORY,
     TIMEZONE,
     actualizar_quincena_producto,
     bitacora,
     consultar_validar_quincena,
+    guardar_libro,
 )
-from perseo.blueprints.nominas.models import Nomina
-from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.nominas.generators.instantanea import consultar_instantanea
 from perseo.blueprints.quincenas_productos.models import QuincenaProducto
 
 FUENTE = "DISPERSIONES PENSIONADOS"
@@ -40,14 +38,7 @@ def crear_dispersiones_pensionados(
     quincena = consultar_validar_quincena(quincena_clave)  # Puede provocar una excepcion
 
     # Consultar las nominas de la quincena
-    nominas = (
-        Nomina.query.join(Persona)
-        .filter(Nomina.quincena_id == quincena.id)
-        .filter(Nomina.tipo == tipo)
-        .filter(Nomina.estatus == "A")
-        .order_by(Persona.rfc)
-        .all()
-    )
+    nominas = consultar_instantanea(quincena.id, tipo)
 
     # Si no hay nominas, provocar error y salir
     if len(nominas) == 0:
@@ -55,11 +46,11 @@ def crear_dispersiones_pensionados(
         actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
         raise MyEmptyError(mensaje)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Iniciar el archivo XLSX en modo solo escritura, las filas se escriben conforme se agregan sin guardarlas en memoria
+    libro = Workbook(write_only=True)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Crear la hoja del libro XLSX
+    hoja = libro.create_sheet()
 
     # Agregar la fila con las cabeceras de las columnas
     hoja.append(
@@ -83,27 +74,15 @@ def crear_dispersiones_pensionados(
     personas_sin_cuentas = []
     for nomina in nominas:
         # Si el modelo de la persona NO es 3, se omite
-        if nomina.persona.modelo != 3:
-            continue
-
-        # Tomar las cuentas de la persona
-        cuentas = nomina.persona.cuentas
-
-        # Si no tiene cuentas, entonces se le crea una cuenta con el banco 10
-        if len(cuentas) == 0:
-            personas_sin_cuentas.append(nomina.persona)
+        if nomina.modelo != 3:
             continue
 
         # Tomar la cuenta de la persona que no tenga la clave 9, porque esa clave es la de DESPENSA
-        su_cuenta = None
-        for cuenta in cuentas:
-            if cuenta.banco.clave != "9" and cuenta.estatus == "A":
-                su_cuenta = cuenta
-                break
+        su_cuenta = nomina.cuenta
 
-        # Si no tiene cuenta bancaria, entonces se le crea una cuenta con el banco 10
+        # Si no tiene cuenta bancaria, entonces se agrega a la lista de personas_sin_cuentas y se salta
         if su_cuenta is None:
-            personas_sin_cuentas.append(nomina.persona)
+            personas_sin_cuentas.append(nomina)
             continue
 
         # Definir referencia_pago, se forma con los dos ultimos caracteres y los caracteres tercero y cuarto de la quincena
@@ -122,8 +101,8 @@ def crear_dispersiones_pensionados(
                 su_cuenta.num_cuenta,
                 nomina.importe,
                 contador + 1,
-                nomina.persona.rfc,
-                nomina.persona.nombre_completo,
+                nomina.rfc,
+                nomina.nombre_completo,
                 referencia_pago,
                 concepto_pago,
             ]
@@ -144,39 +123,34 @@ def crear_dispersiones_pensionados(
     # Determinar el nombre y ruta del archivo XLSX
     nombre_archivo_xlsx = f"dispersiones_pensionados_{quincena_clave}_{ahora.strftime('%Y-%m-%d_%H%M%S')}.xlsx"
     descripcion_archivo_xlsx = f"Dispersiones Pensionados {quincena_clave} {ahora.strftime('%Y-%m-%d %H%M%S')}"
-    archivo_xlsx = Path(LOCAL_BASE_DIRECTORY, nombre_archivo_xlsx)
-
-    # Si no existe la carpeta LOCAL_BASE_DIRECTORY, crearla
-    Path(LOCAL_BASE_DIRECTORY).mkdir(parents=True, exist_ok=True)
 
-    # Guardar el archivo XLSX
-    libro.save(archivo_xlsx)
+    # Guardar el archivo XLSX, se conserva su contenido para subirlo sin volver a leerlo
+    contenido_xlsx = guardar_libro(libro, nombre_archivo_xlsx)
 
     # Si esta configurado settings.CLOUD_STORAGE_DEPOSITO, entonces subir el archivo XLSX a Google Cloud Storage
     settings = get_settings()
     if settings.CLOUD_STORAGE_DEPOSITO != "":
-        with open(archivo_xlsx, "rb") as archivo:
-            try:
-                bitacora.info("GCS: Bucket %s", settings.CLOUD_STORAGE_DEPOSITO)
-                gcstorage = GoogleCloudStorage(
-                    base_directory=GCS_BASE_DIRECTORY,
-                    upload_date=ahora.date(),
-                    allowed_extensions=["xlsx"],
-                    month_in_word=False,
-                    bucket_name=settings.CLOUD_STORAGE_DEPOSITO,
-                )
-                gcs_nombre_archivo_xlsx = gcstorage.set_filename(
-                    description=descripcion_archivo_xlsx,
-                    extension="xlsx",
-                    start_with_date=False,
-                )
-                bitacora.info("GCS: Subiendo %s", gcs_nombre_archivo_xlsx)
-                gcs_public_path = gcstorage.upload(archivo.read())
-                bitacora.info("GCS: Depositado %s", gcs_public_path)
-            except MyAnyError as error:
-                mensaje = str(error)
-                actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
-                raise error
+        try:
+            bitacora.info("GCS: Bucket %s", settings.CLOUD_STORAGE_DEPOSITO)
+            gcstorage = GoogleCloudStorage(
+                base_directory=GCS_BASE_DIRECTORY,
+                upload_date=ahora.date(),
+                allowed_extensions=["xlsx"],
+                month_in_word=False,
+                bucket_name=settings.CLOUD_STORAGE_DEPOSITO,
+            )
+            gcs_nombre_archivo_xlsx = gcstorage.set_filename(
+                description=descripcion_archivo_xlsx,
+                extension="xlsx",
+                start_with_date=False,
+            )
+            bitacora.info("GCS: Subiendo %s", gcs_nombre_archivo_xlsx)
+            gcs_public_path = gcstorage.upload(contenido_xlsx)
+            bitacora.info("GCS: Depositado %s", gcs_public_path)
+        except MyAnyError as error:
+            mensaje = str(error)
+            actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
+            raise error
 
     # Si hubo personas sin cuentas, entonces juntarlas para mensajes
     mensajes = []
@@ -0,0 +1,154 @@
+"""
+Nominas, instantanea de la quincena para los generadores
+
+Consulta de una sola vez las nominas de una quincena con los datos de la persona, su tabulador, puesto,
+centro de trabajo, plaza y cuentas, para que los generadores no hagan consultas por cada fila.
+
+- Las nominas se toman con UNA consulta con JOIN que solo trae las columnas necesarias
+- Las cuentas activas se toman con OTRA consulta y se deja la primera de cada persona, la que no es
+  de DESPENSA (banco con clave 9) en cuenta y la de DESPENSA en cuenta_despensa
+- Los bancos se cargan como objetos de la sesion, son pocos y los comparten todas las cuentas
+
+Ejemplo de uso
+
+    for renglon in consultar_instantanea(quincena.id, "SALARIO"):
+        if renglon.cuenta is None:
+            continue
+        click.echo(f"{renglon.rfc} {renglon.cuenta.banco.nombre} {renglon.cuenta.num_cuenta}")
+
+"""
+from datetime import date
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, update
+
+from perseo.blueprints.bancos.models import Banco
+from perseo.blueprints.centros_trabajos.models import CentroTrabajo
+from perseo.blueprints.cuentas.models import Cuenta
+from perseo.blueprints.nominas.models import Nomina
+from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.plazas.models import Plaza
+from perseo.blueprints.puestos.models import Puesto
+from perseo.blueprints.tabuladores.models import Tabulador
+from perseo.extensions import database
+
+BANCO_CLAVE_DESPENSA = "9"
+
+
+class CuentaInstantanea(NamedTuple):
+    """Cuenta activa de una persona con su banco"""
+
+    banco_id: int
+    num_cuenta: str
+    banco: Banco
+
+
+class RenglonInstantanea(NamedTuple):
+    """Renglon con los datos de una nomina que necesitan los generadores"""
+
+    nomina_id: int
+    importe: Decimal
+    fecha_pago: date
+    num_cheque: str
+    centro_trabajo_clave: str
+    centro_trabajo_descripcion: str
+    plaza_clave: str
+    persona_id: int
+    rfc: str
+    nombres: str
+    apellido_primero: str
+    apellido_segundo: str
+    curp: str
+    num_empleado: int
+    modelo: int
+    ingreso_pj_fecha: date
+    seguridad_social: str
+    codigo_postal_fiscal: int
+    salario_diario: Decimal
+    salario_diario_integrado: Decimal
+    puesto_clave: str
+    cuenta: Optional[CuentaInstantanea]  # La primera cuenta activa que NO es de DESPENSA
+    cuenta_despensa: Optional[CuentaInstantanea]  # La primera cuenta activa de DESPENSA
+
+    @property
+    def nombre_completo(self):
+        """Nombre completo"""
+        return f"{self.nombres} {self.apellido_primero} {self.apellido_segundo}"
+
+
+def consultar_instantanea(quincena_id: int, tipo: str) -> list:
+    """Consultar las nominas activas de una quincena y tipo, ordenadas por RFC, como una lista de RenglonInstantanea"""
+
+    # Iniciar sesion con la base de datos
+    sesion = database.session
+
+    # Filtros de las nominas activas de la quincena y tipo
+    filtros = [Nomina.quincena_id == quincena_id, Nomina.tipo == tipo, Nomina.estatus == "A"]
+
+    # Cargar los bancos como objetos de la sesion, son pocos
+    bancos = {banco.id: banco for banco in Banco.query.all()}
+
+    # Consultar las cuentas activas de las personas que tienen nominas, la primera de cada tipo por persona
+    cuentas = {}
+    cuentas_despensa = {}
+    personas_ids = select(Nomina.persona_id).where(*filtros)
+    for persona_id, banco_id, num_cuenta in (
+        sesion.query(Cuenta.persona_id, Cuenta.banco_id, Cuenta.num_cuenta)
+        .filter(Cuenta.persona_id.in_(personas_ids))
+        .filter(Cuenta.estatus == "A")
+        .order_by(Cuenta.id)
+    ):
+        banco = bancos[banco_id]
+        if banco.clave == BANCO_CLAVE_DESPENSA:
+            cuentas_despensa.setdefault(persona_id, CuentaInstantanea(banco_id, num_cuenta, banco))
+        else:
+            cuentas.setdefault(persona_id, CuentaInstantanea(banco_id, num_cuenta, banco))
+
+    # Consultar las nominas con las columnas de las tablas relacionadas
+    consulta = (
+        sesion.query(
+            Nomina.id,
+            Nomina.importe,
+            Nomina.fecha_pago,
+            Nomina.num_cheque,
+            CentroTrabajo.clave,
+            CentroTrabajo.descripcion,
+            Plaza.clave,
+            Persona.id,
+            Persona.rfc,
+            Persona.nombres,
+            Persona.apellido_primero,
+            Persona.apellido_segundo,
+            Persona.curp,
+            Persona.num_empleado,
+            Persona.modelo,
+            Persona.ingreso_pj_fecha,
+            Persona.seguridad_social,
+            Persona.codigo_postal_fiscal,
+            Tabulador.salario_diario,
+            Tabulador.salario_diario_integrado,
+            Puesto.clave,
+        )
+        .select_from(Nomina)
+        .join(CentroTrabajo, Nomina.centro_trabajo_id == CentroTrabajo.id)
+        .join(Plaza, Nomina.plaza_id == Plaza.id)
+        .join(Persona, Nomina.persona_id == Persona.id)
+        .join(Tabulador, Persona.tabulador_id == Tabulador.id)
+        .join(Puesto, Tabulador.puesto_id == Puesto.id)
+        .filter(*filtros)
+        .order_by(Persona.rfc)
+    )
+
+    # Entregar los renglones con sus cuentas
+    return [RenglonInstantanea(*columnas, cuentas.get(columnas[7]), cuentas_despensa.get(columnas[7])) for columnas in consulta]
+
+
+def fijar_num_cheques(num_cheques: dict):
+    """Actualizar por bloque los numeros de cheque de las nominas, recibe un diccionario nomina_id -> num_cheque"""
+    if len(num_cheques) == 0:
+        return
+    database.session.execute(
+        update(Nomina),
+        [{"id": nomina_id, "num_cheque": num_cheque} for nomina_id, num_cheque in num_cheques.items()],
+    )
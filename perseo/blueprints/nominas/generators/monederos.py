@@ -2,7 +2,6 @@
 Nominas, generadores de monederos
 """
 from datetime import datetime
-from pathlib import Path
 
 import pytz
 from openpyxl import Workbook
@@ -13,15 +12,15 @@ from lib.storage import GoogleCloudStorage
 from perseo.blueprints.bancos.models import Banco
 from perseo.blueprints.nominas.generators.common import (
     GCS_BASE_DIRECTORY,
-    LOCAL_BASE_DIRECTORY,
     TIMEZONE,
     actualizar_quincena_producto,
     bitacora,
     consultar_validar_quincena,
     database,
+    guardar_libro,
 )
-from perseo.blueprints.nominas.models import Nomina
-from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.nominas.generators.consecutivos import reservar_bloques_bancos
+from perseo.blueprints.nominas.generators.instantanea import consultar_instantanea, fijar_num_cheques
 
 FUENTE = "MONEDEROS"
 
@@ -50,14 +49,7 @@ def crear_monederos(
     banco.consecutivo_generado = banco.consecutivo
 
     # Consultar las nominas de la quincena solo tipo DESPENSA
-    nominas = (
-        Nomina.query.join(Persona)
-        .filter(Nomina.quincena_id == quincena.id)
-        .filter(Nomina.tipo == "DESPENSA")
-        .filter(Nomina.estatus == "A")
-        .order_by(Persona.rfc)
-        .all()
-    )
+    nominas = consultar_instantanea(quincena.id, "DESPENSA")
 
     # Si no hay registros, provocar error
     if len(nominas) == 0:
@@ -65,11 +57,11 @@ def crear_monederos(
         actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
         raise MyNotExistsError(mensaje)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Iniciar el archivo XLSX en modo solo escritura, las filas se escriben conforme se agregan sin guardarlas en memoria
+    libro = Workbook(write_only=True)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Crear la hoja del libro XLSX
+    hoja = libro.create_sheet()
 
     # Agregar la fila con las cabeceras de las columnas
     hoja.append(
@@ -84,64 +76,63 @@ def crear_monederos(
         ]
     )
 
-    # Bucle para crear cada fila del archivo XLSX
-    contador = 0
+    # Bucle para juntar las nominas que van al archivo XLSX
+    filas = []
     personas_sin_cuentas = []
     for nomina in nominas:
-        # Tomar las cuentas de la persona
-        cuentas = nomina.persona.cuentas
-
-        # Si no tiene cuentas, entonces se agrega a la lista de personas_sin_cuentas y se salta
-        if len(cuentas) == 0:
-            personas_sin_cuentas.append(nomina.persona)
+        # Si no tiene cuenta de DESPENSA (banco con clave 9), entonces se agrega a la lista de personas_sin_cuentas
+        if nomina.cuenta_despensa is None:
+            personas_sin_cuentas.append(nomina)
             continue
 
-        # Tomar la cuenta de la persona que no tenga la clave 9, porque esa clave es la de DESPENSA
-        su_cuenta = None
-        for cuenta in cuentas:
-            if cuenta.banco.clave == "9" and cuenta.estatus == "A":
-                su_cuenta = cuenta
-                break
+        # Juntar la fila
+        filas.append(nomina)
 
-        # Si no tiene cuenta bancaria, entonces se agrega a la lista de personas_sin_cuentas y se salta
-        if su_cuenta is None:
-            personas_sin_cuentas.append(nomina.persona)
-            continue
+    # Si no hay filas, provocar error
+    if len(filas) == 0:
+        mensaje = "No hubo filas que agregar al archivo XLSX"
+        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
+        raise MyEmptyError(mensaje)
 
-        # Incrementar el consecutivo_generado del banco
-        banco.consecutivo_generado += 1
+    # Guardar el reinicio del consecutivo_generado y reservar de una vez los consecutivos en la misma transaccion
+    sesion.flush()
+    consecutivo = reservar_bloques_bancos({banco.id: len(filas)})[banco.id]
 
-        # Elaborar el numero de cheque, juntando la clave del banco y el consecutivo_generado, siempre de 9 digitos
-        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{banco.consecutivo_generado:07}"
+    # Bucle para crear cada fila del archivo XLSX
+    contador = 0
+    num_cheques = {}
+    for nomina in filas:
+        # Tomar la cuenta de la persona que tenga la clave 9, porque esa clave es la de DESPENSA
+        su_cuenta = nomina.cuenta_despensa
+
+        # Tomar el siguiente consecutivo del bloque del banco
+        consecutivo += 1
+
+        # Elaborar el numero de cheque, juntando la clave del banco y el consecutivo, siempre de 9 digitos
+        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{consecutivo:07}"
 
         # Agregar la fila
         hoja.append(
             [
                 "J",
-                nomina.persona.rfc,
+                nomina.rfc,
                 nomina.importe,
                 num_cheque,
                 su_cuenta.num_cuenta,
-                nomina.quincena.clave,
-                nomina.persona.modelo,
+                quincena.clave,
+                nomina.modelo,
             ]
         )
 
-        # Si fijar_num_cheque es verdadero, entonces actualizar el registro de la nominas con el numero de cheque
+        # Si fijar_num_cheque es verdadero, entonces juntar el numero de cheque para actualizar la nomina
         if fijar_num_cheque:
-            nomina.num_cheque = num_cheque
-            sesion.add(nomina)
+            num_cheques[nomina.nomina_id] = num_cheque
 
         # Incrementar contador
         contador += 1
 
-    # Si contador es cero, provocar error
-    if contador == 0:
-        mensaje = "No hubo filas que agregar al archivo XLSX"
-        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
-        raise MyEmptyError(mensaje)
-
-    # Actualizar los consecutivo_generado de cada banco
+    # Actualizar los numeros de cheque de las nominas
+    fijar_num_cheques(num_cheques)
     sesion.commit()
 
     # Determinar la fecha y tiempo actual en la zona horaria de Mexico
@@ -150,39 +141,34 @@ def crear_monederos(
     # Determinar el nombre y ruta del archivo XLSX
     nombre_archivo_xlsx = f"monederos_{quincena_clave}_{ahora.strftime('%Y-%m-%d_%H%M%S')}.xlsx"
     descripcion_archivo_xlsx = f"Monederos {quincena_clave} {ahora.strftime('%Y-%m-%d %H%M%S')}"
-    archivo_xlsx = Path(LOCAL_BASE_DIRECTORY, nombre_archivo_xlsx)
-
-    # Si no existe la carpeta LOCAL_BASE_DIRECTORY, crearla
-    Path(LOCAL_BASE_DIRECTORY).mkdir(parents=True, exist_ok=True)
 
-    # Guardar el archivo XLSX
-    libro.save(archivo_xlsx)
+    # Guardar el archivo XLSX, se conserva su contenido para subirlo sin volver a leerlo
+    contenido_xlsx = guardar_libro(libro, nombre_archivo_xlsx)
 
     # Si esta configurado settings.CLOUD_STORAGE_DEPOSITO, entonces subir el archivo XLSX a Google Cloud Storage
     settings = get_settings()
     if settings.CLOUD_STORAGE_DEPOSITO != "":
-        with open(archivo_xlsx, "rb") as archivo:
-            try:
-                bitacora.info("GCS: Bucket %s", settings.CLOUD_STORAGE_DEPOSITO)
-                gcstorage = GoogleCloudStorage(
-                    base_directory=GCS_BASE_DIRECTORY,
-                    upload_date=ahora.date(),
-                    allowed_extensions=["xlsx"],
-                    month_in_word=False,
-                    bucket_name=settings.CLOUD_STORAGE_DEPOSITO,
-                )
-                gcs_nombre_archivo_xlsx = gcstorage.set_filename(
-                    description=descripcion_archivo_xlsx,
-                    extension="xlsx",
-                    start_with_date=False,
-                )
-                bitacora.info("GCS: Subiendo %s", gcs_nombre_archivo_xlsx)
-                gcs_public_path = gcstorage.upload(archivo.read())
-                bitacora.info("GCS: Depositado %s", gcs_public_path)
-            except MyAnyError as error:
-                mensaje = str(error)
-                actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
-                raise error
+        try:
+            bitacora.info("GCS: Bucket %s", settings.CLOUD_STORAGE_DEPOSITO)
+            gcstorage = GoogleCloudStorage(
+                base_directory=GCS_BASE_DIRECTORY,
+                upload_date=ahora.date(),
+                allowed_extensions=["xlsx"],
+                month_in_word=False,
+                bucket_name=settings.CLOUD_STORAGE_DEPOSITO,
+            )
+            gcs_nombre_archivo_xlsx = gcstorage.set_filename(
+                description=descripcion_archivo_xlsx,
+                extension="xlsx",
+                start_with_date=False,
+            )
+            bitacora.info("GCS: Subiendo %s", gcs_nombre_archivo_xlsx)
+            gcs_public_path = gcstorage.upload(contenido_xlsx)
+            bitacora.info("GCS: Depositado %s", gcs_public_path)
+        except MyAnyError as error:
+            mensaje = str(error)
+            actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
+            raise error
 
     # Si hubo personas sin cuentas, entonces juntarlas para mensajes
     mensajes = []
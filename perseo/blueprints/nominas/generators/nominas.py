@@ -2,7 +2,6 @@
 Nominas, generadores de nominas
 """
 from datetime import datetime
-from pathlib import Path
 
 import pytz
 from openpyxl import Workbook
@@ -10,18 +9,19 @@ from openpyxl import Workbook
 from config.settings import get_settings
 from lib.exceptions import MyAnyError, MyEmptyError, MyNotValidParamError
 from lib.storage import GoogleCloudStorage
+from lib.tasks import REPORT_EVERY, report_task_progress
 from perseo.blueprints.cuentas.models import Cuenta
 from perseo.blueprints.nominas.generators.common import (
     GCS_BASE_DIRECTORY,
-    LOCAL_BASE_DIRECTORY,
     TIMEZONE,
     actualizar_quincena_producto,
     bitacora,
     consultar_validar_quincena,
     database,
+    guardar_libro,
 )
-from perseo.blueprints.nominas.models import Nomina
-from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.nominas.generators.consecutivos import tomar_consecutivos
+from perseo.blueprints.nominas.generators.instantanea import consultar_instantanea, fijar_num_cheques
 
 FUENTE = "NOMINAS"
 
@@ -31,6 +31,8 @@ def crear_nominas(
     quincena_producto_id: int,
     fijar_num_cheque: bool = False,
     tipo: str = "SALARIO",
+    consecutivos: dict = None,
+    cantidades: dict = None,
 ) -> str:
     """Crear archivo XLSX con las nominas de una quincena"""
 
@@ -44,15 +46,8 @@ def crear_nominas(
     # Iniciar sesion con la base de datos para que la alimentacion sea rapida
     sesion = database.session
 
-    # Consultar las nominas de la quincena
-    nominas = (
-        Nomina.query.join(Persona)
-        .filter(Nomina.quincena_id == quincena.id)
-        .filter(Nomina.tipo == tipo)
-        .filter(Nomina.estatus == "A")
-        .order_by(Persona.rfc)
-        .all()
-    )
+    # Consultar la instantanea de las nominas de la quincena
+    nominas = consultar_instantanea(quincena.id, tipo)
 
     # Si no hay registros, provocar error
     if len(nominas) == 0:
@@ -60,11 +55,11 @@ def crear_nominas(
         actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
         raise MyEmptyError(mensaje)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Iniciar el archivo XLSX en modo solo escritura, las filas se escriben conforme se agregan sin guardarlas en memoria
+    libro = Workbook(write_only=True)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Crear la hoja del libro XLSX
+    hoja = libro.create_sheet()
 
     # Agregar la fila con las cabeceras de las columnas
     hoja.append(
@@ -84,68 +79,78 @@ def crear_nominas(
         ]
     )
 
-    # Bucle para crear cada fila del archivo XLSX
-    contador = 0
+    # Consultar las cuentas activas por banco y numero de cuenta para revisar duplicadas sin consultar por cada fila
+    personas_por_cuenta = {}
+    consulta_cuentas = sesion.query(Cuenta.banco_id, Cuenta.num_cuenta, Cuenta.persona_id).filter(Cuenta.estatus == "A")
+    for banco_id, num_cuenta, persona_id in consulta_cuentas:
+        personas_por_cuenta.setdefault((banco_id, num_cuenta), []).append(persona_id)
+
+    # Bucle para juntar las nominas que van al archivo XLSX
+    filas = []
     personas_sin_cuentas = []
     cuentas_duplicadas = []
     for nomina in nominas:
         # Si el modelo de la persona es 3, se omite
-        if nomina.persona.modelo == 3:
-            continue
-
-        # Tomar las cuentas de la persona
-        cuentas = nomina.persona.cuentas
-
-        # Si no tiene cuentas, entonces se agrega a la lista de personas_sin_cuentas y se salta
-        if len(cuentas) == 0:
-            personas_sin_cuentas.append(nomina.persona)
+        if nomina.modelo == 3:
             continue
 
         # Tomar la cuenta de la persona que no tenga la clave 9, porque esa clave es la de DESPENSA
-        su_cuenta = None
-        for cuenta in cuentas:
-            if cuenta.banco.clave != "9" and cuenta.estatus == "A":
-                su_cuenta = cuenta
-                break
+        su_cuenta = nomina.cuenta
 
         # Si no tiene cuenta bancaria, entonces se agrega a la lista de personas_sin_cuentas y se salta
         if su_cuenta is None:
-            personas_sin_cuentas.append(nomina.persona)
+            personas_sin_cuentas.append(nomina)
             continue
 
         # Validar que no haya otra persona con el mismo banco y numero de cuenta
         hay_cuenta_duplicada = False
-        for posible_cuenta_duplicada in (
-            Cuenta.query.filter_by(banco_id=su_cuenta.banco_id)
-            .filter_by(num_cuenta=su_cuenta.num_cuenta)
-            .filter_by(estatus="A")
-            .all()
-        ):
-            if posible_cuenta_duplicada.persona_id != nomina.persona_id:
-                cuentas_duplicadas.append(f"  Duplicada {nomina.persona.rfc} {su_cuenta.banco.nombre} {su_cuenta.num_cuenta}")
+        for persona_id in personas_por_cuenta.get((su_cuenta.banco_id, su_cuenta.num_cuenta), []):
+            if persona_id != nomina.persona_id:
+                cuentas_duplicadas.append(f"  Duplicada {nomina.rfc} {su_cuenta.banco.nombre} {su_cuenta.num_cuenta}")
                 hay_cuenta_duplicada = False
         if hay_cuenta_duplicada:
             continue
 
-        # Tomar el banco de la cuenta de la persona
+        # Juntar la fila
+        filas.append(nomina)
+
+    # Si no hay filas, provocar error
+    if len(filas) == 0:
+        mensaje = "No hubo filas que agregar al archivo XLSX"
+        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
+        raise MyEmptyError(mensaje)
+
+    # Reservar de una vez los consecutivos de cada banco, a menos que ya vengan reservados para las mismas filas
+    try:
+        consecutivos = tomar_consecutivos(FUENTE, filas, consecutivos, cantidades)
+    except MyNotValidParamError as error:
+        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [str(error)])
+        raise error
+
+    # Bucle para crear cada fila del archivo XLSX
+    contador = 0
+    num_cheques = {}
+    for nomina in filas:
+        # Tomar la cuenta y el banco de la persona
+        su_cuenta = nomina.cuenta
         su_banco = su_cuenta.banco
 
-        # Incrementar la consecutivo del banco
-        su_banco.consecutivo_generado += 1
+        # Tomar el siguiente consecutivo del bloque del banco
+        consecutivos[su_banco.id] += 1
 
         # Elaborar el numero de cheque, juntando la clave del banco y la consecutivo, siempre de 9 digitos
-        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{su_banco.consecutivo_generado:07}"
+        num_cheque = f"{su_banco.clave.zfill(2)}{consecutivos[su_banco.id]:07}"
 
         # Agregar la fila
         hoja.append(
             [
-                nomina.quincena.clave,
-                nomina.centro_trabajo.clave,
-                nomina.persona.rfc,
-                nomina.persona.nombre_completo,
-                nomina.persona.num_empleado,
-                nomina.persona.modelo,
-                nomina.plaza.clave,
+                quincena.clave,
+                nomina.centro_trabajo_clave,
+                nomina.rfc,
+                nomina.nombre_completo,
+                nomina.num_empleado,
+                nomina.modelo,
+                nomina.plaza_clave,
                 su_banco.nombre,
                 su_banco.clave,
                 su_cuenta.num_cuenta,
@@ -154,21 +159,17 @@ def crear_nominas(
             ]
         )
 
-        # Si fijar_num_cheque es verdadero, entonces actualizar el registro de la nominas con el numero de cheque
+        # Si fijar_num_cheque es verdadero, entonces juntar el numero de cheque para actualizar la nomina
         if fijar_num_cheque:
-            nomina.num_cheque = num_cheque
-            sesion.add(nomina)
+            num_cheques[nomina.nomina_id] = num_cheque
 
-        # Incrementar contador
+        # Incrementar contador y reportar el avance cada tantas filas, solo se escribe en Redis
         contador += 1
+        if contador % REPORT_EVERY == 0:
+            report_task_progress(contador, len(filas), "Escribiendo filas del archivo XLSX")
 
-    # Si el contador es cero, provocar error
-    if contador == 0:
-        mensaje = "No hubo filas que agregar al archivo XLSX"
-        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
-        raise MyEmptyError(mensaje)
-
-    # Actualizar los consecutivos de cada banco
+    # Actualizar los numeros de cheque de las nominas
+    fijar_num_cheques(num_cheques)
     sesion.commit()
 
     # Determinar la fecha y tiempo actual en la zona horaria de Mexico
@@ -177,40 +178,35 @@ def crear_nominas(
     # Determinar el nombre y ruta del archivo XLSX
     nombre_archivo_xlsx = f"nominas_{quincena_clave}_{ahora.strftime('%Y-%m-%d_%H%M%S')}.xlsx"
     descripcion_archivo_xlsx = f"Nominas {quincena_clave} {ahora.strftime('%Y-%m-%d %H%M%S')}"
-    archivo_xlsx = Path(LOCAL_BASE_DIRECTORY, nombre_archivo_xlsx)
-
-    # Si no existe la carpeta LOCAL_BASE_DIRECTORY, crearla
-    Path(LOCAL_BASE_DIRECTORY).mkdir(parents=True, exist_ok=True)
 
-    # Guardar el archivo XLSX
-    libro.save(archivo_xlsx)
+    # Guardar el archivo XLSX, se conserva su contenido para subirlo sin volver a leerlo
+    contenido_xlsx = guardar_libro(libro, nombre_archivo_xlsx)
 
     # Si esta configurado settings.CLOUD_STORAGE_DEPOSITO, entonces subir el archivo XLSX a Google Cloud Storage
     gcs_public_path = ""
     settings = get_settings()
     if settings.CLOUD_STORAGE_DEPOSITO != "":
-        with open(archivo_xlsx, "rb") as archivo:
-            try:
-                bitacora.info("GCS: Bucket %s", settings.CLOUD_STORAGE_DEPOSITO)
-                gcstorage = GoogleCloudStorage(
-                    base_directory=GCS_BASE_DIRECTORY,
-                    upload_date=ahora.date(),
-                    allowed_extensions=["xlsx"],
-                    month_in_word=False,
-                    bucket_name=settings.CLOUD_STORAGE_DEPOSITO,
-                )
-                gcs_nombre_archivo_xlsx = gcstorage.set_filename(
-                    description=descripcion_archivo_xlsx,
-                    extension="xlsx",
-                    start_with_date=False,
-                )
-                bitacora.info("GCS: Subiendo %s", gcs_nombre_archivo_xlsx)
-                gcs_public_path = gcstorage.upload(archivo.read())
-                bitacora.info("GCS: Depositado %s", gcs_public_path)
-            except MyAnyError as error:
-                mensaje = str(error)
-                actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
-                raise error
+        try:
+            bitacora.info("GCS: Bucket %s", settings.CLOUD_STORAGE_DEPOSITO)
+            gcstorage = GoogleCloudStorage(
+                base_directory=GCS_BASE_DIRECTORY,
+                upload_date=ahora.date(),
+                allowed_extensions=["xlsx"],
+                month_in_word=False,
+                bucket_name=settings.CLOUD_STORAGE_DEPOSITO,
+            )
+            gcs_nombre_archivo_xlsx = gcstorage.set_filename(
+                description=descripcion_archivo_xlsx,
+                extension="xlsx",
+                start_with_date=False,
+            )
+            bitacora.info("GCS: Subiendo %s", gcs_nombre_archivo_xlsx)
+            gcs_public_path = gcstorage.upload(contenido_xlsx)
+            bitacora.info("GCS: Depositado %s", gcs_public_path)
+        except MyAnyError as error:
+            mensaje = str(error)
+            actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
+            raise error
 
     # Si hubo personas sin cuentas, entonces juntarlas para mensajes
     mensajes = []
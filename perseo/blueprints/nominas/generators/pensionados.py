@@ -2,7 +2,6 @@
 Nominas, generadores de pensionados
 """
 from datetime import datetime
-from pathlib import Path
 
 import pytz
 from openpyxl import Workbook
@@ -12,15 +11,15 @@ from lib.exceptions import MyAnyError, MyEmptyError, MyNotValidParamError
 from lib.storage import GoogleCloudStorage
 from perseo.blueprints.nominas.generators.common import (
     GCS_BASE_DIRECTORY,
-    LOCAL_BASE_DIRECTORY,
     TIMEZONE,
     actualizar_quincena_producto,
     bitacora,
     consultar_validar_quincena,
     database,
+    guardar_libro,
 )
-from perseo.blueprints.nominas.models import Nomina
-from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.nominas.generators.consecutivos import tomar_consecutivos
+from perseo.blueprints.nominas.generators.instantanea import consultar_instantanea, fijar_num_cheques
 from perseo.blueprints.quincenas_productos.models import QuincenaProducto
 
 FUENTE = "PENSIONADOS"
@@ -31,6 +30,8 @@ def crear_pensionados(
     quincena_producto_id: int,
     fijar_num_cheque=False,
     tipo: str = "SALARIO",
+    consecutivos: dict = None,
+    cantidades: dict = None,
 ) -> str:
     """Crear archivo XLSX con los pensionados de una quincena"""
 
@@ -45,14 +46,7 @@ def crear_pensionados(
     sesion = database.session
 
     # Consultar las nominas de la quincena, solo tipo SALARIO
-    nominas = (
-        Nomina.query.join(Persona)
-        .filter(Nomina.quincena_id == quincena.id)
-        .filter(Nomina.tipo == tipo)
-        .filter(Nomina.estatus == "A")
-        .order_by(Persona.rfc)
-        .all()
-    )
+    nominas = consultar_instantanea(quincena.id, tipo)
 
     # Si no hay registros, provocar error
     if len(nominas) == 0:
@@ -60,11 +54,11 @@ def crear_pensionados(
         actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
         raise MyEmptyError(mensaje)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Iniciar el archivo XLSX en modo solo escritura, las filas se escriben conforme se agregan sin guardarlas en memoria
+    libro = Workbook(write_only=True)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Crear la hoja del libro XLSX
+    hoja = libro.create_sheet()
 
     # Agregar la fila con las cabeceras de las columnas
     hoja.append(
@@ -84,53 +78,61 @@ def crear_pensionados(
         ]
     )
 
-    # Bucle para crear cada fila del archivo XLSX
-    contador = 0
+    # Bucle para juntar las nominas que van al archivo XLSX
+    filas = []
     personas_sin_cuentas = []
     for nomina in nominas:
         # Si el modelo de la persona NO es 3, se omite
-        if nomina.persona.modelo != 3:
+        if nomina.modelo != 3:
             continue
 
-        # Tomar las cuentas de la persona
-        cuentas = nomina.persona.cuentas
-
-        # Si no tiene cuentas, entonces se le crea una cuenta con el banco 10
-        if len(cuentas) == 0:
-            personas_sin_cuentas.append(nomina.persona)
+        # Si no tiene cuenta bancaria, entonces se agrega a la lista de personas_sin_cuentas y se salta
+        if nomina.cuenta is None:
+            personas_sin_cuentas.append(nomina)
             continue
 
+        # Juntar la fila
+        filas.append(nomina)
+
+    # Si no hay filas, provocar error
+    if len(filas) == 0:
+        mensaje = "No hubo filas que agregar al archivo XLSX"
+        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
+        raise MyEmptyError(mensaje)
+
+    # Reservar de una vez los consecutivos de cada banco, a menos que ya vengan reservados para las mismas filas
+    try:
+        consecutivos = tomar_consecutivos(FUENTE, filas, consecutivos, cantidades)
+    except MyNotValidParamError as error:
+        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [str(error)])
+        raise error
+
+    # Bucle para crear cada fila del archivo XLSX
+    contador = 0
+    num_cheques = {}
+    for nomina in filas:
         # Tomar la cuenta de la persona que no tenga la clave 9, porque esa clave es la de DESPENSA
-        su_cuenta = None
-        for cuenta in cuentas:
-            if cuenta.banco.clave != "9" and cuenta.estatus == "A":
-                su_cuenta = cuenta
-                break
-
-        # Si no tiene cuenta bancaria, entonces se le crea una cuenta con el banco 10
-        if su_cuenta is None:
-            personas_sin_cuentas.append(nomina.persona)
-            continue
+        su_cuenta = nomina.cuenta
 
         # Tomar el banco de la cuenta de la persona
         su_banco = su_cuenta.banco
 
-        # Incrementar la consecutivo del banco
-        su_banco.consecutivo_generado += 1
+        # Tomar el siguiente consecutivo del bloque del banco
+        consecutivos[su_banco.id] += 1
 
         # Elaborar el numero de cheque, juntando la clave del banco y la consecutivo, siempre de 9 digitos
-        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{su_banco.consecutivo_generado:07}"
+        num_cheque = f"{su_banco.clave.zfill(2)}{consecutivos[su_banco.id]:07}"
 
         # Agregar la fila
         hoja.append(
             [
-                nomina.quincena.clave,
-                nomina.centro_trabajo.clave,
-                nomina.persona.rfc,
-                nomina.persona.nombre_completo,
-                nomina.persona.num_empleado,
-                nomina.persona.modelo,
-                nomina.plaza.clave,
+                quincena.clave,
+                nomina.centro_trabajo_clave,
+                nomina.rfc,
+                nomina.nombre_completo,
+                nomina.num_empleado,
+                nomina.modelo,
+                nomina.plaza_clave,
                 su_banco.nombre,
                 su_banco.clave,
                 su_cuenta.num_cuenta,
@@ -139,21 +141,15 @@ def crear_pensionados(
             ]
         )
 
-        # Si fijar_num_cheque es veradero, entonces actualizar el registro de la nominas con el numero de cheque
+        # Si fijar_num_cheque es veradero, entonces juntar el numero de cheque para actualizar la nomina
         if fijar_num_cheque:
-            nomina.num_cheque = num_cheque
-            sesion.add(nomina)
+            num_cheques[nomina.nomina_id] = num_cheque
 
         # Incrementar contador
         contador += 1
 
-    # Si el contador es cero, provocar error
-    if contador == 0:
-        mensaje = "No hubo filas que agregar al archivo XLSX"
-        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
-        raise MyEmptyError(mensaje)
-
-    # Actualizar los consecutivo_generado de cada banco
+    # Actualizar los numeros de cheque de las nominas
+    fijar_num_cheques(num_cheques)
     sesion.commit()
 
     # Determinar la fecha y tiempo actual en la zona horaria de Mexico
@@ -162,39 +158,34 @@ def crear_pensionados(
     # Determinar el nombre y ruta del archivo XLSX
     nombre_archivo_xlsx = f"pensionados_{quincena_clave}_{ahora.strftime('%Y-%m-%d_%H%M%S')}.xlsx"
     descripcion_archivo_xlsx = f"Pensionados {quincena_clave} {ahora.strftime('%Y-%m-%d %H%M%S')}"
-    archivo_xlsx = Path(LOCAL_BASE_DIRECTORY, nombre_archivo_xlsx)
-
-    # Si no existe la carpeta LOCAL_BASE_DIRECTORY, crearla
-    Path(LOCAL_BASE_DIRECTORY).mkdir(parents=True, exist_ok=True)
 
-    # Guardar el archivo XLSX
-    libro.save(archivo_xlsx)
+    # Guardar el archivo XLSX, se conserva su contenido para subirlo sin volver a leerlo
+    contenido_xlsx = guardar_libro(libro, nombre_archivo_xlsx)
 
     # Si esta configurado settings.CLOUD_STORAGE_DEPOSITO, entonces subir el archivo XLSX a Google Cloud Storage
     settings = get_settings()
     if settings.CLOUD_STORAGE_DEPOSITO != "":
-        with open(archivo_xlsx, "rb") as archivo:
-            try:
-                bitacora.info("GCS: Bucket %s", settings.CLOUD_STORAGE_DEPOSITO)
-                gcstorage = GoogleCloudStorage(
-                    base_directory=GCS_BASE_DIRECTORY,
-                    upload_date=ahora.date(),
-                    allowed_extensions=["xlsx"],
-                    month_in_word=False,
-                    bucket_name=settings.CLOUD_STORAGE_DEPOSITO,
-                )
-                gcs_nombre_archivo_xlsx = gcstorage.set_filename(
-                    description=descripcion_archivo_xlsx,
-                    extension="xlsx",
-                    start_with_date=False,
-                )
-                bitacora.info("GCS: Subiendo %s", gcs_nombre_archivo_xlsx)
-                gcs_public_path = gcstorage.upload(archivo.read())
-                bitacora.info("GCS: Depositado %s", gcs_public_path)
-            except MyAnyError as error:
-                mensaje = str(error)
-                actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
-                raise error
+        try:
+            bitacora.info("GCS: Bucket %s", settings.CLOUD_STORAGE_DEPOSITO)
+            gcstorage = GoogleCloudStorage(
+                base_directory=GCS_BASE_DIRECTORY,
+                upload_date=ahora.date(),
+                allowed_extensions=["xlsx"],
+                month_in_word=False,
+                bucket_name=settings.CLOUD_STORAGE_DEPOSITO,
+            )
+            gcs_nombre_archivo_xlsx = gcstorage.set_filename(
+                description=descripcion_archivo_xlsx,
+                extension="xlsx",
+                start_with_date=False,
+            )
+            bitacora.info("GCS: Subiendo %s", gcs_nombre_archivo_xlsx)
+            gcs_public_path = gcstorage.upload(contenido_xlsx)
+            bitacora.info("GCS: Depositado %s", gcs_public_path)
+        except MyAnyError as error:
+            mensaje = str(error)
+            actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
+            raise error
 
     # Si hubo personas sin cuentas, entonces juntarlas para mensajes
     mensajes = []
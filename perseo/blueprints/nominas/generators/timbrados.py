@@ -2,7 +2,6 @@
 Nominas, generadores de timbrados
 """
 from datetime import datetime
-from pathlib import Path
 
 import pytz
 from openpyxl import Workbook
@@ -14,15 +13,16 @@ from lib.storage import GoogleCloudStorage
 from perseo.blueprints.conceptos.models import Concepto
 from perseo.blueprints.nominas.generators.common import (
     GCS_BASE_DIRECTORY,
-    LOCAL_BASE_DIRECTORY,
     TIMEZONE,
     actualizar_quincena_producto,
     bitacora,
     consultar_validar_quincena,
+    guardar_libro,
 )
-from perseo.blueprints.nominas.models import Nomina
+from perseo.blueprints.nominas.generators.instantanea import consultar_instantanea
 from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
-from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.quincenas.models import Quincena
+from perseo.extensions import database
 
 PATRON_RFC = "PJE901211TI9"
 COMPANIA_NOMBRE = "PODER JUDICIAL DEL ESTADO DE COAHUILA DE ZARAGOZA"
@@ -30,90 +30,115 @@ COMPANIA_RFC = PATRON_RFC
 COMPANIA_CP = "25000"
 
 
-def crear_timbrados(
-    quincena_clave: str,
-    quincena_producto_id: int,
-    tipo: str = "SALARIO",
-) -> str:
-    """Crear archivo XLSX con los timbrados de una quincena"""
+CONCEPTOS_APOYO_ANUAL = {
+    "PAZ": None,  # Percepcion de Apoyo Anual
+    "DAZ": None,  # Deduccion ISR Apoyo Anual
+    "D62": None,  # Deduccion Pension Alimenticia
+}
 
-    # Consultar y validar quincena
-    quincena = consultar_validar_quincena(quincena_clave)  # Puede provocar una excepcion
 
-    # Validar el tipo
-    if tipo not in ["APOYO ANUAL", "AGUINALDO", "SALARIO"]:
-        raise MyNotValidParamError(f"El tipo {tipo} no es valido")
+def ordenar_conceptos(tipo: str) -> dict:
+    """Armar el diccionario ordenado de conceptos que seran las columnas de la segunda parte"""
 
-    # Por defecto fuente es TIMBRADOS para el tipo SALARIO
-    fuente = "TIMBRADOS"
-    if tipo == "AGUINALDO":
-        fuente = "TIMBRADOS AGUINALDOS"
-    elif tipo == "APOYO ANUAL":
-        fuente = "TIMBRADOS APOYOS ANUALES"
+    # Si el tipo es APOYO ANUAL las columnas son PAZ, DAZ y D62
+    if tipo == "APOYO ANUAL":
+        return dict(CONCEPTOS_APOYO_ANUAL)
+
+    # Consultar los conceptos activos
+    conceptos = Concepto.query.filter_by(estatus="A").order_by(Concepto.clave).all()
 
-    # Inicializar el diccionario de conceptos
+    # Ordenar las claves, primero las que empiezan con P, luego con D y al final las demas
     conceptos_dict = {}
+    for concepto in conceptos:
+        if concepto.clave.startswith("P"):
+            conceptos_dict[concepto.clave] = concepto
+    for concepto in conceptos:
+        if concepto.clave.startswith("D"):
+            conceptos_dict[concepto.clave] = concepto
+    for concepto in conceptos:
+        if not concepto.clave.startswith("P") and not concepto.clave.startswith("D"):
+            conceptos_dict[concepto.clave] = concepto
+
+    # Entregar
+    return conceptos_dict
+
+
+def pivotar_percepciones_deducciones(quincena_id: int, conceptos_dict: dict, tipo: str) -> dict:
+    """Consultar en UNA sola consulta las P-D de la quincena y entregar un diccionario persona_id -> importes por concepto"""
+
+    # Definir la posicion de cada concepto en la fila, por su clave
+    posiciones = {clave: posicion for posicion, clave in enumerate(conceptos_dict.keys())}
+
+    # Consultar las P-D de la quincena, solo las columnas necesarias, ordenadas por id para respetar la primera
+    consulta = (
+        database.session.query(PercepcionDeduccion.persona_id, Concepto.clave, PercepcionDeduccion.importe)
+        .join(Concepto)
+        .filter(PercepcionDeduccion.quincena_id == quincena_id)
+        .filter(Concepto.clave.in_(list(posiciones.keys())))
+    )
+
+    # Si el tipo es APOYO ANUAL, solo se toman las P-D de ese tipo
+    if tipo == "APOYO ANUAL":
+        consulta = consulta.filter(PercepcionDeduccion.tipo == "APOYO ANUAL")
+
+    # Pivotar en memoria, una lista de importes por persona, si hay repetidos se conserva el primero
+    matriz = {}
+    for persona_id, concepto_clave, importe in consulta.order_by(PercepcionDeduccion.id).all():
+        importes = matriz.setdefault(persona_id, [None] * len(posiciones))
+        posicion = posiciones[concepto_clave]
+        if importes[posicion] is None:
+            importes[posicion] = importe
+
+    # Cambiar los None por ceros
+    for importes in matriz.values():
+        for posicion, importe in enumerate(importes):
+            if importe is None:
+                importes[posicion] = 0
+
+    # Entregar
+    return matriz
+
+
+def elaborar_timbrados(quincena: Quincena, tipo: str = "SALARIO") -> tuple:
+    """Elaborar el libro XLSX con los timbrados, entrega el libro, la cantidad de filas y las personas sin cuentas"""
+
+    # Validar el tipo
+    if tipo not in ["APOYO ANUAL", "AGUINALDO", "SALARIO"]:
+        raise MyNotValidParamError(f"El tipo {tipo} no es valido")
 
     # Determinar las fechas inicial y final de la quincena
     if tipo == "SALARIO":
-        quincena_fecha_inicial = quincena_to_fecha(quincena_clave, dame_ultimo_dia=False)
-        quincena_fecha_final = quincena_to_fecha(quincena_clave, dame_ultimo_dia=True)
+        quincena_fecha_inicial = quincena_to_fecha(quincena.clave, dame_ultimo_dia=False)
+        quincena_fecha_final = quincena_to_fecha(quincena.clave, dame_ultimo_dia=True)
     else:
         quincena_fecha_inicial = datetime(year=2023, month=1, day=1).date()
         quincena_fecha_final = datetime(year=2023, month=12, day=31).date()
 
-    # Si el tipo es AGUINALDO o SALARIO armar un diccionario con las percepciones y deducciones de Conceptos activos
-    if tipo in ["AGUINALDO", "SALARIO"]:
-        # Consultar los conceptos activos
-        conceptos = Concepto.query.filter_by(estatus="A").order_by(Concepto.clave).all()
-        # Ordenar las claves, primero las que empiezan con P
-        for concepto in conceptos:
-            if concepto.clave.startswith("P"):
-                conceptos_dict[concepto.clave] = concepto
-        # Ordenar las claves, primero las que empiezan con P
-        for concepto in conceptos:
-            if concepto.clave.startswith("D"):
-                conceptos_dict[concepto.clave] = concepto
-        # Al final agregar las claves que NO empiezan con P o D
-        for concepto in conceptos:
-            if not concepto.clave.startswith("P") and not concepto.clave.startswith("D"):
-                conceptos_dict[concepto.clave] = concepto
-
-    # Si el tipo es APOYO ANUAL armar un diccionario con PAZ, DAZ y D62
-    if tipo == "APOYO ANUAL":
-        conceptos_dict = {
-            "PAZ": None,  # Percepcion de Apoyo Anual
-            "DAZ": None,  # Deduccion ISR Apoyo Anual
-            "D62": None,  # Deduccion Pension Alimenticia
-        }
+    # Armar el diccionario ordenado de conceptos
+    conceptos_dict = ordenar_conceptos(tipo)
 
-    # Si no hay conceptos, provocar error y salir
+    # Si no hay conceptos, provocar error
     if len(conceptos_dict) == 0:
-        mensaje = f"No hay conceptos para el tipo {tipo}"
-        actualizar_quincena_producto(quincena_producto_id, quincena.id, fuente, [mensaje])
-        raise MyEmptyError(mensaje)
-
-    # Consultar las Nominas activas de la quincena, del tipo dado, juntar con personas para ordenar por RFC
-    nominas = (
-        Nomina.query.join(Persona)
-        .filter(Nomina.quincena_id == quincena.id)
-        .filter(Nomina.tipo == tipo)
-        .filter(Nomina.estatus == "A")
-        .order_by(Persona.rfc)
-        .all()
-    )
+        raise MyEmptyError(f"No hay conceptos para el tipo {tipo}")
+
+    # Consultar la instantanea de las nominas activas de la quincena, del tipo dado, ordenadas por RFC
+    nominas = consultar_instantanea(quincena.id, tipo)
 
     # Si no hay registros, provocar error
     if len(nominas) == 0:
-        mensaje = f"No hay registros en nominas de tipo {tipo}"
-        actualizar_quincena_producto(quincena_producto_id, quincena.id, fuente, [mensaje])
-        raise MyEmptyError(mensaje)
+        raise MyEmptyError(f"No hay registros en nominas de tipo {tipo}")
+
+    # Consultar y pivotar las percepciones-deducciones, para SALARIO y APOYO ANUAL
+    matriz = {}
+    if tipo in ["APOYO ANUAL", "SALARIO"]:
+        matriz = pivotar_percepciones_deducciones(quincena.id, conceptos_dict, tipo)
+    ceros = [0] * len(conceptos_dict)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Iniciar el archivo XLSX en modo solo escritura, las filas se escriben conforme se agregan sin guardarlas en memoria
+    libro = Workbook(write_only=True)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Crear la hoja del libro XLSX
+    hoja = libro.create_sheet()
 
     # Encabezados primera parte
     encabezados_parte_1 = [
@@ -180,19 +205,12 @@ def crear_timbrados(
 
     # Bucle para crear cada fila del archivo XLSX
     for nomina in nominas:
-        # Consultar las cuentas de la persona
-        cuentas = nomina.persona.cuentas
-
-        # De las cuentas hay que sacar la que no tenga la clave 9, porque esa clave es la de DESPENSA
-        su_cuenta = None
-        for cuenta in cuentas:
-            if cuenta.banco.clave != "9" and cuenta.estatus == "A":
-                su_cuenta = cuenta
-                break
+        # Tomar la cuenta de la persona que no tenga la clave 9, porque esa clave es la de DESPENSA
+        su_cuenta = nomina.cuenta
 
         # Si no tiene cuenta bancaria, entonces se agrega a la lista de personas_sin_cuentas y se salta
         if su_cuenta is None:
-            personas_sin_cuentas.append(nomina.persona.rfc)
+            personas_sin_cuentas.append(nomina)
             continue
 
         # Incrementar contador
@@ -201,21 +219,21 @@ def crear_timbrados(
         # Fila parte 1
         fila_parte_1 = [
             contador,  # CONSECUTIVO
-            nomina.persona.num_empleado,  # NUMERO DE EMPLEADO
-            nomina.persona.apellido_primero,  # APELLIDO PRIMERO
-            nomina.persona.apellido_segundo,  # APELLIDO SEGUNDO
-            nomina.persona.nombres,  # NOMBRES
-            nomina.persona.rfc,  # RFC
-            nomina.persona.curp,  # CURP
-            nomina.persona.seguridad_social,  # NO DE SEGURIDAD SOCIAL
-            nomina.persona.ingreso_pj_fecha,  # FECHA DE INGRESO
+            nomina.num_empleado,  # NUMERO DE EMPLEADO
+            nomina.apellido_primero,  # APELLIDO PRIMERO
+            nomina.apellido_segundo,  # APELLIDO SEGUNDO
+            nomina.nombres,  # NOMBRES
+            nomina.rfc,  # RFC
+            nomina.curp,  # CURP
+            nomina.seguridad_social,  # NO DE SEGURIDAD SOCIAL
+            nomina.ingreso_pj_fecha,  # FECHA DE INGRESO
             "O" if tipo == "SALARIO" else "E",  # CLAVE TIPO NOMINA ordinarias es O, extraordinarias es E
-            "SI" if nomina.persona.modelo == 2 else "NO",  # SINDICALIZADO modelo es 2
+            "SI" if nomina.modelo == 2 else "NO",  # SINDICALIZADO modelo es 2
             su_cuenta.banco.clave_dispersion_pensionados,  # CLAVE BANCO SAT
             su_cuenta.num_cuenta,  # NUMERO DE CUENTA
             "",  # PLANTA nula
-            nomina.persona.tabulador.salario_diario,  # SALARIO DIARIO
-            nomina.persona.tabulador.salario_diario_integrado,  # SALARIO INTEGRADO
+            nomina.salario_diario,  # SALARIO DIARIO
+            nomina.salario_diario_integrado,  # SALARIO INTEGRADO
             quincena_fecha_inicial,  # FECHA INICIAL PERIODO
             quincena_fecha_final,  # FECHA FINAL PERIODO
             nomina.fecha_pago,  # FECHA DE PAGO
@@ -239,63 +257,20 @@ def crear_timbrados(
             "",  # CLAVE CENTRO COSTOS nulo
             "",  # CENTRO COSTOS nulo
             "04" if tipo == "SALARIO" else "99",  # FORMA DE PAGO para la ayuda es 99 y para los salarios es 04
-            nomina.centro_trabajo.clave,  # CLAVE DEPARTAMENTO
-            nomina.centro_trabajo.descripcion,  # NOMBRE DEPARTAMENTO
-            nomina.persona.tabulador.puesto.clave,  # NOMBRE PUESTO por lo pronto es la clave del puesto
+            nomina.centro_trabajo_clave,  # CLAVE DEPARTAMENTO
+            nomina.centro_trabajo_descripcion,  # NOMBRE DEPARTAMENTO
+            nomina.puesto_clave,  # NOMBRE PUESTO por lo pronto es la clave del puesto
         ]
 
-        # Fila parte 2
+        # Fila parte 2, los importes de la persona por cada concepto, para AGUINALDO no hay
         fila_parte_2 = []
-        if tipo == "SALARIO":
-            # Bucle por los conceptos
-            for _, concepto in conceptos_dict.items():
-                # Consultar la P-D de la quincena, la persona y el concepto
-                percepcion_deduccion = (
-                    PercepcionDeduccion.query.filter_by(quincena_id=quincena.id)
-                    .filter_by(persona_id=nomina.persona.id)
-                    .filter_by(concepto_id=concepto.id)
-                    .first()
-                )
-                if percepcion_deduccion is not None:
-                    fila_parte_2.append(percepcion_deduccion.importe)
-                else:
-                    fila_parte_2.append(0)
-        elif tipo == "APOYO ANUAL":
-            # Consultar la PercepcionDeduccion con concepto PAZ
-            percepcion_deduccion_paz = (
-                PercepcionDeduccion.query.join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona.id)
-                .filter(PercepcionDeduccion.tipo == "APOYO ANUAL")
-                .filter(Concepto.clave == "PAZ")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_paz.importe if percepcion_deduccion_paz is not None else 0)
-            # Consultar la PercepcionDeduccion con concepto DAZ
-            percepcion_deduccion_daz = (
-                PercepcionDeduccion.query.join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona.id)
-                .filter(PercepcionDeduccion.tipo == "APOYO ANUAL")
-                .filter(Concepto.clave == "DAZ")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_daz.importe if percepcion_deduccion_daz is not None else 0)
-            # Consultar la PercepcionDeduccion con concepto D62
-            percepcion_deduccion_d62 = (
-                PercepcionDeduccion.query.join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona.id)
-                .filter(PercepcionDeduccion.tipo == "APOYO ANUAL")
-                .filter(Concepto.clave == "D62")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_d62.importe if percepcion_deduccion_d62 is not None else 0)
+        if tipo in ["APOYO ANUAL", "SALARIO"]:
+            fila_parte_2 = matriz.get(nomina.persona_id, ceros)
 
         # Si el codigo postal fiscal es cero, entonces se usa 00000
         codigo_postal_fiscal = "00000"
-        if nomina.persona.codigo_postal_fiscal:
-            codigo_postal_fiscal = str(nomina.persona.codigo_postal_fiscal).zfill(5)
+        if nomina.codigo_postal_fiscal:
+            codigo_postal_fiscal = str(nomina.codigo_postal_fiscal).zfill(5)
 
         # Fila parte 3
         fila_parte_3 = [
@@ -309,9 +284,39 @@ def crear_timbrados(
 
     # Si el contador es cero, provocar error
     if contador == 0:
-        mensaje = "No hubo filas que agregar al archivo XLSX"
-        actualizar_quincena_producto(quincena_producto_id, quincena.id, fuente, [mensaje])
-        raise MyEmptyError(mensaje)
+        raise MyEmptyError("No hubo filas que agregar al archivo XLSX")
+
+    # Entregar el libro, la cantidad de filas y las personas sin cuentas
+    return libro, contador, personas_sin_cuentas
+
+
+def crear_timbrados(
+    quincena_clave: str,
+    quincena_producto_id: int,
+    tipo: str = "SALARIO",
+) -> str:
+    """Crear archivo XLSX con los timbrados de una quincena"""
+
+    # Consultar y validar quincena
+    quincena = consultar_validar_quincena(quincena_clave)  # Puede provocar una excepcion
+
+    # Validar el tipo
+    if tipo not in ["APOYO ANUAL", "AGUINALDO", "SALARIO"]:
+        raise MyNotValidParamError(f"El tipo {tipo} no es valido")
+
+    # Por defecto fuente es TIMBRADOS para el tipo SALARIO
+    fuente = "TIMBRADOS"
+    if tipo == "AGUINALDO":
+        fuente = "TIMBRADOS AGUINALDOS"
+    elif tipo == "APOYO ANUAL":
+        fuente = "TIMBRADOS APOYOS ANUALES"
+
+    # Elaborar el libro XLSX, si no hay conceptos, nominas o filas se provoca un error
+    try:
+        libro, contador, personas_sin_cuentas = elaborar_timbrados(quincena, tipo)
+    except MyEmptyError as error:
+        actualizar_quincena_producto(quincena_producto_id, quincena.id, fuente, [str(error)])
+        raise error
 
     # Determinar la fecha y tiempo actual en la zona horaria de Mexico
     ahora = datetime.now(tz=pytz.timezone(TIMEZONE))
@@ -326,40 +331,35 @@ def crear_timbrados(
     elif tipo == "APOYO ANUAL":
         nombre_archivo_xlsx = f"timbrados_apoyos_anuales_{quincena_clave}_{ahora.strftime('%Y-%m-%d_%H%M%S')}.xlsx"
         descripcion_archivo_xlsx = f"Timbrados apoyos anuales {quincena_clave} {ahora.strftime('%Y-%m-%d %H%M%S')}"
-    archivo_xlsx = Path(LOCAL_BASE_DIRECTORY, nombre_archivo_xlsx)
-
-    # Si no existe la carpeta LOCAL_BASE_DIRECTORY, crearla
-    Path(LOCAL_BASE_DIRECTORY).mkdir(parents=True, exist_ok=True)
 
-    # Guardar el archivo XLSX
-    libro.save(archivo_xlsx)
+    # Guardar el archivo XLSX, se conserva su contenido para subirlo sin volver a leerlo
+    contenido_xlsx = guardar_libro(libro, nombre_archivo_xlsx)
 
     # Si esta configurado settings.CLOUD_STORAGE_DEPOSITO, entonces subir el archivo XLSX a Google Cloud Storage
     gcs_public_path = ""
     settings = get_settings()
     if settings.CLOUD_STORAGE_DEPOSITO != "":
-        with open(archivo_xlsx, "rb") as archivo:
-            try:
-                bitacora.info("GCS: Bucket %s", settings.CLOUD_STORAGE_DEPOSITO)
-                gcstorage = GoogleCloudStorage(
-                    base_directory=GCS_BASE_DIRECTORY,
-                    upload_date=ahora.date(),
-                    allowed_extensions=["xlsx"],
-                    month_in_word=False,
-                    bucket_name=settings.CLOUD_STORAGE_DEPOSITO,
-                )
-                gcs_nombre_archivo_xlsx = gcstorage.set_filename(
-                    description=descripcion_archivo_xlsx,
-                    extension="xlsx",
-                    start_with_date=False,
-                )
-                bitacora.info("GCS: Subiendo %s", gcs_nombre_archivo_xlsx)
-                gcs_public_path = gcstorage.upload(archivo.read())
-                bitacora.info("GCS: Depositado %s", gcs_public_path)
-            except MyAnyError as error:
-                mensaje = str(error)
-                actualizar_quincena_producto(quincena_producto_id, quincena.id, fuente, [mensaje])
-                raise error
+        try:
+            bitacora.info("GCS: Bucket %s", settings.CLOUD_STORAGE_DEPOSITO)
+            gcstorage = GoogleCloudStorage(
+                base_directory=GCS_BASE_DIRECTORY,
+                upload_date=ahora.date(),
+                allowed_extensions=["xlsx"],
+                month_in_word=False,
+                bucket_name=settings.CLOUD_STORAGE_DEPOSITO,
+            )
+            gcs_nombre_archivo_xlsx = gcstorage.set_filename(
+                description=descripcion_archivo_xlsx,
+                extension="xlsx",
+                start_with_date=False,
+            )
+            bitacora.info("GCS: Subiendo %s", gcs_nombre_archivo_xlsx)
+            gcs_public_path = gcstorage.upload(contenido_xlsx)
+            bitacora.info("GCS: Depositado %s", gcs_public_path)
+        except MyAnyError as error:
+            mensaje = str(error)
+            actualizar_quincena_producto(quincena_producto_id, quincena.id, fuente, [mensaje])
+            raise error
 
     # Si hubo personas sin cuentas, entonces juntarlas para mensajes
     mensajes = []
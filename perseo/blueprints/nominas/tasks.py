@@ -1,15 +1,27 @@
 """
 Nominas, tareas en el fondo
 """
+from rq import Queue, get_current_job
+
 from lib.exceptions import MyAnyError
-from lib.tasks import set_task_error, set_task_progress
+from lib.tasks import set_parent_task_progress, set_task_children, set_task_error, set_task_progress
 from perseo.blueprints.bancos.tasks import reiniciar_consecutivos_generados
 from perseo.blueprints.nominas.generators.common import bitacora
+from perseo.blueprints.nominas.generators.consecutivos import reservar_consecutivos
 from perseo.blueprints.nominas.generators.dispersiones_pensionados import crear_dispersiones_pensionados
 from perseo.blueprints.nominas.generators.monederos import crear_monederos
 from perseo.blueprints.nominas.generators.nominas import crear_nominas
 from perseo.blueprints.nominas.generators.pensionados import crear_pensionados
 from perseo.blueprints.nominas.generators.timbrados import crear_timbrados
+from perseo.blueprints.tareas.colas import COLAS
+
+GENERADORES_TODOS = {
+    "NOMINAS": crear_nominas,
+    "MONEDEROS": crear_monederos,
+    "PENSIONADOS": crear_pensionados,
+    "DISPERSIONES PENSIONADOS": crear_dispersiones_pensionados,
+    "TIMBRADOS": crear_timbrados,
+}
 
 
 def lanzar_generar_nominas(quincena_clave: str, quincena_producto_id: int) -> str:
@@ -167,30 +179,80 @@ def lanzar_generar_timbrados_apoyos_anuales(quincena_clave: str, quincena_produc
     return mensaje_termino
 
 
+def lanzar_generar_hija(fuente: str, quincena_clave: str, padre_id: str, **kwargs) -> str:
+    """Tarea hija de generar todos, ejecuta un generador y suma su termino al progreso de la tarea padre"""
+
+    # Ejecutar el creador
+    try:
+        mensaje_termino = GENERADORES_TODOS[fuente](quincena_clave, 0, **kwargs)
+        bitacora.info(mensaje_termino)
+    except MyAnyError as error:
+        mensaje_termino = f"{fuente}: {str(error)}"
+        bitacora.error(mensaje_termino)
+
+    # Sumar a la tarea padre y entregar el mensaje de termino
+    set_parent_task_progress(padre_id, mensaje_termino)
+    return mensaje_termino
+
+
+def fallar_generar_hija(job, connection, tipo, valor, rastreo):
+    """Si una tarea hija falla sin control, sumarla a la tarea padre para que esta pueda terminar"""
+    mensaje_error = f"{job.kwargs['fuente']}: {str(valor)}"
+    bitacora.error(mensaje_error)
+    set_parent_task_progress(job.kwargs["padre_id"], mensaje_error, connection)
+
+
 def lanzar_generar_todos(quincena_clave: str) -> str:
     """Ejecutar todas las tareas en el fondo"""
 
     # Iniciar la tarea en el fondo
     set_task_progress(0, f"Generar todos los archivos XLSX de {quincena_clave}...")
 
-    # Ejecutar cada uno de los generadores
-    mensajes = []
+    # Reiniciar los consecutivos y reservar los bloques de nominas y pensionados, antes de lanzar las hijas
     try:
-        mensajes.append(msg := reiniciar_consecutivos_generados())
-        set_task_progress(25, msg)
-        mensajes.append(msg := crear_nominas(quincena_clave, 0, True))
-        set_task_progress(50, msg)
-        mensajes.append(msg := crear_monederos(quincena_clave, 0, True))
-        set_task_progress(75, msg)
-        mensajes.append(msg := crear_pensionados(quincena_clave, 0, True))
-        set_task_progress(100, msg)
+        mensaje_reiniciar = reiniciar_consecutivos_generados()
+        reservas = reservar_consecutivos(quincena_clave)
     except MyAnyError as error:
         mensaje_error = str(error)
         set_task_error(mensaje_error)
         bitacora.error(mensaje_error)
+        return mensaje_error
+    bitacora.info(mensaje_reiniciar)
+
+    # Los generadores son independientes entre si porque los consecutivos ya estan reservados
+    hijas = {
+        "NOMINAS": {"fijar_num_cheque": True, **reservas["NOMINAS"]},
+        "MONEDEROS": {"fijar_num_cheque": True},
+        "PENSIONADOS": {"fijar_num_cheque": True, **reservas["PENSIONADOS"]},
+        "DISPERSIONES PENSIONADOS": {},
+        "TIMBRADOS": {},
+    }
+
+    # Si no se ejecuta en RQ, ejecutar los generadores uno tras otro
+    job = get_current_job()
+    if job is None:
+        mensajes = [mensaje_reiniciar]
+        for fuente, kwargs in hijas.items():
+            try:
+                mensajes.append(GENERADORES_TODOS[fuente](quincena_clave, 0, **kwargs))
+            except MyAnyError as error:
+                mensajes.append(f"{fuente}: {str(error)}")
+        return "\n".join(mensajes)
+
+    # Registrar las hijas antes de lanzarlas, la tarea padre termina cuando termine la ultima
+    set_task_children(len(hijas), mensaje_reiniciar)
+
+    # Lanzar cada generador como tarea hija en la misma cola, con el tiempo limite de los generadores y no el de RQ
+    cola = Queue(job.origin, connection=job.connection)
+    for fuente, kwargs in hijas.items():
+        cola.enqueue(
+            lanzar_generar_hija,
+            kwargs={"fuente": fuente, "quincena_clave": quincena_clave, "padre_id": job.get_id(), **kwargs},
+            job_timeout=COLAS["pesadas"],
+            on_failure=fallar_generar_hija,
+        )
 
-    # Entregar mensajes de termino
-    mensaje_termino = "\n".join(mensajes)
-    set_task_progress(100, mensaje_termino)
+    # Entregar mensaje de termino, el progreso lo actualizan las hijas
+    mensaje_termino = f"Se lanzaron {len(hijas)} tareas para generar los archivos XLSX de {quincena_clave}"
     bitacora.info(mensaje_termino)
     return mensaje_termino
@@ -7,7 +7,8 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.busquedas import buscar_similares
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_message, safe_quincena, safe_rfc, safe_string
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.modulos.models import Modulo
@@ -19,6 +20,23 @@ from perseo.blueprints.quincenas.models import Quincena
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "NOMINAS"
+COLUMNAS_DATATABLE = {
+    "id": "id",
+    "quincena_clave": "quincena.clave",
+    "persona_rfc": "persona.rfc",
+    "persona_nombre_completo": "persona.nombre_completo",
+    "centro_trabajo_clave": "centro_trabajo.clave",
+    "plaza_clave": "plaza.clave",
+    "tipo": "tipo",
+    "desde_clave": "desde_clave",
+    "hasta_clave": "hasta_clave",
+    "percepcion": "percepcion",
+    "deduccion": "deduccion",
+    "importe": "importe",
+    "num_cheque": "num_cheque",
+    "fecha_pago": "fecha_pago",
+    "timbrado_id": "timbrado_id",
+}
 
 nominas = Blueprint("nominas", __name__, template_folder="templates")
 
@@ -69,6 +87,7 @@ def datatable_json():
         or "persona_nombres" in request.form
         or "persona_apellido_primero" in request.form
         or "persona_apellido_segundo" in request.form
+        or "persona_nombre_completo" in request.form
     ):
         consulta = consulta.join(Persona)
     if "persona_rfc" in request.form:
@@ -83,9 +102,13 @@ def datatable_json():
         consulta = consulta.filter(
             Persona.apellido_segundo.contains(safe_string(request.form["persona_apellido_segundo"], save_enie=True))
         )
+    if "persona_nombre_completo" in request.form:
+        persona_nombre_completo = safe_string(request.form["persona_nombre_completo"], save_enie=True)
+        if persona_nombre_completo != "":
+            consulta, _ = buscar_similares(consulta, Persona.nombre_completo, persona_nombre_completo)
     # Ordenar y paginar
-    registros = consulta.order_by(Nomina.id.desc()).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Nomina.id], start, rows_per_page, descendente=True, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -95,11 +118,11 @@ def datatable_json():
                     "id": resultado.id,
                     "url": url_for("nominas.detail", nomina_id=resultado.id),
                 },
-                "quincena_clave": resultado.quincena.clave,
-                "persona_rfc": resultado.persona.rfc,
-                "persona_nombre_completo": resultado.persona.nombre_completo,
-                "centro_trabajo_clave": resultado.centro_trabajo.clave,
-                "plaza_clave": resultado.plaza.clave,
+                "quincena_clave": resultado.quincena_clave,
+                "persona_rfc": resultado.persona_rfc,
+                "persona_nombre_completo": resultado.persona_nombre_completo,
+                "centro_trabajo_clave": resultado.centro_trabajo_clave,
+                "plaza_clave": resultado.plaza_clave,
                 "tipo": resultado.tipo,
                 "desde_clave": resultado.desde_clave,
                 "hasta_clave": resultado.hasta_clave,
@@ -164,7 +187,7 @@ def edit(nomina_id):
         nomina.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Editado Nomina {nomina.id}"),
             url=url_for("nominas.detail", nomina_id=nomina.id),
         )
@@ -194,7 +217,7 @@ def delete(nomina_id):
         nomina.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Nomina ID {nomina.id}"),
             url=url_for("nominas.detail", nomina_id=nomina.id),
         )
@@ -212,7 +235,7 @@ def recover(nomina_id):
         nomina.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Nomina ID {nomina.id}"),
             url=url_for("nominas.detail", nomina_id=nomina.id),
         )
@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_clave, safe_message, safe_quincena, safe_rfc
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.conceptos.models import Concepto
@@ -19,6 +19,18 @@ from perseo.blueprints.quincenas.models import Quincena
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "PERCEPCIONES DEDUCCIONES"
+COLUMNAS_DATATABLE = {
+    "id": "id",
+    "persona_rfc": "persona.rfc",
+    "persona_nombre_completo": "persona.nombre_completo",
+    "centro_trabajo_clave": "centro_trabajo.clave",
+    "concepto_clave": "concepto.clave",
+    "concepto_descripcion": "concepto.descripcion",
+    "plaza_clave": "plaza.clave",
+    "tipo": "tipo",
+    "quincena_clave": "quincena.clave",
+    "importe": "importe",
+}
 
 percepciones_deducciones = Blueprint("percepciones_deducciones", __name__, template_folder="templates")
 
@@ -67,8 +79,8 @@ def datatable_json():
         consulta = consulta.join(Persona)
         consulta = consulta.filter(Persona.rfc.contains(safe_rfc(request.form["persona_rfc"], search_fragment=True)))
     # Ordenar y paginar
-    registros = consulta.order_by(PercepcionDeduccion.id.desc()).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [PercepcionDeduccion.id], start, rows_per_page, descendente=True, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -78,14 +90,14 @@ def datatable_json():
                     "id": resultado.id,
                     "url": url_for("percepciones_deducciones.detail", percepcion_deduccion_id=resultado.id),
                 },
-                "persona_rfc": resultado.persona.rfc,
-                "persona_nombre_completo": resultado.persona.nombre_completo,
-                "centro_trabajo_clave": resultado.centro_trabajo.clave,
-                "concepto_clave": resultado.concepto.clave,
-                "concepto_descripcion": resultado.concepto.descripcion,
-                "plaza_clave": resultado.plaza.clave,
+                "persona_rfc": resultado.persona_rfc,
+                "persona_nombre_completo": resultado.persona_nombre_completo,
+                "centro_trabajo_clave": resultado.centro_trabajo_clave,
+                "concepto_clave": resultado.concepto_clave,
+                "concepto_descripcion": resultado.concepto_descripcion,
+                "plaza_clave": resultado.plaza_clave,
                 "tipo": resultado.tipo,
-                "quincena_clave": resultado.quincena.clave,
+                "quincena_clave": resultado.quincena_clave,
                 "importe": resultado.importe,
             }
         )
@@ -135,7 +147,7 @@ def edit(percepcion_deduccion_id):
         percepcion_deduccion.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Editado Percepcion Deduccion {percepcion_deduccion.id}"),
             url=url_for("percepciones_deducciones.detail", percepcion_deduccion_id=percepcion_deduccion.id),
         )
@@ -161,7 +173,7 @@ def delete(percepcion_deduccion_id):
         percepcion_deduccion.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Percepcion Deduccion ID {percepcion_deduccion.id}"),
             url=url_for("percepciones_deducciones.detail", percepcion_deduccion_id=percepcion_deduccion.id),
         )
@@ -179,7 +191,7 @@ def recover(percepcion_deduccion_id):
         percepcion_deduccion.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Percepcion Deduccion ID {percepcion_deduccion.id}"),
             url=url_for("percepciones_deducciones.detail", percepcion_deduccion_id=percepcion_deduccion.id),
         )
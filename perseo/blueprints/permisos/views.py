@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_message
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.modulos.models import Modulo
@@ -16,6 +16,15 @@ from perseo.blueprints.roles.models import Rol
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "PERMISOS"
+COLUMNAS_DATATABLE = {
+    "nombre": "nombre",
+    "id": "id",
+    "nivel": "nivel",
+    "modulo_nombre": "modulo.nombre",
+    "modulo_id": "modulo_id",
+    "rol_nombre": "rol.nombre",
+    "rol_id": "rol_id",
+}
 
 permisos = Blueprint("permisos", __name__, template_folder="templates")
 
@@ -42,8 +51,8 @@ def datatable_json():
         consulta = consulta.filter_by(modulo_id=request.form["modulo_id"])
     if "rol_id" in request.form:
         consulta = consulta.filter_by(rol_id=request.form["rol_id"])
-    registros = consulta.order_by(Permiso.nombre).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Permiso.nombre], start, rows_per_page, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -53,13 +62,13 @@ def datatable_json():
                     "nombre": resultado.nombre,
                     "url": url_for("permisos.detail", permiso_id=resultado.id),
                 },
-                "nivel": resultado.nivel_descrito,
+                "nivel": Permiso.NIVELES[resultado.nivel],
                 "modulo": {
-                    "nombre": resultado.modulo.nombre,
+                    "nombre": resultado.modulo_nombre,
                     "url": url_for("modulos.detail", modulo_id=resultado.modulo_id) if current_user.can_view("MODULOS") else "",
                 },
                 "rol": {
-                    "nombre": resultado.rol.nombre,
+                    "nombre": resultado.rol_nombre,
                     "url": url_for("roles.detail", rol_id=resultado.rol_id) if current_user.can_view("ROLES") else "",
                 },
             }
@@ -174,7 +183,7 @@ def edit(permiso_id):
         permiso.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Editado Permiso {permiso.nombre}"),
             url=url_for("permisos.detail", permiso_id=permiso.id),
         )
@@ -196,7 +205,7 @@ def delete(permiso_id):
         permiso.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Permiso {permiso.nombre}"),
             url=url_for("permisos.detail", permiso_id=permiso.id),
         )
@@ -214,7 +223,7 @@ def recover(permiso_id):
         permiso.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Permiso {permiso.nombre}"),
             url=url_for("permisos.detail", permiso_id=permiso.id),
         )
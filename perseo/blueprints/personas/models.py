@@ -1,7 +1,8 @@
 """
 Personas, modelos
 """
-from sqlalchemy import Column, Date, ForeignKey, Integer, String
+from sqlalchemy import DDL, Column, Date, ForeignKey, Index, Integer, String, event
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 
 from lib.universal_mixin import UniversalMixin
@@ -52,11 +53,35 @@ class Persona(database.Model, UniversalMixin):
     percepciones_deducciones = relationship("PercepcionDeduccion", back_populates="persona")
     # puestos_historiales = relationship("PuestoHistorial", back_populates="persona")
 
-    @property
+    @hybrid_property
     def nombre_completo(self):
         """Nombre completo"""
         return f"{self.nombres} {self.apellido_primero} {self.apellido_segundo}"
 
+    @nombre_completo.expression
+    def nombre_completo(cls):
+        """Nombre completo como expresion SQL, para proyectarlo en las consultas"""
+        return cls.nombres + " " + cls.apellido_primero + " " + cls.apellido_segundo
+
     def __repr__(self):
         """Representación"""
         return f"<Persona {self.rfc}>"
+
+
+# Indices GIN de trigramas para buscar por fragmentos (LIKE '%x%') y por similitud, solo en PostgreSQL
+event.listen(Persona.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+INDICES_TRIGRAMAS = [
+    Index(
+        f"personas_{nombre}_trgm",
+        expresion.label(nombre),
+        postgresql_using="gin",
+        postgresql_ops={nombre: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
+    for nombre, expresion in (
+        ("rfc", Persona.rfc),
+        ("nombres", Persona.nombres),
+        ("apellido_primero", Persona.apellido_primero),
+        ("apellido_segundo", Persona.apellido_segundo),
+        ("nombre_completo", Persona.nombre_completo),
+    )
+]
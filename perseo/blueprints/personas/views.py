@@ -6,7 +6,8 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.busquedas import buscar_similares
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_curp, safe_message, safe_rfc, safe_string
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.modulos.models import Modulo
@@ -18,6 +19,18 @@ from perseo.blueprints.tabuladores.models import Tabulador
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "PERSONAS"
+COLUMNAS_DATATABLE = {
+    "rfc": "rfc",
+    "id": "id",
+    "tabulador_id": "tabulador_id",
+    "nombres": "nombres",
+    "apellido_primero": "apellido_primero",
+    "apellido_segundo": "apellido_segundo",
+    "curp": "curp",
+    "num_empleado": "num_empleado",
+    "modelo": "modelo",
+    "codigo_postal_fiscal": "codigo_postal_fiscal",
+}
 
 personas = Blueprint("personas", __name__, template_folder="templates")
 
@@ -58,9 +71,15 @@ def datatable_json():
                 consulta = consulta.filter_by(codigo_postal_fiscal=str(codigo_postal_fiscal).zfill(5))
         except ValueError:
             pass
-    # Ordenar y paginar
-    registros = consulta.order_by(Persona.rfc).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    # Buscar por nombre completo, ordenando del mas al menos parecido
+    nombre_completo = safe_string(request.form.get("nombre_completo", ""), save_enie=True)
+    if nombre_completo != "":
+        consulta, similitud = buscar_similares(consulta, Persona.nombre_completo, nombre_completo)
+        orden = [similitud, Persona.id]
+        registros = paginar(consulta, orden, start, rows_per_page, descendente=True, columnas=COLUMNAS_DATATABLE)
+    else:
+        registros = paginar(consulta, [Persona.rfc], start, rows_per_page, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -71,7 +90,7 @@ def datatable_json():
                     "url": url_for("personas.detail", persona_id=resultado.id),
                 },
                 "tabulador": {
-                    "id": resultado.tabulador.id,
+                    "id": resultado.tabulador_id,
                     "url": url_for("tabuladores.detail", tabulador_id=resultado.tabulador_id),
                 },
                 "nombres": resultado.nombres,
@@ -123,8 +142,12 @@ def exportar_xlsx():
     tarea = current_user.launch_task(
         comando="personas.tasks.lanzar_exportar_xlsx",
         mensaje="Exportando las Personas a un archivo XLSX...",
+        reutilizar_tablas=["personas"],
     )
-    flash("Se ha lanzado esta tarea en el fondo. Esta página se va a recargar en 10 segundos...", "info")
+    if tarea.ha_terminado:
+        flash("No hay cambios desde la exportacion anterior, se entrega su archivo.", "info")
+    else:
+        flash("Se ha lanzado esta tarea en el fondo.", "info")
     return redirect(url_for("tareas.detail", tarea_id=tarea.id))
 
 
@@ -186,7 +209,7 @@ def new():
             persona.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Nuevo Persona {persona.rfc}"),
                 url=url_for("personas.detail", persona_id=persona.id),
             )
@@ -245,7 +268,7 @@ def edit(persona_id):
             persona.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Editado Persona {persona.rfc}"),
                 url=url_for("personas.detail", persona_id=persona.id),
             )
@@ -276,7 +299,7 @@ def delete(persona_id):
         persona.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Persona {persona.rfc}"),
             url=url_for("personas.detail", persona_id=persona.id),
         )
@@ -294,7 +317,7 @@ def recover(persona_id):
         persona.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Persona {persona.rfc}"),
             url=url_for("personas.detail", persona_id=persona.id),
         )
@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_clave, safe_message, safe_string
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.modulos.models import Modulo
@@ -40,8 +40,8 @@ def datatable_json():
     else:
         consulta = consulta.filter_by(estatus="A")
     # Ordenar y paginar
-    registros = consulta.order_by(Producto.id).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Producto.id], start, rows_per_page)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -107,7 +107,7 @@ def new():
         producto.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Nuevo Producto {producto.clave}"),
             url=url_for("productos.detail", producto_id=producto.id),
         )
@@ -139,7 +139,7 @@ def edit(producto_id):
             producto.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Editado Producto {producto.descripcion}"),
                 url=url_for("productos.detail", producto_id=producto.id),
             )
@@ -160,7 +160,7 @@ def delete(producto_id):
         producto.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Producto {producto.clave}"),
             url=url_for("productos.detail", producto_id=producto.id),
         )
@@ -178,7 +178,7 @@ def recover(producto_id):
         producto.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Producto {producto.clave}"),
             url=url_for("productos.detail", producto_id=producto.id),
         )
@@ -19,9 +19,8 @@ from lib.exceptions import (
 )
 from lib.google_cloud_storage import upload_file_to_gcs
 from lib.tasks import set_task_error, set_task_progress
-from perseo.app import create_app
+from perseo.app import get_app
 from perseo.blueprints.puestos.models import Puesto
-from perseo.extensions import database
 
 GCS_BASE_DIRECTORY = "puestos"
 LOCAL_BASE_DIRECTORY = "exports/puestos"
@@ -34,9 +33,7 @@ empunadura = logging.FileHandler("logs/puestos.log")
 empunadura.setFormatter(formato)
 bitacora.addHandler(empunadura)
 
-app = create_app()
-app.app_context().push()
-database.app = app
+app = get_app()
 
 
 def exportar_xlsx() -> tuple[str, str, str]:
@@ -5,7 +5,7 @@ import logging
 
 from lib.exceptions import MyAnyError, MyNotExistsError
 from lib.tasks import set_task_error, set_task_progress
-from perseo.app import create_app
+from perseo.app import get_app
 from perseo.blueprints.bancos.models import Banco
 from perseo.blueprints.quincenas.models import Quincena
 from perseo.extensions import database
@@ -21,9 +21,7 @@ empunadura = logging.FileHandler("quincenas.log")
 empunadura.setFormatter(formato)
 bitacora.addHandler(empunadura)
 
-app = create_app()
-app.app_context().push()
-database.app = app
+app = get_app()
 
 
 def cerrar() -> str:
@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_message, safe_quincena
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.modulos.models import Modulo
@@ -14,6 +14,7 @@ from perseo.blueprints.permisos.models import Permiso
 from perseo.blueprints.quincenas.forms import QuincenaForm
 from perseo.blueprints.quincenas.models import Quincena
 from perseo.blueprints.quincenas_productos.models import QuincenaProducto
+from perseo.blueprints.tareas.candados import apartar_lanzamiento
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "QUINCENAS"
@@ -46,8 +47,8 @@ def datatable_json():
         except ValueError:
             pass
     # Ordenar y paginar
-    registros = consulta.order_by(Quincena.clave.desc()).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Quincena.clave], start, rows_per_page, descendente=True)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -185,7 +186,7 @@ def edit(quincena_id):
             quincena.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Editada Quincena {quincena.clave} con estado {quincena.estado}"),
                 url=url_for("quincenas.detail", quincena_id=quincena.id),
             )
@@ -220,7 +221,7 @@ def new():
             quincena.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Nueva Quincena {quincena.clave} como {quincena.estado}"),
                 url=url_for("quincenas.detail", quincena_id=quincena.id),
             )
@@ -239,7 +240,7 @@ def delete(quincena_id):
         quincena.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminada Quincena {quincena.clave}"),
             url=url_for("quincenas.detail", quincena_id=quincena.id),
         )
@@ -257,7 +258,7 @@ def recover(quincena_id):
         quincena.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperada Quincena {quincena.clave}"),
             url=url_for("quincenas.detail", quincena_id=quincena.id),
         )
@@ -270,11 +271,11 @@ def recover(quincena_id):
 @permission_required(MODULO, Permiso.ADMINISTRAR)
 def close_all():
     """Lanzar tarea en el fondo para cerrar TODAS las quincenas con estado ABIERTA"""
-    current_user.launch_task(
+    tarea = current_user.launch_task(
         comando="quincenas.tasks.lanzar_cerrar",
         mensaje="Lanzando cerrar quincenas...",
     )
-    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar en 10 segundos...", "info")
+    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar al terminar...", f"tarea:{tarea.id}")
     return redirect(url_for("quincenas.list_active"))
 
 
@@ -290,6 +291,11 @@ def generate_nominas(quincena_id):
     if quincena.estado != "ABIERTA":
         flash("Quincena no abierta", "warning")
         return redirect(url_for("quincenas.detail", quincena_id=quincena.id))
+    # Apartar la tarea antes de agregar el producto, si ya se esta generando en el fondo ir a esa tarea
+    tarea_id, es_nueva = apartar_lanzamiento("nominas.tasks.lanzar_generar_nominas", {"quincena_clave": quincena.clave})
+    if not es_nueva:
+        flash("Ya hay una tarea en el fondo generando este archivo", "warning")
+        return redirect(url_for("tareas.detail", tarea_id=tarea_id))
     # Definir mensaje de inicio
     mensaje = f"Crear un archivo XLSX con las nominas de {quincena.clave}..."
     # Agregar producto
@@ -303,13 +309,15 @@ def generate_nominas(quincena_id):
     )
     quincena_producto.save()
     # Lanzar la tarea en el fondo
-    current_user.launch_task(
+    tarea = current_user.launch_task(
         comando="nominas.tasks.lanzar_generar_nominas",
         mensaje=mensaje,
         quincena_clave=quincena.clave,
         quincena_producto_id=quincena_producto.id,
+        llave={"quincena_clave": quincena.clave},
+        tarea_apartada=tarea_id,
     )
-    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar en 30 segundos...", "info")
+    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar al terminar...", f"tarea:{tarea.id}")
     # Redireccionar al detalle del producto
     return redirect(url_for("quincenas_productos.detail", quincena_producto_id=quincena_producto.id))
 
@@ -326,6 +334,11 @@ def generate_monederos(quincena_id):
     if quincena.estado != "ABIERTA":
         flash("Quincena no abierta", "warning")
         return redirect(url_for("quincenas.detail", quincena_id=quincena.id))
+    # Apartar la tarea antes de agregar el producto, si ya se esta generando en el fondo ir a esa tarea
+    tarea_id, es_nueva = apartar_lanzamiento("nominas.tasks.lanzar_generar_monederos", {"quincena_clave": quincena.clave})
+    if not es_nueva:
+        flash("Ya hay una tarea en el fondo generando este archivo", "warning")
+        return redirect(url_for("tareas.detail", tarea_id=tarea_id))
     # Definir mensaje de inicio
     mensaje = f"Crear un archivo XLSX con los monederos de {quincena.clave}..."
     # Agregar producto
@@ -339,13 +352,15 @@ def generate_monederos(quincena_id):
     )
     quincena_producto.save()
     # Lanzar la tarea en el fondo
-    current_user.launch_task(
+    tarea = current_user.launch_task(
         comando="nominas.tasks.lanzar_generar_monederos",
         mensaje=mensaje,
         quincena_clave=quincena.clave,
         quincena_producto_id=quincena_producto.id,
+        llave={"quincena_clave": quincena.clave},
+        tarea_apartada=tarea_id,
     )
-    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar en 30 segundos...", "info")
+    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar al terminar...", f"tarea:{tarea.id}")
     # Redireccionar al detalle del producto
     return redirect(url_for("quincenas_productos.detail", quincena_producto_id=quincena_producto.id))
 
@@ -362,6 +377,11 @@ def generate_pensionados(quincena_id):
     if quincena.estado != "ABIERTA":
         flash("Quincena no abierta", "warning")
         return redirect(url_for("quincenas.detail", quincena_id=quincena.id))
+    # Apartar la tarea antes de agregar el producto, si ya se esta generando en el fondo ir a esa tarea
+    tarea_id, es_nueva = apartar_lanzamiento("nominas.tasks.lanzar_generar_pensionados", {"quincena_clave": quincena.clave})
+    if not es_nueva:
+        flash("Ya hay una tarea en el fondo generando este archivo", "warning")
+        return redirect(url_for("tareas.detail", tarea_id=tarea_id))
     # Definir mensaje de inicio
     mensaje = f"Crear un archivo XLSX con los pensionados de {quincena.clave}..."
     # Agregar producto
@@ -375,13 +395,15 @@ def generate_pensionados(quincena_id):
     )
     quincena_producto.save()
     # Lanzar la tarea en el fondo
-    current_user.launch_task(
+    tarea = current_user.launch_task(
         comando="nominas.tasks.lanzar_generar_pensionados",
         mensaje=mensaje,
         quincena_clave=quincena.clave,
         quincena_producto_id=quincena_producto.id,
+        llave={"quincena_clave": quincena.clave},
+        tarea_apartada=tarea_id,
     )
-    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar en 30 segundos...", "info")
+    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar al terminar...", f"tarea:{tarea.id}")
     # Redireccionar al detalle del producto
     return redirect(url_for("quincenas_productos.detail", quincena_producto_id=quincena_producto.id))
 
@@ -398,6 +420,13 @@ def generate_dispersiones_pensionados(quincena_id):
     if quincena.estado != "ABIERTA":
         flash("Quincena no abierta", "warning")
         return redirect(url_for("quincenas.detail", quincena_id=quincena.id))
+    # Apartar la tarea antes de agregar el producto, si ya se esta generando en el fondo ir a esa tarea
+    tarea_id, es_nueva = apartar_lanzamiento(
+        "nominas.tasks.lanzar_generar_dispersiones_pensionados", {"quincena_clave": quincena.clave}
+    )
+    if not es_nueva:
+        flash("Ya hay una tarea en el fondo generando este archivo", "warning")
+        return redirect(url_for("tareas.detail", tarea_id=tarea_id))
     # Definir mensaje de inicio
     mensaje = f"Crear un archivo XLSX con las dispersiones pensionados de {quincena.clave}..."
     # Agregar producto
@@ -411,13 +440,15 @@ def generate_dispersiones_pensionados(quincena_id):
     )
     quincena_producto.save()
     # Lanzar la tarea en el fondo
-    current_user.launch_task(
+    tarea = current_user.launch_task(
         comando="nominas.tasks.lanzar_generar_dispersiones_pensionados",
         mensaje=mensaje,
         quincena_clave=quincena.clave,
         quincena_producto_id=quincena_producto.id,
+        llave={"quincena_clave": quincena.clave},
+        tarea_apartada=tarea_id,
     )
-    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar en 10 segundos...", "info")
+    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar al terminar...", f"tarea:{tarea.id}")
     # Redireccionar al detalle del producto
     return redirect(url_for("quincenas_productos.detail", quincena_producto_id=quincena_producto.id))
 
@@ -434,6 +465,11 @@ def generate_timbrados(quincena_id):
     if quincena.estado != "ABIERTA":
         flash("Quincena no abierta", "warning")
         return redirect(url_for("quincenas.detail", quincena_id=quincena.id))
+    # Apartar la tarea antes de agregar el producto, si ya se esta generando en el fondo ir a esa tarea
+    tarea_id, es_nueva = apartar_lanzamiento("nominas.tasks.lanzar_generar_timbrados", {"quincena_clave": quincena.clave})
+    if not es_nueva:
+        flash("Ya hay una tarea en el fondo generando este archivo", "warning")
+        return redirect(url_for("tareas.detail", tarea_id=tarea_id))
     # Agregar producto
     quincena_producto = QuincenaProducto(
         quincena=quincena,
@@ -445,13 +481,15 @@ def generate_timbrados(quincena_id):
     )
     quincena_producto.save()
     # Lanzar la tarea en el fondo
-    current_user.launch_task(
+    tarea = current_user.launch_task(
         comando="nominas.tasks.lanzar_generar_timbrados",
         mensaje=f"Crear un archivo XLSX con los timbrados de {quincena.clave}...",
         quincena_clave=quincena.clave,
         quincena_producto_id=quincena_producto.id,
+        llave={"quincena_clave": quincena.clave},
+        tarea_apartada=tarea_id,
     )
-    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar en 30 segundos...", "info")
+    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar al terminar...", f"tarea:{tarea.id}")
     # Redireccionar al detalle del producto
     return redirect(url_for("quincenas_productos.detail", quincena_producto_id=quincena_producto.id))
 
@@ -471,6 +509,13 @@ def generate_timbrados_aguinaldos(quincena_id):
     if quincena.tiene_aguinaldos is False:
         flash("Quincena no tiene aguinaldos", "warning")
         return redirect(url_for("quincenas.detail", quincena_id=quincena.id))
+    # Apartar la tarea antes de agregar el producto, si ya se esta generando en el fondo ir a esa tarea
+    tarea_id, es_nueva = apartar_lanzamiento(
+        "nominas.tasks.lanzar_generar_timbrados_aguinaldos", {"quincena_clave": quincena.clave}
+    )
+    if not es_nueva:
+        flash("Ya hay una tarea en el fondo generando este archivo", "warning")
+        return redirect(url_for("tareas.detail", tarea_id=tarea_id))
     # Agregar producto
     quincena_producto = QuincenaProducto(
         quincena=quincena,
@@ -482,13 +527,15 @@ def generate_timbrados_aguinaldos(quincena_id):
     )
     quincena_producto.save()
     # Lanzar la tarea en el fondo
-    current_user.launch_task(
+    tarea = current_user.launch_task(
         comando="nominas.tasks.lanzar_generar_timbrados_aguinaldos",
         mensaje=f"Crear un archivo XLSX con los timbrados aguinaldos de {quincena.clave}...",
         quincena_clave=quincena.clave,
         quincena_producto_id=quincena_producto.id,
+        llave={"quincena_clave": quincena.clave},
+        tarea_apartada=tarea_id,
     )
-    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar en 30 segundos...", "info")
+    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar al terminar...", f"tarea:{tarea.id}")
     # Redireccionar al detalle del producto
     return redirect(url_for("quincenas_productos.detail", quincena_producto_id=quincena_producto.id))
 
@@ -508,6 +555,13 @@ def generate_timbrados_apoyos_anuales(quincena_id):
     if quincena.tiene_apoyos_anuales is False:
         flash("Quincena no tiene apoyos anuales", "warning")
         return redirect(url_for("quincenas.detail", quincena_id=quincena.id))
+    # Apartar la tarea antes de agregar el producto, si ya se esta generando en el fondo ir a esa tarea
+    tarea_id, es_nueva = apartar_lanzamiento(
+        "nominas.tasks.lanzar_generar_timbrados_apoyos_anuales", {"quincena_clave": quincena.clave}
+    )
+    if not es_nueva:
+        flash("Ya hay una tarea en el fondo generando este archivo", "warning")
+        return redirect(url_for("tareas.detail", tarea_id=tarea_id))
     # Agregar producto
     quincena_producto = QuincenaProducto(
         quincena=quincena,
@@ -519,13 +573,15 @@ def generate_timbrados_apoyos_anuales(quincena_id):
     )
     quincena_producto.save()
     # Lanzar la tarea en el fondo
-    current_user.launch_task(
+    tarea = current_user.launch_task(
         comando="nominas.tasks.lanzar_generar_timbrados_apoyos_anuales",
         mensaje=f"Crear un archivo XLSX con los timbrados apoyos anuales de {quincena.clave}...",
         quincena_clave=quincena.clave,
         quincena_producto_id=quincena_producto.id,
+        llave={"quincena_clave": quincena.clave},
+        tarea_apartada=tarea_id,
     )
-    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar en 30 segundos...", "info")
+    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar al terminar...", f"tarea:{tarea.id}")
     # Redireccionar al detalle del producto
     return redirect(url_for("quincenas_productos.detail", quincena_producto_id=quincena_producto.id))
 
@@ -543,11 +599,11 @@ def generate_todos(quincena_id):
         flash("Quincena no abierta", "warning")
         return redirect(url_for("quincenas.detail", quincena_id=quincena.id))
     # Lanzar la tarea en el fondo
-    current_user.launch_task(
+    tarea = current_user.launch_task(
         comando="nominas.tasks.lanzar_generar_todos",
         mensaje=f"Crear todos los archivo XLSX de {quincena.clave}...",
         quincena_clave=quincena.clave,
     )
-    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar en 60 segundos...", "info")
+    flash("Se ha lanzado la tarea en el fondo. Esta página se va a recargar al terminar...", f"tarea:{tarea.id}")
     # Redireccionar al detalle de la quincena
     return redirect(url_for("quincenas.detail", quincena_id=quincena.id))
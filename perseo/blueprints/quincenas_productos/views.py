@@ -3,12 +3,13 @@ Quincenas Productos, vistas
 """
 import json
 
-from flask import Blueprint, current_app, flash, make_response, redirect, render_template, request, url_for
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
+from lib.descargas import descargar_archivo
 from lib.exceptions import MyAnyError
-from lib.google_cloud_storage import get_blob_name_from_url, get_file_from_gcs
+from lib.google_cloud_storage import get_blob_name_from_url
 from lib.safe_string import safe_message, safe_quincena
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.modulos.models import Modulo
@@ -18,6 +19,14 @@ from perseo.blueprints.quincenas_productos.models import QuincenaProducto
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "QUINCENAS PRODUCTOS"
+COLUMNAS_DATATABLE = {
+    "id": "id",
+    "quincena_clave": "quincena.clave",
+    "fuente": "fuente",
+    "mensajes": "mensajes",
+    "archivo": "archivo",
+    "url": "url",
+}
 
 quincenas_productos = Blueprint("quincenas_productos", __name__, template_folder="templates")
 
@@ -54,8 +63,8 @@ def datatable_json():
         except ValueError:
             pass
     # Ordenar y paginar
-    registros = consulta.order_by(QuincenaProducto.id.desc()).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [QuincenaProducto.id], start, rows_per_page, descendente=True, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -65,7 +74,7 @@ def datatable_json():
                     "id": resultado.id,
                     "url": url_for("quincenas_productos.detail", quincena_producto_id=resultado.id),
                 },
-                "quincena_clave": resultado.quincena.clave,
+                "quincena_clave": resultado.quincena_clave,
                 "fuente": resultado.fuente,
                 "mensajes": resultado.mensajes,
                 "archivo": {
@@ -126,22 +135,18 @@ def download_xlsx(quincena_producto_id):
         fuente_str = quincena_producto.fuente.replace(" ", "_").lower()
         descarga_nombre = f"{quincena_producto.quincena.clave}-{fuente_str}.xlsx"
 
-    # Obtener el contenido del archivo desde Google Storage
+    # Redirigir a una URL firmada o transmitir por bloques el archivo XLSX desde el deposito
     try:
-        descarga_contenido = get_file_from_gcs(
+        return descargar_archivo(
             bucket_name=current_app.config["CLOUD_STORAGE_DEPOSITO"],
             blob_name=get_blob_name_from_url(quincena_producto.url),
+            descarga_nombre=descarga_nombre,
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
     except MyAnyError as error:
         flash(str(error), "danger")
         return redirect(url_for("quincenas_productos.detail", quincena_producto_id=quincena_producto.id))
 
-    # Descargar un archivo XLSX
-    response = make_response(descarga_contenido)
-    response.headers["Content-Type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    response.headers["Content-Disposition"] = f"attachment; filename={descarga_nombre}"
-    return response
-
 
 @quincenas_productos.route("/quincenas_productos/eliminar/<int:quincena_producto_id>")
 @permission_required(MODULO, Permiso.ADMINISTRAR)
@@ -152,7 +157,7 @@ def delete(quincena_producto_id):
         quincena_producto.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Quincena Producto {quincena_producto.archivo}"),
             url=url_for("quincenas_productos.detail", quincena_producto_id=quincena_producto.id),
         )
@@ -170,7 +175,7 @@ def recover(quincena_producto_id):
         quincena_producto.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Quincena Producto {quincena_producto.archivo}"),
             url=url_for("quincenas_productos.detail", quincena_producto_id=quincena_producto.id),
         )
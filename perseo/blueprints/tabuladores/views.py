@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_clave, safe_message, safe_string
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.modulos.models import Modulo
@@ -17,6 +17,17 @@ from perseo.blueprints.tabuladores.models import Tabulador
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "TABULADORES"
+COLUMNAS_DATATABLE = {
+    "id": "id",
+    "puesto_clave": "puesto.clave",
+    "puesto_id": "puesto_id",
+    "modelo": "modelo",
+    "nivel": "nivel",
+    "quinquenio": "quinquenio",
+    "fecha": "fecha",
+    "sueldo_base": "sueldo_base",
+    "monedero": "monedero",
+}
 
 tabuladores = Blueprint("tabuladores", __name__, template_folder="templates")
 
@@ -58,8 +69,8 @@ def datatable_json():
         except ValueError:
             pass
     # Ordenar y paginar
-    registros = consulta.order_by(Tabulador.id).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Tabulador.id], start, rows_per_page, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -70,7 +81,7 @@ def datatable_json():
                     "url": url_for("tabuladores.detail", tabulador_id=resultado.id),
                 },
                 "puesto": {
-                    "clave": resultado.puesto.clave,
+                    "clave": resultado.puesto_clave,
                     "url": url_for("puestos.detail", puesto_id=resultado.puesto_id),
                 },
                 "modelo": resultado.modelo,
@@ -121,8 +132,12 @@ def exportar_xlsx():
     tarea = current_user.launch_task(
         comando="tabuladores.tasks.lanzar_exportar_xlsx",
         mensaje="Exportando los Tabuladores a un archivo XLSX...",
+        reutilizar_tablas=["puestos", "tabuladores"],
     )
-    flash("Se ha lanzado esta tarea en el fondo. Esta página se va a recargar en 10 segundos...", "info")
+    if tarea.ha_terminado:
+        flash("No hay cambios desde la exportacion anterior, se entrega su archivo.", "info")
+    else:
+        flash("Se ha lanzado esta tarea en el fondo.", "info")
     return redirect(url_for("tareas.detail", tarea_id=tarea.id))
 
 
@@ -179,7 +194,7 @@ def new():
             tabulador.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Nuevo Tabulador {tabulador.puesto_id}"),
                 url=url_for("tabuladores.detail", tabulador_id=tabulador.id),
             )
@@ -241,7 +256,7 @@ def edit(tabulador_id):
             tabulador.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Editado Tabulador {tabulador.puesto}"),
                 url=url_for("tabuladores.detail", tabulador_id=tabulador.id),
             )
@@ -284,7 +299,7 @@ def delete(tabulador_id):
         tabulador.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Tabulador {tabulador.id}"),
             url=url_for("tabuladores.detail", tabulador_id=tabulador.id),
         )
@@ -302,7 +317,7 @@ def recover(tabulador_id):
         tabulador.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Tabulador {tabulador.id}"),
             url=url_for("tabuladores.detail", tabulador_id=tabulador.id),
         )
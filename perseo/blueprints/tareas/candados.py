@@ -0,0 +1,98 @@
+"""
+Tareas, candados para no lanzar dos veces la misma tarea
+
+- La huella de una tarea es el comando con los argumentos que la identifican
+- El candado es una llave en Redis con la huella que guarda el id de la tarea, expira con el tiempo limite
+  de la cola de la tarea (vea colas.py) por si el worker muere sin terminarla
+- Mientras la tarea del candado no termine, lanzar otra igual entrega esa misma tarea
+- Opcionalmente, una tarea terminada sin error se reutiliza mientras no cambien las tablas que lee,
+  para eso la llave del resultado lleva las versiones de esas tablas (vea lib/datatables.py)
+- Si la vista guarda registros para la tarea antes de lanzarla, debe apartar primero el candado con
+  apartar_lanzamiento y pasar el id a launch_task, asi un doble clic no deja registros huerfanos
+
+Ejemplo de uso
+
+    tarea_id, es_nueva = apartar_lanzamiento("nominas.tasks.lanzar_generar_nominas", {"quincena_clave": quincena.clave})
+    if not es_nueva:
+        return redirect(url_for("tareas.detail", tarea_id=tarea_id))
+    quincena_producto = QuincenaProducto(...).save()
+    current_user.launch_task(..., llave={"quincena_clave": quincena.clave}, tarea_apartada=tarea_id)
+
+"""
+import hashlib
+import json
+from uuid import uuid4
+
+from flask import current_app
+
+from lib.datatables import version_tablas
+from perseo.blueprints.tareas.colas import COLAS, clase_del_comando
+from perseo.blueprints.tareas.models import Tarea, leer_avance
+
+TASK_LOCK_KEY = "perseo:tareas:candado:{}"
+TASK_RESULT_KEY = "perseo:tareas:resultado:{}:{}"
+TASK_RESULT_TTL = 86400  # Segundos que se puede reutilizar el resultado de una tarea
+
+
+def huella_tarea(comando: str, llave) -> str:
+    """Huella de la tarea con el comando y los argumentos que la identifican"""
+    texto = json.dumps([comando, llave], sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode()).hexdigest()
+
+
+def tarea_del_candado(redis, huella: str):
+    """Entregar la tarea que tiene el candado si aun esta en la cola o en ejecucion"""
+    tarea_id = redis.get(TASK_LOCK_KEY.format(huella))
+    if tarea_id is None:
+        return None
+    tarea = Tarea.query.get(tarea_id.decode())
+    if tarea is None or tarea.ha_terminado:
+        return None
+    return tarea
+
+
+def tarea_reutilizable(redis, huella: str, tablas: list):
+    """Entregar la tarea terminada sin error si no han cambiado las tablas que lee"""
+    tarea_id = redis.get(TASK_RESULT_KEY.format(huella, version_tablas(redis, tablas)))
+    if tarea_id is None:
+        return None
+    tarea = Tarea.query.get(tarea_id.decode())
+    if tarea is None or not tarea.ha_terminado or leer_avance(redis, tarea.id).get("error") == "1":
+        return None
+    return tarea
+
+
+def apartar_tarea(redis, huella: str, vigencia: int, tablas: list = None) -> tuple[str, bool]:
+    """Apartar el candado para una tarea nueva, entrega el id de la tarea que lo tiene y si es nueva"""
+    nuevo_id = str(uuid4())
+    llave = TASK_LOCK_KEY.format(huella)
+    if not redis.set(llave, nuevo_id, nx=True, ex=vigencia):
+        actual_id = redis.get(llave)
+        if actual_id is not None:
+            actual_id = actual_id.decode()
+            tarea = Tarea.query.get(actual_id)
+            # Sin registro aun la esta lanzando otra peticion, sin terminar sigue en la cola o en ejecucion
+            if tarea is None or not tarea.ha_terminado:
+                return actual_id, False
+        redis.set(llave, nuevo_id, ex=vigencia)
+    if tablas:
+        redis.set(TASK_RESULT_KEY.format(huella, version_tablas(redis, tablas)), nuevo_id, ex=TASK_RESULT_TTL)
+    return nuevo_id, True
+
+
+def buscar_tarea_en_curso(comando: str, llave: dict, tablas: list = None):
+    """Entregar la tarea igual que esta en la cola o en ejecucion, o la reutilizable si se dan las tablas"""
+    redis = current_app.redis
+    huella = huella_tarea(comando, llave)
+    tarea = tarea_del_candado(redis, huella)
+    if tarea is None and tablas:
+        tarea = tarea_reutilizable(redis, huella, tablas)
+    return tarea
+
+
+def apartar_lanzamiento(comando: str, llave: dict, tablas: list = None) -> tuple[str, bool]:
+    """Apartar el candado antes de preparar una tarea, entrega el id de la tarea nueva o de la igual en curso y si es nueva"""
+    tarea = buscar_tarea_en_curso(comando, llave, tablas)
+    if tarea is not None:
+        return tarea.id, False
+    return apartar_tarea(current_app.redis, huella_tarea(comando, llave), COLAS[clase_del_comando(comando)], tablas)
@@ -0,0 +1,105 @@
+"""
+Tareas, colas por tipo de trabajo
+
+- interactivas: exportaciones y tareas cortas que alguien esta esperando en la pagina
+- pesadas: los generadores de archivos de una quincena y el ZIP de timbrados
+- masivas: las que lanzan muchas tareas hijas o procesan todo de una vez, sus hijas van a la misma cola
+  con el tiempo limite de pesadas, porque cada hija es un generador
+
+Cada comando declara su tipo en COMANDOS_COLAS, los que no esten van a la cola interactivas.
+Los workers escuchan sus colas en el orden de COLAS, asi un worker que atiende varias toma primero las interactivas.
+Para arrancar N workers por cola use el CLI, por ejemplo
+
+    cli tareas trabajar --cola interactivas --cantidad 2
+    cli tareas trabajar --cola pesadas --cola masivas
+
+"""
+from pathlib import Path
+from typing import NamedTuple
+
+import rq
+from redis.exceptions import RedisError
+from rq.registry import StartedJobRegistry
+from rq.utils import utcnow
+
+COLAS = {
+    "interactivas": 600,  # Segundos que RQ deja correr una tarea de esta cola, tambien es la vigencia de su candado
+    "pesadas": 1920,
+    "masivas": 3600,
+}
+COLA_POR_DEFECTO = "interactivas"
+COMANDOS_COLAS = {
+    "nominas.tasks.lanzar_generar_dispersiones_pensionados": "pesadas",
+    "nominas.tasks.lanzar_generar_monederos": "pesadas",
+    "nominas.tasks.lanzar_generar_nominas": "pesadas",
+    "nominas.tasks.lanzar_generar_pensionados": "pesadas",
+    "nominas.tasks.lanzar_generar_timbrados": "pesadas",
+    "nominas.tasks.lanzar_generar_timbrados_aguinaldos": "pesadas",
+    "nominas.tasks.lanzar_generar_timbrados_apoyos_anuales": "pesadas",
+    "nominas.tasks.lanzar_generar_todos": "masivas",
+    "timbrados.tasks.lanzar_exportar_zip": "pesadas",
+}
+
+
+class EstadoCola(NamedTuple):
+    """Estado de una cola para mostrarlo en el listado de tareas"""
+
+    clase: str
+    nombre: str
+    en_cola: int
+    en_ejecucion: int
+    trabajadores: int
+    espera: int  # Segundos que lleva esperando la tarea mas antigua en la cola
+
+
+def clase_del_comando(comando: str) -> str:
+    """Entregar el tipo de cola que declara el comando"""
+    return COMANDOS_COLAS.get(comando, COLA_POR_DEFECTO)
+
+
+def modulos_tareas() -> list:
+    """Modulos con tareas en el fondo, el worker los carga antes de atender las colas"""
+    blueprints = Path(__file__).resolve().parent.parent
+    return sorted(f"perseo.blueprints.{ruta.parent.name}.tasks" for ruta in blueprints.glob("*/tasks.py"))
+
+
+def nombre_cola(prefijo: str, clase: str) -> str:
+    """Nombre de la cola en Redis, el prefijo es TASK_QUEUE"""
+    return f"{prefijo}_{clase}"
+
+
+def crear_colas(prefijo: str, connection) -> dict:
+    """Crear las colas de RQ en el orden de prioridad de COLAS"""
+    return {
+        clase: rq.Queue(nombre_cola(prefijo, clase), connection=connection, default_timeout=timeout)
+        for clase, timeout in COLAS.items()
+    }
+
+
+def espera_cola(cola) -> int:
+    """Segundos que lleva en la cola la tarea mas antigua, cero si esta vacia"""
+    for job_id in cola.get_job_ids(0, 1):
+        job = cola.fetch_job(job_id)
+        if job is not None and job.enqueued_at is not None:
+            return max(0, int((utcnow() - job.enqueued_at).total_seconds()))
+    return 0
+
+
+def estado_colas(colas: dict) -> list:
+    """Consultar en Redis la cantidad de tareas en cola y en ejecucion, los workers y la espera de cada cola"""
+    estados = []
+    try:
+        for clase, cola in colas.items():
+            estados.append(
+                EstadoCola(
+                    clase=clase,
+                    nombre=cola.name,
+                    en_cola=cola.count,
+                    en_ejecucion=StartedJobRegistry(queue=cola).count,
+                    trabajadores=rq.Worker.count(queue=cola),
+                    espera=espera_cola(cola),
+                )
+            )
+    except RedisError:
+        return []
+    return estados
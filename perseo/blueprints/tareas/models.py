@@ -10,6 +10,23 @@ from sqlalchemy.orm import relationship
 from lib.universal_mixin import UniversalMixin
 from perseo.extensions import database
 
+PROGRESS_KEY = "perseo:tareas:{}:avance"  # Hash de Redis con el avance que escribe lib/tasks.py
+PROGRESS_CHANNEL = "perseo:tareas:{}:eventos"  # Canal de Redis donde lib/tasks.py publica cada cambio del avance
+
+
+def leer_avance(connection, tarea_id: str) -> dict:
+    """Leer de Redis el avance de la tarea: progress, done, total, stage, eta y message"""
+    try:
+        avance = connection.hgetall(PROGRESS_KEY.format(tarea_id))
+    except redis.exceptions.RedisError:
+        return {}
+    return {campo.decode(): valor.decode() for campo, valor in avance.items()}
+
+
+def avance_terminado(avance: dict) -> bool:
+    """Revisar si el avance indica que la tarea termino"""
+    return int(avance.get("progress", 0)) >= 100
+
 
 class Tarea(database.Model, UniversalMixin):
     """Tarea"""
@@ -39,8 +56,15 @@ class Tarea(database.Model, UniversalMixin):
             return None
         return rq_job
 
+    def get_avance(self) -> dict:
+        """Leer de Redis el avance de la tarea"""
+        return leer_avance(current_app.redis, self.id)
+
     def get_progress(self):
         """Returns the progress percentage for the task"""
+        avance = self.get_avance()
+        if "progress" in avance:
+            return int(avance["progress"])
         job = self.get_rq_job()
         return job.meta.get("progress", 0) if job is not None else 100
 
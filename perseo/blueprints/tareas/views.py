@@ -3,17 +3,29 @@ Tareas, vistas
 """
 import json
 
-from flask import Blueprint, current_app, flash, make_response, redirect, render_template, request, url_for
+from flask import Blueprint, Response, abort, current_app, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
+from lib.descargas import descargar_archivo
+from lib.eventos import DURACION, ENCABEZADOS, transmitir_canal
 from lib.exceptions import MyAnyError
-from lib.google_cloud_storage import get_blob_name_from_url, get_file_from_gcs
+from lib.google_cloud_storage import get_blob_name_from_url
 from perseo.blueprints.permisos.models import Permiso
-from perseo.blueprints.tareas.models import Tarea
+from perseo.blueprints.tareas.colas import estado_colas
+from perseo.blueprints.tareas.models import PROGRESS_CHANNEL, Tarea, avance_terminado, leer_avance
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "TAREAS"
+COLUMNAS_DATATABLE = {
+    "comando": "comando",
+    "id": "id",
+    "ha_terminado": "ha_terminado",
+    "mensaje": "mensaje",
+    "usuario_email": "usuario.email",
+    "usuario_id": "usuario_id",
+    "creado": "creado",
+}
 
 tareas = Blueprint("tareas", __name__, template_folder="templates")
 
@@ -44,8 +56,8 @@ def datatable_json():
     if "usuario_id" in request.form:
         consulta = consulta.filter_by(usuario_id=request.form["usuario_id"])
     # Ordenar y paginar
-    registros = consulta.order_by(Tarea.creado.desc()).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Tarea.creado, Tarea.id], start, rows_per_page, descendente=True, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -58,7 +70,7 @@ def datatable_json():
                 "ha_terminado": resultado.ha_terminado,
                 "mensaje": resultado.mensaje,
                 "usuario": {
-                    "email": resultado.usuario.email,
+                    "email": resultado.usuario_email,
                     "url": url_for("usuarios.detail", usuario_id=resultado.usuario_id)
                     if current_user.can_view("USUARIOS")
                     else "",
@@ -80,6 +92,7 @@ def list_active():
         filtros=json.dumps({"estatus": "A"}),
         titulo="Tareas",
         estatus="A",
+        colas=estado_colas(current_app.task_queues),
     )
 
 
@@ -101,7 +114,29 @@ def list_inactive():
 def detail(tarea_id):
     """Detalle de un Tarea"""
     tarea = Tarea.query.get_or_404(tarea_id)
-    return render_template("tareas/detail.jinja2", tarea=tarea)
+    avance = tarea.get_avance() if not tarea.ha_terminado else {}
+    return render_template("tareas/detail.jinja2", tarea=tarea, avance=avance)
+
+
+@tareas.route("/tareas/<tarea_id>/eventos")
+@login_required
+def events(tarea_id):
+    """Transmitir el avance de una Tarea con eventos enviados por el servidor"""
+    tarea = Tarea.query.get_or_404(tarea_id)
+    ha_terminado = tarea.ha_terminado
+    redis = current_app.redis
+
+    # La transmision no usa la base de datos, asi la sesion se libera al terminar la peticion
+    def consultar_avance():
+        avance = leer_avance(redis, tarea_id)
+        if ha_terminado:
+            avance["progress"] = "100"
+        return avance
+
+    # Sin EVENTOS_EN_VIVO, como en App Engine standard que no transmite, se entrega el avance y el navegador vuelve a preguntar
+    duracion = DURACION if current_app.config.get("EVENTOS_EN_VIVO", True) else 0
+    eventos = transmitir_canal(redis, PROGRESS_CHANNEL.format(tarea_id), consultar_avance, avance_terminado, duracion)
+    return Response(eventos, mimetype="text/event-stream", headers=ENCABEZADOS)
 
 
 @tareas.route("/tareas/<tarea_id>/xlsx")
@@ -128,18 +163,50 @@ def download_xlsx(tarea_id):
         flash("Esta tarea no tiene un archivo XLSX para descargar", "warning")
         return redirect(url_for("tareas.detail", tarea_id=tarea.id))
 
-    # Obtener el contenido del archivo desde Google Storage
+    # Redirigir a una URL firmada o transmitir por bloques el archivo XLSX desde el deposito
     try:
-        descarga_contenido = get_file_from_gcs(
+        return descargar_archivo(
             bucket_name=current_app.config["CLOUD_STORAGE_DEPOSITO"],
             blob_name=get_blob_name_from_url(tarea.url),
+            descarga_nombre=descarga_nombre,
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
     except MyAnyError as error:
         flash(str(error), "danger")
         return redirect(url_for("tareas.detail", tarea_id=tarea.id))
 
-    # Descargar un archivo XLSX
-    response = make_response(descarga_contenido)
-    response.headers["Content-Type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    response.headers["Content-Disposition"] = f"attachment; filename={descarga_nombre}"
-    return response
+
+@tareas.route("/tareas/<tarea_id>/zip")
+@login_required
+def download_zip(tarea_id):
+    """Descargar archivo ZIP de una Tarea"""
+
+    # Consultar la Tarea
+    tarea = Tarea.query.get_or_404(tarea_id)
+
+    # El ZIP tiene los CFDI de todas las personas, solo lo descarga quien lanzo la tarea o quien puede ver los timbrados
+    if tarea.usuario_id != current_user.id and not current_user.can_view("TIMBRADOS"):
+        abort(403)
+
+    # Si no tiene URL, regidir a la página de detalle
+    if tarea.url == "":
+        flash("Esta tarea no tiene un URL para descargar", "warning")
+        return redirect(url_for("tareas.detail", tarea_id=tarea.id))
+
+    # Validar que el nombre del archivo termine en .zip
+    descarga_nombre = tarea.archivo
+    if not descarga_nombre.endswith(".zip"):
+        flash("Esta tarea no tiene un archivo ZIP para descargar", "warning")
+        return redirect(url_for("tareas.detail", tarea_id=tarea.id))
+
+    # Redirigir a una URL firmada o transmitir por bloques el archivo ZIP desde el deposito
+    try:
+        return descargar_archivo(
+            bucket_name=current_app.config["CLOUD_STORAGE_DEPOSITO"],
+            blob_name=get_blob_name_from_url(tarea.url),
+            descarga_nombre=descarga_nombre,
+            content_type="application/zip",
+        )
+    except MyAnyError as error:
+        flash(str(error), "danger")
+        return redirect(url_for("tareas.detail", tarea_id=tarea.id))
@@ -0,0 +1,196 @@
+"""
+Timbrados, tareas en el fondo
+"""
+import logging
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+import pytz
+
+from config.settings import get_settings
+from lib.depositos import HILOS, TAMANO_BLOQUE, obtener_deposito
+from lib.exceptions import MyAnyError, MyEmptyError, MyMissingConfigurationError, MyNotExistsError, MyNotValidParamError
+from lib.google_cloud_storage import get_blob_name_from_url
+from lib.tasks import report_task_progress, set_task_error, set_task_progress
+from perseo.app import get_app
+from perseo.blueprints.centros_trabajos.models import CentroTrabajo
+from perseo.blueprints.nominas.models import Nomina
+from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.quincenas.models import Quincena
+from perseo.blueprints.timbrados.models import Timbrado
+from perseo.extensions import database
+
+GCS_BASE_DIRECTORY = "timbrados_zip"
+TIMEZONE = "America/Mexico_City"
+TAMANO_EN_MEMORIA = 1024 * 1024  # Los archivos descargados mas grandes que esto se guardan en disco temporal
+PENDIENTES_POR_HILO = 2  # Descargas en vuelo por hilo, para que los temporales no se acumulen si el ZIP es mas lento
+
+bitacora = logging.getLogger(__name__)
+bitacora.setLevel(logging.INFO)
+formato = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
+empunadura = logging.FileHandler("logs/timbrados.log")
+empunadura.setFormatter(formato)
+bitacora.addHandler(empunadura)
+
+app = get_app()
+
+
+def descargar_temporal(deposito, blob_name: str):
+    """Descargar por bloques un archivo del deposito a un archivo temporal, entrega el temporal al inicio"""
+    temporal = tempfile.SpooledTemporaryFile(max_size=TAMANO_EN_MEMORIA)
+    archivo, _, _ = deposito.abrir(blob_name)
+    with archivo:
+        shutil.copyfileobj(archivo, temporal, TAMANO_BLOQUE)
+    temporal.seek(0)
+    return temporal
+
+
+def descargar_en_paralelo(deposito, archivos: list, hilos: int = HILOS):
+    """Descargar los archivos (nombre, blob_name) con un limite de hilos, entrega (nombre, temporal, error) conforme llegan"""
+    hilos = max(1, hilos)
+    por_descargar = iter(archivos)
+    en_vuelo = {}
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        while True:
+            # Lanzar descargas hasta tener a lo mas PENDIENTES_POR_HILO por hilo sin entregar
+            for nombre, blob_name in islice(por_descargar, PENDIENTES_POR_HILO * hilos - len(en_vuelo)):
+                en_vuelo[ejecutor.submit(descargar_temporal, deposito, blob_name)] = nombre
+            if len(en_vuelo) == 0:
+                break
+
+            # Esperar a que termine al menos una y entregar las que terminaron
+            terminados, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                nombre = en_vuelo.pop(futuro)
+                try:
+                    yield nombre, futuro.result(), None
+                except (MyAnyError, OSError) as error:
+                    yield nombre, None, error
+
+
+def exportar_zip(
+    quincena_clave: str,
+    tipo: str = "SALARIO",
+    centro_trabajo_clave: str = "",
+    rfcs: list = None,
+    hilos: int = HILOS,
+) -> tuple[str, str, str]:
+    """Exportar los archivos PDF y XML de los Timbrados de una quincena a un archivo ZIP"""
+
+    # Validar el deposito
+    settings = get_settings()
+    if settings.CLOUD_STORAGE_DEPOSITO == "":
+        raise MyMissingConfigurationError("No esta configurado el deposito de archivos.")
+    deposito = obtener_deposito(settings.CLOUD_STORAGE_DEPOSITO)
+
+    # Validar la quincena
+    quincena = Quincena.query.filter_by(clave=quincena_clave).first()
+    if quincena is None:
+        raise MyNotExistsError(f"No existe la quincena {quincena_clave}")
+
+    # Validar el tipo
+    if tipo not in Nomina.TIPOS:
+        raise MyNotValidParamError(f"El tipo {tipo} no es valido")
+
+    # Consultar los Timbrados vigentes de las nominas de la quincena, con el RFC de la persona
+    consulta = (
+        database.session.query(Timbrado, Persona.rfc)
+        .join(Nomina, Nomina.timbrado_id == Timbrado.id)
+        .join(Persona, Persona.id == Nomina.persona_id)
+        .filter(Nomina.quincena_id == quincena.id)
+        .filter(Nomina.tipo == tipo)
+        .filter(Nomina.estatus == "A")
+        .filter(Timbrado.estatus == "A")
+    )
+    if centro_trabajo_clave != "":
+        consulta = consulta.join(CentroTrabajo, CentroTrabajo.id == Nomina.centro_trabajo_id)
+        consulta = consulta.filter(CentroTrabajo.clave == centro_trabajo_clave)
+    if rfcs:
+        consulta = consulta.filter(Persona.rfc.in_(rfcs))
+
+    # Elaborar la lista de archivos, cada uno con su nombre dentro del ZIP y su nombre en el deposito
+    archivos = []
+    for timbrado, rfc in consulta.order_by(Persona.rfc, Timbrado.id).all():
+        if timbrado.url_pdf != "":
+            archivo_pdf = timbrado.archivo_pdf if timbrado.archivo_pdf != "" else f"{timbrado.tfd_uuid}.pdf"
+            archivos.append((f"{rfc}/{archivo_pdf}", get_blob_name_from_url(timbrado.url_pdf)))
+        if timbrado.url_xml != "":
+            archivo_xml = timbrado.archivo_xml if timbrado.archivo_xml != "" else f"{timbrado.tfd_uuid}.xml"
+            archivos.append((f"{rfc}/{archivo_xml}", get_blob_name_from_url(timbrado.url_xml)))
+
+    # Si no hay archivos, causar error
+    if len(archivos) == 0:
+        mensaje_error = f"No hay archivos de timbrados de {tipo} en la quincena {quincena_clave}"
+        bitacora.error(mensaje_error)
+        raise MyEmptyError(mensaje_error)
+
+    # Determinar el nombre del archivo ZIP y la ruta en el deposito con el año y el número de mes en dos digitos
+    ahora = datetime.now(tz=pytz.timezone(TIMEZONE))
+    nombre_archivo_zip = f"timbrados_{quincena_clave}_{tipo.replace(' ', '_').lower()}_{ahora.strftime('%Y-%m-%d_%H%M%S')}.zip"
+    ruta_gcs = Path(GCS_BASE_DIRECTORY, ahora.strftime("%Y"), ahora.strftime("%m"))
+
+    # El ZIP puede pesar varios GB, se escribe en un directorio temporal que se elimina al terminar aunque falle
+    with tempfile.TemporaryDirectory(prefix="timbrados_zip_") as directorio:
+        ruta_local_archivo_zip = Path(directorio, nombre_archivo_zip)
+
+        # Descargar en paralelo y escribir en el ZIP cada archivo en cuanto llega
+        contador = 0
+        faltantes = []
+        with zipfile.ZipFile(ruta_local_archivo_zip, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archivo_zip:
+            for numero, (nombre, temporal, error) in enumerate(descargar_en_paralelo(deposito, archivos, hilos), start=1):
+                if error is not None:
+                    bitacora.warning("No se pudo descargar %s: %s", nombre, str(error))
+                    faltantes.append(nombre)
+                    continue
+                with temporal, archivo_zip.open(nombre, "w", force_zip64=True) as destino:
+                    shutil.copyfileobj(temporal, destino, TAMANO_BLOQUE)
+                contador += 1
+
+                # Reportar el avance en Redis, el 100 es hasta que se suba el ZIP
+                report_task_progress(numero, len(archivos), "Agregando archivos al ZIP", f"Se han agregado {contador} archivos")
+
+        # Si no se pudo agregar ningun archivo, causar error
+        if contador == 0:
+            mensaje_error = f"No se pudo descargar ninguno de los {len(archivos)} archivos de timbrados"
+            bitacora.error(mensaje_error)
+            raise MyEmptyError(mensaje_error)
+
+        # Subir el archivo ZIP sin cargarlo en memoria
+        public_url = deposito.subir_archivo(f"{ruta_gcs}/{nombre_archivo_zip}", ruta_local_archivo_zip, "application/zip")
+        bitacora.info("Se subio el archivo ZIP a %s", public_url)
+
+    # Entregar mensaje de termino, el nombre del archivo ZIP y la URL publica
+    mensaje_termino = f"Se exportaron {contador} archivos de timbrados a {nombre_archivo_zip}"
+    if len(faltantes) > 0:
+        mensaje_termino += f", faltaron {len(faltantes)}: {', '.join(faltantes[:10])}"
+    bitacora.info(mensaje_termino)
+    return mensaje_termino, nombre_archivo_zip, public_url
+
+
+def lanzar_exportar_zip(
+    quincena_clave: str,
+    tipo: str = "SALARIO",
+    centro_trabajo_clave: str = "",
+    rfcs: list = None,
+):
+    """Exportar los archivos PDF y XML de los Timbrados de una quincena a un archivo ZIP"""
+
+    # Iniciar la tarea en el fondo
+    set_task_progress(0, f"Exportando los timbrados de {tipo} de {quincena_clave} a un archivo ZIP...")
+
+    # Ejecutar el creador
+    try:
+        mensaje_termino, nombre_archivo_zip, public_url = exportar_zip(quincena_clave, tipo, centro_trabajo_clave, rfcs)
+    except MyAnyError as error:
+        mensaje_error = str(error)
+        set_task_error(mensaje_error)
+        return mensaje_error
+
+    # Terminar la tarea en el fondo y entregar el mensaje de termino
+    set_task_progress(100, mensaje_termino, nombre_archivo_zip, public_url)
+    return mensaje_termino
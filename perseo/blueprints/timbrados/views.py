@@ -3,13 +3,14 @@ Timbrados, vistas
 """
 import json
 
-from flask import Blueprint, current_app, flash, make_response, redirect, render_template, request, url_for
-from flask_login import login_required
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
+from lib.descargas import descargar_archivo
 from lib.exceptions import MyAnyError
-from lib.google_cloud_storage import get_blob_name_from_url, get_file_from_gcs
-from lib.safe_string import safe_quincena, safe_rfc
+from lib.google_cloud_storage import get_blob_name_from_url
+from lib.safe_string import safe_clave, safe_quincena, safe_rfc, safe_string
 from perseo.blueprints.nominas.models import Nomina
 from perseo.blueprints.permisos.models import Permiso
 from perseo.blueprints.personas.models import Persona
@@ -18,6 +19,13 @@ from perseo.blueprints.timbrados.models import Timbrado
 from perseo.blueprints.usuarios.decorators import permission_required
 
 MODULO = "TIMBRADOS"
+COLUMNAS_DATATABLE = {
+    "tfd_uuid": "tfd_uuid",
+    "id": "id",
+    "nomina_quincena_clave": "nomina.quincena.clave",
+    "nomina_persona_rfc": "nomina.persona.rfc",
+    "nomina_persona_nombre_completo": "nomina.persona.nombre_completo",
+}
 
 timbrados = Blueprint("timbrados", __name__, template_folder="templates")
 
@@ -59,8 +67,8 @@ def datatable_json():
         consulta = consulta.join(Persona)
         consulta = consulta.filter(Persona.rfc.contains(safe_rfc(request.form["persona_rfc"], search_fragment=True)))
     # Ordenar y paginar
-    registros = consulta.order_by(Timbrado.id.desc()).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Timbrado.id], start, rows_per_page, descendente=True, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -70,9 +78,9 @@ def datatable_json():
                     "tfd_uuid": resultado.tfd_uuid,
                     "url": url_for("timbrados.detail", timbrado_id=resultado.id),
                 },
-                "quincena_clave": resultado.nomina.quincena.clave,
-                "persona_rfc": resultado.nomina.persona.rfc,
-                "persona_nombre_completo": resultado.nomina.persona.nombre_completo,
+                "quincena_clave": resultado.nomina_quincena_clave,
+                "persona_rfc": resultado.nomina_persona_rfc,
+                "persona_nombre_completo": resultado.nomina_persona_nombre_completo,
             }
         )
     # Entregar JSON
@@ -126,22 +134,18 @@ def download_pdf(timbrado_id):
     if descarga_nombre == "":
         descarga_nombre = f"{timbrado.tfd_uuid}.pdf"
 
-    # Obtener el contenido del archivo desde Google Storage
+    # Redirigir a una URL firmada o transmitir por bloques el archivo PDF desde el deposito
     try:
-        descarga_contenido = get_file_from_gcs(
+        return descargar_archivo(
             bucket_name=current_app.config["CLOUD_STORAGE_DEPOSITO"],
             blob_name=get_blob_name_from_url(timbrado.url_pdf),
+            descarga_nombre=descarga_nombre,
+            content_type="application/pdf",
         )
     except MyAnyError as error:
         flash(str(error), "danger")
         return redirect(url_for("timbrados.detail", timbrado_id=timbrado.id))
 
-    # Descargar un archivo PDF
-    response = make_response(descarga_contenido)
-    response.headers["Content-Type"] = "application/pdf"
-    response.headers["Content-Disposition"] = f"attachment; filename={descarga_nombre}"
-    return response
-
 
 @timbrados.route("/timbrados/<int:timbrado_id>/xml")
 def download_xml(timbrado_id):
@@ -160,18 +164,57 @@ def download_xml(timbrado_id):
     if descarga_nombre == "":
         descarga_nombre = f"{timbrado.tfd_uuid}.xml"
 
-    # Obtener el contenido del archivo desde Google Storage
+    # Redirigir a una URL firmada o transmitir por bloques el archivo XML desde el deposito
     try:
-        descarga_contenido = get_file_from_gcs(
+        return descargar_archivo(
             bucket_name=current_app.config["CLOUD_STORAGE_DEPOSITO"],
             blob_name=get_blob_name_from_url(timbrado.url_xml),
+            descarga_nombre=descarga_nombre,
+            content_type="text/xml",
         )
     except MyAnyError as error:
         flash(str(error), "danger")
         return redirect(url_for("timbrados.detail", timbrado_id=timbrado.id))
 
-    # Descargar un archivo XML
-    response = make_response(descarga_contenido)
-    response.headers["Content-Type"] = "text/xml"
-    response.headers["Content-Disposition"] = f"attachment; filename={descarga_nombre}"
-    return response
+
+@timbrados.route("/timbrados/exportar_zip/<quincena_clave>")
+@permission_required(MODULO, Permiso.ADMINISTRAR)
+def exportar_zip(quincena_clave):
+    """Lanzar tarea en el fondo para exportar los archivos PDF y XML de los Timbrados de una quincena a un archivo ZIP"""
+
+    # Validar la quincena
+    try:
+        quincena_clave = safe_quincena(quincena_clave)
+    except ValueError:
+        flash("Quincena invalida", "warning")
+        return redirect(url_for("timbrados.list_active"))
+
+    # Validar el tipo, por defecto SALARIO
+    tipo = safe_string(request.args.get("tipo", "SALARIO"))
+    if tipo not in Nomina.TIPOS:
+        flash("Tipo invalido", "warning")
+        return redirect(url_for("timbrados.list_active"))
+
+    # Filtros opcionales: la clave del centro de trabajo y una lista de RFC separados por comas
+    centro_trabajo_clave = safe_clave(request.args.get("centro_trabajo_clave", ""))
+    try:
+        rfcs = [safe_rfc(rfc) for rfc in request.args.get("rfcs", "").split(",") if rfc.strip() != ""]
+    except ValueError:
+        flash("Hay un RFC invalido en el filtro", "warning")
+        return redirect(url_for("timbrados.list_active"))
+
+    # Lanzar la tarea en el fondo
+    tarea = current_user.launch_task(
+        comando="timbrados.tasks.lanzar_exportar_zip",
+        mensaje=f"Exportando los timbrados de {tipo} de {quincena_clave} a un archivo ZIP...",
+        quincena_clave=quincena_clave,
+        tipo=tipo,
+        centro_trabajo_clave=centro_trabajo_clave,
+        rfcs=rfcs,
+        reutilizar_tablas=["centros_trabajos", "nominas", "personas", "quincenas", "timbrados"],
+    )
+    if tarea.ha_terminado:
+        flash("No hay cambios desde la exportacion anterior, se entrega su archivo.", "info")
+    else:
+        flash("Se ha lanzado esta tarea en el fondo.", "info")
+    return redirect(url_for("tareas.detail", tarea_id=tarea.id))
@@ -0,0 +1,113 @@
+"""
+Usuarios, cache de permisos
+
+- consultar_permisos obtiene con una sola consulta el nivel mas alto de cada modulo y los modulos del menu principal
+- obtener_permisos los guarda en Redis por usuario, la llave lleva las versiones de las tablas de permisos,
+  roles, usuarios_roles y modulos; al hacer commit de cambios en ellas sube su version (vea lib/datatables.py)
+  y los permisos guardados dejan de usarse sin tener que borrarlos
+- Sin Redis o si falla, se consulta la base de datos
+
+Ejemplo de uso
+
+    permisos, modulos_menu_principal = obtener_permisos(usuario.id)
+    if permisos.get("NOMINAS", 0) >= Permiso.VER:
+        ...
+
+"""
+import json
+from typing import NamedTuple
+
+from flask import current_app, has_app_context
+from redis.exceptions import RedisError
+from sqlalchemy import func
+
+from lib.datatables import version_tablas
+from perseo.blueprints.modulos.models import Modulo
+from perseo.blueprints.permisos.models import Permiso
+from perseo.blueprints.usuarios_roles.models import UsuarioRol
+from perseo.extensions import database
+
+PERMISOS_KEY = "perseo:permisos:{}:{}"
+PERMISOS_TTL = 3600  # Segundos que se conservan los permisos de un usuario
+PERMISOS_TABLAS = ["modulos", "permisos", "roles", "usuarios_roles"]
+
+
+class ModuloMenu(NamedTuple):
+    """Modulo en el menu principal"""
+
+    nombre: str
+    nombre_corto: str
+    icono: str
+    ruta: str
+
+
+class PermisosMixin:
+    """Revisar los permisos de quien tenga el diccionario permisos con el nivel de cada modulo"""
+
+    def can(self, modulo_nombre: str, permission: int):
+        """¿Tiene permiso?"""
+        if modulo_nombre in self.permisos:
+            return self.permisos[modulo_nombre] >= permission
+        return False
+
+    def can_view(self, modulo_nombre: str):
+        """¿Tiene permiso para ver?"""
+        return self.can(modulo_nombre, Permiso.VER)
+
+    def can_edit(self, modulo_nombre: str):
+        """¿Tiene permiso para editar?"""
+        return self.can(modulo_nombre, Permiso.MODIFICAR)
+
+    def can_insert(self, modulo_nombre: str):
+        """¿Tiene permiso para agregar?"""
+        return self.can(modulo_nombre, Permiso.CREAR)
+
+    def can_admin(self, modulo_nombre: str):
+        """¿Tiene permiso para administrar?"""
+        return self.can(modulo_nombre, Permiso.ADMINISTRAR)
+
+
+def consultar_permisos(usuario_id: int) -> tuple[dict, list]:
+    """Consultar los permisos y los modulos del menu principal de un usuario en una sola consulta"""
+    consulta = (
+        database.session.query(Modulo.nombre, Modulo.nombre_corto, Modulo.icono, Modulo.ruta, Modulo.en_navegacion)
+        .add_columns(func.max(Permiso.nivel).label("nivel"))
+        .select_from(UsuarioRol)
+        .join(Permiso, Permiso.rol_id == UsuarioRol.rol_id)
+        .join(Modulo, Modulo.id == Permiso.modulo_id)
+        .filter(UsuarioRol.usuario_id == usuario_id)
+        .filter(UsuarioRol.estatus == "A")
+        .filter(Permiso.estatus == "A")
+        .group_by(Modulo.nombre, Modulo.nombre_corto, Modulo.icono, Modulo.ruta, Modulo.en_navegacion)
+    )
+    permisos = {}
+    modulos_menu_principal = []
+    for renglon in consulta.all():
+        permisos[renglon.nombre] = renglon.nivel
+        if renglon.nivel > 0 and renglon.en_navegacion:
+            modulos_menu_principal.append(ModuloMenu(renglon.nombre, renglon.nombre_corto, renglon.icono, renglon.ruta))
+    return permisos, sorted(modulos_menu_principal, key=lambda modulo: modulo.nombre_corto)
+
+
+def obtener_permisos(usuario_id: int) -> tuple[dict, list]:
+    """Entregar los permisos y los modulos del menu principal de un usuario, de Redis si ya estan guardados"""
+    redis = getattr(current_app, "redis", None) if has_app_context() else None
+    llave = None
+    if redis is not None:
+        try:
+            llave = PERMISOS_KEY.format(version_tablas(redis, PERMISOS_TABLAS), usuario_id)
+            guardado = redis.get(llave)
+            if guardado is not None:
+                datos = json.loads(guardado)
+                return datos["permisos"], [ModuloMenu(*modulo) for modulo in datos["menu"]]
+        except RedisError:
+            llave = None
+
+    # Consultar y guardar en Redis
+    permisos, modulos_menu_principal = consultar_permisos(usuario_id)
+    if llave is not None:
+        try:
+            redis.set(llave, json.dumps({"permisos": permisos, "menu": modulos_menu_principal}), ex=PERMISOS_TTL)
+        except RedisError:
+            pass
+    return permisos, modulos_menu_principal
@@ -1,19 +1,24 @@
 """
 Usuarios, modelos
 """
+from functools import cached_property
+
 from flask import current_app
 from flask_login import UserMixin
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, func
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 
 from lib.universal_mixin import UniversalMixin
-from perseo.blueprints.permisos.models import Permiso
+from perseo.blueprints.tareas.candados import apartar_lanzamiento
+from perseo.blueprints.tareas.colas import clase_del_comando
 from perseo.blueprints.tareas.models import Tarea
+from perseo.blueprints.usuarios.cache import PermisosMixin, obtener_permisos
 from perseo.blueprints.usuarios_roles.models import UsuarioRol
 from perseo.extensions import database, pwd_context
 
 
-class Usuario(database.Model, UserMixin, UniversalMixin):
+class Usuario(database.Model, UserMixin, UniversalMixin, PermisosMixin):
     """Usuario"""
 
     # Nombre de la tabla
@@ -45,50 +50,30 @@ class Usuario(database.Model, UserMixin, UniversalMixin):
     tareas = relationship("Tarea", back_populates="usuario")
     usuarios_roles = relationship("UsuarioRol", back_populates="usuario")
 
-    # Propiedades
-    modulos_menu_principal_consultados = []
-    permisos_consultados = {}
-
-    @property
+    @hybrid_property
     def nombre(self):
         """Junta nombres, apellido primero y apellido segundo"""
-        return self.nombres + " " + self.apellido_primero + " " + self.apellido_segundo
+        return self.nombres + " " + self.apellido_primero + " " + (self.apellido_segundo or "")
+
+    @nombre.expression
+    def nombre(cls):
+        """Junta nombres y apellidos como expresion SQL, para proyectarlo en las consultas"""
+        return cls.nombres + " " + cls.apellido_primero + " " + func.coalesce(cls.apellido_segundo, "")
+
+    @cached_property
+    def permisos_y_menu(self):
+        """Permisos y modulos del menu principal, se obtienen una vez por instancia"""
+        return obtener_permisos(self.id)
 
     @property
     def modulos_menu_principal(self):
-        """Elaborar listado con los modulos ordenados para el menu principal"""
-        if len(self.modulos_menu_principal_consultados) > 0:
-            return self.modulos_menu_principal_consultados
-        modulos = []
-        modulos_nombres = []
-        for usuario_rol in self.usuarios_roles:
-            if usuario_rol.estatus == "A":
-                for permiso in usuario_rol.rol.permisos:
-                    if (
-                        permiso.modulo.nombre not in modulos_nombres
-                        and permiso.estatus == "A"
-                        and permiso.nivel > 0
-                        and permiso.modulo.en_navegacion
-                    ):
-                        modulos.append(permiso.modulo)
-                        modulos_nombres.append(permiso.modulo.nombre)
-        self.modulos_menu_principal_consultados = sorted(modulos, key=lambda x: x.nombre_corto)
-        return self.modulos_menu_principal_consultados
+        """Listado con los modulos ordenados para el menu principal"""
+        return self.permisos_y_menu[1]
 
     @property
     def permisos(self):
-        """Entrega un diccionario con todos los permisos"""
-        if len(self.permisos_consultados) > 0:
-            return self.permisos_consultados
-        self.permisos_consultados = {}
-        for usuario_rol in self.usuarios_roles:
-            if usuario_rol.estatus == "A":
-                for permiso in usuario_rol.rol.permisos:
-                    if permiso.estatus == "A":
-                        etiqueta = permiso.modulo.nombre
-                        if etiqueta not in self.permisos_consultados or permiso.nivel > self.permisos_consultados[etiqueta]:
-                            self.permisos_consultados[etiqueta] = permiso.nivel
-        return self.permisos_consultados
+        """Entrega un diccionario con el nivel mas alto de cada modulo"""
+        return self.permisos_y_menu[0]
 
     @classmethod
     def find_by_identity(cls, identity):
@@ -106,38 +91,36 @@ class Usuario(database.Model, UserMixin, UniversalMixin):
             return pwd_context.verify(password, self.contrasena)
         return True
 
-    def can(self, modulo_nombre: str, permission: int):
-        """¿Tiene permiso?"""
-        if modulo_nombre in self.permisos:
-            return self.permisos[modulo_nombre] >= permission
-        return False
-
-    def can_view(self, modulo_nombre: str):
-        """¿Tiene permiso para ver?"""
-        return self.can(modulo_nombre, Permiso.VER)
-
-    def can_edit(self, modulo_nombre: str):
-        """¿Tiene permiso para editar?"""
-        return self.can(modulo_nombre, Permiso.MODIFICAR)
-
-    def can_insert(self, modulo_nombre: str):
-        """¿Tiene permiso para agregar?"""
-        return self.can(modulo_nombre, Permiso.CREAR)
-
-    def can_admin(self, modulo_nombre: str):
-        """¿Tiene permiso para administrar?"""
-        return self.can(modulo_nombre, Permiso.ADMINISTRAR)
-
     def get_roles(self):
         """Obtener roles"""
         usuarios_roles = UsuarioRol.query.filter_by(usuario_id=self.id).filter_by(estatus="A").all()
         return [usuario_rol.rol.nombre for usuario_rol in usuarios_roles]
 
-    def launch_task(self, comando, mensaje, *args, **kwargs):
-        """Lanzar tarea en el fondo"""
-        rq_job = current_app.task_queue.enqueue(f"perseo.blueprints.{comando}", *args, **kwargs)
-        tarea = Tarea(id=rq_job.get_id(), comando=comando, mensaje=mensaje, usuario=self)
+    def launch_task(
+        self,
+        comando,
+        mensaje,
+        *args,
+        llave: dict = None,
+        reutilizar_tablas: list = None,
+        tarea_apartada: str = None,
+        **kwargs,
+    ):
+        """Lanzar tarea en el fondo, si una igual esta en la cola o en ejecucion se entrega esa (vea tareas/candados.py)"""
+        # Por defecto la tarea se identifica por todos sus argumentos
+        if llave is None:
+            llave = {"args": args, "kwargs": kwargs}
+        # Si la vista no aparto antes el candado, apartarlo ahora; si hay una igual en curso o reutilizable se entrega esa
+        tarea_id = tarea_apartada
+        if tarea_id is None:
+            tarea_id, es_nueva = apartar_lanzamiento(comando, llave, reutilizar_tablas)
+            if not es_nueva:
+                return Tarea.query.get(tarea_id) or Tarea(id=tarea_id, comando=comando, mensaje=mensaje)
+        # Guardar la tarea antes de encolarla para que el worker la encuentre
+        tarea = Tarea(id=tarea_id, comando=comando, mensaje=mensaje, usuario=self)
         tarea.save()
+        clase = clase_del_comando(comando)
+        current_app.task_queues[clase].enqueue(f"perseo.blueprints.{comando}", *args, job_id=tarea_id, **kwargs)
         return tarea
 
     def get_tasks_in_progress(self):
@@ -0,0 +1,129 @@
+"""
+Usuarios, usuario autenticado sin consultar la base de datos
+
+- UsuarioPrincipal es lo que Flask-Login entrega como current_user: id, email, nombre, estatus,
+  permisos y modulos del menu principal; es una tupla y no esta ligado a la sesion de SQLAlchemy
+- cargar_principal lo toma de Redis, o lo arma con una consulta del usuario mas la de sus permisos;
+  la llave lleva las versiones de las tablas usuarios, permisos, roles, usuarios_roles y modulos,
+  asi que cambiar el estatus de un usuario o sus roles lo invalida al hacer commit
+- olvidar_principal lo borra de Redis al salir del sistema
+- Para asignar el usuario en un modelo use usuario_id=current_user.id; si necesita el registro completo
+  use obtener_usuario, que si consulta la base de datos
+
+Ejemplo de uso
+
+    @login_manager.user_loader
+    def load_user(uid):
+        return cargar_principal(uid)
+
+"""
+import json
+from typing import NamedTuple
+
+from flask import current_app, has_app_context
+from redis.exceptions import RedisError
+
+from lib.datatables import version_tablas
+from perseo.blueprints.usuarios.cache import PERMISOS_TABLAS, ModuloMenu, PermisosMixin, obtener_permisos
+from perseo.blueprints.usuarios.models import Usuario
+
+PRINCIPAL_KEY = "perseo:usuarios:principal:{}:{}"
+PRINCIPAL_TTL = 300  # Segundos que se conserva el usuario autenticado
+PRINCIPAL_TABLAS = ["usuarios"] + PERMISOS_TABLAS
+
+
+class DatosPrincipal(NamedTuple):
+    """Datos del usuario autenticado"""
+
+    id: int
+    email: str
+    nombre: str
+    estatus: str
+    permisos: dict
+    modulos_menu_principal: tuple
+
+
+class UsuarioPrincipal(DatosPrincipal, PermisosMixin):
+    """Usuario autenticado para Flask-Login, con los metodos de permisos de Usuario"""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    @property
+    def is_active(self):
+        """¿Es activo?"""
+        return self.estatus == "A"
+
+    def get_id(self):
+        """Identificador para la sesion de Flask-Login"""
+        return str(self.id)
+
+    def obtener_usuario(self) -> Usuario:
+        """Consultar el registro completo del usuario"""
+        return Usuario.query.get(self.id)
+
+    def launch_task(self, comando, mensaje, *args, **kwargs):
+        """Lanzar tarea en el fondo"""
+        return self.obtener_usuario().launch_task(comando, mensaje, *args, **kwargs)
+
+    def get_tasks_in_progress(self):
+        """Obtener tareas"""
+        return self.obtener_usuario().get_tasks_in_progress()
+
+    def get_roles(self):
+        """Obtener roles"""
+        return self.obtener_usuario().get_roles()
+
+
+def llave_principal(redis, usuario_id: int) -> str:
+    """Llave en Redis del usuario autenticado, con las versiones de las tablas de las que depende"""
+    return PRINCIPAL_KEY.format(version_tablas(redis, PRINCIPAL_TABLAS), usuario_id)
+
+
+def consultar_principal(usuario_id: int):
+    """Armar el usuario autenticado consultando la base de datos, entrega None si no existe"""
+    usuario = Usuario.query.get(usuario_id)
+    if usuario is None:
+        return None
+    permisos, modulos_menu_principal = obtener_permisos(usuario.id)
+    return UsuarioPrincipal(usuario.id, usuario.email, usuario.nombre, usuario.estatus, permisos, tuple(modulos_menu_principal))
+
+
+def cargar_principal(uid: str):
+    """Entregar el usuario autenticado, de Redis si ya esta guardado"""
+    try:
+        usuario_id = int(uid)
+    except (TypeError, ValueError):
+        return None
+    redis = getattr(current_app, "redis", None) if has_app_context() else None
+    llave = None
+    if redis is not None:
+        try:
+            llave = llave_principal(redis, usuario_id)
+            guardado = redis.get(llave)
+            if guardado is not None:
+                datos = json.loads(guardado)
+                datos["modulos_menu_principal"] = tuple(ModuloMenu(*modulo) for modulo in datos["modulos_menu_principal"])
+                return UsuarioPrincipal(**datos)
+        except RedisError:
+            llave = None
+
+    # Consultar y guardar en Redis
+    principal = consultar_principal(usuario_id)
+    if principal is not None and llave is not None:
+        try:
+            redis.set(llave, json.dumps(principal._asdict()), ex=PRINCIPAL_TTL)
+        except RedisError:
+            pass
+    return principal
+
+
+def olvidar_principal(usuario_id: int) -> None:
+    """Borrar de Redis el usuario autenticado, por ejemplo al salir del sistema"""
+    redis = getattr(current_app, "redis", None) if has_app_context() else None
+    if redis is None:
+        return
+    try:
+        redis.delete(llave_principal(redis, usuario_id))
+    except RedisError:
+        pass
@@ -13,7 +13,7 @@ from flask_login import current_user, login_required, login_user, logout_user
 from pytz import timezone
 
 from config.firebase import get_firebase_settings
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.pwgen import generar_contrasena
 from lib.safe_next_url import safe_next_url
 from lib.safe_string import CONTRASENA_REGEXP, EMAIL_REGEXP, TOKEN_REGEXP, safe_email, safe_message, safe_string
@@ -25,10 +25,19 @@ from perseo.blueprints.permisos.models import Permiso
 from perseo.blueprints.usuarios.decorators import anonymous_required, permission_required
 from perseo.blueprints.usuarios.forms import AccesoForm, UsuarioForm
 from perseo.blueprints.usuarios.models import Usuario
+from perseo.blueprints.usuarios.principal import olvidar_principal
 
 HTTP_REQUEST = google.auth.transport.requests.Request()
 
 MODULO = "USUARIOS"
+COLUMNAS_DATATABLE = {
+    "email": "email",
+    "id": "id",
+    "nombre": "nombre",
+    "puesto": "puesto",
+    "autoridad_clave": "autoridad.clave",
+    "autoridad_id": "autoridad_id",
+}
 
 usuarios = Blueprint("usuarios", __name__, template_folder="templates")
 
@@ -111,6 +120,7 @@ def logout():
         tipo="SALIO",
         direccion_ip=request.remote_addr,
     ).save()
+    olvidar_principal(current_user.id)
     logout_user()
     flash("Ha salido de este sistema.", "success")
     return redirect(url_for("usuarios.login"))
@@ -125,6 +135,7 @@ def profile():
     formato_fecha = "%Y-%m-%d %H:%M %p"
     return render_template(
         "usuarios/profile.jinja2",
+        usuario=Usuario.query.get_or_404(current_user.id),
         ahora_utc_str=ahora_utc.strftime(formato_fecha),
         ahora_mx_coah_str=ahora_mx_coah.strftime(formato_fecha),
     )
@@ -157,8 +168,8 @@ def datatable_json():
         consulta = consulta.filter(Usuario.puesto.contains(safe_string(request.form["puesto"])))
     if "email" in request.form:
         consulta = consulta.filter(Usuario.email.contains(safe_email(request.form["email"], search_fragment=True)))
-    registros = consulta.order_by(Usuario.email).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [Usuario.email], start, rows_per_page, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -171,7 +182,7 @@ def datatable_json():
                 "nombre": resultado.nombre,
                 "puesto": resultado.puesto,
                 "autoridad": {
-                    "clave": resultado.autoridad.clave,
+                    "clave": resultado.autoridad_clave,
                     "url": url_for("autoridades.detail", autoridad_id=resultado.autoridad_id)
                     if current_user.can_view("AUTORIDADES")
                     else "",
@@ -243,7 +254,7 @@ def new():
         usuario.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Nuevo Usuario {usuario.email}"),
             url=url_for("usuarios.detail", usuario_id=usuario.id),
         )
@@ -281,7 +292,7 @@ def edit(usuario_id):
             usuario.save()
             bitacora = Bitacora(
                 modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-                usuario=current_user,
+                usuario_id=current_user.id,
                 descripcion=safe_message(f"Editado Usuario {usuario.email}"),
                 url=url_for("usuarios.detail", usuario_id=usuario.id),
             )
@@ -312,7 +323,7 @@ def delete(usuario_id):
         # Guardar en la bitacora
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Usuario {usuario.email}"),
             url=url_for("usuarios.detail", usuario_id=usuario.id),
         )
@@ -335,7 +346,7 @@ def recover(usuario_id):
         # Guardar en la bitacora
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Usuario {usuario.email}"),
             url=url_for("usuarios.detail", usuario_id=usuario.id),
         )
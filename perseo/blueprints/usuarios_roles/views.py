@@ -6,7 +6,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import contar, get_datatable_parameters, output_datatable_json, paginar
 from lib.safe_string import safe_message
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.modulos.models import Modulo
@@ -18,6 +18,15 @@ from perseo.blueprints.usuarios_roles.forms import UsuarioRolNewWithRolForm, Usu
 from perseo.blueprints.usuarios_roles.models import UsuarioRol
 
 MODULO = "USUARIOS ROLES"
+COLUMNAS_DATATABLE = {
+    "id": "id",
+    "usuario_email": "usuario.email",
+    "usuario_id": "usuario_id",
+    "usuario_nombre": "usuario.nombre",
+    "usuario_puesto": "usuario.puesto",
+    "rol_nombre": "rol.nombre",
+    "rol_id": "rol_id",
+}
 
 usuarios_roles = Blueprint("usuarios_roles", __name__, template_folder="templates")
 
@@ -44,8 +53,8 @@ def datatable_json():
         consulta = consulta.filter_by(usuario_id=request.form["usuario_id"])
     if "rol_id" in request.form:
         consulta = consulta.filter_by(rol_id=request.form["rol_id"])
-    registros = consulta.order_by(UsuarioRol.id).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    registros = paginar(consulta, [UsuarioRol.id], start, rows_per_page, columnas=COLUMNAS_DATATABLE)
+    total = contar(consulta)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -56,15 +65,15 @@ def datatable_json():
                     "url": url_for("usuarios_roles.detail", usuario_rol_id=resultado.id),
                 },
                 "usuario": {
-                    "email": resultado.usuario.email,
+                    "email": resultado.usuario_email,
                     "url": url_for("usuarios.detail", usuario_id=resultado.usuario_id)
                     if current_user.can_view("USUARIOS")
                     else "",
                 },
-                "usuario_nombre": resultado.usuario.nombre,
-                "usuario_puesto": resultado.usuario.puesto,
+                "usuario_nombre": resultado.usuario_nombre,
+                "usuario_puesto": resultado.usuario_puesto,
                 "rol": {
-                    "nombre": resultado.rol.nombre,
+                    "nombre": resultado.rol_nombre,
                     "url": url_for("roles.detail", rol_id=resultado.rol_id) if current_user.can_view("ROLES") else "",
                 },
             }
@@ -124,7 +133,7 @@ def new_with_rol(rol_id):
         usuario_rol.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Nuevo Usuario-Rol {usuario_rol.descripcion}"),
             url=url_for("roles.detail", rol_id=rol.id),
         )
@@ -161,7 +170,7 @@ def new_with_usuario(usuario_id):
         usuario_rol.save()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Nuevo Usuario-Rol {usuario_rol.descripcion}"),
             url=url_for("usuarios.detail", usuario_id=usuario.id),
         )
@@ -188,7 +197,7 @@ def delete(usuario_rol_id):
         usuario_rol.delete()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Eliminado Usuario-Rol {usuario_rol.descripcion}"),
             url=url_for("usuarios_roles.detail", usuario_rol_id=usuario_rol.id),
         )
@@ -206,7 +215,7 @@ def recover(usuario_rol_id):
         usuario_rol.recover()
         bitacora = Bitacora(
             modulo=Modulo.query.filter_by(nombre=MODULO).first(),
-            usuario=current_user,
+            usuario_id=current_user.id,
             descripcion=safe_message(f"Recuperado Usuario-Rol {usuario_rol.descripcion}"),
             url=url_for("usuarios_roles.detail", usuario_rol_id=usuario_rol.id),
         )
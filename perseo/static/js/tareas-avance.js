@@ -0,0 +1,32 @@
+/*
+  Avance de las tareas en el fondo
+  Cada barra con data-eventos-url escucha los eventos enviados por el servidor de su tarea,
+  actualiza su ancho y su texto con cada cambio y recarga la pagina cuando la tarea termina.
+*/
+document.querySelectorAll("[data-eventos-url]").forEach(function (barra) {
+  var texto = document.getElementById(barra.dataset.textoId);
+  var fuente = new EventSource(barra.dataset.eventosUrl);
+  fuente.onmessage = function (evento) {
+    var avance = JSON.parse(evento.data);
+    // Actualizar el ancho de la barra
+    if (avance.progress !== undefined) {
+      var porcentaje = Math.max(1, parseInt(avance.progress, 10));
+      barra.style.width = porcentaje + "%";
+      barra.setAttribute("aria-valuenow", porcentaje);
+    }
+    // Actualizar el texto con la etapa, los renglones, el tiempo restante y el mensaje
+    if (texto) {
+      var partes = [];
+      if (avance.stage) partes.push(avance.stage);
+      if (avance.total && avance.total !== "0") partes.push(avance.done + " de " + avance.total);
+      if (avance.eta && avance.eta !== "0") partes.push("faltan " + avance.eta + " segundos");
+      if (avance.message) partes.push(avance.message);
+      if (partes.length > 0) texto.textContent = partes.join(" - ");
+    }
+    // Al terminar, cerrar la conexion y recargar la pagina
+    if (avance.progress !== undefined && parseInt(avance.progress, 10) >= 100) {
+      fuente.close();
+      location.reload();
+    }
+  };
+});
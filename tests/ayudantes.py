@@ -0,0 +1,148 @@
+"""
+Ayudantes que comparten las pruebas
+"""
+import unittest
+from datetime import date, datetime
+
+try:
+    from flask import Flask
+    from sqlalchemy import insert
+
+    import perseo.app  # Registra todos los modelos para que se puedan configurar sus relaciones
+    from lib.datatables import registrar_invalidacion_conteos
+    from perseo.blueprints.modulos.models import Modulo
+    from perseo.blueprints.permisos.models import Permiso
+    from perseo.blueprints.roles.models import Rol
+    from perseo.blueprints.usuarios.models import Usuario
+    from perseo.blueprints.usuarios_roles.models import UsuarioRol
+    from perseo.extensions import database
+except ImportError:
+    Flask = None
+
+IMPORTES_TABULADOR = [
+    "sueldo_base",
+    "incentivo",
+    "monedero",
+    "rec_cul_dep",
+    "sobresueldo",
+    "rec_dep_cul_gravado",
+    "rec_dep_cul_excento",
+    "ayuda_transp",
+    "monto_quinquenio",
+    "total_percepciones",
+    "salario_diario",
+    "prima_vacacional_mensual",
+    "aguinaldo_mensual",
+    "prima_vacacional_mensual_adicional",
+    "total_percepciones_integrado",
+    "salario_diario_integrado",
+    "pension_vitalicia_excento",
+    "pension_vitalicia_gravable",
+    "pension_bonificacion",
+]
+
+
+def tabulador(tabulador_id: int, puesto_id: int, modelo: int, nivel: int, quinquenio: int) -> dict:
+    """Renglon de un tabulador con todos sus importes en cero"""
+    renglon = {"id": tabulador_id, "puesto_id": puesto_id, "modelo": modelo, "nivel": nivel, "quinquenio": quinquenio}
+    renglon["fecha"] = date(2024, 1, 1)
+    renglon.update({importe: 0 for importe in IMPORTES_TABULADOR})
+    return renglon
+
+
+class RedisFalso:
+    """Diccionario con los comandos de Redis que usan los caches, los candados y el avance de las tareas"""
+
+    def __init__(self):
+        self.datos = {}
+
+    def pipeline(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self):
+        return []
+
+    def get(self, llave):
+        return self.datos.get(llave)
+
+    def mget(self, llaves):
+        return [self.datos.get(llave) for llave in llaves]
+
+    def set(self, llave, valor, nx=False, ex=None):
+        if nx and llave in self.datos:
+            return None
+        self.datos[llave] = valor if isinstance(valor, bytes) else str(valor).encode()
+        return True
+
+    def delete(self, llave):
+        return 1 if self.datos.pop(llave, None) is not None else 0
+
+    def incr(self, llave):
+        self.datos[llave] = str(int(self.datos.get(llave, b"0")) + 1).encode()
+        return int(self.datos[llave])
+
+    def expire(self, llave, segundos):
+        return True
+
+    def publish(self, canal, datos):
+        return 0
+
+    def hset(self, llave, mapping):
+        self.datos.setdefault(llave, {}).update({campo.encode(): str(valor).encode() for campo, valor in mapping.items()})
+
+    def hgetall(self, llave):
+        return self.datos.get(llave, {})
+
+    def rpush(self, llave, valor):
+        self.datos.setdefault(llave, []).append(valor.encode())
+        return len(self.datos[llave])
+
+    def lrange(self, llave, inicio, fin):
+        return self.datos.get(llave, [])
+
+
+def crear_usuario_con_roles(
+    prueba: unittest.TestCase,
+    modulos: list,
+    roles: list,
+    usuarios_roles: list,
+    permisos: list,
+    email: str = "usuario@pjecz.gob.mx",
+    nombres: str = "USUARIO",
+):
+    """Crear la app con SQLite en memoria y Redis simulado, con el usuario 1, sus roles y permisos; se elimina al terminar"""
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    app.redis = RedisFalso()
+    database.init_app(app)
+    registrar_invalidacion_conteos()
+    contexto = app.app_context()
+    contexto.push()
+    prueba.addCleanup(contexto.pop)
+    database.create_all()
+    prueba.addCleanup(database.drop_all)
+    prueba.addCleanup(database.session.remove)
+    sesion = database.session
+    sesion.execute(insert(Modulo), modulos)
+    sesion.execute(insert(Rol), roles)
+    usuario = {
+        "id": 1,
+        "autoridad_id": 1,
+        "email": email,
+        "nombres": nombres,
+        "apellido_primero": "PRUEBA",
+        "api_key": "",
+        "api_key_expiracion": datetime(2024, 1, 1),
+        "contrasena": "",
+    }
+    sesion.execute(insert(Usuario), [usuario])
+    sesion.execute(insert(UsuarioRol), usuarios_roles)
+    sesion.execute(insert(Permiso), permisos)
+    sesion.commit()
+    return app
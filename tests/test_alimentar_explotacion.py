@@ -0,0 +1,155 @@
+"""
+Prueba las etapas de cli/commands/alimentar_explotacion.py en una sola transaccion con SQLite
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import unittest
+from datetime import datetime
+
+from tests.ayudantes import tabulador
+
+try:
+    from flask import Flask
+    from sqlalchemy import insert
+
+    import perseo.app  # Registra todos los modelos para que se puedan configurar sus relaciones
+    from cli.commands.alimentar_explotacion import (
+        ReportePersonas,
+        alimentar_cuentas_bancarias,
+        alimentar_nominas,
+        alimentar_percepciones_deducciones,
+        consultar_o_agregar_quincena,
+    )
+    from cli.commands.dimensiones import Dimensiones
+    from cli.commands.explotacion import ConceptoImporte, RenglonCuenta, RenglonNomina
+    from perseo.blueprints.bancos.models import Banco
+    from perseo.blueprints.centros_trabajos.models import CentroTrabajo
+    from perseo.blueprints.conceptos.models import Concepto
+    from perseo.blueprints.cuentas.models import Cuenta
+    from perseo.blueprints.nominas.models import Nomina
+    from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
+    from perseo.blueprints.personas.models import Persona
+    from perseo.blueprints.puestos.models import Puesto
+    from perseo.blueprints.quincenas.models import Quincena
+    from perseo.blueprints.tabuladores.models import Tabulador
+    from perseo.extensions import database
+except ImportError:
+    alimentar_nominas = None
+
+
+def renglon_nomina(rfc: str, nombre_completo: str, conceptos: tuple, num_empleado: int = 1234):
+    """Renglon de NominaFmt2.XLS de modelo 1 con el puesto PU01"""
+    return RenglonNomina(
+        centro_trabajo_clave="CT02",
+        rfc=rfc,
+        nombre_completo=nombre_completo,
+        plaza_clave="PL02",
+        nivel=10,
+        percepcion=1500.0,
+        deduccion=250.0,
+        importe=1250.0,
+        desde_s="202401",
+        hasta_s="202401",
+        quincena_ingreso="201001",
+        puesto_clave="PU01",
+        modelo=1,
+        num_empleado=num_empleado,
+        quinquenios=None,
+        es_concepto_pme=False,
+        tipo="SALARIO",
+        conceptos=conceptos,
+    )
+
+
+@unittest.skipIf(alimentar_nominas is None, "Requiere Flask y SQLAlchemy")
+class TestAlimentarExplotacion(unittest.TestCase):
+    """Pruebas de las etapas que comparten la sesion, sin commit hasta el final"""
+
+    def setUp(self):
+        """Crear la base de datos con los puestos, tabuladores, una persona, un concepto y un banco"""
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        database.init_app(app)
+        contexto = app.app_context()
+        contexto.push()
+        self.addCleanup(contexto.pop)
+        database.create_all()
+        sesion = database.session
+        sesion.execute(
+            insert(Puesto), [{"id": 1, "clave": "ND", "descripcion": "ND"}, {"id": 2, "clave": "PU01", "descripcion": "UNO"}]
+        )
+        sesion.execute(insert(Tabulador), [tabulador(1, 1, 1, 0, 0), tabulador(2, 2, 1, 10, 0)])
+        persona = {"id": 1, "tabulador_id": 2, "rfc": "AAAA010101AAA", "nombres": "A", "apellido_primero": "A", "modelo": 1}
+        sesion.execute(insert(Persona), [{**persona, "num_empleado": 1234}])
+        sesion.execute(insert(Concepto), [{"id": 1, "clave": "P07", "descripcion": "SUELDO"}])
+        sesion.execute(insert(Banco), [{"id": 1, "clave": "5", "clave_dispersion_pensionados": "BBV", "nombre": "BBVA"}])
+        sesion.commit()
+        self.sesion = sesion
+
+    def tearDown(self):
+        """Eliminar la base de datos"""
+        database.session.remove()
+        database.drop_all()
+
+    def alimentar(self, renglones: tuple, renglones_cuentas: tuple = ()) -> tuple:
+        """Ejecutar las etapas como el comando quincenas alimentar, sin hacer commit"""
+        dimensiones = Dimensiones(self.sesion)
+        reporte = ReportePersonas()
+        quincena = consultar_o_agregar_quincena(self.sesion, "202401")
+        fecha_pago = datetime(2024, 1, 15)
+        nominas = alimentar_nominas(self.sesion, dimensiones, quincena, renglones, fecha_pago, 1, reporte=reporte)
+        percepciones_deducciones = alimentar_percepciones_deducciones(
+            self.sesion, dimensiones, quincena, renglones, "SALARIO", 1, reporte=reporte
+        )
+        cuentas = alimentar_cuentas_bancarias(self.sesion, dimensiones, renglones_cuentas)
+        return nominas, percepciones_deducciones, cuentas, reporte
+
+    def contar(self) -> dict:
+        """Cantidad de registros por tabla"""
+        modelos = [CentroTrabajo, Concepto, Cuenta, Nomina, PercepcionDeduccion, Persona, Quincena]
+        return {modelo.__tablename__: self.sesion.query(modelo).count() for modelo in modelos}
+
+    def test_etapas_completas(self):
+        """Las etapas insertan las nominas, percepciones-deducciones y cuentas, y el commit las guarda juntas"""
+        renglones = (
+            renglon_nomina("AAAA010101AAA", "A A A", (ConceptoImporte("P07", 1000.0),), num_empleado=999),
+            renglon_nomina("BBBB010101BBB", "PEREZ LOPEZ JUAN", (ConceptoImporte("P07", 900.0), ConceptoImporte("D62", 50.0))),
+        )
+        cuentas = (RenglonCuenta("BBBB010101BBB", "5", "1234567890"), RenglonCuenta("CCCC010101CCC", "5", "1"))
+        nominas, percepciones_deducciones, cuentas, reporte = self.alimentar(renglones, cuentas)
+        self.sesion.commit()
+        self.assertEqual((nominas, percepciones_deducciones, cuentas), (2, 2, 1))
+        self.assertEqual((reporte.personas_insertadas_contador, reporte.personas_actualizadas_contador), (1, 1))
+        self.assertEqual(
+            self.contar(),
+            {
+                "centros_trabajos": 1,
+                "conceptos": 2,
+                "cuentas": 1,
+                "nominas": 2,
+                "percepciones_deducciones": 3,
+                "personas": 2,
+                "quincenas": 1,
+            },
+        )
+        persona = self.sesion.query(Persona).filter_by(rfc="BBBB010101BBB").one()
+        self.assertEqual((persona.apellido_primero, persona.apellido_segundo, persona.nombres), ("PEREZ", "LOPEZ", "JUAN"))
+        self.assertEqual(persona.tabulador_id, 2)
+        self.assertEqual(self.sesion.get(Persona, 1).num_empleado, 999)
+
+    def test_falla_a_la_mitad_revierte_todo(self):
+        """Si falla un bloque de percepciones-deducciones se revierte la transaccion, incluidas las nominas ya insertadas"""
+        renglones = (
+            renglon_nomina("AAAA010101AAA", "A A A", (ConceptoImporte("P07", 1000.0),), num_empleado=999),
+            renglon_nomina("BBBB010101BBB", "PEREZ LOPEZ JUAN", (ConceptoImporte("D62", None),)),  # Importe nulo
+        )
+        antes = self.contar()
+        with self.assertRaises(SystemExit) as salida:
+            self.alimentar(renglones)
+        self.assertEqual(salida.exception.code, 1)
+        self.assertEqual(self.contar(), antes)
+        self.assertEqual(self.sesion.get(Persona, 1).num_empleado, 1234)
+        self.assertIsNone(self.sesion.query(CentroTrabajo).filter_by(clave="CT02").first())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Prueba la busqueda por similitud de lib/busquedas.py
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import unittest
+from unittest import mock
+
+try:
+    from sqlalchemy import Column, Integer, String, create_engine
+    from sqlalchemy.dialects import postgresql
+    from sqlalchemy.ext.hybrid import hybrid_property
+    from sqlalchemy.orm import Session, declarative_base
+
+    from lib import busquedas
+    from lib.busquedas import buscar_similares
+    from lib.datatables import codificar_llave, decodificar_llave, ordenar, paginar_keyset
+except ImportError:
+    buscar_similares = None
+
+NOMBRES = [
+    ("JUAN", "PEREZ", "LOPEZ"),
+    ("JUAN CARLOS", "PEREZ", "GARCIA"),
+    ("MARIA", "PEREZ", "JUAREZ"),
+    ("JUANA", "LOPEZ", "PEREZ"),
+    ("PEDRO", "GARCIA", ""),
+]
+
+
+@unittest.skipIf(buscar_similares is None, "Requiere SQLAlchemy")
+class TestBusquedas(unittest.TestCase):
+    """Pruebas de la busqueda por similitud"""
+
+    def setUp(self):
+        """Crear una tabla de personas en SQLite"""
+        Base = declarative_base()
+
+        class Persona(Base):
+            __tablename__ = "personas"
+            id = Column(Integer, primary_key=True)
+            nombres = Column(String(256))
+            apellido_primero = Column(String(256))
+            apellido_segundo = Column(String(256))
+
+            @hybrid_property
+            def nombre_completo(self):
+                return f"{self.nombres} {self.apellido_primero} {self.apellido_segundo}"
+
+            @nombre_completo.expression
+            def nombre_completo(cls):
+                return cls.nombres + " " + cls.apellido_primero + " " + cls.apellido_segundo
+
+        self.Persona = Persona
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.sesion = Session(self.engine)
+        for numero, (nombres, apellido_primero, apellido_segundo) in enumerate(NOMBRES, start=1):
+            persona = Persona(id=numero, nombres=nombres, apellido_primero=apellido_primero, apellido_segundo=apellido_segundo)
+            self.sesion.add(persona)
+        self.sesion.commit()
+
+    def tearDown(self):
+        """Cerrar la sesion y la base de datos"""
+        self.sesion.close()
+        self.engine.dispose()
+
+    def test_buscar_similares(self):
+        """En SQLite se filtra por cada palabra y primero van los nombres mas cortos que la contienen"""
+        consulta = self.sesion.query(self.Persona.id)
+        consulta, similitud = buscar_similares(consulta, self.Persona.nombre_completo, " juan  perez ")
+        identificadores = [renglon.id for renglon in consulta.order_by(similitud.desc(), self.Persona.id)]
+        self.assertEqual(identificadores, [1, 4, 2])
+
+    def test_buscar_similares_postgresql(self):
+        """En PostgreSQL se filtra con el operador de similitud de palabras, que usa el indice de trigramas"""
+        consulta = self.sesion.query(self.Persona.id)
+        with mock.patch.object(busquedas, "es_postgresql", return_value=True):
+            consulta, similitud = buscar_similares(consulta, self.Persona.nombre_completo, "JUAN PEREZ")
+        sql = str(consulta.add_columns(similitud).statement.compile(dialect=postgresql.dialect()))
+        self.assertIn("%>", sql)
+        self.assertIn("word_similarity", sql)
+
+    def test_paginar_por_similitud(self):
+        """Al paginar por llave con empates en la similitud, el ancla que pasa por JSON no salta ni repite renglones"""
+        for numero, apellido_segundo in enumerate(["ROJAS", "SOSAS", "TAPIA"], start=len(NOMBRES) + 1):
+            self.sesion.add(
+                self.Persona(id=numero, nombres="JUAN", apellido_primero="PEREZ", apellido_segundo=apellido_segundo)
+            )
+        self.sesion.commit()
+        consulta, similitud = buscar_similares(self.sesion.query(self.Persona.id), self.Persona.nombre_completo, "JUAN PEREZ")
+        consulta = consulta.add_columns(similitud)
+        orden = [similitud, self.Persona.id]
+        por_offset = [renglon.id for renglon in ordenar(consulta, orden, True)]
+        por_llave = []
+        ultimo = None
+        while True:
+            pagina = paginar_keyset(consulta, orden, ultimo, 2, True).all()
+            por_llave.extend(renglon.id for renglon in pagina)
+            if len(pagina) < 2:
+                break
+            ultimo = decodificar_llave(codificar_llave([pagina[-1].similitud, pagina[-1].id]))
+        self.assertEqual(por_llave, por_offset)
+        self.assertEqual(len(por_llave), 6)
+
+    def test_similitud_doble_precision_postgresql(self):
+        """En PostgreSQL la similitud es doble precision en las columnas y en la comparacion con el ancla"""
+        consulta = self.sesion.query(self.Persona.id)
+        with mock.patch.object(busquedas, "es_postgresql", return_value=True):
+            consulta, similitud = buscar_similares(consulta, self.Persona.nombre_completo, "JUAN PEREZ")
+        consulta = paginar_keyset(consulta.add_columns(similitud), [similitud, self.Persona.id], [0.6666667, 3], 10, True)
+        sql = str(consulta.statement.compile(dialect=postgresql.dialect()))
+        self.assertEqual(sql.count("CAST(word_similarity("), 2)  # En las columnas y en la comparacion, el orden usa la etiqueta
+        self.assertEqual(sql.count("AS FLOAT(53))"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
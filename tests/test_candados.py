@@ -0,0 +1,80 @@
+"""
+Prueba los candados de las tareas en el fondo de perseo/blueprints/tareas/candados.py
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from tests.ayudantes import RedisFalso
+
+try:
+    from perseo.blueprints.tareas import candados
+except ImportError:
+    candados = None
+
+
+@unittest.skipIf(candados is None, "Requiere Flask, RQ y SQLAlchemy")
+class TestCandados(unittest.TestCase):
+    """Pruebas de los candados de las tareas"""
+
+    def setUp(self):
+        """Simular Redis y el modelo Tarea"""
+        self.redis = RedisFalso()
+        self.tareas = {}
+        Tarea = mock.patch.object(candados, "Tarea").start()
+        Tarea.query.get.side_effect = self.tareas.get
+        mock.patch.object(candados, "leer_avance", return_value={}).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def registrar(self, tarea_id: str, ha_terminado: bool = False):
+        """Agregar una tarea a la tabla simulada"""
+        self.tareas[tarea_id] = SimpleNamespace(id=tarea_id, ha_terminado=ha_terminado)
+        return self.tareas[tarea_id]
+
+    def test_huella(self):
+        """La huella no depende del orden de los argumentos"""
+        huella = candados.huella_tarea("nominas.tasks.lanzar_generar_nominas", {"a": 1, "b": "2024-01"})
+        self.assertEqual(huella, candados.huella_tarea("nominas.tasks.lanzar_generar_nominas", {"b": "2024-01", "a": 1}))
+        self.assertNotEqual(huella, candados.huella_tarea("nominas.tasks.lanzar_generar_monederos", {"a": 1, "b": "2024-01"}))
+
+    def test_misma_tarea_mientras_no_termine(self):
+        """Mientras la tarea del candado no termine se entrega esa, al terminar se aparta para una nueva"""
+        primera_id, es_nueva = candados.apartar_tarea(self.redis, "huella", 600)
+        self.assertTrue(es_nueva)
+        self.assertEqual(candados.apartar_tarea(self.redis, "huella", 600), (primera_id, False))
+        tarea = self.registrar(primera_id)
+        self.assertIs(candados.tarea_del_candado(self.redis, "huella"), tarea)
+        self.assertEqual(candados.apartar_tarea(self.redis, "huella", 600), (primera_id, False))
+        tarea.ha_terminado = True
+        self.assertIsNone(candados.tarea_del_candado(self.redis, "huella"))
+        segunda_id, es_nueva = candados.apartar_tarea(self.redis, "huella", 600)
+        self.assertTrue(es_nueva)
+        self.assertNotEqual(segunda_id, primera_id)
+
+    def test_reutilizar_mientras_no_cambien_las_tablas(self):
+        """La tarea terminada se reutiliza hasta que sube la version de alguna de sus tablas"""
+        tarea_id, _ = candados.apartar_tarea(self.redis, "huella", 600, ["conceptos"])
+        tarea = self.registrar(tarea_id)
+        self.assertIsNone(candados.tarea_reutilizable(self.redis, "huella", ["conceptos"]))
+        tarea.ha_terminado = True
+        self.assertIs(candados.tarea_reutilizable(self.redis, "huella", ["conceptos"]), tarea)
+        self.redis.set("perseo:datatables:version:conceptos", "1")
+        self.assertIsNone(candados.tarea_reutilizable(self.redis, "huella", ["conceptos"]))
+
+    def test_apartar_antes_de_preparar(self):
+        """Al apartar antes de guardar los datos de la tarea, un doble clic recibe la misma tarea aunque aun no se guarde"""
+        comando = "nominas.tasks.lanzar_generar_nominas"
+        with mock.patch.object(candados, "current_app", SimpleNamespace(redis=self.redis)):
+            tarea_id, es_nueva = candados.apartar_lanzamiento(comando, {"quincena_clave": "202401"})
+            self.assertTrue(es_nueva)
+            self.assertEqual(candados.apartar_lanzamiento(comando, {"quincena_clave": "202401"}), (tarea_id, False))
+            self.registrar(tarea_id)
+            self.assertEqual(candados.apartar_lanzamiento(comando, {"quincena_clave": "202401"}), (tarea_id, False))
+            self.assertTrue(candados.apartar_lanzamiento(comando, {"quincena_clave": "202402"})[1])
+            llave = f"perseo:tareas:candado:{candados.huella_tarea(comando, {'quincena_clave': '202401'})}"
+        self.assertEqual(self.redis.get(llave), tarea_id.encode())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Prueba leer_cfdi y leer_cfdis
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+from cli.commands.cfdi import ARCHIVOS_POR_BLOQUE, leer_cfdi, leer_cfdis
+
+CFDI_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<cfdi:Comprobante xmlns:cfdi="http://www.sat.gob.mx/cfd/4" xmlns:tfd="http://www.sat.gob.mx/TimbreFiscalDigital"
+    xmlns:nomina12="http://www.sat.gob.mx/nomina12" Version="4.0" Serie="A" Folio="1">
+  <cfdi:Emisor Rfc="PJE901211TI9" Nombre="PODER JUDICIAL" RegimenFiscal="603"/>
+  <cfdi:Receptor Rfc="{rfc}" Nombre="PERSONA DE PRUEBA" UsoCFDI="CN01"/>
+  <cfdi:Conceptos>
+    <cfdi:Concepto ClaveProdServ="84111505" Cantidad="1" Importe="1000.00"/>
+  </cfdi:Conceptos>
+  <cfdi:Complemento>
+    <tfd:TimbreFiscalDigital Version="1.1" UUID="{uuid}" FechaTimbrado="2024-01-17T14:19:16"
+        SelloCFD="SELLOCFD" NoCertificadoSAT="00001000000509846663" SelloSAT="SELLOSAT"/>
+    <nomina12:Nomina Version="1.2" TipoNomina="O"/>
+  </cfdi:Complemento>
+</cfdi:Comprobante>
+"""
+
+
+class TestCfdi(unittest.TestCase):
+    """Pruebas de las funciones leer_cfdi y leer_cfdis"""
+
+    def setUp(self):
+        """Crear un directorio temporal"""
+        self.directorio = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Eliminar el directorio temporal"""
+        self.directorio.cleanup()
+
+    def escribir(self, nombre: str, contenido: str) -> Path:
+        """Escribir un archivo en el directorio temporal"""
+        ruta = Path(self.directorio.name, nombre)
+        ruta.write_text(contenido, encoding="utf8")
+        return ruta
+
+    def test_leer_cfdi(self):
+        """Se toman los datos de Emisor, Receptor y TimbreFiscalDigital"""
+        ruta = self.escribir("AAAA010101AAA.xml", CFDI_XML.format(rfc="AAAA010101AAA", uuid="UUID-1"))
+        datos = leer_cfdi(ruta)
+        self.assertTrue(datos.es_comprobante)
+        self.assertEqual(datos.emisor_rfc, "PJE901211TI9")
+        self.assertEqual(datos.emisor_regimen_fiscal, "603")
+        self.assertEqual(datos.receptor_rfc, "AAAA010101AAA")
+        self.assertEqual(datos.tfd_uuid, "UUID-1")
+        self.assertEqual(datos.tfd_fecha_timbrado, "2024-01-17T14:19:16")
+        self.assertEqual(datos.tfd_num_cert_sat, "00001000000509846663")
+
+    def test_leer_cfdi_no_es_comprobante(self):
+        """Si la raiz no es cfdi:Comprobante o el XML esta mal formado, no es comprobante"""
+        self.assertFalse(leer_cfdi(self.escribir("otro.xml", "<raiz><hijo/></raiz>")).es_comprobante)
+        self.assertFalse(leer_cfdi(self.escribir("roto.xml", "<raiz><hijo></raiz>")).es_comprobante)
+
+    def test_leer_cfdis_en_paralelo(self):
+        """En procesos paralelos se entregan los mismos datos en el mismo orden"""
+        rutas = []
+        for numero in range(ARCHIVOS_POR_BLOQUE * 2):
+            rfc = f"AAAA{numero:06}AAA"
+            rutas.append(self.escribir(f"{rfc}.xml", CFDI_XML.format(rfc=rfc, uuid=f"UUID-{numero}")))
+        cfdis = leer_cfdis(rutas, procesos=2)
+        self.assertEqual([cfdi.ruta for cfdi in cfdis], rutas)
+        self.assertEqual([cfdi.tfd_uuid for cfdi in cfdis], [f"UUID-{numero}" for numero in range(len(rutas))])
+
+
+if __name__ == "__main__":
+    unittest.main()
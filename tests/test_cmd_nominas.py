@@ -0,0 +1,125 @@
+"""
+Prueba los numeros de cheque de los comandos generar de cli/commands/cmd_nominas.py con SQLite
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import logging
+import os
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+
+from tests.ayudantes import tabulador
+
+try:
+    from click.testing import CliRunner
+    from flask import Flask
+    from openpyxl import load_workbook
+    from sqlalchemy import insert
+
+    import perseo.app  # Registra todos los modelos para que se puedan configurar sus relaciones
+
+    # El modulo crea la app del proceso, una bitacora y fija el locale es_MX al importarse, en la prueba no se necesitan
+    with mock.patch("perseo.app.get_app"), mock.patch("logging.FileHandler", return_value=logging.NullHandler()):
+        with mock.patch("locale.setlocale"):
+            from cli.commands import cmd_nominas
+    from perseo.blueprints.bancos.models import Banco
+    from perseo.blueprints.centros_trabajos.models import CentroTrabajo
+    from perseo.blueprints.cuentas.models import Cuenta
+    from perseo.blueprints.nominas.models import Nomina
+    from perseo.blueprints.personas.models import Persona
+    from perseo.blueprints.plazas.models import Plaza
+    from perseo.blueprints.puestos.models import Puesto
+    from perseo.blueprints.quincenas.models import Quincena
+    from perseo.blueprints.tabuladores.models import Tabulador
+    from perseo.extensions import database
+except ImportError:
+    cmd_nominas = None
+
+
+@unittest.skipIf(cmd_nominas is None, "Requiere Flask, SQLAlchemy y openpyxl")
+class TestCmdNominas(unittest.TestCase):
+    """Pruebas de los consecutivos que toman los comandos generar"""
+
+    def setUp(self):
+        """Crear la base de datos con una quincena abierta y tres personas con cuenta en el mismo banco"""
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        database.init_app(app)
+        contexto = app.app_context()
+        contexto.push()
+        self.addCleanup(contexto.pop)
+        database.create_all()
+        sesion = database.session
+        sesion.execute(insert(Quincena), [{"id": 1, "clave": "202401", "estado": "ABIERTA"}])
+        sesion.execute(insert(Banco), [{"id": 1, "clave": "5", "clave_dispersion_pensionados": "BBV", "nombre": "BBVA"}])
+        sesion.execute(insert(CentroTrabajo), [{"id": 1, "clave": "CT01", "descripcion": "UNO"}])
+        sesion.execute(insert(Plaza), [{"id": 1, "clave": "PL01", "descripcion": "UNO"}])
+        sesion.execute(insert(Puesto), [{"id": 1, "clave": "PU01", "descripcion": "UNO"}])
+        sesion.execute(insert(Tabulador), [tabulador(1, 1, 1, 10, 0)])
+        personas, cuentas, nominas = [], [], []
+        for numero, modelo in ((1, 1), (2, 1), (3, 3)):
+            rfc = f"{'ABC'[numero - 1] * 4}010101AAA"
+            personas.append(
+                {"id": numero, "tabulador_id": 1, "rfc": rfc, "nombres": "N", "apellido_primero": "A", "modelo": modelo}
+            )
+            cuentas.append({"id": numero, "banco_id": 1, "persona_id": numero, "num_cuenta": f"000{numero}"})
+            nominas.append(
+                {
+                    "id": numero,
+                    "centro_trabajo_id": 1,
+                    "persona_id": numero,
+                    "plaza_id": 1,
+                    "quincena_id": 1,
+                    "tipo": "SALARIO",
+                    "desde": date(2024, 1, 1),
+                    "desde_clave": "202401",
+                    "hasta": date(2024, 1, 15),
+                    "hasta_clave": "202401",
+                    "percepcion": 1500,
+                    "deduccion": 250,
+                    "importe": 1250,
+                    "fecha_pago": date(2024, 1, 15),
+                }
+            )
+        sesion.execute(insert(Persona), personas)
+        sesion.execute(insert(Cuenta), cuentas)
+        sesion.execute(insert(Nomina), nominas)
+        sesion.execute(Banco.__table__.update().values(consecutivo_generado=100))
+        sesion.commit()
+
+        # Escribir los archivos XLSX en un directorio temporal
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.directorio.name)
+
+    def tearDown(self):
+        """Eliminar la base de datos"""
+        database.session.remove()
+        database.drop_all()
+
+    def generar(self, comando) -> list:
+        """Ejecutar el comando y entregar los numeros de cheque del archivo XLSX que escribio"""
+        resultado = CliRunner().invoke(comando, ["202401"])
+        self.assertEqual(resultado.exit_code, 0, resultado.output)
+        (ruta,) = os.listdir(self.directorio.name)
+        filas = list(load_workbook(ruta).active.iter_rows(min_row=2, values_only=True))
+        os.remove(ruta)
+        return [fila[-1] for fila in filas]
+
+    def test_reservar_bloque_antes_de_escribir(self):
+        """Cada comando reserva su bloque, aunque otro proceso reserve despues de cargar el banco no se repiten"""
+        self.assertEqual(self.generar(cmd_nominas.generar_nominas), ["050000101", "050000102"])
+        self.assertEqual(database.session.get(Banco, 1).consecutivo_generado, 102)
+
+        # Otra tarea reserva en medio, el banco ya cargado en la sesion del comando no debe regresar el consecutivo
+        banco = database.session.get(Banco, 1)
+        with database.engine.begin() as conexion:
+            conexion.execute(Banco.__table__.update().values(consecutivo_generado=Banco.consecutivo_generado + 5))
+        self.assertEqual(self.generar(cmd_nominas.generar_pensionados), ["050000108"])
+        self.assertEqual(banco.consecutivo_generado, 108)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+Prueba las colas de las tareas en el fondo de perseo/blueprints/tareas/colas.py
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+try:
+    from perseo.blueprints.tareas import colas
+except ImportError:
+    colas = None
+
+
+@unittest.skipIf(colas is None, "Requiere RQ y redis")
+class TestColas(unittest.TestCase):
+    """Pruebas de las colas por tipo de trabajo"""
+
+    def test_clase_del_comando(self):
+        """Los generadores van a la cola pesadas y los comandos sin declarar a la interactivas"""
+        self.assertEqual(colas.clase_del_comando("nominas.tasks.lanzar_generar_nominas"), "pesadas")
+        self.assertEqual(colas.clase_del_comando("nominas.tasks.lanzar_generar_todos"), "masivas")
+        self.assertEqual(colas.clase_del_comando("personas.tasks.lanzar_exportar_xlsx"), "interactivas")
+
+    def test_crear_colas(self):
+        """Una cola por tipo con su tiempo limite, en orden de prioridad"""
+        creadas = colas.crear_colas("pjecz_perseo", mock.MagicMock())
+        self.assertEqual(list(creadas), ["interactivas", "pesadas", "masivas"])
+        self.assertEqual(creadas["pesadas"].name, "pjecz_perseo_pesadas")
+        self.assertEqual(creadas["pesadas"]._default_timeout, colas.COLAS["pesadas"])
+
+    def test_espera_cola(self):
+        """La espera es la antiguedad de la tarea mas vieja en la cola"""
+        cola = mock.MagicMock()
+        cola.get_job_ids.return_value = ["tarea-1"]
+        cola.fetch_job.return_value.enqueued_at = colas.utcnow() - timedelta(seconds=90)
+        self.assertIn(colas.espera_cola(cola), (90, 91))
+        cola.get_job_ids.return_value = []
+        self.assertEqual(colas.espera_cola(cola), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
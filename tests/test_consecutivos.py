@@ -0,0 +1,103 @@
+"""
+Prueba reservar_bloques con varios procesos ligeros reservando al mismo tiempo
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+    Usa una base de datos SQLite temporal, o la definida en la variable de entorno PERSEO_TEST_DATABASE_URL
+"""
+import os
+import tempfile
+import threading
+import unittest
+
+try:
+    from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select
+    from sqlalchemy.orm import sessionmaker
+
+    from lib.consecutivos import reservar_bloques
+except ImportError:
+    reservar_bloques = None
+
+HILOS = 8
+RESERVAS_POR_HILO = 25
+CANTIDADES = [{1: 3, 2: 5}, {2: 1, 3: 7}, {1: 4, 3: 2}, {1: 1, 2: 1, 3: 1}]
+
+
+@unittest.skipIf(reservar_bloques is None, "Requiere SQLAlchemy")
+class TestConsecutivos(unittest.TestCase):
+    """Pruebas de la función reservar_bloques"""
+
+    def setUp(self):
+        """Crear la tabla bancos con tres renglones"""
+        self.directorio = tempfile.TemporaryDirectory()
+        url = os.environ.get("PERSEO_TEST_DATABASE_URL", f"sqlite:///{self.directorio.name}/consecutivos.sqlite")
+        connect_args = {"timeout": 30} if url.startswith("sqlite") else {}
+        self.engine = create_engine(url, connect_args=connect_args)
+        metadata = MetaData()
+        self.tabla = Table(
+            "pruebas_bancos",
+            metadata,
+            Column("id", Integer, primary_key=True),
+            Column("clave", String(2), nullable=False),
+            Column("consecutivo_generado", Integer, nullable=False, default=0),
+        )
+        metadata.drop_all(self.engine)
+        metadata.create_all(self.engine)
+        with self.engine.begin() as conexion:
+            conexion.execute(self.tabla.insert(), [{"id": i, "clave": str(i), "consecutivo_generado": 100} for i in (1, 2, 3)])
+        self.sesiones = sessionmaker(bind=self.engine)
+
+    def tearDown(self):
+        """Eliminar la tabla"""
+        self.tabla.drop(self.engine)
+        self.engine.dispose()
+        self.directorio.cleanup()
+
+    def test_reservar_bloques_vacio(self):
+        """Sin cantidades no se reserva nada"""
+        with self.sesiones() as sesion:
+            self.assertEqual(reservar_bloques(sesion, self.tabla, {}), {})
+
+    def test_reservar_bloques_secuencial(self):
+        """Los bloques son contiguos y empiezan despues del ultimo consecutivo usado"""
+        with self.sesiones() as sesion:
+            self.assertEqual(reservar_bloques(sesion, self.tabla, {1: 10, 2: 3}), {1: 100, 2: 100})
+            self.assertEqual(reservar_bloques(sesion, self.tabla, {1: 5}), {1: 110})
+
+    def test_reservar_bloques_concurrente(self):
+        """Varios hilos reservando al mismo tiempo nunca reciben numeros repetidos"""
+        bloques = []
+        errores = []
+        candado = threading.Lock()
+
+        def trabajar(numero: int):
+            try:
+                with self.sesiones() as sesion:
+                    for vuelta in range(RESERVAS_POR_HILO):
+                        cantidades = CANTIDADES[(numero + vuelta) % len(CANTIDADES)]
+                        inicios = reservar_bloques(sesion, self.tabla, cantidades)
+                        with candado:
+                            bloques.extend((i, inicios[i], cantidades[i]) for i in cantidades)
+            except Exception as error:
+                errores.append(error)
+
+        hilos = [threading.Thread(target=trabajar, args=(numero,)) for numero in range(HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+
+        # Cada numero asignado debe aparecer una sola vez por banco y sin huecos
+        for banco_id in (1, 2, 3):
+            numeros = []
+            for identificador, inicio, cantidad in bloques:
+                if identificador == banco_id:
+                    numeros.extend(range(inicio + 1, inicio + cantidad + 1))
+            self.assertEqual(len(numeros), len(set(numeros)))
+            self.assertEqual(sorted(numeros), list(range(101, 101 + len(numeros))))
+            with self.engine.connect() as conexion:
+                ultimo = conexion.execute(select(self.tabla.c.consecutivo_generado).where(self.tabla.c.id == banco_id)).scalar()
+            self.assertEqual(ultimo, 100 + len(numeros))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+Prueba la paginacion por llave, la proyeccion de columnas y la invalidacion de los totales de lib/datatables.py
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+try:
+    from sqlalchemy import (
+        Column,
+        DateTime,
+        ForeignKey,
+        Integer,
+        MetaData,
+        String,
+        Table,
+        create_engine,
+        event,
+        insert,
+        select,
+        update,
+    )
+    from sqlalchemy.orm import Session, declarative_base, relationship
+
+    from lib import datatables
+    from lib.datatables import (
+        codificar_llave,
+        decodificar_llave,
+        ordenar,
+        paginar,
+        paginar_keyset,
+        registrar_invalidacion_conteos,
+    )
+except ImportError:
+    paginar_keyset = None
+
+POR_PAGINA = 7
+
+
+@unittest.skipIf(paginar_keyset is None, "Requiere Flask, Redis y SQLAlchemy")
+class TestDatatables(unittest.TestCase):
+    """Pruebas de la paginacion por llave"""
+
+    def setUp(self):
+        """Crear una tabla con fechas repetidas, como las tareas que se crean en el mismo segundo"""
+        self.engine = create_engine("sqlite://")
+        self.tabla = Table(
+            "pruebas_tareas",
+            MetaData(),
+            Column("id", String(36), primary_key=True),
+            Column("creado", DateTime(), nullable=False),
+        )
+        self.tabla.metadata.create_all(self.engine)
+        base = datetime(2024, 1, 1)
+        with self.engine.begin() as conexion:
+            renglones = [{"id": f"{numero:04}", "creado": base + timedelta(minutes=numero // 3)} for numero in range(50)]
+            conexion.execute(self.tabla.insert(), renglones)
+
+    def tearDown(self):
+        """Cerrar la base de datos"""
+        self.engine.dispose()
+
+    def test_codificar_llave(self):
+        """Las fechas conservan su tipo al codificar y decodificar"""
+        valores = [datetime(2024, 1, 2, 3, 4, 5), date(2024, 1, 2), "0001", 3]
+        self.assertEqual(decodificar_llave(codificar_llave(valores)), valores)
+
+    def test_paginar_keyset(self):
+        """Recorrer por llave entrega los mismos renglones y en el mismo orden que con offset"""
+        consulta = select(self.tabla)
+        orden = [self.tabla.c.creado, self.tabla.c.id]
+        with self.engine.connect() as conexion:
+            for descendente in (False, True):
+                por_offset = [renglon.id for renglon in conexion.execute(ordenar(consulta, orden, descendente))]
+                por_llave = []
+                ultimo = None
+                while True:
+                    pagina = conexion.execute(paginar_keyset(consulta, orden, ultimo, POR_PAGINA, descendente)).all()
+                    por_llave.extend(renglon.id for renglon in pagina)
+                    if len(pagina) < POR_PAGINA:
+                        break
+                    ultimo = [pagina[-1].creado, pagina[-1].id]
+                self.assertEqual(por_llave, por_offset)
+
+    def test_invalidacion_conteos(self):
+        """Al hacer commit se invalidan los totales de las tablas que cambiaron, y no al revertir"""
+        registrar_invalidacion_conteos()
+        with mock.patch.object(datatables, "invalidar_conteos") as invalidar, Session(self.engine) as sesion:
+            sesion.execute(update(self.tabla).where(self.tabla.c.id == "0001").values(creado=datetime(2024, 2, 1)))
+            sesion.commit()
+            invalidar.assert_called_once_with({"pruebas_tareas"})
+            sesion.execute(insert(self.tabla), [{"id": "9999", "creado": datetime(2024, 2, 1)}])
+            sesion.rollback()
+            sesion.commit()
+            invalidar.assert_called_with(set())
+
+    def test_proyectar_columnas(self):
+        """Con columnas cada pagina es un solo SELECT, sin importar cuantos renglones tenga"""
+        Base = declarative_base()
+
+        class Quincena(Base):
+            __tablename__ = "quincenas"
+            id = Column(Integer, primary_key=True)
+            clave = Column(String(6))
+
+        class Persona(Base):
+            __tablename__ = "personas"
+            id = Column(Integer, primary_key=True)
+            rfc = Column(String(13))
+
+        class Nomina(Base):
+            __tablename__ = "nominas"
+            id = Column(Integer, primary_key=True)
+            quincena_id = Column(Integer, ForeignKey("quincenas.id"))
+            quincena = relationship("Quincena")
+            persona_id = Column(Integer, ForeignKey("personas.id"))
+            persona = relationship("Persona")
+
+        Base.metadata.create_all(self.engine)
+        with Session(self.engine) as sesion:
+            sesion.add_all([Quincena(id=1, clave="202401"), Quincena(id=2, clave="202402")])
+            for numero in range(1, 61):
+                sesion.add(Persona(id=numero, rfc=f"RFC{numero:04}"))
+                sesion.add(Nomina(id=numero, quincena_id=1 + numero % 2, persona_id=numero))
+            sesion.commit()
+
+        # Contar las sentencias que llegan a la base de datos
+        sentencias = []
+        event.listen(self.engine, "before_cursor_execute", lambda *args: sentencias.append(args[2]))
+
+        # Las anclas se guardan en un diccionario en lugar de Redis
+        anclas = {}
+        columnas = {"id": "id", "quincena_clave": "quincena.clave", "persona_rfc": "persona.rfc"}
+        with mock.patch.multiple(
+            datatables,
+            firma_consulta=mock.Mock(return_value="prueba"),
+            leer_ancla=mock.Mock(side_effect=lambda firma, start: anclas.get(start)),
+            guardar_ancla=mock.Mock(side_effect=lambda firma, start, valores: anclas.update({start: valores})),
+        ), Session(self.engine) as sesion:
+            consulta = sesion.query(Nomina).join(Quincena).filter(Quincena.clave == "202401")
+            for rows_per_page in (5, 10):
+                anclas.clear()
+                for start in (0, rows_per_page):
+                    sentencias.clear()
+                    registros = paginar(consulta, [Nomina.id], start, rows_per_page, True, columnas=columnas)
+                    self.assertEqual(len(sentencias), 1)
+                    esperados = list(range(60 - 2 * start, 0, -2))[:rows_per_page]
+                    self.assertEqual([registro.id for registro in registros], esperados)
+                    self.assertEqual({registro.quincena_clave for registro in registros}, {"202401"})
+                    rfcs = [f"RFC{numero:04}" for numero in esperados]
+                    self.assertEqual([registro.persona_rfc for registro in registros], rfcs)
+
+                    # Sin columnas se cargan las relaciones con una consulta por renglon
+                    sesion.expunge_all()
+                    sentencias.clear()
+                    nominas = paginar(consulta, [Nomina.id], start, rows_per_page, True)
+                    self.assertEqual([nomina.persona.rfc for nomina in nominas], rfcs)
+                    self.assertEqual(len(sentencias), 1 + rows_per_page)
+
+
+if __name__ == "__main__":
+    unittest.main()
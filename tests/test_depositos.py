@@ -0,0 +1,121 @@
+"""
+Prueba DepositoLocal, obtener_deposito y subir_en_paralelo
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from lib import depositos
+from lib.depositos import DepositoLocal, Subida, obtener_deposito, subir_en_paralelo
+from lib.exceptions import MyBucketNotFoundError, MyFileNotFoundError, MyUploadError
+
+
+class DepositoConFallas(DepositoLocal):
+    """Deposito local que falla las primeras veces que sube cada archivo"""
+
+    def __init__(self, directorio: str, fallas: int):
+        super().__init__(directorio)
+        self.fallas = fallas
+        self.intentos = {}
+        self.candado = threading.Lock()
+
+    def subir(self, nombre: str, data: bytes, content_type: str) -> str:
+        with self.candado:
+            self.intentos[nombre] = self.intentos.get(nombre, 0) + 1
+            intento = self.intentos[nombre]
+        if intento <= self.fallas:
+            raise MyUploadError(f"Falla {intento} en {nombre}")
+        return super().subir(nombre, data, content_type)
+
+
+class TestDepositos(unittest.TestCase):
+    """Pruebas del deposito local y de las subidas en paralelo"""
+
+    def setUp(self):
+        """Crear los directorios temporales del deposito y de los archivos por subir"""
+        self.temporal = tempfile.TemporaryDirectory()
+        self.deposito_dir = Path(self.temporal.name, "deposito")
+        self.deposito_dir.mkdir()
+        self.subidas = []
+        for numero in range(20):
+            ruta = Path(self.temporal.name, f"{numero}.xml")
+            ruta.write_text(f"<xml>{numero}</xml>", encoding="utf8")
+            self.subidas.append(Subida(f"timbrados/202401/{numero}.xml", ruta, "application/xml"))
+
+    def tearDown(self):
+        """Eliminar los directorios temporales"""
+        self.temporal.cleanup()
+
+    def test_listar_y_subir(self):
+        """Lo que se sube aparece al listar con el prefijo y no con otro"""
+        deposito = DepositoLocal(str(self.deposito_dir))
+        resultado = subir_en_paralelo(deposito, self.subidas, hilos=4)
+        self.assertEqual(resultado.errores, {})
+        self.assertEqual(len(resultado.urls), 20)
+        self.assertEqual(deposito.listar("timbrados/202401/"), {subida.nombre for subida in self.subidas})
+        self.assertEqual(deposito.listar("timbrados/202402/"), set())
+        self.assertEqual(Path(self.deposito_dir, "local/timbrados/202401/3.xml").read_text(encoding="utf8"), "<xml>3</xml>")
+        self.assertEqual(resultado.urls["timbrados/202401/3.xml"], deposito.url_publica("timbrados/202401/3.xml"))
+
+    def test_existe_y_descargar(self):
+        """Se puede revisar y leer lo que se subio, y lo que no existe causa MyFileNotFoundError"""
+        deposito = DepositoLocal(str(self.deposito_dir), "pjecz-perseo")
+        deposito.subir("conceptos/conceptos.xlsx", b"contenido", "application/octet-stream")
+        self.assertTrue(deposito.existe("conceptos/conceptos.xlsx"))
+        self.assertFalse(deposito.existe("conceptos/otro.xlsx"))
+        self.assertEqual(deposito.descargar("conceptos/conceptos.xlsx"), b"contenido")
+        self.assertRaises(MyFileNotFoundError, deposito.descargar, "conceptos/otro.xlsx")
+        archivo, tamano, etag = deposito.abrir("conceptos/conceptos.xlsx")
+        with archivo:
+            self.assertEqual((archivo.read(), tamano), (b"contenido", 9))
+        archivo, _, etag_otra_vez = deposito.abrir("conceptos/conceptos.xlsx")
+        archivo.close()
+        self.assertEqual(etag_otra_vez, etag)
+        self.assertIsNone(deposito.url_firmada("conceptos/conceptos.xlsx", 5, "conceptos.xlsx", "application/pdf"))
+        url = deposito.url_publica("conceptos/conceptos.xlsx")
+        self.assertEqual(url, "file://localhost/pjecz-perseo/conceptos/conceptos.xlsx")
+
+    def test_subir_archivo(self):
+        """Se copia un archivo local al deposito y se entrega su URL"""
+        deposito = DepositoLocal(str(self.deposito_dir))
+        url = deposito.subir_archivo("timbrados_zip/2024/01/timbrados.zip", self.subidas[0].ruta, "application/zip")
+        self.assertEqual(url, deposito.url_publica("timbrados_zip/2024/01/timbrados.zip"))
+        self.assertEqual(deposito.descargar("timbrados_zip/2024/01/timbrados.zip"), self.subidas[0].ruta.read_bytes())
+
+    def test_obtener_deposito(self):
+        """Con DEPOSITO_LOCAL_DIR se entrega un DepositoLocal, el mismo para todos los hilos"""
+        with mock.patch.object(depositos, "DEPOSITO_LOCAL_DIR", str(self.deposito_dir)), mock.patch.dict(depositos._depositos):
+            depositos._depositos.clear()
+            entregados = []
+            hilos = [threading.Thread(target=lambda: entregados.append(obtener_deposito("pjecz-perseo"))) for _ in range(8)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            self.assertIsInstance(entregados[0], DepositoLocal)
+            self.assertTrue(all(deposito is entregados[0] for deposito in entregados))
+            self.assertIsNot(obtener_deposito("otro-bucket"), entregados[0])
+
+    def test_listar_sin_deposito(self):
+        """Si no existe el directorio del deposito, es como si no existiera el bucket"""
+        deposito = DepositoLocal(str(Path(self.temporal.name, "no-existe")))
+        self.assertRaises(MyBucketNotFoundError, deposito.listar, "timbrados/")
+
+    def test_reintentos(self):
+        """Las fallas pasajeras se reintentan y las que persisten se entregan como errores"""
+        deposito = DepositoConFallas(str(self.deposito_dir), fallas=2)
+        resultado = subir_en_paralelo(deposito, self.subidas, hilos=4, reintentos=2, espera=0.001)
+        self.assertEqual(resultado.errores, {})
+        self.assertEqual(len(resultado.urls), 20)
+        deposito = DepositoConFallas(str(self.deposito_dir), fallas=5)
+        resultado = subir_en_paralelo(deposito, self.subidas[:3], hilos=2, reintentos=2, espera=0.001)
+        self.assertEqual(resultado.urls, {})
+        self.assertEqual(set(resultado.errores), {subida.nombre for subida in self.subidas[:3]})
+        self.assertTrue(all(intentos == 3 for intentos in deposito.intentos.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Prueba las descargas de lib/descargas.py con un DepositoLocal y el cliente de pruebas de Flask
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import tempfile
+import unittest
+from unittest import mock
+
+from lib.depositos import DepositoGCS, DepositoLocal
+from lib.exceptions import MyFileNotFoundError
+
+try:
+    from flask import Flask
+
+    from lib import descargas
+    from lib.descargas import descargar_archivo
+except ImportError:
+    descargar_archivo = None
+
+try:
+    from google.auth.exceptions import DefaultCredentialsError
+except ImportError:
+    DefaultCredentialsError = None
+
+CONTENIDO = b"%PDF-1.4 " + b"0123456789" * 100000  # Mas grande que un bloque para transmitir varios
+
+
+class DepositoFirmado(DepositoLocal):
+    """Deposito local que puede firmar URLs"""
+
+    def url_firmada(self, nombre: str, minutos: int, descarga_nombre: str, content_type: str):
+        return f"https://firmada.example/{nombre}?minutos={minutos}&nombre={descarga_nombre}"
+
+
+@unittest.skipIf(descargar_archivo is None, "Requiere Flask")
+class TestDescargas(unittest.TestCase):
+    """Pruebas de las descargas redirigidas o transmitidas por bloques"""
+
+    def setUp(self):
+        """Crear el deposito con un archivo y una app con una ruta que lo descarga"""
+        self.temporal = tempfile.TemporaryDirectory()
+        self.deposito = DepositoLocal(self.temporal.name, "pjecz-perseo")
+        self.deposito.subir("timbrados/202401/recibo.pdf", CONTENIDO, "application/pdf")
+        self.app = Flask(__name__)
+        self.app.config["DESCARGAS_POR_PROXY"] = False
+        self.app.add_url_rule("/descargar/<path:nombre>", "descargar", self.descargar)
+        self.obtener_deposito = mock.patch.object(descargas, "obtener_deposito", return_value=self.deposito).start()
+        self.addCleanup(mock.patch.stopall)
+        self.cliente = self.app.test_client()
+
+    def tearDown(self):
+        """Eliminar el directorio temporal"""
+        self.temporal.cleanup()
+
+    @staticmethod
+    def descargar(nombre: str):
+        """Vista de prueba que descarga un archivo del deposito"""
+        return descargar_archivo("pjecz-perseo", nombre, "recibo.pdf", "application/pdf")
+
+    def test_transmitir_con_etag(self):
+        """Si el deposito no puede firmar, se transmite el archivo completo con Content-Length y ETag"""
+        respuesta = self.cliente.get("/descargar/timbrados/202401/recibo.pdf")
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.is_streamed)
+        self.assertEqual(respuesta.data, CONTENIDO)
+        self.assertEqual(respuesta.headers["Content-Length"], str(len(CONTENIDO)))
+        self.assertEqual(respuesta.headers["Content-Type"], "application/pdf")
+        self.assertEqual(respuesta.headers["Content-Disposition"], "attachment; filename=recibo.pdf")
+        _, _, etag = self.deposito.abrir("timbrados/202401/recibo.pdf")
+        self.assertEqual(respuesta.get_etag(), (etag, False))
+        self.obtener_deposito.assert_called_with("pjecz-perseo")
+
+    def test_no_modificado(self):
+        """Con If-None-Match igual al ETag se responde 304 sin contenido y sin leer el archivo"""
+        etag = self.cliente.get("/descargar/timbrados/202401/recibo.pdf").get_etag()[0]
+        with mock.patch.object(descargas, "leer_bloques") as leer_bloques:
+            respuesta = self.cliente.get("/descargar/timbrados/202401/recibo.pdf", headers={"If-None-Match": f'"{etag}"'})
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta.data, b"")
+        self.assertEqual(respuesta.get_etag(), (etag, False))
+        leer_bloques.assert_not_called()
+        otra = self.cliente.get("/descargar/timbrados/202401/recibo.pdf", headers={"If-None-Match": '"otro-etag"'})
+        self.assertEqual((otra.status_code, otra.data), (200, CONTENIDO))
+
+    def test_redirigir_a_url_firmada(self):
+        """Si el deposito puede firmar se redirige a la URL firmada, salvo con DESCARGAS_POR_PROXY"""
+        self.obtener_deposito.return_value = DepositoFirmado(self.temporal.name, "pjecz-perseo")
+        respuesta = self.cliente.get("/descargar/timbrados/202401/recibo.pdf")
+        self.assertEqual(respuesta.status_code, 302)
+        url = f"https://firmada.example/timbrados/202401/recibo.pdf?minutos={descargas.URL_FIRMADA_MINUTOS}&nombre=recibo.pdf"
+        self.assertEqual(respuesta.headers["Location"], url)
+        self.app.config["DESCARGAS_POR_PROXY"] = True
+        respuesta = self.cliente.get("/descargar/timbrados/202401/recibo.pdf")
+        self.assertEqual((respuesta.status_code, respuesta.data), (200, CONTENIDO))
+
+    def test_archivo_no_existe(self):
+        """Si el archivo no existe se provoca MyFileNotFoundError para que la vista lo informe"""
+        self.app.testing = True
+        with self.assertRaises(MyFileNotFoundError):
+            self.cliente.get("/descargar/timbrados/202401/otro.pdf")
+
+
+@unittest.skipIf(descargar_archivo is None or DefaultCredentialsError is None, "Requiere Flask y google-auth")
+class TestUrlFirmada(unittest.TestCase):
+    """Pruebas de la URL firmada de DepositoGCS sin red"""
+
+    def test_sin_credenciales_para_firmar(self):
+        """Si las credenciales no pueden firmar se entrega None y queda una advertencia en la bitacora"""
+        deposito = DepositoGCS.__new__(DepositoGCS)
+        deposito.bucket = mock.MagicMock()
+        deposito.bucket.blob.return_value.generate_signed_url.side_effect = AttributeError("sin llave privada")
+        deposito.credenciales = None
+        deposito.candado = mock.MagicMock()
+        with mock.patch("google.auth.default", side_effect=DefaultCredentialsError("sin credenciales")):
+            with self.assertLogs("lib.depositos", level="WARNING") as registros:
+                self.assertIsNone(deposito.url_firmada("recibo.pdf", 5, "recibo.pdf", "application/pdf"))
+        self.assertIn("sin credenciales", registros.output[0])
+
+    def test_otros_errores_no_se_ocultan(self):
+        """Un error que no es de las credenciales no se convierte en None"""
+        deposito = DepositoGCS.__new__(DepositoGCS)
+        deposito.bucket = mock.MagicMock()
+        deposito.bucket.blob.return_value.generate_signed_url.side_effect = ValueError("expiracion invalida")
+        self.assertRaises(ValueError, deposito.url_firmada, "recibo.pdf", 5, "recibo.pdf", "application/pdf")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Prueba los catalogos en memoria de cli/commands/dimensiones.py con SQLite
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import unittest
+
+from tests.ayudantes import tabulador
+
+try:
+    from flask import Flask
+    from sqlalchemy import event, insert
+
+    import perseo.app  # Registra todos los modelos para que se puedan configurar sus relaciones
+    from cli.commands.dimensiones import Dimensiones
+    from perseo.blueprints.bancos.models import Banco
+    from perseo.blueprints.centros_trabajos.models import CentroTrabajo
+    from perseo.blueprints.conceptos.models import Concepto
+    from perseo.blueprints.cuentas.models import Cuenta
+    from perseo.blueprints.personas.models import Persona
+    from perseo.blueprints.plazas.models import Plaza
+    from perseo.blueprints.puestos.models import Puesto
+    from perseo.blueprints.tabuladores.models import Tabulador
+    from perseo.extensions import database
+except ImportError:
+    Dimensiones = None
+
+
+@unittest.skipIf(Dimensiones is None, "Requiere Flask y SQLAlchemy")
+class TestDimensiones(unittest.TestCase):
+    """Pruebas de los catalogos que se cargan una vez y se actualizan al insertar"""
+
+    def setUp(self):
+        """Crear la base de datos con un registro en cada catalogo"""
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        database.init_app(app)
+        contexto = app.app_context()
+        contexto.push()
+        self.addCleanup(contexto.pop)
+        database.create_all()
+        sesion = database.session
+        sesion.execute(insert(Banco), [{"id": 1, "clave": "5", "clave_dispersion_pensionados": "BBV", "nombre": "BBVA"}])
+        sesion.execute(insert(CentroTrabajo), [{"id": 1, "clave": "CT01", "descripcion": "UNO"}])
+        sesion.execute(insert(Concepto), [{"id": 1, "clave": "P07", "descripcion": "SUELDO"}])
+        sesion.execute(insert(Plaza), [{"id": 1, "clave": "PL01", "descripcion": "UNO"}])
+        sesion.execute(insert(Puesto), [{"id": 1, "clave": "PU01", "descripcion": "UNO"}])
+        sesion.execute(insert(Tabulador), [tabulador(1, 1, 1, 10, 0), tabulador(2, 1, 1, 10, 0), tabulador(3, 1, 1, 10, 1)])
+        persona = {"id": 1, "tabulador_id": 1, "rfc": "AAAA010101AAA", "nombres": "A", "apellido_primero": "A", "modelo": 1}
+        sesion.execute(insert(Persona), [persona])
+        sesion.execute(insert(Cuenta), [{"id": 1, "banco_id": 1, "persona_id": 1, "num_cuenta": "0001"}])
+        sesion.commit()
+        self.dimensiones = Dimensiones(sesion)
+
+        # Contar las sentencias que llegan a la base de datos
+        self.sentencias = []
+        event.listen(database.engine, "before_cursor_execute", self.contar)
+        self.addCleanup(event.remove, database.engine, "before_cursor_execute", self.contar)
+
+    def tearDown(self):
+        """Eliminar la base de datos"""
+        database.session.remove()
+        database.drop_all()
+
+    def contar(self, *args):
+        """Anotar cada sentencia"""
+        self.sentencias.append(args[2])
+
+    def consultas(self) -> int:
+        """Entregar cuantas consultas SELECT se ejecutaron y empezar de nuevo"""
+        cantidad = len([sentencia for sentencia in self.sentencias if sentencia.lstrip().upper().startswith("SELECT")])
+        self.sentencias.clear()
+        return cantidad
+
+    def test_una_consulta_por_catalogo(self):
+        """Cada catalogo se consulta una sola vez, las siguientes busquedas son en memoria"""
+        self.assertEqual(self.dimensiones.consultar_centro_trabajo("CT01").id, 1)
+        self.assertEqual(self.consultas(), 1)
+        self.assertEqual(self.dimensiones.consultar_centro_trabajo("CT01").id, 1)
+        self.assertIsNone(self.dimensiones.consultar_centro_trabajo("CT99"))
+        self.assertEqual(self.dimensiones.consultar_persona("AAAA010101AAA").id, 1)
+        self.assertEqual(self.dimensiones.consultar_persona("AAAA010101AAA").id, 1)
+        self.assertEqual(self.consultas(), 1)
+
+    def test_tabuladores_conserva_el_primero(self):
+        """Con tabuladores repetidos se conserva el primero, y por id se cargan en la misma consulta"""
+        self.assertEqual(self.dimensiones.consultar_tabulador(1, 1, 10, 0).id, 1)
+        self.assertEqual(self.dimensiones.consultar_tabulador(1, 1, 10, 1).id, 3)
+        self.assertEqual(self.dimensiones.consultar_tabulador_por_id(2).id, 2)
+        self.assertEqual(self.consultas(), 1)
+
+    def test_agregar_actualiza_en_su_lugar(self):
+        """Al agregar se hace flush para tener el id y se encuentra sin volver a consultar"""
+        self.dimensiones.centros_trabajos
+        self.dimensiones.conceptos
+        self.dimensiones.personas
+        self.dimensiones.plazas
+        self.assertEqual(self.consultas(), 4)
+        centro_trabajo = self.dimensiones.agregar_centro_trabajo(CentroTrabajo(clave="CT02", descripcion="ND"))
+        concepto = self.dimensiones.agregar_concepto(Concepto(clave="D62", descripcion="ND"))
+        persona = self.dimensiones.agregar_persona(
+            Persona(tabulador_id=1, rfc="BBBB010101BBB", nombres="B", apellido_primero="B", modelo=1)
+        )
+        plaza = self.dimensiones.agregar_plaza(Plaza(clave="PL02", descripcion="ND"))
+        self.assertEqual((centro_trabajo.id, concepto.id, persona.id, plaza.id), (2, 2, 2, 2))
+        self.assertIs(self.dimensiones.consultar_centro_trabajo("CT02"), centro_trabajo)
+        self.assertIs(self.dimensiones.consultar_concepto("D62"), concepto)
+        self.assertIs(self.dimensiones.consultar_persona("BBBB010101BBB"), persona)
+        self.assertIs(self.dimensiones.consultar_plaza("PL02"), plaza)
+        self.assertEqual(self.consultas(), 0)
+
+    def test_agregar_cuenta_sin_flush(self):
+        """La cuenta agregada se suma al listado de la persona sin ejecutar sentencias"""
+        self.assertEqual([cuenta.num_cuenta for cuenta in self.dimensiones.consultar_cuentas(1)], ["0001"])
+        self.assertEqual(self.consultas(), 2)  # Los bancos y las cuentas
+        cuenta = self.dimensiones.agregar_cuenta(Cuenta(banco_id=1, persona_id=1, num_cuenta="0002"))
+        self.assertEqual(self.sentencias, [])
+        self.assertEqual(self.dimensiones.consultar_cuentas(1)[-1], cuenta)
+        self.assertEqual(self.dimensiones.consultar_cuentas(2), [])
+        database.session.commit()
+        self.assertEqual(database.session.query(Cuenta).count(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
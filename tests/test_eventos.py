@@ -0,0 +1,77 @@
+"""
+Prueba la transmision de eventos enviados por el servidor de lib/eventos.py
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import json
+import unittest
+from unittest import mock
+
+try:
+    from lib import eventos
+    from lib.eventos import transmitir_canal
+except ImportError:
+    transmitir_canal = None
+
+
+def terminado(datos: dict) -> bool:
+    """Termina cuando el progreso llega a 100"""
+    return int(datos.get("progress", 0)) >= 100
+
+
+def datos_de(evento: str) -> dict:
+    """Extraer el diccionario de un evento SSE"""
+    linea = [linea for linea in evento.split("\n") if linea.startswith("data: ")][0]
+    return json.loads(linea[len("data: ") :])
+
+
+@unittest.skipIf(transmitir_canal is None, "Requiere redis")
+class TestEventos(unittest.TestCase):
+    """Pruebas de la transmision de eventos"""
+
+    def setUp(self):
+        """Simular la conexion a Redis y su pubsub"""
+        self.redis = mock.MagicMock()
+        self.pubsub = self.redis.pubsub.return_value
+
+    def test_estado_y_mensajes_hasta_terminar(self):
+        """Primero el estado actual, despues un evento por mensaje y comentarios mientras no hay cambios"""
+        self.pubsub.get_message.side_effect = [
+            {"data": json.dumps({"progress": "40", "stage": "Escribiendo"})},
+            None,
+            {"data": json.dumps({"progress": "100"})},
+        ]
+        transmitidos = list(transmitir_canal(self.redis, "canal", lambda: {"progress": "10"}, terminado))
+        self.pubsub.subscribe.assert_called_once_with("canal")
+        self.assertTrue(transmitidos[0].startswith(f"retry: {eventos.REINTENTO}\n"))
+        self.assertEqual(datos_de(transmitidos[0]), {"progress": "10"})
+        self.assertEqual(datos_de(transmitidos[1]), {"progress": "40", "stage": "Escribiendo"})
+        self.assertEqual(transmitidos[2], ": keepalive\n\n")
+        self.assertEqual(datos_de(transmitidos[3]), {"progress": "100"})
+        self.assertEqual(len(transmitidos), 4)
+        self.pubsub.close.assert_called_once()
+
+    def test_ya_terminada(self):
+        """Si el estado actual ya termino, se envia solo ese evento sin esperar mensajes"""
+        transmitidos = list(transmitir_canal(self.redis, "canal", lambda: {"progress": "100"}, terminado))
+        self.assertEqual(len(transmitidos), 1)
+        self.pubsub.get_message.assert_not_called()
+
+    def test_duracion_limitada(self):
+        """Al pasar la duracion se cierra la conexion para que el navegador se vuelva a conectar"""
+        self.pubsub.get_message.return_value = None
+        with mock.patch.object(eventos.time, "monotonic", side_effect=[0.0, 0.0, 50.0, 60.0]):
+            transmitidos = list(transmitir_canal(self.redis, "canal", dict, terminado, duracion=60))
+        self.assertEqual(transmitidos[1:], [": keepalive\n\n", ": keepalive\n\n"])
+        self.assertEqual(self.pubsub.get_message.call_args_list[-1], mock.call(timeout=10.0))
+
+    def test_sin_duracion_solo_el_estado(self):
+        """Con duracion cero se envia el estado actual sin suscribirse, el navegador vuelve a preguntar"""
+        transmitidos = list(transmitir_canal(self.redis, "canal", lambda: {"progress": "10"}, terminado, duracion=0))
+        self.assertEqual(len(transmitidos), 1)
+        self.assertTrue(transmitidos[0].startswith(f"retry: {eventos.REINTENTO}\n"))
+        self.assertEqual(datos_de(transmitidos[0]), {"progress": "10"})
+        self.redis.pubsub.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Prueba la lectura de los archivos de explotacion de cli/commands/explotacion.py con un libro simulado
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+try:
+    from cli.commands import explotacion
+    from cli.commands.explotacion import ConceptoImporte, RenglonCuenta, RenglonMonedero, RenglonNomina
+except ImportError:
+    explotacion = None
+
+
+def valores_nomina(rfc: str, conceptos: list, modelo: int = 1, puesto: str = "PU01A") -> list:
+    """Valores de un renglon de NominaFmt2.XLS como los entrega xlrd, los numeros son flotantes"""
+    valores = [""] * 241
+    valores[1] = "CT01"
+    valores[2] = rfc
+    valores[3] = f"NOMBRE DE {rfc}"
+    valores[8] = "PL01"
+    valores[9] = 10.0
+    valores[12] = 150000.0
+    valores[13] = 25050.0
+    valores[14] = 124950.0
+    valores[16] = 202401.0
+    valores[17] = 202401.0
+    valores[19] = 201001.0
+    valores[20] = puesto
+    valores[236] = float(modelo)
+    valores[240] = 1234.0
+    for numero, (p_o_d, conc, importe) in enumerate(conceptos):
+        columna = 26 + numero * 6
+        valores[columna] = p_o_d
+        valores[columna + 1] = conc
+        valores[columna + 3] = importe
+    return valores
+
+
+class LibroFalso:
+    """Libro de xlrd con una sola hoja, el primer renglon es el encabezado"""
+
+    def __init__(self, renglones: list):
+        self.renglones = [["ENCABEZADO"]] + renglones
+        self.nrows = len(self.renglones)
+
+    def sheet_by_index(self, indice: int):
+        return self
+
+    def row_values(self, fila: int) -> list:
+        return self.renglones[fila]
+
+
+@unittest.skipIf(explotacion is None, "Requiere xlrd y unidecode")
+class TestExplotacion(unittest.TestCase):
+    """Pruebas de los renglones inmutables y del cache por hash del XLS"""
+
+    def setUp(self):
+        """Crear el directorio del cache y un archivo XLS que solo sirve para calcular el hash"""
+        self.temporal = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.temporal.name, "cache")
+        mock.patch.object(explotacion, "EXPLOTACION_CACHE_DIR", str(self.cache_dir)).start()
+        self.addCleanup(mock.patch.stopall)
+        self.ruta = Path(self.temporal.name, "NominaFmt2.XLS")
+        self.ruta.write_bytes(b"quincena 202401")
+
+    def tearDown(self):
+        """Eliminar el directorio temporal"""
+        self.temporal.cleanup()
+
+    def test_analizar_renglon(self):
+        """Se toman los conceptos con su importe, los quinquenios de PQ2 y el puesto de 4 caracteres si es modelo 2"""
+        conceptos = [("P", "07", 100000.0), ("P", "Q2", 5000.0), ("D", "62", "")]
+        renglon = explotacion.analizar_renglon(valores_nomina("AAAA010101AAA", conceptos, modelo=2))
+        self.assertEqual(
+            renglon.conceptos,
+            (ConceptoImporte("P07", 1000.0), ConceptoImporte("PQ2", 50.0), ConceptoImporte("D62", 0.0)),
+        )
+        self.assertEqual((renglon.quinquenios, renglon.es_concepto_pme, renglon.tipo), (2, False, "SALARIO"))
+        self.assertEqual((renglon.modelo, renglon.puesto_clave, renglon.nivel, renglon.num_empleado), (2, "PU01", 10, 1234))
+        self.assertEqual((renglon.percepcion, renglon.deduccion, renglon.importe), (1500.0, 250.5, 1249.5))
+        self.assertEqual((renglon.desde_s, renglon.hasta_s, renglon.quincena_ingreso), ("202401", "202401", "201001"))
+
+    def test_pme_antes_de_quinquenios(self):
+        """Si PME aparece antes que PQ1 a PQ6 no hay quinquenios y el tipo es DESPENSA"""
+        renglon = explotacion.analizar_renglon(valores_nomina("AAAA010101AAA", [("P", "ME", 80000.0), ("P", "Q1", 100.0)]))
+        self.assertEqual((renglon.quinquenios, renglon.es_concepto_pme, renglon.tipo), (None, True, "DESPENSA"))
+        self.assertEqual(renglon.puesto_clave, "PU01A")
+
+    def test_cache_por_hash(self):
+        """La primera lectura guarda el cache con el hash del XLS, la segunda lo usa sin abrir el XLS"""
+        libro = LibroFalso(
+            [
+                valores_nomina("AAAA010101AAA", [("P", "07", 100000.0), ("P", "Q3", 5000.0)]),
+                valores_nomina("BBBB010101BBB", [("P", "ME", 80000.0)]),
+            ]
+        )
+        with mock.patch.object(explotacion.xlrd, "open_workbook", return_value=libro) as open_workbook:
+            leidos = explotacion.leer_nominas_fmt2(self.ruta)
+            guardados = explotacion.leer_nominas_fmt2(self.ruta)
+        open_workbook.assert_called_once_with(str(self.ruta))
+        self.assertEqual(guardados, leidos)
+        self.assertEqual([renglon.rfc for renglon in guardados], ["AAAA010101AAA", "BBBB010101BBB"])
+        self.assertIsInstance(guardados[0], RenglonNomina)
+        self.assertIsInstance(guardados[0].conceptos[0], ConceptoImporte)
+        nombre = f"{explotacion.calcular_hash(self.ruta)}-nominas-v{explotacion.CACHE_VERSION}.json.gz"
+        self.assertEqual([ruta.name for ruta in self.cache_dir.iterdir()], [nombre])
+
+    def test_otro_archivo_otro_cache(self):
+        """Si el XLS cambia su hash es otro y se vuelve a leer, sin cache siempre se lee"""
+        libro = LibroFalso([valores_nomina("AAAA010101AAA", [("P", "07", 100000.0)])])
+        with mock.patch.object(explotacion.xlrd, "open_workbook", return_value=libro) as open_workbook:
+            explotacion.leer_nominas_fmt2(self.ruta)
+            self.ruta.write_bytes(b"quincena 202402")
+            explotacion.leer_nominas_fmt2(self.ruta)
+            explotacion.leer_nominas_fmt2(self.ruta, usar_cache=False)
+        self.assertEqual(open_workbook.call_count, 3)
+        self.assertEqual(len(list(self.cache_dir.iterdir())), 2)
+
+    def test_cuentas_y_monederos(self):
+        """Los renglones de cuentas y monederos tambien se reconstruyen desde el cache"""
+        cuenta = ["AAAA010101AAA"] + [""] * 21 + [1234567890.0, 5.0]
+        monedero = ["", " aaaa010101aaa ", "", "", " 5062000011112222 "]
+        with mock.patch.object(explotacion.xlrd, "open_workbook", return_value=LibroFalso([cuenta])):
+            explotacion.leer_cuentas_bancarias(self.ruta)
+        with mock.patch.object(explotacion.xlrd, "open_workbook", return_value=LibroFalso([monedero])):
+            explotacion.leer_monederos(self.ruta)
+        with mock.patch.object(explotacion.xlrd, "open_workbook") as open_workbook:
+            cuentas = explotacion.leer_cuentas_bancarias(self.ruta)
+            monederos = explotacion.leer_monederos(self.ruta)
+        open_workbook.assert_not_called()
+        self.assertEqual(cuentas, (RenglonCuenta("AAAA010101AAA", "5", "1234567890"),))
+        self.assertEqual(monederos, (RenglonMonedero("AAAA010101AAA", "5062000011112222"),))
+        self.assertIsInstance(monederos[0], RenglonMonedero)
+
+
+if __name__ == "__main__":
+    unittest.main()
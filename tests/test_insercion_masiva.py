@@ -0,0 +1,111 @@
+"""
+Prueba la insercion por bloques de lib/insercion_masiva.py con SQLite
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import csv
+import unittest
+from unittest import mock
+
+from lib.exceptions import MyBulkInsertError
+
+try:
+    from flask import Flask
+
+    import perseo.app  # Registra todos los modelos para que se puedan configurar sus relaciones
+    from lib.insercion_masiva import InsercionMasiva
+    from perseo.blueprints.centros_trabajos.models import CentroTrabajo
+    from perseo.blueprints.conceptos.models import Concepto
+    from perseo.blueprints.nominas.models import Nomina
+    from perseo.extensions import database
+except ImportError:
+    InsercionMasiva = None
+
+
+@unittest.skipIf(InsercionMasiva is None, "Requiere Flask y SQLAlchemy")
+class TestInsercionMasiva(unittest.TestCase):
+    """Pruebas de la insercion por bloques, cada uno en su SAVEPOINT"""
+
+    def setUp(self):
+        """Crear la base de datos vacia"""
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        database.init_app(app)
+        contexto = app.app_context()
+        contexto.push()
+        self.addCleanup(contexto.pop)
+        database.create_all()
+        self.sesion = database.session
+
+    def tearDown(self):
+        """Eliminar la base de datos"""
+        database.session.remove()
+        database.drop_all()
+
+    def claves(self) -> list:
+        """Claves de los conceptos en la base de datos"""
+        return [concepto.clave for concepto in self.sesion.query(Concepto).order_by(Concepto.clave).all()]
+
+    def test_insertar_por_bloques(self):
+        """Al llenarse el bloque se inserta, vaciar inserta el resto y los valores por defecto se aplican"""
+        insercion = InsercionMasiva(self.sesion, Concepto, ["clave", "descripcion"], tamano_bloque=2)
+        self.assertFalse(insercion.usar_copy)
+        for numero in range(5):
+            insercion.agregar((f"P{numero:02d}", f"CONCEPTO {numero}"))
+        self.assertEqual((insercion.contador, len(insercion.renglones)), (4, 1))
+        insercion.vaciar()
+        self.sesion.commit()
+        self.assertEqual(insercion.contador, 5)
+        self.assertEqual(self.claves(), ["P00", "P01", "P02", "P03", "P04"])
+        self.assertTrue(all(concepto.estatus == "A" for concepto in self.sesion.query(Concepto).all()))
+
+    def test_bloque_fallido_se_revierte(self):
+        """Si un bloque falla se revierte solo su SAVEPOINT, lo anterior de la transaccion se conserva"""
+        self.sesion.add(CentroTrabajo(clave="CT01", descripcion="UNO"))
+        self.sesion.flush()
+        insercion = InsercionMasiva(self.sesion, Concepto, ["clave", "descripcion"], tamano_bloque=2)
+        insercion.agregar(("P01", "UNO"))
+        insercion.agregar(("P02", "DOS"))
+        insercion.agregar(("P03", "TRES"))
+        with self.assertRaises(MyBulkInsertError):
+            insercion.agregar(("P01", "REPETIDO"))  # Llena el bloque y la clave se repite
+        self.assertEqual((insercion.contador, insercion.renglones), (2, []))
+        insercion.agregar(("P04", "CUATRO"))
+        insercion.vaciar()
+        self.sesion.commit()
+        self.assertEqual(self.claves(), ["P01", "P02", "P04"])
+        self.assertEqual(self.sesion.query(CentroTrabajo).count(), 1)
+
+    def test_renglon_incompleto(self):
+        """Un renglon con otra cantidad de valores que las columnas se rechaza sin insertar"""
+        insercion = InsercionMasiva(self.sesion, Concepto, ["clave", "descripcion"])
+        self.assertRaises(MyBulkInsertError, insercion.agregar, ("P01",))
+        insercion.vaciar()
+        self.assertEqual((insercion.contador, insercion.renglones_por_segundo), (0, 0))
+
+
+@unittest.skipIf(InsercionMasiva is None, "Requiere Flask y SQLAlchemy")
+class TestInsercionMasivaCopy(unittest.TestCase):
+    """Pruebas del CSV que se entrega a COPY FROM STDIN, con una sesion simulada de psycopg2"""
+
+    def test_nulos_y_textos_vacios(self):
+        """Los None llegan como NULL y los textos vacios, como el num_cheque por defecto, como textos vacios"""
+        sesion = mock.MagicMock()
+        sesion.get_bind.return_value.dialect.driver = "psycopg2"
+        insercion = InsercionMasiva(sesion, Nomina, ["persona_id", "tipo", "desde_clave", "timbrado_id"])
+        self.assertTrue(insercion.usar_copy)
+        self.assertEqual(insercion.columnas_por_defecto["num_cheque"], "")
+        insercion.agregar((1, "SALARIO", "", None))
+        insercion.vaciar()
+        cursor = sesion.connection.return_value.connection.cursor.return_value.__enter__.return_value
+        sentencia, archivo = cursor.copy_expert.call_args.args
+        self.assertIn("FORMAT csv, NULL '\\N'", sentencia)
+        columnas = sentencia[sentencia.index("(") + 1 : sentencia.index(")")].split(", ")
+        renglon = dict(zip(columnas, next(csv.reader(archivo.getvalue().splitlines()))))
+        self.assertEqual((renglon["desde_clave"], renglon["timbrado_id"]), ("", "\\N"))
+        self.assertEqual((renglon["num_cheque"], renglon["estatus"]), ("", "A"))
+        self.assertNotEqual(renglon["creado"], "\\N")
+        self.assertEqual(insercion.contador, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
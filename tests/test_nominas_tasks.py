@@ -0,0 +1,52 @@
+"""
+Prueba el lanzamiento de las tareas hijas de perseo/blueprints/nominas/tasks.py
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import logging
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+try:
+    from perseo.blueprints.tareas.colas import COLAS
+
+    # El modulo crea la app del proceso, una bitacora y fija el locale es_MX al importarse, en la prueba no se necesitan
+    with mock.patch("perseo.app.get_app"), mock.patch("logging.FileHandler", return_value=logging.NullHandler()):
+        with mock.patch("locale.setlocale"):
+            from perseo.blueprints.nominas import tasks
+except ImportError:
+    tasks = None
+
+
+@unittest.skipIf(tasks is None, "Requiere Flask, RQ y SQLAlchemy")
+class TestNominasTasks(unittest.TestCase):
+    """Pruebas de generar todos con tareas hijas"""
+
+    def setUp(self):
+        """Simular el trabajo de RQ, la cola y los consecutivos reservados"""
+        self.job = SimpleNamespace(origin="pjecz_perseo_masivas", connection=mock.MagicMock(), get_id=lambda: "padre")
+        mock.patch.object(tasks, "get_current_job", return_value=self.job).start()
+        self.Queue = mock.patch.object(tasks, "Queue").start()
+        mock.patch.object(tasks, "reiniciar_consecutivos_generados", return_value="Reiniciados").start()
+        reservas = {fuente: {"consecutivos": {}, "cantidades": {}} for fuente in ("NOMINAS", "PENSIONADOS")}
+        mock.patch.object(tasks, "reservar_consecutivos", return_value=reservas).start()
+        mock.patch.object(tasks, "set_task_progress").start()
+        self.set_task_children = mock.patch.object(tasks, "set_task_children").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_hijas_con_el_tiempo_de_los_generadores(self):
+        """Las hijas van a la cola del padre, pero con el tiempo limite de la cola pesadas y no el de RQ"""
+        tasks.lanzar_generar_todos("202401")
+        self.Queue.assert_called_once_with("pjecz_perseo_masivas", connection=self.job.connection)
+        llamadas = self.Queue.return_value.enqueue.call_args_list
+        self.assertEqual(len(llamadas), len(tasks.GENERADORES_TODOS))
+        self.set_task_children.assert_called_once_with(len(tasks.GENERADORES_TODOS), "Reiniciados")
+        for llamada in llamadas:
+            self.assertEqual(llamada.kwargs["job_timeout"], COLAS["pesadas"])
+            self.assertEqual(llamada.kwargs["kwargs"]["padre_id"], "padre")
+        fuentes = [llamada.kwargs["kwargs"]["fuente"] for llamada in llamadas]
+        self.assertEqual(fuentes, list(tasks.GENERADORES_TODOS))
+
+
+if __name__ == "__main__":
+    unittest.main()
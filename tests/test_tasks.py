@@ -0,0 +1,89 @@
+"""
+Prueba el avance de las tareas en el fondo de lib/tasks.py
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import json
+import unittest
+from unittest import mock
+
+from tests.ayudantes import RedisFalso
+
+try:
+    from lib import tasks
+except ImportError:
+    tasks = None
+
+
+@unittest.skipIf(tasks is None, "Requiere Flask, RQ y SQLAlchemy")
+class TestTasks(unittest.TestCase):
+    """Pruebas del avance de las tareas"""
+
+    def setUp(self):
+        """Simular la tarea actual de RQ y el modelo Tarea"""
+        self.job = mock.MagicMock()
+        self.job.get_id.return_value = "tarea-1"
+        self.tuberia = self.job.connection.pipeline.return_value.__enter__.return_value
+        mock.patch.object(tasks, "get_current_job", return_value=self.job).start()
+        self.Tarea = mock.patch.object(tasks, "Tarea").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def campos_guardados(self) -> dict:
+        """Campos del ultimo hset en Redis"""
+        return self.tuberia.hset.call_args.kwargs["mapping"]
+
+    def test_avance_solo_en_redis(self):
+        """Reportar el avance no consulta ni escribe la tabla tareas"""
+        for numero in range(1, 2001):
+            if numero % tasks.REPORT_EVERY == 0:
+                tasks.report_task_progress(numero, 2000, "Escribiendo filas")
+        tasks.set_task_progress(50, "A la mitad")
+        self.Tarea.query.get.assert_not_called()
+        self.assertEqual(self.tuberia.hset.call_count, 5)
+        self.assertEqual(self.campos_guardados()["message"], "A la mitad")
+
+    def test_porcentaje_y_tiempo_estimado(self):
+        """El porcentaje no llega a 100 hasta terminar y el tiempo estimado es proporcional a lo que falta"""
+        with mock.patch.object(tasks.time, "monotonic", side_effect=[100.0, 110.0]):
+            tasks.report_task_progress(0, 400, "Etapa")
+            tasks.report_task_progress(100, 400, "Etapa")
+        esperados = {"done": "100", "total": "400", "stage": "Etapa", "progress": "25", "eta": "30"}
+        self.assertEqual(self.campos_guardados(), esperados)
+        tasks.report_task_progress(400, 400, "Etapa")
+        self.assertEqual(self.campos_guardados()["progress"], "99")
+
+    def test_cambios_de_estado_en_la_base_de_datos(self):
+        """Al iniciar, al terminar y al fallar se escribe en la tabla tareas"""
+        tasks.set_task_progress(0, "Iniciando")
+        tasks.set_task_progress(100, "Termino", "archivo.xlsx", "https://url")
+        tasks.set_task_error("Fallo")
+        self.assertEqual(self.Tarea.query.get.call_count, 3)
+        tarea = self.Tarea.query.get.return_value
+        self.assertEqual(tarea.save.call_count, 3)
+        self.assertEqual((tarea.mensaje, tarea.ha_terminado), ("Fallo", True))
+
+    def test_publicar_despues_de_guardar(self):
+        """Al terminar se guarda en la tabla tareas antes de publicar el avance en el canal"""
+        orden = []
+        self.Tarea.query.get.return_value.save.side_effect = lambda: orden.append("save")
+        self.tuberia.publish.side_effect = lambda canal, datos: orden.append(canal)
+        tasks.set_task_progress(100, "Termino")
+        self.assertEqual(orden, ["save", "perseo:tareas:tarea-1:eventos"])
+        publicado = json.loads(self.tuberia.publish.call_args.args[1])
+        self.assertEqual(publicado, {"progress": "100", "eta": "0", "message": "Termino"})
+
+    def test_padre_termina_sin_su_trabajo_en_rq(self):
+        """La tarea padre termina con la ultima hija aunque RQ ya haya borrado el trabajo de la padre"""
+        redis = RedisFalso()
+        self.job.connection = redis
+        redis.hset("rq:job:tarea-1", mapping={"status": "finished"})
+        tasks.set_task_children(2, "Se reiniciaron los consecutivos")
+        self.assertEqual(tasks.set_parent_task_progress("tarea-1", "NOMINAS: listo", redis), 50)
+        redis.delete("rq:job:tarea-1")
+        self.assertEqual(tasks.set_parent_task_progress("tarea-1", "TIMBRADOS: listo", redis), 100)
+        tarea = self.Tarea.query.get.return_value
+        self.assertTrue(tarea.ha_terminado)
+        self.assertEqual(tarea.mensaje, "Se reiniciaron los consecutivos\nNOMINAS: listo\nTIMBRADOS: listo")
+
+
+if __name__ == "__main__":
+    unittest.main()
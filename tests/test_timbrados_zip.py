@@ -0,0 +1,235 @@
+"""
+Prueba exportar_zip de perseo/blueprints/timbrados/tasks.py con un DepositoLocal y SQLite, y los permisos de sus vistas
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import logging
+import tempfile
+import threading
+import unittest
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from lib.depositos import DepositoLocal
+
+try:
+    from flask import Flask
+    from sqlalchemy import insert
+
+    # El modulo crea la app del proceso y una bitacora en logs/ al importarse, en la prueba no se necesitan
+    with mock.patch("perseo.app.get_app"), mock.patch("logging.FileHandler", return_value=logging.NullHandler()):
+        from perseo.blueprints.timbrados import tasks
+    from lib.exceptions import MyEmptyError
+    from perseo.blueprints.centros_trabajos.models import CentroTrabajo
+    from perseo.blueprints.nominas.models import Nomina
+    from perseo.blueprints.permisos.models import Permiso
+    from perseo.blueprints.personas.models import Persona
+    from perseo.blueprints.quincenas.models import Quincena
+    from perseo.blueprints.tareas import views as tareas_views
+    from perseo.blueprints.timbrados import views as timbrados_views
+    from perseo.blueprints.timbrados.models import Timbrado
+    from perseo.extensions import database
+except ImportError:
+    tasks = None
+
+BUCKET = "pjecz-perseo"
+
+# RFC, clave del centro de trabajo, tipo de nomina, ¿existe su XML en el deposito?
+NOMINAS = [
+    ("AAAA010101AAA", "CT01", "SALARIO", True),
+    ("BBBB010101BBB", "CT01", "SALARIO", False),
+    ("CCCC010101CCC", "CT02", "SALARIO", True),
+    ("AAAA010101AAA", "CT01", "AGUINALDO", True),
+]
+
+
+class DepositoContado(DepositoLocal):
+    """Deposito local que cuenta las descargas que empiezan"""
+
+    def __init__(self, directorio: str, bucket_name: str):
+        super().__init__(directorio, bucket_name)
+        self.iniciadas = 0
+        self.candado = threading.Lock()
+
+    def abrir(self, nombre: str) -> tuple:
+        with self.candado:
+            self.iniciadas += 1
+        return super().abrir(nombre)
+
+
+@unittest.skipIf(tasks is None, "Requiere Flask, RQ y SQLAlchemy")
+class TestTimbradosZip(unittest.TestCase):
+    """Pruebas de exportar a un archivo ZIP los timbrados de una quincena"""
+
+    def setUp(self):
+        """Crear el deposito con los PDF y XML, y la base de datos con las nominas y sus timbrados"""
+        self.temporal = tempfile.TemporaryDirectory()
+        self.deposito = DepositoLocal(self.temporal.name, BUCKET)
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        database.init_app(app)
+        contexto = app.app_context()
+        contexto.push()
+        self.addCleanup(contexto.pop)
+        database.create_all()
+        self.insertar()
+        mock.patch.object(tasks, "get_settings", return_value=SimpleNamespace(CLOUD_STORAGE_DEPOSITO=BUCKET)).start()
+        mock.patch.object(tasks, "obtener_deposito", return_value=self.deposito).start()
+        self.directorio_temporal = Path(self.temporal.name, "tmp")
+        self.directorio_temporal.mkdir()
+        mock.patch.object(tempfile, "tempdir", str(self.directorio_temporal)).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def tearDown(self):
+        """Eliminar la base de datos y el directorio temporal"""
+        database.session.remove()
+        database.drop_all()
+        self.temporal.cleanup()
+
+    def insertar(self):
+        """Insertar la quincena, los centros de trabajo, las personas, las nominas y los timbrados"""
+        sesion = database.session
+        sesion.execute(insert(Quincena), [{"id": 1, "clave": "202401", "estado": "ABIERTA"}])
+        sesion.execute(insert(CentroTrabajo), [{"id": 1, "clave": "CT01", "descripcion": "UNO"}])
+        sesion.execute(insert(CentroTrabajo), [{"id": 2, "clave": "CT02", "descripcion": "DOS"}])
+        rfcs = sorted({rfc for rfc, _, _, _ in NOMINAS})
+        personas = [
+            {"id": i, "tabulador_id": 1, "rfc": rfc, "nombres": rfc, "apellido_primero": rfc, "modelo": 1}
+            for i, rfc in enumerate(rfcs, 1)
+        ]
+        sesion.execute(insert(Persona), personas)
+        for numero, (rfc, centro_trabajo_clave, tipo, con_xml) in enumerate(NOMINAS, start=1):
+            nombre = f"timbrados/202401/{rfc}-{tipo}"
+            self.deposito.subir(f"{nombre}.pdf", f"PDF {rfc} {tipo}".encode(), "application/pdf")
+            if con_xml:
+                self.deposito.subir(f"{nombre}.xml", f"XML {rfc} {tipo}".encode(), "application/xml")
+            nomina = {
+                "id": numero,
+                "centro_trabajo_id": int(centro_trabajo_clave[-1]),
+                "persona_id": rfcs.index(rfc) + 1,
+                "plaza_id": 1,
+                "quincena_id": 1,
+                "tipo": tipo,
+                "desde": date(2024, 1, 1),
+                "desde_clave": "202401",
+                "hasta": date(2024, 1, 15),
+                "hasta_clave": "202401",
+                "percepcion": 100,
+                "deduccion": 0,
+                "importe": 100,
+                "fecha_pago": date(2024, 1, 15),
+                "timbrado_id": numero,
+            }
+            sesion.execute(insert(Nomina), [nomina])
+            timbrado = {
+                "id": numero,
+                "nomina_id": numero,
+                "estado": "TIMBRADO",
+                "tfd_version": "1.1",
+                "tfd_uuid": f"uuid-{numero}",
+                "tfd_fecha_timbrado": datetime(2024, 1, 15),
+                "tfd_sello_cfd": "",
+                "tfd_num_cert_sat": "",
+                "tfd_sello_sat": "",
+                "archivo_pdf": f"{rfc}-{tipo}.pdf",
+                "url_pdf": self.deposito.url_publica(f"{nombre}.pdf"),
+                "archivo_xml": "" if tipo == "SALARIO" and rfc == "CCCC010101CCC" else f"{rfc}-{tipo}.xml",
+                "url_xml": self.deposito.url_publica(f"{nombre}.xml"),
+            }
+            sesion.execute(insert(Timbrado), [timbrado])
+        sesion.commit()
+
+    def leer_zip(self, nombre_archivo_zip: str) -> dict:
+        """Leer el ZIP subido al deposito, entrega nombre -> contenido"""
+        nombres = [nombre for nombre in self.deposito.listar("timbrados_zip/") if nombre.endswith(nombre_archivo_zip)]
+        self.assertEqual(len(nombres), 1)
+        with zipfile.ZipFile(Path(self.deposito.raiz, nombres[0])) as archivo_zip:
+            return {nombre: archivo_zip.read(nombre) for nombre in archivo_zip.namelist()}
+
+    def test_contenido_y_faltantes(self):
+        """El ZIP lleva una carpeta por RFC con sus PDF y XML, y los que no estan en el deposito se informan"""
+        mensaje, nombre_archivo_zip, url = tasks.exportar_zip("202401")
+        contenido = self.leer_zip(nombre_archivo_zip)
+        esperados = {
+            "AAAA010101AAA/AAAA010101AAA-SALARIO.pdf": b"PDF AAAA010101AAA SALARIO",
+            "AAAA010101AAA/AAAA010101AAA-SALARIO.xml": b"XML AAAA010101AAA SALARIO",
+            "BBBB010101BBB/BBBB010101BBB-SALARIO.pdf": b"PDF BBBB010101BBB SALARIO",
+            "CCCC010101CCC/CCCC010101CCC-SALARIO.pdf": b"PDF CCCC010101CCC SALARIO",
+            "CCCC010101CCC/uuid-3.xml": b"XML CCCC010101CCC SALARIO",
+        }
+        self.assertEqual(contenido, esperados)
+        self.assertIn("Se exportaron 5 archivos", mensaje)
+        self.assertIn("faltaron 1: BBBB010101BBB/BBBB010101BBB-SALARIO.xml", mensaje)
+        self.assertTrue(nombre_archivo_zip.startswith("timbrados_202401_salario_"))
+        self.assertTrue(url.endswith(nombre_archivo_zip))
+        self.assertEqual(list(self.directorio_temporal.iterdir()), [])  # El ZIP local se elimino al subirlo
+
+    def test_filtros(self):
+        """Se puede filtrar por tipo, por centro de trabajo y por RFC"""
+        _, nombre_archivo_zip, _ = tasks.exportar_zip("202401", tipo="AGUINALDO")
+        self.assertEqual(
+            set(self.leer_zip(nombre_archivo_zip)),
+            {"AAAA010101AAA/AAAA010101AAA-AGUINALDO.pdf", "AAAA010101AAA/AAAA010101AAA-AGUINALDO.xml"},
+        )
+        _, nombre_archivo_zip, _ = tasks.exportar_zip("202401", centro_trabajo_clave="CT02")
+        self.assertEqual({nombre.split("/")[0] for nombre in self.leer_zip(nombre_archivo_zip)}, {"CCCC010101CCC"})
+        _, nombre_archivo_zip, _ = tasks.exportar_zip("202401", rfcs=["BBBB010101BBB"])
+        self.assertEqual(set(self.leer_zip(nombre_archivo_zip)), {"BBBB010101BBB/BBBB010101BBB-SALARIO.pdf"})
+        self.assertRaises(MyEmptyError, tasks.exportar_zip, "202401", tipo="DESPENSA")
+
+    def test_descargas_en_vuelo(self):
+        """Nunca hay mas de PENDIENTES_POR_HILO descargas por hilo sin entregar"""
+        deposito = DepositoContado(self.temporal.name, BUCKET)
+        archivos = [
+            (f"{numero}.pdf", f"timbrados/202401/{rfc}-{tipo}.pdf") for numero, (rfc, _, tipo, _) in enumerate(NOMINAS * 10)
+        ]
+        entregados = []
+        for nombre, temporal, error in tasks.descargar_en_paralelo(deposito, archivos, hilos=2):
+            self.assertIsNone(error)
+            temporal.close()
+            entregados.append(nombre)
+            self.assertLessEqual(deposito.iniciadas - len(entregados), tasks.PENDIENTES_POR_HILO * 2)
+        self.assertEqual(sorted(entregados), sorted(nombre for nombre, _ in archivos))
+
+
+@unittest.skipIf(tasks is None, "Requiere Flask, RQ y SQLAlchemy")
+class TestPermisosZip(unittest.TestCase):
+    """Pruebas de quien puede lanzar y descargar el ZIP de los timbrados"""
+
+    def setUp(self):
+        """Crear una app con las vistas de tareas y timbrados, con la tarea y el usuario simulados"""
+        app = Flask(__name__)
+        app.config.update(LOGIN_DISABLED=True, CLOUD_STORAGE_DEPOSITO=BUCKET)
+        app.register_blueprint(tareas_views.tareas)
+        app.register_blueprint(timbrados_views.timbrados)
+        self.cliente = app.test_client()
+        self.usuario = SimpleNamespace(id=1, permisos={})
+        self.usuario.can = lambda modulo, nivel: self.usuario.permisos.get(modulo, 0) >= nivel
+        self.usuario.can_view = lambda modulo: self.usuario.can(modulo, Permiso.VER)
+        for modulo in ("perseo.blueprints.usuarios.decorators", tareas_views.__name__, timbrados_views.__name__):
+            mock.patch(f"{modulo}.current_user", self.usuario).start()
+        tarea = SimpleNamespace(id="tarea", usuario_id=2, url=f"https://{BUCKET}/timbrados_zip/t.zip", archivo="t.zip")
+        mock.patch.object(tareas_views, "Tarea").start().query.get_or_404.return_value = tarea
+        self.descargar_archivo = mock.patch.object(tareas_views, "descargar_archivo", return_value="ZIP").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_descargar_solo_quien_la_lanzo_o_ve_timbrados(self):
+        """Otro usuario sin permiso en TIMBRADOS recibe 403, quien la lanzo o puede ver los timbrados la descarga"""
+        self.assertEqual(self.cliente.get("/tareas/tarea/zip").status_code, 403)
+        self.descargar_archivo.assert_not_called()
+        self.usuario.permisos["TIMBRADOS"] = Permiso.VER
+        self.assertEqual(self.cliente.get("/tareas/tarea/zip").data, b"ZIP")
+        self.usuario.permisos.clear()
+        self.usuario.id = 2
+        self.assertEqual(self.cliente.get("/tareas/tarea/zip").data, b"ZIP")
+
+    def test_exportar_requiere_administrar(self):
+        """Con solo VER en TIMBRADOS no se puede lanzar la exportacion"""
+        self.usuario.permisos["TIMBRADOS"] = Permiso.VER
+        self.assertEqual(self.cliente.get("/timbrados/exportar_zip/202401").status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Prueba el cache de permisos de perseo/blueprints/usuarios/cache.py con SQLite
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import unittest
+
+from tests.ayudantes import crear_usuario_con_roles
+
+try:
+    from sqlalchemy import event
+
+    from perseo.blueprints.permisos.models import Permiso
+    from perseo.blueprints.roles.models import Rol
+    from perseo.blueprints.usuarios.cache import ModuloMenu, obtener_permisos
+    from perseo.blueprints.usuarios_roles.models import UsuarioRol
+    from perseo.extensions import database
+except ImportError:
+    obtener_permisos = None
+
+
+@unittest.skipIf(obtener_permisos is None, "Requiere Flask, Redis y SQLAlchemy")
+class TestUsuariosCache(unittest.TestCase):
+    """Pruebas del cache de permisos por usuario"""
+
+    def setUp(self):
+        """Crear la base de datos con un usuario, su rol y los permisos de dos modulos"""
+        modulos = [
+            {"id": 1, "nombre": "NOMINAS", "nombre_corto": "Nominas", "icono": "bi-cash", "ruta": "/nominas"},
+            {"id": 2, "nombre": "PERSONAS", "nombre_corto": "Personas", "icono": "bi-person", "ruta": "/personas"},
+        ]
+        permisos = [
+            {"id": 1, "rol_id": 1, "modulo_id": 1, "nombre": "CAPTURISTAS en NOMINAS", "nivel": Permiso.MODIFICAR},
+            {"id": 2, "rol_id": 1, "modulo_id": 2, "nombre": "CAPTURISTAS en PERSONAS", "nivel": Permiso.VER},
+        ]
+        crear_usuario_con_roles(
+            self,
+            modulos=modulos,
+            roles=[{"id": 1, "nombre": "CAPTURISTAS"}],
+            usuarios_roles=[{"id": 1, "rol_id": 1, "usuario_id": 1, "descripcion": "CAPTURISTAS"}],
+            permisos=permisos,
+            email="capturista@pjecz.gob.mx",
+            nombres="CAPTURISTA",
+        )
+
+        # Contar las sentencias que llegan a la base de datos
+        self.sentencias = []
+        event.listen(database.engine, "before_cursor_execute", self.contar)
+        self.addCleanup(event.remove, database.engine, "before_cursor_execute", self.contar)
+
+    def contar(self, *args):
+        """Anotar cada sentencia"""
+        self.sentencias.append(args[2])
+
+    def consultas_al_obtener(self) -> int:
+        """Obtener los permisos del usuario y entregar cuantas sentencias se ejecutaron"""
+        self.sentencias.clear()
+        self.permisos, self.menu = obtener_permisos(1)
+        return len(self.sentencias)
+
+    def test_frio_y_caliente(self):
+        """Sin cache es una sola consulta, con cache ninguna, y se entregan los mismos permisos y menu"""
+        self.assertEqual(self.consultas_al_obtener(), 1)
+        esperados = ({"NOMINAS": Permiso.MODIFICAR, "PERSONAS": Permiso.VER}, self.menu)
+        self.assertEqual(self.consultas_al_obtener(), 0)
+        self.assertEqual((self.permisos, self.menu), esperados)
+        self.assertEqual(
+            self.menu,
+            [
+                ModuloMenu("NOMINAS", "Nominas", "bi-cash", "/nominas"),
+                ModuloMenu("PERSONAS", "Personas", "bi-person", "/personas"),
+            ],
+        )
+
+    def test_invalidar_al_cambiar_permiso(self):
+        """Al hacer commit de un cambio en un permiso se vuelve a consultar y se ve el cambio"""
+        self.consultas_al_obtener()
+        database.session.get(Permiso, 2).nivel = Permiso.ADMINISTRAR
+        database.session.commit()
+        self.assertEqual(self.consultas_al_obtener(), 1)
+        self.assertEqual(self.permisos["PERSONAS"], Permiso.ADMINISTRAR)
+        self.assertEqual(self.consultas_al_obtener(), 0)
+
+    def test_invalidar_al_cambiar_rol(self):
+        """Al hacer commit de un cambio en un rol se vuelve a consultar"""
+        self.consultas_al_obtener()
+        database.session.get(Rol, 1).nombre = "CAPTURISTAS NOMINAS"
+        database.session.commit()
+        self.assertEqual(self.consultas_al_obtener(), 1)
+
+    def test_invalidar_al_quitar_rol_al_usuario(self):
+        """Al hacer commit de la baja de un usuario_rol el usuario se queda sin esos permisos"""
+        self.consultas_al_obtener()
+        database.session.get(UsuarioRol, 1).estatus = "B"
+        database.session.commit()
+        self.assertEqual(self.consultas_al_obtener(), 1)
+        self.assertEqual((self.permisos, self.menu), ({}, []))
+
+    def test_sin_commit_no_se_invalida(self):
+        """Un cambio que se revierte no invalida el cache"""
+        self.consultas_al_obtener()
+        database.session.get(Permiso, 1).nivel = Permiso.VER
+        database.session.rollback()
+        self.assertEqual(self.consultas_al_obtener(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Prueba el usuario autenticado en Redis de perseo/blueprints/usuarios/principal.py con SQLite
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+import unittest
+
+from tests.ayudantes import crear_usuario_con_roles
+
+try:
+    from sqlalchemy import event
+
+    from perseo.blueprints.permisos.models import Permiso
+    from perseo.blueprints.usuarios.models import Usuario
+    from perseo.blueprints.usuarios.principal import UsuarioPrincipal, cargar_principal, olvidar_principal
+    from perseo.blueprints.usuarios_roles.models import UsuarioRol
+    from perseo.extensions import database
+except ImportError:
+    cargar_principal = None
+
+
+@unittest.skipIf(cargar_principal is None, "Requiere Flask, Redis y SQLAlchemy")
+class TestUsuariosPrincipal(unittest.TestCase):
+    """Pruebas del usuario autenticado sin consultar la base de datos"""
+
+    def setUp(self):
+        """Crear la base de datos con un usuario con dos roles"""
+        usuarios_roles = [
+            {"id": 1, "rol_id": 1, "usuario_id": 1, "descripcion": "CONSULTAS"},
+            {"id": 2, "rol_id": 2, "usuario_id": 1, "descripcion": "ADMINISTRADORES", "estatus": "B"},
+        ]
+        permisos = [
+            {"id": 1, "rol_id": 1, "modulo_id": 1, "nombre": "CONSULTAS en NOMINAS", "nivel": Permiso.VER},
+            {"id": 2, "rol_id": 2, "modulo_id": 1, "nombre": "ADMINISTRADORES en NOMINAS", "nivel": Permiso.ADMINISTRAR},
+        ]
+        crear_usuario_con_roles(
+            self,
+            modulos=[{"id": 1, "nombre": "NOMINAS", "nombre_corto": "Nominas", "icono": "bi", "ruta": "/"}],
+            roles=[{"id": 1, "nombre": "CONSULTAS"}, {"id": 2, "nombre": "ADMINISTRADORES"}],
+            usuarios_roles=usuarios_roles,
+            permisos=permisos,
+        )
+
+        # Contar las sentencias que llegan a la base de datos
+        self.sentencias = []
+        event.listen(database.engine, "before_cursor_execute", self.contar)
+        self.addCleanup(event.remove, database.engine, "before_cursor_execute", self.contar)
+
+    def contar(self, *args):
+        """Anotar cada sentencia"""
+        self.sentencias.append(args[2])
+
+    def consultas_al_cargar(self) -> int:
+        """Cargar el usuario autenticado como lo hace Flask-Login y entregar cuantas sentencias se ejecutaron"""
+        database.session.remove()  # Cada peticion empieza con una sesion nueva
+        self.sentencias.clear()
+        self.principal = cargar_principal("1")
+        return len(self.sentencias)
+
+    def test_frio_y_caliente(self):
+        """Sin cache se consulta el usuario y sus permisos, con cache no se toca la base de datos"""
+        self.assertEqual(self.consultas_al_cargar(), 2)
+        frio = self.principal
+        self.assertEqual(self.consultas_al_cargar(), 0)
+        self.assertIsInstance(self.principal, UsuarioPrincipal)
+        self.assertEqual(self.principal, frio)
+        self.assertEqual((self.principal.id, self.principal.email), (1, "usuario@pjecz.gob.mx"))
+        self.assertTrue(self.principal.is_active)
+        self.assertTrue(self.principal.can_view("NOMINAS"))
+        self.assertFalse(self.principal.can_admin("NOMINAS"))
+        self.assertEqual(self.principal.modulos_menu_principal[0].nombre, "NOMINAS")
+
+    def test_olvidar_al_salir(self):
+        """Al salir del sistema se borra de Redis y la siguiente vez se consulta la base de datos"""
+        self.consultas_al_cargar()
+        olvidar_principal(1)
+        self.assertEqual(self.consultas_al_cargar(), 1)  # Solo el usuario, los permisos siguen en su cache
+        self.assertEqual(self.consultas_al_cargar(), 0)
+
+    def test_invalidar_al_cambiar_estatus(self):
+        """Al dar de baja al usuario se deja de usar el guardado y deja de estar activo"""
+        self.consultas_al_cargar()
+        database.session.get(Usuario, 1).estatus = "B"
+        database.session.commit()
+        self.assertGreater(self.consultas_al_cargar(), 0)
+        self.assertFalse(self.principal.is_active)
+
+    def test_invalidar_al_cambiar_roles(self):
+        """Al activar un rol del usuario se deja de usar el guardado y se ven sus nuevos permisos"""
+        self.consultas_al_cargar()
+        database.session.get(UsuarioRol, 2).estatus = "A"
+        database.session.commit()
+        self.assertGreater(self.consultas_al_cargar(), 0)
+        self.assertTrue(self.principal.can_admin("NOMINAS"))
+
+    def test_usuario_inexistente(self):
+        """Si el usuario no existe o el identificador no es valido se entrega None"""
+        self.assertIsNone(cargar_principal("999"))
+        self.assertIsNone(cargar_principal("no-es-numero"))
+
+
+if __name__ == "__main__":
+    unittest.main()